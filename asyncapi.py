@@ -0,0 +1,110 @@
+"""Asyncio API for planning and applying renames from an event loop.
+
+Every filesystem call runs in a bounded thread pool, so slow mounts never
+block the loop. apply() is an async iterator that keeps at most ``window``
+renames in flight and schedules more only as the consumer pulls results, so a
+slow consumer throttles the filesystem work instead of queueing it all up.
+
+    results = await plan(folder, [{"type": "case", "mode": "lowercase"}])
+    async for outcome in apply(results):
+        print(outcome["original"].name, outcome["status"])
+"""
+
+import asyncio
+from collections.abc import AsyncIterator
+from concurrent.futures import Executor, ThreadPoolExecutor
+from functools import partial
+from pathlib import Path
+
+from engine import apply_one, list_files, validate_new_names
+from fsbackend import LOCAL, FileSystem
+from metrics import ApplyMetrics
+from organize import find_organize
+from regexguard import DEFAULT_BUDGET, compute_names
+
+DEFAULT_WORKERS = 8
+DEFAULT_WINDOW = 32
+
+_default_executor: ThreadPoolExecutor | None = None
+
+
+def default_executor() -> ThreadPoolExecutor:
+    """Return the shared pool used when no executor is passed (created on first use)."""
+    global _default_executor
+    if _default_executor is None:
+        _default_executor = ThreadPoolExecutor(
+            max_workers=DEFAULT_WORKERS, thread_name_prefix="renametool"
+        )
+    return _default_executor
+
+
+def _plan_sync(
+    folder: Path,
+    operations: list[dict],
+    ext_filter: str | None,
+    excluded_names: frozenset[str],
+    regex_budget: float | None,
+    fs: FileSystem,
+) -> list[dict]:
+    if find_organize(operations) is not None:
+        raise ValueError("organize operations are not supported here; use organize.plan_organize()")
+    files = list_files(folder, ext_filter, excluded_names=excluded_names, fs=fs)
+    names = compute_names(files, operations, regex_budget)
+    return validate_new_names(list(zip(files, names)), fs=fs)
+
+
+async def plan(
+    folder: Path,
+    operations: list[dict],
+    *,
+    ext_filter: str | None = None,
+    excluded_names: frozenset[str] = frozenset(),
+    regex_budget: float | None = DEFAULT_BUDGET,
+    executor: Executor | None = None,
+    fs: FileSystem = LOCAL,
+) -> list[dict]:
+    """List folder, compute new names and validate them without blocking the loop.
+
+    Returns validate_new_names() results for every listed file. Raises
+    regexguard.RegexTimeout if regex operations exceed regex_budget, and
+    ValueError for an organize operation (see organize.plan_organize()).
+    """
+    loop = asyncio.get_running_loop()
+    return await loop.run_in_executor(
+        executor or default_executor(),
+        partial(_plan_sync, folder, operations, ext_filter, excluded_names, regex_budget, fs),
+    )
+
+
+async def apply(
+    results: list[dict],
+    *,
+    executor: Executor | None = None,
+    window: int = DEFAULT_WINDOW,
+    metrics: ApplyMetrics | None = None,
+    fs: FileSystem = LOCAL,
+) -> AsyncIterator[dict]:
+    """Apply the OK rows of results, yielding one outcome dict per file.
+
+    Outcomes have keys original, new_name, status ("RENAMED" or "ERROR") and
+    error, and are yielded in completion order. If the consumer stops early,
+    renames already in flight finish but no new ones start.
+    """
+    loop = asyncio.get_running_loop()
+    executor = executor or default_executor()
+    items = [r for r in results if r["status"] == "OK"]
+    metrics = metrics or ApplyMetrics(len(items))
+    pending: set[asyncio.Future] = set()
+    next_item = 0
+    try:
+        while next_item < len(items) or pending:
+            while next_item < len(items) and len(pending) < max(1, window):
+                rename = partial(apply_one, items[next_item], metrics, fs=fs)
+                pending.add(loop.run_in_executor(executor, rename))
+                next_item += 1
+            done, pending = await asyncio.wait(pending, return_when=asyncio.FIRST_COMPLETED)
+            for future in done:
+                yield future.result()
+    finally:
+        if pending:
+            await asyncio.wait(pending)
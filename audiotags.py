@@ -0,0 +1,277 @@
+"""Tag-region-only audio metadata reading for music renaming.
+
+ID3v2 frames, FLAC metadata blocks and MP4 atoms are walked header by header;
+only the frames/blocks/atoms that carry naming fields are read; everything
+else (artwork, seek tables, sample tables, audio payload) is skipped with a
+seek.
+"""
+
+import struct
+from pathlib import Path
+
+from filecache import DEFAULT_WORKERS, FileCache, map_cached
+
+TAGS_CACHE_FILE = ".renametool_tags.json"
+MAX_FIELD_SIZE = 64 * 1024
+MAX_META_SIZE = 1024 * 1024
+MAX_BLOCKS = 256
+
+# Frame/field names -> normalized keys
+ID3_FRAMES = {
+    "TIT2": "title",
+    "TPE1": "artist",
+    "TPE2": "albumartist",
+    "TALB": "album",
+    "TRCK": "track",
+    "TPOS": "disc",
+    "TDRC": "year",
+    "TYER": "year",
+    # ID3v2.2 three-character ids
+    "TT2": "title",
+    "TP1": "artist",
+    "TP2": "albumartist",
+    "TAL": "album",
+    "TRK": "track",
+    "TPA": "disc",
+    "TYE": "year",
+}
+VORBIS_FIELDS = {
+    "TITLE": "title",
+    "ARTIST": "artist",
+    "ALBUMARTIST": "albumartist",
+    "ALBUM": "album",
+    "TRACKNUMBER": "track",
+    "DISCNUMBER": "disc",
+    "DATE": "year",
+}
+MP4_ATOMS = {
+    b"\xa9nam": "title",
+    b"\xa9ART": "artist",
+    b"aART": "albumartist",
+    b"\xa9alb": "album",
+    b"\xa9day": "year",
+    b"trkn": "track",
+    b"disk": "disc",
+}
+MP4_CONTAINERS = (b"moov", b"udta", b"meta", b"ilst")
+
+
+def _normalize(raw: dict) -> dict:
+    """Turn raw string fields into the final info dict (numbers for track/disc/year)."""
+    info = {}
+    for key, value in raw.items():
+        if isinstance(value, str):
+            value = value.strip("\0 ").strip()
+            if not value:
+                continue
+        if key in ("track", "disc", "year"):
+            digits = str(value).split("/")[0].strip()[:4]
+            if not digits.isdigit():
+                continue
+            value = int(digits)
+            if value == 0:
+                continue
+        info[key] = value
+    return info
+
+
+def _syncsafe(data: bytes) -> int:
+    return (data[0] << 21) | (data[1] << 14) | (data[2] << 7) | data[3]
+
+
+def _decode_id3_text(body: bytes) -> str:
+    if not body:
+        return ""
+    encoding, text = body[0], body[1:]
+    if encoding == 1:
+        return text.decode("utf-16", errors="replace").split("\0")[0]
+    if encoding == 2:
+        return text.decode("utf-16-be", errors="replace").split("\0")[0]
+    if encoding == 3:
+        return text.decode("utf-8", errors="replace").split("\0")[0]
+    return text.decode("latin-1").split("\0")[0]
+
+
+def _read_id3(f) -> dict:
+    header = f.read(10)
+    major, flags = header[3], header[5]
+    end = 10 + _syncsafe(header[6:10])
+
+    if major == 2:
+        id_len, header_len = 3, 6
+    else:
+        id_len, header_len = 4, 10
+    if flags & 0x80 and major < 4:
+        # Whole-tag unsynchronisation: frame boundaries are unreliable without
+        # undoing it, so fall back to a bounded read of the tag.
+        data = f.read(min(end - 10, MAX_META_SIZE)).replace(b"\xff\x00", b"\xff")
+        return _parse_id3_frames(data, major, id_len, header_len)
+    if flags & 0x40:
+        ext = f.read(4)
+        ext_size = _syncsafe(ext) if major >= 4 else struct.unpack(">I", ext)[0] + 4
+        f.seek(10 + ext_size)
+
+    raw = {}
+    while f.tell() + header_len <= end:
+        frame_header = f.read(header_len)
+        frame_id = frame_header[:id_len].decode("latin-1")
+        if not frame_id.strip("\0") or not frame_id.isalnum():
+            break  # padding
+        if major == 2:
+            size = int.from_bytes(frame_header[3:6], "big")
+        elif major >= 4:
+            size = _syncsafe(frame_header[4:8])
+        else:
+            size = struct.unpack(">I", frame_header[4:8])[0]
+        key = ID3_FRAMES.get(frame_id)
+        if key and size <= MAX_FIELD_SIZE and key not in raw:
+            raw[key] = _decode_id3_text(f.read(size))
+        else:
+            f.seek(size, 1)
+    return raw
+
+
+def _parse_id3_frames(data: bytes, major: int, id_len: int, header_len: int) -> dict:
+    raw = {}
+    pos = 0
+    while pos + header_len <= len(data):
+        frame_id = data[pos : pos + id_len].decode("latin-1")
+        if not frame_id.strip("\0") or not frame_id.isalnum():
+            break
+        if major == 2:
+            size = int.from_bytes(data[pos + 3 : pos + 6], "big")
+        else:
+            size = struct.unpack(">I", data[pos + 4 : pos + 8])[0]
+        key = ID3_FRAMES.get(frame_id)
+        body = data[pos + header_len : pos + header_len + size]
+        if key and key not in raw:
+            raw[key] = _decode_id3_text(body)
+        pos += header_len + size
+    return raw
+
+
+def _read_flac(f) -> dict:
+    f.seek(4)
+    for _ in range(MAX_BLOCKS):
+        header = f.read(4)
+        if len(header) < 4:
+            break
+        last, block_type = header[0] & 0x80, header[0] & 0x7F
+        size = int.from_bytes(header[1:4], "big")
+        if block_type == 4:  # VORBIS_COMMENT
+            return _parse_vorbis_comment(f.read(min(size, MAX_META_SIZE)))
+        f.seek(size, 1)
+        if last:
+            break
+    return {}
+
+
+def _parse_vorbis_comment(data: bytes) -> dict:
+    (vendor_len,) = struct.unpack_from("<I", data, 0)
+    pos = 4 + vendor_len
+    (count,) = struct.unpack_from("<I", data, pos)
+    pos += 4
+    raw = {}
+    for _ in range(count):
+        (length,) = struct.unpack_from("<I", data, pos)
+        pos += 4
+        comment = data[pos : pos + length].decode("utf-8", errors="replace")
+        pos += length
+        name, _, value = comment.partition("=")
+        key = VORBIS_FIELDS.get(name.upper())
+        if key and key not in raw:
+            raw[key] = value
+    return raw
+
+
+def _mp4_atoms(f, end: int):
+    """Yield (type, payload_start, atom_end) for the atoms between f.tell() and end."""
+    pos = f.tell()
+    while pos + 8 <= end:
+        f.seek(pos)
+        header = f.read(8)
+        if len(header) < 8:
+            return
+        size, atom_type = struct.unpack(">I4s", header)
+        header_len = 8
+        if size == 1:
+            (size,) = struct.unpack(">Q", f.read(8))
+            header_len = 16
+        elif size == 0:
+            size = end - pos
+        if size < header_len:
+            return
+        yield atom_type, pos + header_len, pos + size
+        pos += size
+
+
+def _read_mp4(f, file_size: int) -> dict:
+    # Descend moov -> udta -> meta -> ilst, seeking past every other atom
+    start, end = 0, file_size
+    for container in MP4_CONTAINERS:
+        f.seek(start)
+        for atom_type, payload, atom_end in _mp4_atoms(f, end):
+            if atom_type == container:
+                start, end = payload, atom_end
+                if container == b"meta":
+                    start += 4  # FullBox version/flags
+                break
+        else:
+            return {}
+
+    if end - start > MAX_META_SIZE:
+        return {}
+    f.seek(start)
+    ilst = f.read(end - start)
+    raw = {}
+    pos = 0
+    while pos + 8 <= len(ilst):
+        size, atom_type = struct.unpack_from(">I4s", ilst, pos)
+        if size < 8:
+            break
+        key = MP4_ATOMS.get(atom_type)
+        # Each item holds a 'data' atom: size, 'data', type(4), locale(4), value
+        data_size, data_type = struct.unpack_from(">I4s", ilst, pos + 8)
+        if key and data_type == b"data":
+            value = ilst[pos + 24 : pos + 8 + data_size]
+            if atom_type in (b"trkn", b"disk"):
+                raw[key] = struct.unpack_from(">H", value, 2)[0] if len(value) >= 4 else 0
+            else:
+                raw[key] = value.decode("utf-8", errors="replace")
+        pos += size
+    return raw
+
+
+def read_tags(path: Path) -> dict | None:
+    """Read naming fields from an MP3 (ID3v2), FLAC or MP4/M4A file.
+
+    Returns a dict with any of the keys title, artist, albumartist, album,
+    track, disc, year (numbers as ints), or None if no tags were found.
+    """
+    try:
+        with open(path, "rb") as f:
+            magic = f.read(12)
+            f.seek(0)
+            if magic[:3] == b"ID3":
+                raw = _read_id3(f)
+            elif magic[:4] == b"fLaC":
+                raw = _read_flac(f)
+            elif magic[4:8] == b"ftyp":
+                raw = _read_mp4(f, path.stat().st_size)
+            else:
+                return None
+    except (OSError, struct.error, IndexError):
+        return None
+    return _normalize(raw) or None
+
+
+def read_tags_batch(
+    files: list[Path],
+    cache: FileCache | None = None,
+    workers: int = DEFAULT_WORKERS,
+) -> dict[Path, dict]:
+    """Read tags for many files in parallel; files without tags are omitted."""
+    infos = map_cached(files, lambda p: read_tags(p) or {}, cache, workers)
+    if cache is not None:
+        cache.save()
+    return {p: info for p, info in infos.items() if info}
@@ -0,0 +1,54 @@
+"""Benchmark catalog.Catalog inserts and history lookups.
+
+    python benchmarks/bench_catalog.py [ROWS]
+
+Records ROWS (default 1,000,000) renames of existing files, in runs of
+10,000 spread over 1,000 folders, into a temporary catalog, then times
+lookup() and trace() for names at random.
+"""
+
+import random
+import sys
+import tempfile
+import time
+from pathlib import Path
+
+sys.path.insert(0, str(Path(__file__).resolve().parent.parent))
+
+from catalog import Catalog  # noqa: E402
+
+RUN = 10_000
+
+
+def main(n_rows: int) -> None:
+    rng = random.Random(0)
+    with tempfile.TemporaryDirectory() as tmp:
+        tmp = Path(tmp)
+        existing = tmp / "file.txt"  # every recorded target resolves to this file
+        existing.write_text("")
+        with Catalog(tmp / "catalog.db") as catalog:
+            start = time.perf_counter()
+            for run in range(0, n_rows, RUN):
+                pairs = [
+                    (Path(f"/archive/{i % 1000}/old{i}.mkv"), existing)
+                    for i in range(run, min(run + RUN, n_rows))
+                ]
+                catalog.record(pairs)
+            elapsed = time.perf_counter() - start
+            print(f"recorded {n_rows:,} renames in {elapsed:.1f}s ({n_rows / elapsed:,.0f}/s)")
+
+            names = [f"old{rng.randrange(n_rows)}.mkv" for _ in range(1000)]
+            start = time.perf_counter()
+            for name in names:
+                catalog.lookup(name)
+            per = (time.perf_counter() - start) / len(names)
+            print(f"lookup: {per * 1000:.3f} ms per name")
+            start = time.perf_counter()
+            for _ in range(100):
+                catalog.trace("file.txt", tmp)
+            per = (time.perf_counter() - start) / 100
+            print(f"trace of a name {n_rows:,} files were renamed to: {per * 1000:.3f} ms")
+
+
+if __name__ == "__main__":
+    main(int(sys.argv[1]) if len(sys.argv) > 1 else 1_000_000)
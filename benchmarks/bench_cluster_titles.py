@@ -0,0 +1,36 @@
+"""Benchmark patterns.cluster_titles() on many random titles.
+
+    python benchmarks/bench_cluster_titles.py [TITLES]
+
+Builds TITLES (default 20,000) titles of one to four words drawn from 3,000
+random words, so most titles share trigrams with many others, and clusters
+them without a year.
+"""
+
+import random
+import sys
+import time
+from pathlib import Path
+
+sys.path.insert(0, str(Path(__file__).resolve().parent.parent))
+
+from patterns import cluster_titles  # noqa: E402
+
+LETTERS = "abcdefghijklmnopqrstuvwxyz"
+
+
+def make_titles(n: int, rng: random.Random) -> list[str]:
+    words = ["".join(rng.choices(LETTERS, k=rng.randint(3, 9))) for _ in range(3000)]
+    return [" ".join(rng.choices(words, k=rng.randint(1, 4))) for _ in range(n)]
+
+
+def main(n_titles: int) -> None:
+    titles = make_titles(n_titles, random.Random(1))
+    start = time.perf_counter()
+    groups = cluster_titles(titles)
+    elapsed = time.perf_counter() - start
+    print(f"clustered {n_titles:,} titles into {len(groups):,} groups in {elapsed:.2f}s")
+
+
+if __name__ == "__main__":
+    main(int(sys.argv[1]) if len(sys.argv) > 1 else 20_000)
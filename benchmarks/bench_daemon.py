@@ -0,0 +1,66 @@
+"""Benchmark repeated plan requests against the rename daemon.
+
+    python benchmarks/bench_daemon.py [FILES]
+
+Creates FILES (default 1,000) TV episode files in a temporary folder, serves
+a daemon on a thread and times, over one client connection, the first plan
+of a template rename (a cold listing and parse) and then repeated plans of
+the same operations, which the daemon answers from the warm session. For
+comparison it also times planning from scratch in this process, as a
+one-shot script run would (without the interpreter startup it also pays).
+"""
+
+import statistics
+import sys
+import tempfile
+import threading
+import time
+from pathlib import Path
+
+sys.path.insert(0, str(Path(__file__).resolve().parent.parent))
+
+from client import Client  # noqa: E402
+from daemon import FolderWatcher, RenameDaemon, serve  # noqa: E402
+from session import RenameSession  # noqa: E402
+
+OPERATIONS = [{"type": "template", "template": "{show} - S{season}E{episode}"}]
+REPEATS = 200
+
+
+def main(n_files: int) -> None:
+    with tempfile.TemporaryDirectory() as tmp:
+        tmp = Path(tmp)
+        folder = tmp / "media"
+        folder.mkdir()
+        for i in range(n_files):
+            (folder / f"show.{i // 100}.s{i % 20:02d}e{i % 100:02d}.720p.x264.mkv").write_text("")
+        path = tmp / "d.sock"
+        daemon = RenameDaemon({}, FolderWatcher.create())
+        ready = threading.Event()
+        thread = threading.Thread(target=serve, args=(daemon, path, ready.set), daemon=True)
+        thread.start()
+        ready.wait()
+        with Client(path) as client:
+            start = time.perf_counter()
+            client.plan(folder, OPERATIONS)
+            print(f"first plan of {n_files:,} files: {(time.perf_counter() - start) * 1000:.1f} ms")
+            times = []
+            for _ in range(REPEATS):
+                start = time.perf_counter()
+                client.plan(folder, OPERATIONS)
+                times.append(time.perf_counter() - start)
+            print(
+                f"repeated plan: median {statistics.median(times) * 1000:.2f} ms,"
+                f" p95 {statistics.quantiles(times, n=20)[-1] * 1000:.2f} ms"
+            )
+            client.shutdown()
+        thread.join()
+        daemon.close()
+
+        start = time.perf_counter()
+        RenameSession(folder, OPERATIONS).preview()
+        print(f"cold plan in a fresh session: {(time.perf_counter() - start) * 1000:.1f} ms")
+
+
+if __name__ == "__main__":
+    main(int(sys.argv[1]) if len(sys.argv) > 1 else 1_000)
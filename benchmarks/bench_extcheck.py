@@ -0,0 +1,54 @@
+"""Benchmark extcheck.iter_validated() against validate_new_names().
+
+    python benchmarks/bench_extcheck.py [FILES]
+
+Plans FILES (default 1,000,000) renames in an empty temporary folder, 1% of
+them onto a shared name, and checks them once on disk (streaming, counting
+statuses) and once in memory, printing the time and the peak Python memory
+of each as traced by tracemalloc (which slows both down, and does not see
+SQLite's page cache, bounded by extcheck.CACHE_KIB).
+"""
+
+import sys
+import tempfile
+import time
+import tracemalloc
+from collections import Counter
+from pathlib import Path
+
+sys.path.insert(0, str(Path(__file__).resolve().parent.parent))
+
+from engine import validate_new_names  # noqa: E402
+from extcheck import iter_validated  # noqa: E402
+
+
+def pairs(folder: Path, n: int):
+    for i in range(n):
+        yield folder / f"file{i:08d}.txt", f"dup{i % 100}.txt" if i % 100 == 0 else f"new{i}.txt"
+
+
+def measure(label: str, run) -> None:
+    tracemalloc.start()
+    start = time.perf_counter()
+    counts = run()
+    elapsed = time.perf_counter() - start
+    peak = tracemalloc.get_traced_memory()[1]
+    tracemalloc.stop()
+    print(f"{label}: {elapsed:.1f}s, peak {peak / 2**20:,.0f} MiB, {dict(counts)}")
+
+
+def main(n: int) -> None:
+    with tempfile.TemporaryDirectory() as tmp:
+        folder = Path(tmp)
+        measure(
+            "on disk  ",
+            lambda: Counter(r["status"] for r in iter_validated(pairs(folder, n), n)),
+        )
+        measure(
+            "in memory",
+            lambda: Counter(r["status"] for r in validate_new_names(list(pairs(folder, n)))),
+        )
+
+
+if __name__ == "__main__":
+    main(int(sys.argv[1]) if len(sys.argv) > 1 else 1_000_000)
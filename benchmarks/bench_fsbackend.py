@@ -0,0 +1,71 @@
+"""Benchmark dry runs on MemoryFileSystem and applies under injected NAS latency.
+
+    python benchmarks/bench_fsbackend.py [FILES] [SLOW_FILES]
+
+Plans and applies a lowercase rename of FILES (default 1,000,000) files held
+in memory, then applies SLOW_FILES (default 500) renames through a
+FaultyFileSystem adding 2 ms per rename and 0.5 ms per stat (a NAS round
+trip), one at a time with RenameSession.apply() and 32 at a time with
+asyncapi.apply(). Nothing touches the disk.
+"""
+
+import asyncio
+import sys
+import time
+from pathlib import Path
+
+sys.path.insert(0, str(Path(__file__).resolve().parent.parent))
+
+import asyncapi  # noqa: E402
+from fsbackend import FaultyFileSystem, MemoryFileSystem  # noqa: E402
+from session import RenameSession  # noqa: E402
+
+ROOT = Path("/library")
+LOWER = [{"type": "case", "mode": "lowercase"}]
+NAS_LATENCY = {"rename": 0.002, "stat": 0.0005}
+
+
+def timed(label: str, fn):
+    start = time.perf_counter()
+    result = fn()
+    print(f"{label}: {time.perf_counter() - start:.2f}s")
+    return result
+
+
+def dry_run(n_files: int) -> None:
+    fs = MemoryFileSystem()
+    timed(
+        f"create {n_files:,} files in memory",
+        lambda: fs.add_files(ROOT, (f"Episode {i:07d}.MKV" for i in range(n_files))),
+    )
+    session = RenameSession(ROOT, LOWER, fs=fs)
+    rows = timed("plan", session.preview)
+    print(f"  {sum(r['status'] == 'OK' for r in rows):,} OK")
+    outcomes = timed("apply", session.apply)
+    print(f"  {sum(o['status'] == 'RENAMED' for o in outcomes):,} renamed")
+
+
+def slow_apply(n_files: int) -> None:
+    def slow_fs() -> FaultyFileSystem:
+        fs = MemoryFileSystem()
+        fs.add_files(ROOT, (f"Episode {i:05d}.MKV" for i in range(n_files)))
+        return FaultyFileSystem(fs, latency=NAS_LATENCY)
+
+    session = RenameSession(ROOT, LOWER, fs=slow_fs())
+    session.preview()
+    timed(f"apply {n_files:,} renames sequentially at NAS latency", session.apply)
+
+    fs = slow_fs()
+
+    async def run():
+        results = await asyncapi.plan(ROOT, LOWER, fs=fs)
+        return [o async for o in asyncapi.apply(results, window=32, fs=fs)]
+
+    start = time.perf_counter()
+    asyncio.run(run())
+    print(f"plan and apply with asyncapi, window 32: {time.perf_counter() - start:.2f}s")
+
+
+if __name__ == "__main__":
+    dry_run(int(sys.argv[1]) if len(sys.argv) > 1 else 1_000_000)
+    slow_apply(int(sys.argv[2]) if len(sys.argv) > 2 else 500)
@@ -0,0 +1,52 @@
+"""Benchmark patterns.mine_patterns() on a large mixed folder.
+
+    python benchmarks/bench_mine_patterns.py [FILES]
+
+Builds FILES (default 100,000) names: fansub episodes with a group prefix
+and CRC tag, "_FINAL_vN" documents, camera sequences, and a share of
+unstructured names, then mines them and prints the proposals.
+"""
+
+import random
+import string
+import sys
+import time
+from pathlib import Path
+
+sys.path.insert(0, str(Path(__file__).resolve().parent.parent))
+
+from patterns import mine_patterns  # noqa: E402
+
+WORDS = "alpha bravo charlie delta echo foxtrot golf hotel india juliet kilo lima".split()
+
+
+def make_names(n: int, rng: random.Random) -> list[str]:
+    junk = string.ascii_lowercase + string.digits + "_-. "
+    names = []
+    for _ in range(n):
+        kind = rng.random()
+        title = " ".join(rng.choices(WORDS, k=3)).title()
+        if kind < 0.3:
+            crc = f"{rng.getrandbits(32):08X}"
+            names.append(f"[SubsPlease] {title} - {rng.randint(1, 99):02d} (1080p) [{crc}].mkv")
+        elif kind < 0.5:
+            names.append(f"{title.replace(' ', '_')}_FINAL_v{rng.randint(1, 12)}.docx")
+        elif kind < 0.7:
+            names.append(f"IMG_{rng.randint(0, 99999):05d}.jpg")
+        else:
+            names.append("".join(rng.choices(junk, k=rng.randint(8, 30))) + ".txt")
+    return names
+
+
+def main(n_files: int) -> None:
+    names = make_names(n_files, random.Random(0))
+    start = time.perf_counter()
+    results = mine_patterns(names)
+    elapsed = time.perf_counter() - start
+    print(f"mined {n_files:,} names in {elapsed:.2f}s")
+    for r in results:
+        print(f"  {r['match_count']:>7,}  {r['regex']:<32}  {r['name']}")
+
+
+if __name__ == "__main__":
+    main(int(sys.argv[1]) if len(sys.argv) > 1 else 100_000)
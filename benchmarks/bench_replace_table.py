@@ -0,0 +1,61 @@
+"""Benchmark replacetable.ReplacementTable against one find_replace op per entry.
+
+    python benchmarks/bench_replace_table.py [PATTERNS] [STEMS]
+
+Builds PATTERNS (default 10,000) random literal entries and applies them to
+STEMS (default 10,000) release-style stems, once through a compiled
+replacement table and once as the equivalent stack of find_replace
+operations (on a 1% sample of stems, extrapolated, since it is O(ops x files)).
+"""
+
+import random
+import string
+import sys
+import time
+from pathlib import Path
+
+sys.path.insert(0, str(Path(__file__).resolve().parent.parent))
+
+from engine import compute_new_name  # noqa: E402
+from replacetable import ReplacementTable  # noqa: E402
+
+
+def main(n_patterns: int, n_stems: int) -> None:
+    rng = random.Random(0)
+    alphabet = string.ascii_letters + string.digits
+    replacements = {}
+    while len(replacements) < n_patterns:
+        find = "".join(rng.choices(alphabet, k=rng.randint(3, 12)))
+        replacements[find] = find.lower()
+    stems = [
+        ".".join("".join(rng.choices(alphabet, k=rng.randint(2, 8))) for _ in range(8))
+        for _ in range(n_stems)
+    ]
+    files = [Path(f"/media/{stem}.mkv") for stem in stems]
+
+    start = time.perf_counter()
+    table = ReplacementTable(replacements)
+    build = time.perf_counter() - start
+    op = [{"type": "replace_table", "table": table}]
+    start = time.perf_counter()
+    for f in files:
+        compute_new_name(f, op)
+    elapsed = time.perf_counter() - start
+    print(f"table: built {n_patterns:,} entries in {build:.2f}s")
+    print(f"table: {n_stems:,} stems in {elapsed:.2f}s ({n_stems / elapsed:,.0f} stems/s)")
+
+    ops = [
+        {"type": "find_replace", "find": k, "replace": v, "regex": False}
+        for k, v in replacements.items()
+    ]
+    sample = files[: max(1, n_stems // 100)]
+    start = time.perf_counter()
+    for f in sample:
+        compute_new_name(f, ops)
+    per_stem = (time.perf_counter() - start) / len(sample)
+    print(f"find_replace ops: ~{per_stem * n_stems:.2f}s for {n_stems:,} stems (extrapolated)")
+
+
+if __name__ == "__main__":
+    args = [int(a) for a in sys.argv[1:3]]
+    main(*(args + [10_000, 10_000][len(args) :]))
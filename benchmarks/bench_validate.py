@@ -0,0 +1,57 @@
+"""Benchmark engine.validate_new_names() on a large synthetic batch.
+
+    python benchmarks/bench_validate.py [COUNT]
+
+Builds COUNT (default 1,000,000) rename pairs in a temporary folder holding a
+few real files, so the folder is listed and probed once as in a real run, and
+reports names validated per second. The batch mixes plain, non-ASCII,
+colliding, reserved and illegal names.
+"""
+
+import sys
+import tempfile
+import time
+from pathlib import Path
+
+sys.path.insert(0, str(Path(__file__).resolve().parent.parent))
+
+from engine import validate_new_names  # noqa: E402
+
+
+def make_pairs(folder: Path, count: int) -> list[tuple[Path, str]]:
+    pairs = []
+    for i in range(count):
+        original = folder / f"IMG_{i:07d}.JPG"
+        if i % 1000 == 0:
+            new_name = "CON.jpg"
+        elif i % 1000 == 1:
+            new_name = f"bad:{i}.jpg"
+        elif i % 100 == 2:
+            new_name = "collision.jpg"
+        elif i % 10 == 3:
+            new_name = f"Café – {i:07d}.jpg"
+        else:
+            new_name = f"img_{i:07d}.jpg"
+        pairs.append((original, new_name))
+    return pairs
+
+
+def main(count: int) -> None:
+    with tempfile.TemporaryDirectory() as tmp:
+        folder = Path(tmp)
+        for name in ("IMG_0000000.JPG", "existing.jpg"):
+            (folder / name).write_text("")
+        pairs = make_pairs(folder, count)
+        start = time.perf_counter()
+        results = validate_new_names(pairs)
+        elapsed = time.perf_counter() - start
+    statuses: dict[str, int] = {}
+    for r in results:
+        statuses[r["status"]] = statuses.get(r["status"], 0) + 1
+    print(f"{count:,} names in {elapsed:.2f}s ({count / elapsed:,.0f} names/s)")
+    for status, n in sorted(statuses.items()):
+        print(f"  {status}: {n:,}")
+
+
+if __name__ == "__main__":
+    main(int(sys.argv[1]) if len(sys.argv) > 1 else 1_000_000)
@@ -0,0 +1,194 @@
+"""Central SQLite catalog of every rename, for history lookups across folders.
+
+Each folder's .renametool.log and undo map only describe that folder. With a
+catalog configured, every apply (and undo) run is also recorded in one
+database: a session row with its time, and one row per renamed file with its
+folders, old and new name, and a fingerprint (device, inode, size and mtime,
+as filecache.file_key()) that identifies the file across later renames.
+
+Rows are inserted in batches inside one transaction per run, in WAL mode so
+a query can read while another process records. Both names are indexed, so
+lookup() and trace() are a few B-tree probes however many rows there are.
+
+    with Catalog(path) as catalog:
+        catalog.record([(src, dst), ...])
+        catalog.trace("Show - S01E01.mkv")  # every earlier name, oldest first
+"""
+
+import sqlite3
+from collections.abc import Iterable
+from datetime import datetime
+from pathlib import Path
+
+from filecache import file_key
+from fsbackend import LOCAL, FileSystem
+
+BATCH_ROWS = 10_000  # rows per executemany()
+MAX_TRACE = 1_000  # renames followed back by trace()
+
+_SCHEMA = """
+PRAGMA journal_mode = WAL;
+PRAGMA synchronous = NORMAL;
+CREATE TABLE IF NOT EXISTS folders (id INTEGER PRIMARY KEY, path TEXT NOT NULL UNIQUE);
+CREATE TABLE IF NOT EXISTS sessions (
+    id INTEGER PRIMARY KEY, started TEXT NOT NULL, kind TEXT NOT NULL
+);
+CREATE TABLE IF NOT EXISTS renames (
+    id INTEGER PRIMARY KEY,
+    session INTEGER NOT NULL REFERENCES sessions (id),
+    folder INTEGER NOT NULL REFERENCES folders (id),
+    old TEXT NOT NULL,
+    new_folder INTEGER NOT NULL REFERENCES folders (id),
+    new TEXT NOT NULL,
+    fingerprint TEXT
+);
+CREATE INDEX IF NOT EXISTS renames_old ON renames (old);
+CREATE INDEX IF NOT EXISTS renames_new ON renames (new);
+CREATE INDEX IF NOT EXISTS renames_target ON renames (new_folder, new);
+"""
+
+_SELECT = """
+SELECT r.id, s.started, s.kind, f.path, r.old, nf.path, r.new, r.fingerprint
+FROM renames r
+JOIN sessions s ON s.id = r.session
+JOIN folders f ON f.id = r.folder
+JOIN folders nf ON nf.id = r.new_folder
+"""
+
+
+def _row(values: tuple) -> dict:
+    _, started, kind, folder, old, new_folder, new, fingerprint = values
+    return {
+        "when": started,
+        "kind": kind,
+        "folder": folder,
+        "old": old,
+        "new_folder": new_folder,
+        "new": new,
+        "fingerprint": fingerprint,
+    }
+
+
+class Catalog:
+    """A rename catalog database, created on first use."""
+
+    def __init__(self, path: Path):
+        self.path = Path(path)
+        self.path.parent.mkdir(parents=True, exist_ok=True)
+        self.db = sqlite3.connect(self.path)
+        self.db.executescript(_SCHEMA)
+        self._folders: dict[str, int] = {}
+
+    def __enter__(self) -> "Catalog":
+        return self
+
+    def __exit__(self, *exc) -> None:
+        self.close()
+
+    def close(self) -> None:
+        self.db.close()
+
+    def _folder_id(self, path: str) -> int:
+        folder_id = self._folders.get(path)
+        if folder_id is None:
+            self.db.execute("INSERT OR IGNORE INTO folders (path) VALUES (?)", (path,))
+            (folder_id,) = self.db.execute(
+                "SELECT id FROM folders WHERE path = ?", (path,)
+            ).fetchone()
+            self._folders[path] = folder_id
+        return folder_id
+
+    def record(
+        self, renames: Iterable[tuple[Path, Path]], kind: str = "rename", fs: FileSystem = LOCAL
+    ) -> int:
+        """Record one run's (old path, new path) renames as a session; return how many.
+
+        Fingerprints are taken by stat()ing each new path through fs. Pairs
+        whose new path does not exist (the rename failed) are skipped.
+        Nothing is recorded, not even the session, if no pair is left.
+        """
+        count = 0
+        with self.db:
+            started = datetime.now().isoformat(sep=" ", timespec="seconds")
+            session = self.db.execute(
+                "INSERT INTO sessions (started, kind) VALUES (?, ?)", (started, kind)
+            ).lastrowid
+            batch = []
+            for src, dst in renames:
+                try:
+                    fingerprint = file_key(fs.stat(dst))
+                except OSError:
+                    continue
+                batch.append(
+                    (
+                        session,
+                        self._folder_id(str(src.parent)),
+                        src.name,
+                        self._folder_id(str(dst.parent)),
+                        dst.name,
+                        fingerprint,
+                    )
+                )
+                if len(batch) >= BATCH_ROWS:
+                    count += self._insert(batch)
+            count += self._insert(batch)
+            if not count:
+                self.db.execute("DELETE FROM sessions WHERE id = ?", (session,))
+        return count
+
+    def _insert(self, batch: list[tuple]) -> int:
+        self.db.executemany(
+            "INSERT INTO renames (session, folder, old, new_folder, new, fingerprint)"
+            " VALUES (?, ?, ?, ?, ?, ?)",
+            batch,
+        )
+        n = len(batch)
+        batch.clear()
+        return n
+
+    def lookup(self, name: str, limit: int = 100) -> list[dict]:
+        """Return up to limit renames from or to name (in any folder), newest first.
+
+        Rows have keys when, kind, folder, old, new_folder, new and fingerprint.
+        """
+        # Each side walks its name index newest first and stops at limit
+        query = f"""
+            SELECT * FROM ({_SELECT} WHERE r.old = ?1 ORDER BY r.id DESC LIMIT ?2)
+            UNION ALL
+            SELECT * FROM ({_SELECT} WHERE r.new = ?1 AND r.old != ?1 ORDER BY r.id DESC LIMIT ?2)
+            ORDER BY 1 DESC LIMIT ?2
+        """
+        return [_row(values) for values in self.db.execute(query, (name, limit))]
+
+    def trace(self, name: str, folder: Path | None = None) -> list[dict]:
+        """Return the renames that led to name (in folder, if given), oldest first.
+
+        Starting from the latest rename to name, each step follows the rename
+        that produced the previous one's old name in its folder, so the rows
+        list every name the file had.
+        """
+        chain: list[dict] = []
+        before = None
+        target = str(folder) if folder is not None else None
+        while len(chain) < MAX_TRACE:
+            conditions, args = ["r.new = ?"], [name]
+            if target is not None:
+                folder_id = self.db.execute(
+                    "SELECT id FROM folders WHERE path = ?", (target,)
+                ).fetchone()
+                if folder_id is None:
+                    break
+                conditions.append("r.new_folder = ?")
+                args.append(folder_id[0])
+            if before is not None:
+                conditions.append("r.id < ?")
+                args.append(before)
+            query = f"{_SELECT} WHERE {' AND '.join(conditions)} ORDER BY r.id DESC LIMIT 1"
+            values = self.db.execute(query, args).fetchone()
+            if values is None:
+                break
+            row = _row(values)
+            chain.append(row)
+            name, target, before = row["old"], row["folder"], values[0]
+        chain.reverse()
+        return chain
@@ -0,0 +1,165 @@
+"""Small client for the rename daemon (see daemon.py), using only the standard library.
+
+Requests and replies are single JSON lines over a Unix socket, and a Client
+keeps its connection open, so repeated calls cost one round trip each. Like
+the daemon, it needs Unix domain sockets (Linux or macOS).
+
+    with Client() as c:
+        rows = c.plan("/media/tv", [{"type": "case", "mode": "lowercase"}])
+        outcomes = c.apply("/media/tv", [{"type": "case", "mode": "lowercase"}])
+
+From a shell:
+
+    python client.py plan /media/tv '[{"type": "case", "mode": "lowercase"}]'
+"""
+
+import argparse
+import json
+import os
+import socket
+import sys
+import tempfile
+from pathlib import Path
+
+
+def default_socket() -> Path:
+    """Return the per-user socket path ($XDG_RUNTIME_DIR, else the temp folder)."""
+    base = os.environ.get("XDG_RUNTIME_DIR") or tempfile.gettempdir()
+    return Path(base) / f"renametool-{os.getuid()}.sock"
+
+
+class DaemonError(RuntimeError):
+    """The daemon could not be reached or rejected a request."""
+
+
+class Client:
+    """A connection to the rename daemon, opened on first request."""
+
+    def __init__(self, path: Path | None = None, timeout: float | None = 60):
+        self.path = Path(path) if path is not None else default_socket()
+        self.timeout = timeout
+        self._sock: socket.socket | None = None
+        self._reader = None
+
+    def __enter__(self) -> "Client":
+        return self
+
+    def __exit__(self, *exc) -> None:
+        self.close()
+
+    def close(self) -> None:
+        if self._sock is not None:
+            self._reader.close()
+            self._sock.close()
+            self._sock = self._reader = None
+
+    def _connect(self) -> None:
+        sock = socket.socket(socket.AF_UNIX, socket.SOCK_STREAM)
+        sock.settimeout(self.timeout)
+        try:
+            sock.connect(str(self.path))
+        except OSError as e:
+            sock.close()
+            raise DaemonError(f"Cannot reach the daemon at {self.path}: {e}") from e
+        self._sock = sock
+        self._reader = sock.makefile("rb")
+
+    def request(self, op: str, **params) -> dict:
+        """Send one request and return its reply; raises DaemonError if it failed."""
+        if self._sock is None:
+            self._connect()
+        try:
+            self._sock.sendall(json.dumps({"op": op, **params}).encode("utf-8") + b"\n")
+            line = self._reader.readline()
+        except OSError as e:
+            self.close()
+            raise DaemonError(f"Lost the connection to the daemon: {e}") from e
+        if not line:
+            self.close()
+            raise DaemonError("The daemon closed the connection")
+        reply = json.loads(line)
+        if not reply.get("ok"):
+            raise DaemonError(reply.get("error", "Request failed"))
+        return reply
+
+    def ping(self) -> dict:
+        return self.request("ping")
+
+    def plan(
+        self,
+        folder: str | Path,
+        operations: list[dict],
+        ext_filter: str | None = None,
+        select: list[str] | None = None,
+    ) -> list[dict]:
+        """Return the preview rows (original and new name, status) for operations in folder."""
+        return self.request(
+            "plan",
+            folder=str(folder),
+            operations=operations,
+            ext_filter=ext_filter,
+            select=select,
+        )["rows"]
+
+    def apply(
+        self,
+        folder: str | Path,
+        operations: list[dict],
+        ext_filter: str | None = None,
+        select: list[str] | None = None,
+    ) -> list[dict]:
+        """Apply operations in folder and return one outcome per renamed file."""
+        return self.request(
+            "apply",
+            folder=str(folder),
+            operations=operations,
+            ext_filter=ext_filter,
+            select=select,
+        )["rows"]
+
+    def undo(self, folder: str | Path) -> list[dict]:
+        """Reverse the last apply in folder and return the outcomes."""
+        return self.request("undo", folder=str(folder))["rows"]
+
+    def shutdown(self) -> None:
+        self.request("shutdown")
+        self.close()
+
+
+def main(argv: list[str] | None = None) -> int:
+    parser = argparse.ArgumentParser(description="Talk to a running renametool daemon")
+    parser.add_argument("--socket", type=Path, help="daemon socket (default: per-user path)")
+    commands = parser.add_subparsers(dest="command", required=True)
+    commands.add_parser("ping")
+    commands.add_parser("shutdown")
+    for name in ("plan", "apply"):
+        sub = commands.add_parser(name)
+        sub.add_argument("folder")
+        sub.add_argument("operations", help="JSON list of operations")
+        sub.add_argument("--ext", dest="ext_filter")
+    commands.add_parser("undo").add_argument("folder")
+    args = parser.parse_args(argv)
+
+    with Client(args.socket) as client:
+        try:
+            if args.command in ("plan", "apply"):
+                operations = json.loads(args.operations)
+                call = client.plan if args.command == "plan" else client.apply
+                result = call(args.folder, operations, args.ext_filter)
+            elif args.command == "undo":
+                result = client.undo(args.folder)
+            elif args.command == "shutdown":
+                client.shutdown()
+                return 0
+            else:
+                result = client.ping()
+        except (DaemonError, json.JSONDecodeError) as e:
+            print(f"error: {e}", file=sys.stderr)
+            return 1
+    json.dump(result, sys.stdout, indent=1)
+    print()
+    return 0
+
+
+if __name__ == "__main__":  # pragma: no cover
+    sys.exit(main())
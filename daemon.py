@@ -0,0 +1,362 @@
+"""Long-running rename daemon: warm sessions served over a Unix socket.
+
+Each wizard or script run pays interpreter and import startup, reads the
+config again and lists every folder from cold. The daemon pays that once and
+keeps a RenameSession per (folder, extension filter): its listing, snapshot,
+compiled operations and last plan stay in memory, and the templates' parsed
+media names stay cached for the life of the process. A repeated plan for the
+same library and operations is answered from the session's cached plan.
+
+On Linux, an inotify watch on each session's folder drops its cached state as
+soon as an entry is added, removed, renamed or modified (content changes do
+not touch the folder mtime the session would otherwise check). Elsewhere the
+session's own folder mtime check still catches added, removed and renamed
+files.
+
+The protocol is one JSON object per line each way (see client.py):
+``{"op": "plan" | "apply" | "undo" | "ping" | "shutdown", ...}`` answered by
+``{"ok": true, ...}`` or ``{"ok": false, "error": message}``. Operations are
+limited to session.JSON_OPERATION_TYPES. Requests are handled one at a time
+on one thread, so sessions need no locking.
+"""
+
+import ctypes
+import ctypes.util
+import json
+import os
+import selectors
+import socket
+import stat
+import struct
+import sys
+from collections import OrderedDict
+from pathlib import Path
+
+from catalog import Catalog
+from client import default_socket
+from regexguard import DEFAULT_BUDGET, RegexTimeout
+from session import RenameSession, compile_operation
+
+MAX_SESSIONS = 32  # least recently used sessions beyond this are dropped
+MAX_REQUEST = 64 * 1024 * 1024  # bytes in one request line
+
+_IN_MODIFY = 0x002
+_IN_ATTRIB = 0x004
+_IN_MOVED_FROM = 0x040
+_IN_MOVED_TO = 0x080
+_IN_CREATE = 0x100
+_IN_DELETE = 0x200
+_IN_DELETE_SELF = 0x400
+_IN_MOVE_SELF = 0x800
+_IN_IGNORED = 0x8000
+_IN_NONBLOCK = os.O_NONBLOCK
+_IN_CLOEXEC = getattr(os, "O_CLOEXEC", 0o2000000)
+_WATCH_MASK = (
+    _IN_MODIFY
+    | _IN_ATTRIB
+    | _IN_MOVED_FROM
+    | _IN_MOVED_TO
+    | _IN_CREATE
+    | _IN_DELETE
+    | _IN_DELETE_SELF
+    | _IN_MOVE_SELF
+)
+_EVENT = struct.Struct("iIII")  # wd, mask, cookie, name length
+
+
+class FolderWatcher:
+    """inotify watches on folders, reporting which ones changed.
+
+    Use FolderWatcher.create(), which returns None where inotify is not
+    available (anything but Linux).
+    """
+
+    def __init__(self, libc: ctypes.CDLL, fd: int):
+        self._libc = libc
+        self.fd = fd
+        self._folders: dict[int, str] = {}
+        self._watches: dict[str, int] = {}
+
+    @classmethod
+    def create(cls) -> "FolderWatcher | None":
+        if not sys.platform.startswith("linux"):
+            return None
+        try:
+            libc = ctypes.CDLL(ctypes.util.find_library("c"), use_errno=True)
+            fd = libc.inotify_init1(_IN_NONBLOCK | _IN_CLOEXEC)
+        except (OSError, AttributeError):
+            return None
+        if fd < 0:
+            return None
+        return cls(libc, fd)
+
+    def fileno(self) -> int:
+        return self.fd
+
+    def watch(self, folder: str) -> bool:
+        """Start watching folder; False if it cannot be watched (it is then only mtime-checked)."""
+        if folder in self._watches:
+            return True
+        wd = self._libc.inotify_add_watch(self.fd, os.fsencode(folder), _WATCH_MASK)
+        if wd < 0:
+            return False
+        self._watches[folder] = wd
+        self._folders[wd] = folder
+        return True
+
+    def unwatch(self, folder: str) -> None:
+        wd = self._watches.pop(folder, None)
+        if wd is not None:
+            self._folders.pop(wd, None)
+            self._libc.inotify_rm_watch(self.fd, wd)
+
+    def changed(self) -> set[str]:
+        """Read the pending events and return the folders they were for."""
+        folders = set()
+        while True:
+            try:
+                data = os.read(self.fd, 64 * 1024)
+            except BlockingIOError:
+                break
+            offset = 0
+            while offset < len(data):
+                wd, mask, _, length = _EVENT.unpack_from(data, offset)
+                offset += _EVENT.size + length
+                folder = self._folders.get(wd)
+                if folder is None:
+                    continue
+                folders.add(folder)
+                if mask & _IN_IGNORED:  # the folder is gone; the kernel dropped the watch
+                    del self._folders[wd]
+                    self._watches.pop(folder, None)
+        return folders
+
+    def close(self) -> None:
+        os.close(self.fd)
+
+
+def _row(row: dict) -> dict:
+    """Return a preview row or apply outcome with its original path as a plain name."""
+    out = dict(row)
+    out["original"] = row["original"].name
+    return out
+
+
+class RenameDaemon:
+    """Plan, apply and undo requests against cached RenameSessions.
+
+    config is the renametool.toml dict: excluded_files, regex_budget and
+    catalog are honored as in the wizard.
+    """
+
+    def __init__(self, config: dict | None = None, watcher: FolderWatcher | None = None):
+        config = config or {}
+        self.excluded_names = frozenset(n.lower() for n in config.get("excluded_files", []))
+        self.regex_budget = config.get("regex_budget", DEFAULT_BUDGET)
+        self.catalog = Catalog(Path(config["catalog"])) if config.get("catalog") else None
+        self.watcher = watcher
+        self.sessions: OrderedDict[tuple[str, str | None], RenameSession] = OrderedDict()
+        self.running = True
+        # Serialized plan rows per session, valid while its plan_token is unchanged
+        self._plans: dict[RenameSession, tuple[object, list[dict]]] = {}
+        self._encoded: tuple[list[dict], bytes] | None = None
+
+    def session(self, folder: str, ext_filter: str | None = None) -> RenameSession:
+        """Return the cached session for folder and ext_filter, creating it if needed."""
+        folder = os.path.abspath(folder)
+        key = (folder, ext_filter)
+        session = self.sessions.get(key)
+        if session is not None:
+            self.sessions.move_to_end(key)
+            return session
+        if not os.path.isdir(folder):
+            raise ValueError(f"Not a directory: {folder}")
+        session = RenameSession(
+            Path(folder),
+            ext_filter=ext_filter,
+            excluded_names=self.excluded_names,
+            regex_budget=self.regex_budget,
+            catalog=self.catalog,
+        )
+        self.sessions[key] = session
+        if self.watcher is not None:
+            self.watcher.watch(folder)
+        while len(self.sessions) > MAX_SESSIONS:
+            (old_folder, _), old = self.sessions.popitem(last=False)
+            self._plans.pop(old, None)
+            if self.watcher is not None and all(f != old_folder for f, _ in self.sessions):
+                self.watcher.unwatch(old_folder)
+        return session
+
+    def invalidate(self, folders: set[str]) -> None:
+        """Drop the cached listings and plans of every session on folders."""
+        for (folder, _), session in self.sessions.items():
+            if folder in folders:
+                session.refresh()
+
+    def _planned(self, request: dict) -> RenameSession:
+        session = self.session(request["folder"], request.get("ext_filter"))
+        operations = request.get("operations", [])
+        if not isinstance(operations, list):
+            raise ValueError("operations must be a list")
+        operations = [compile_operation(op, from_json=True) for op in operations]
+        # Unchanged operations keep the session's cached plan
+        if tuple(operations) != session.operations:
+            session.clear_operations()
+            for op in operations:
+                session.add_operation(op)
+        session.select(request.get("select"))
+        return session
+
+    def _plan_rows(self, session: RenameSession) -> list[dict]:
+        cached = self._plans.get(session)
+        token = session.plan_token
+        if cached is not None and token is not None and cached[0] is token:
+            return cached[1]
+        rows = [_row(r) for r in session.preview()]
+        self._plans[session] = (session.plan_token, rows)
+        return rows
+
+    def handle(self, request: dict) -> dict:
+        """Answer one request; errors are returned as {"ok": False, "error": message}."""
+        try:
+            op = request.get("op")
+            if op == "ping":
+                return {"ok": True, "pid": os.getpid(), "sessions": len(self.sessions)}
+            if op == "plan":
+                return {"ok": True, "rows": self._plan_rows(self._planned(request))}
+            if op == "apply":
+                return {"ok": True, "rows": [_row(r) for r in self._planned(request).apply()]}
+            if op == "undo":
+                session = self.session(request["folder"], request.get("ext_filter"))
+                return {"ok": True, "rows": session.undo()}
+            if op == "shutdown":
+                self.running = False
+                return {"ok": True}
+            return {"ok": False, "error": f"Unknown op: {op!r}"}
+        except KeyError as e:
+            return {"ok": False, "error": f"Missing field: {e.args[0]}"}
+        except (ValueError, TypeError, OSError, RegexTimeout) as e:
+            return {"ok": False, "error": str(e)}
+        except Exception as e:  # a bad request must never take the daemon down
+            return {"ok": False, "error": f"Internal error: {type(e).__name__}: {e}"}
+
+    def encode(self, reply: dict) -> bytes:
+        """Return reply as a JSON line, reusing the last encoding of the same plan rows."""
+        rows = reply.get("rows")
+        if rows is not None and self._encoded is not None and self._encoded[0] is rows:
+            return self._encoded[1]
+        line = json.dumps(reply).encode("utf-8") + b"\n"
+        if rows is not None and any(rows is cached for _, cached in self._plans.values()):
+            self._encoded = (rows, line)
+        return line
+
+    def close(self) -> None:
+        if self.watcher is not None:
+            self.watcher.close()
+        if self.catalog is not None:
+            self.catalog.close()
+
+
+def _bind(path: Path) -> socket.socket:
+    """Listen on path, replacing a stale socket file but not a live daemon's.
+
+    Raises FileExistsError if path is anything other than a socket, so a
+    mistyped socket path never deletes a regular file.
+    """
+    try:
+        mode = path.lstat().st_mode
+    except FileNotFoundError:
+        mode = None
+    if mode is not None:
+        if not stat.S_ISSOCK(mode):
+            raise FileExistsError(f"{path} exists and is not a socket; not replacing it")
+        probe = socket.socket(socket.AF_UNIX, socket.SOCK_STREAM)
+        try:
+            probe.connect(str(path))
+        except OSError:
+            path.unlink()
+        else:
+            raise OSError(f"A daemon is already listening on {path}")
+        finally:
+            probe.close()
+    server = socket.socket(socket.AF_UNIX, socket.SOCK_STREAM)
+    old_umask = os.umask(0o077)  # only this user may connect
+    try:
+        server.bind(str(path))
+    finally:
+        os.umask(old_umask)
+    server.listen()
+    return server
+
+
+def serve(daemon: RenameDaemon, path: Path | None = None, ready=None) -> None:
+    """Serve daemon's requests on the Unix socket at path until a shutdown request.
+
+    ready, if given, is called once the socket is listening.
+    """
+    path = Path(path) if path is not None else default_socket()
+    server = _bind(path)
+    selector = selectors.DefaultSelector()
+    selector.register(server, selectors.EVENT_READ, "accept")
+    if daemon.watcher is not None:
+        selector.register(daemon.watcher, selectors.EVENT_READ, "watch")
+    buffers: dict[socket.socket, bytearray] = {}
+
+    def drop(conn: socket.socket) -> None:
+        selector.unregister(conn)
+        buffers.pop(conn, None)
+        conn.close()
+
+    if ready is not None:
+        ready()
+    try:
+        while daemon.running:
+            for key, _ in selector.select():
+                if key.data == "accept":
+                    conn, _ = server.accept()
+                    selector.register(conn, selectors.EVENT_READ, "client")
+                    buffers[conn] = bytearray()
+                    continue
+                if key.data == "watch":
+                    daemon.invalidate(daemon.watcher.changed())
+                    continue
+                conn = key.fileobj
+                # Apply our own pending events before answering from the cache
+                if daemon.watcher is not None:
+                    daemon.invalidate(daemon.watcher.changed())
+                try:
+                    data = conn.recv(1024 * 1024)
+                except OSError:
+                    data = b""
+                if not data:
+                    drop(conn)
+                    continue
+                buffer = buffers[conn]
+                buffer += data
+                if len(buffer) > MAX_REQUEST:
+                    drop(conn)
+                    continue
+                while b"\n" in buffer:
+                    line, _, rest = bytes(buffer).partition(b"\n")
+                    buffer[:] = rest
+                    try:
+                        request = json.loads(line)
+                        if not isinstance(request, dict):
+                            raise ValueError("A request must be a JSON object")
+                        reply = daemon.handle(request)
+                    except ValueError as e:
+                        reply = {"ok": False, "error": f"Bad request: {e}"}
+                    try:
+                        conn.sendall(daemon.encode(reply))
+                    except OSError:  # the client went away
+                        drop(conn)
+                        break
+                    if not daemon.running:
+                        break
+    finally:
+        for conn in list(buffers):
+            drop(conn)
+        selector.close()
+        server.close()
+        path.unlink(missing_ok=True)
@@ -0,0 +1,537 @@
+"""Rename engine: listing, name computation, validation and apply/undo primitives.
+
+Nothing here imports the TUI libraries, so scripts and long-running services
+can use the engine (directly or through session.RenameSession) without
+pulling in rich or questionary. renamer.py re-exports these names.
+"""
+
+import errno
+import json
+import os
+import re
+from collections.abc import Iterable
+from itertools import chain
+from pathlib import Path
+
+from fsbackend import LOCAL, FileSystem
+from metrics import ApplyMetrics
+from nameindex import NameIndex
+from profiling import PROFILER
+from templates import compile_template
+
+HIDDEN_NAMES = {"desktop.ini", "thumbs.db"}
+INVALID_CHARS = set('<>:"/\\|?*')
+MAX_NAME_LEN = 255  # bytes on Linux/macOS filesystems, UTF-16 units on NTFS
+UNDO_FILE = ".renametool_undo.json"
+
+# INVALID_CHARS plus ASCII control characters, anywhere in a name
+ILLEGAL_CHARS_RE = re.compile(r'[<>:"/\\|?*\x00-\x1f]')
+# "", ".txt", "..", "...jpg": nothing but dots before the extension
+EMPTY_STEM_RE = re.compile(r"(?:\.+[^.]*)?")
+# Device names Windows reserves with any extension (CON.txt is CON)
+RESERVED_NAMES = frozenset(
+    ["CON", "PRN", "AUX", "NUL"]
+    + [f"{dev}{n}" for dev in ("COM", "LPT") for n in "123456789\u00b9\u00b2\u00b3"]
+)
+
+
+def list_files(
+    folder: Path,
+    ext_filter: str | None = None,
+    excluded_names: frozenset[str] = frozenset(),
+    fs: FileSystem = LOCAL,
+) -> list[Path]:
+    """Return non-hidden files in folder, filtered by extension if given, sorted alphabetically."""
+    with PROFILER.span("list_files"):
+        with fs.scandir(folder) as it:
+            files, names = _listable_files(folder, it, ext_filter, excluded_names)
+        PROFILER.add(len(files), scandir=1, stat=len(names))
+    return files
+
+
+def _listable_files(
+    folder: Path, entries, ext_filter: str | None, excluded_names: frozenset[str]
+) -> tuple[list[Path], list[str]]:
+    """Return (the files list_files() keeps, every entry name) from folder's scandir entries."""
+    files = []
+    names = []
+    for entry in entries:
+        name = entry.name
+        names.append(name)
+        try:
+            if not entry.is_file():
+                continue
+        except OSError:
+            continue
+        if name.startswith(".") or name.lower() in HIDDEN_NAMES:
+            continue
+        if name.lower() in excluded_names:
+            continue
+        path = folder / name
+        if ext_filter and path.suffix.lower() != ext_filter.lower():
+            continue
+        files.append(path)
+    files.sort(key=lambda p: p.name.lower())
+    return files, names
+
+
+class FolderListing:
+    """The listable files of a folder from one scan, grouped by extension.
+
+    Holds what list_files() would return with no filter, each file's size,
+    and the file indexes per lowercase extension ("" for none), so any
+    extension filter (or several at once) is answered from memory.
+    """
+
+    __slots__ = ("folder", "fs", "mtime_ns", "files", "sizes", "_by_ext")
+
+    def __init__(
+        self,
+        folder: Path,
+        excluded_names: frozenset[str] = frozenset(),
+        fs: FileSystem = LOCAL,
+    ):
+        with PROFILER.span("list_files"):
+            self.folder = folder
+            self.fs = fs
+            self.mtime_ns = fs.stat(folder).st_mtime_ns
+            found = []
+            entries = 0
+            with fs.scandir(folder) as it:
+                for entry in it:
+                    entries += 1
+                    name = entry.name
+                    lower = name.lower()
+                    if name.startswith(".") or lower in HIDDEN_NAMES or lower in excluded_names:
+                        continue
+                    try:
+                        if not entry.is_file():
+                            continue
+                        size = entry.stat().st_size
+                    except OSError:
+                        continue
+                    found.append((lower, Path(entry.path), size))
+            found.sort(key=lambda t: t[0])
+            self.files = [path for _, path, _ in found]
+            self.sizes = [size for _, _, size in found]
+            self._by_ext: dict[str, list[int]] = {}
+            for i, path in enumerate(self.files):
+                self._by_ext.setdefault(path.suffix.lower(), []).append(i)
+            PROFILER.add(len(found), scandir=1, stat=entries + 1)
+
+    def is_current(self) -> bool:
+        """True if the folder's mtime is unchanged (no entry added, removed or renamed)."""
+        try:
+            return self.fs.stat(self.folder).st_mtime_ns == self.mtime_ns
+        except OSError:
+            return False
+
+    def histogram(self) -> dict[str, tuple[int, int]]:
+        """Return {extension: (file count, total bytes)}, sorted by extension."""
+        sizes = self.sizes
+        return {
+            ext: (len(indexes), sum(sizes[i] for i in indexes))
+            for ext, indexes in sorted(self._by_ext.items())
+        }
+
+    def indexes(self, extensions: Iterable[str] | None = None) -> list[int]:
+        """Return the positions in files of the given extensions (every file if None)."""
+        if extensions is None:
+            return list(range(len(self.files)))
+        groups = [self._by_ext.get(ext, []) for ext in {e.lower() for e in extensions}]
+        if len(groups) == 1:
+            return list(groups[0])
+        return sorted(chain.from_iterable(groups))
+
+    def select(self, extensions: Iterable[str] | None = None) -> list[Path]:
+        """Return the files with the given extensions, in list_files() order."""
+        files = self.files
+        return [files[i] for i in self.indexes(extensions)]
+
+
+def apply_find_replace(stem: str, find: str, replace: str, use_regex: bool) -> str:
+    if use_regex:
+        return re.sub(find, replace, stem)
+    return stem.replace(find, replace)
+
+
+def apply_prefix(stem: str, prefix: str) -> str:
+    return prefix + stem
+
+
+def apply_suffix(stem: str, suffix: str) -> str:
+    return stem + suffix
+
+
+def apply_case(stem: str, mode: str) -> str:
+    if mode == "uppercase":
+        return stem.upper()
+    elif mode == "lowercase":
+        return stem.lower()
+    elif mode == "title":
+        return stem.title()
+    elif mode == "snake_case":
+        return re.sub(r"[\s\-]+", "_", stem.lower())
+    return stem
+
+
+def format_tv_name(info: dict, ext: str) -> str:
+    """Build a Plex/Jellyfin-compatible TV episode filename.
+
+    Format: Show - S01E01 - Episode Title.ext (title omitted if empty).
+    """
+    name = f"{info['show']} - S{info['season']:02d}E{info['episode']:02d}"
+    if info.get("title"):
+        name += f" - {info['title']}"
+    return name + ext
+
+
+def format_movie_name(info: dict, ext: str) -> str:
+    """Build a Plex/Jellyfin-compatible movie filename.
+
+    Format: Title (Year).ext
+    """
+    return f"{info['title']} ({info['year']}){ext}"
+
+
+def format_photo_name(info: dict, ext: str) -> str:
+    """Build a capture-date photo filename from EXIF info (see exif.read_exif).
+
+    Format: YYYY-MM-DD_HHMMSS_Model.ext (model omitted if unknown, spaces become hyphens).
+    """
+    name = info["taken"].replace(" ", "_").replace(":", "")
+    model = "".join(c for c in info.get("model", "") if c not in INVALID_CHARS)
+    model = "-".join(model.split())
+    if model:
+        name += f"_{model}"
+    return name + ext
+
+
+def format_music_name(info: dict, ext: str) -> str:
+    """Build a music track filename from audio tags (see audiotags.read_tags).
+
+    Format: Artist - Album - NN Title.ext (artist/album/number omitted if unknown).
+    """
+    parts = [info[k] for k in ("artist", "album") if info.get(k)]
+    title = info.get("title", "")
+    if info.get("track"):
+        title = f"{info['track']:02d} {title}".rstrip()
+    parts.append(title)
+    name = " - ".join(parts)
+    return "".join(c for c in name if c not in INVALID_CHARS) + ext
+
+
+def normalize_extension(raw: str) -> str:
+    """Normalize user input to a single leading-dot extension (e.g. '..jpg' → '.jpg')."""
+    stripped = raw.lstrip(".")
+    return "." + stripped if stripped else ""
+
+
+def validate_extension(ext: str) -> str | None:
+    """Return an error message if ext is invalid, or None if OK."""
+    if not ext or ext == ".":
+        return "Extension cannot be empty."
+    body = ext.lstrip(".")
+    if not body:
+        return "Extension cannot be empty."
+    if any(c in INVALID_CHARS for c in body):
+        return f"Extension contains invalid characters: {ext}"
+    if " " in body:
+        return f"Extension contains spaces: {ext}"
+    return None
+
+
+def compute_new_name(file: Path, operations: list[dict], index: int = 0, trace=None) -> str:
+    """Apply all operations sequentially to the stem, reattach extension.
+
+    index is the file's 0-based position in the batch (used by {counter} templates).
+    trace, if given, is called with each operation's index before it runs.
+    """
+    stem = file.stem
+    ext = file.suffix
+
+    for op_index, op in enumerate(operations):
+        if trace is not None:
+            trace(op_index)
+        if op["type"] == "find_replace":
+            stem = apply_find_replace(stem, op["find"], op["replace"], op["regex"])
+        elif op["type"] == "prefix":
+            stem = apply_prefix(stem, op["prefix"])
+        elif op["type"] == "suffix":
+            stem = apply_suffix(stem, op["suffix"])
+        elif op["type"] == "case":
+            stem = apply_case(stem, op["mode"])
+        elif op["type"] == "ext_change":
+            ext = op["ext"]
+        elif op["type"] == "template":
+            rendered = compile_template(op["template"]).render(file, index)
+            if rendered is not None:
+                stem = rendered
+        elif op["type"] == "replace_table":
+            stem = op["table"].apply(stem)
+        elif op["type"] == "content_hash":
+            stem = op["hashes"].get(file.name, stem)
+        elif op["type"] == "photo_date":
+            info = op["photos"].get(file.name)
+            if info and info.get("taken"):
+                stem = format_photo_name(info, "")
+        elif op["type"] == "music_tags":
+            info = op["tracks"].get(file.name)
+            if info and info.get("title"):
+                stem = format_music_name(info, "")
+        elif op["type"] == "media_tv":
+            if op.get("file") and op["file"] != file.name:
+                continue
+            return format_tv_name(op["info"], ext)
+        elif op["type"] == "media_movie":
+            if op.get("file") and op["file"] != file.name:
+                continue
+            return format_movie_name(op["info"], ext)
+        elif op["type"] == "media_movies":
+            info = op["movies"].get(file.name)
+            if info is None:
+                continue
+            return format_movie_name(info, ext)
+        elif op["type"] == "mapping":
+            new_name = op["names"].get(file.name)
+            if new_name is None:
+                continue
+            return new_name
+
+    return stem + ext
+
+
+def check_name(name: str) -> str | None:
+    """Return the INVALID status for a new file name, or None if it is valid.
+
+    Length is measured in UTF-8 bytes, which is never less than the UTF-16
+    length NTFS counts, so a name that passes fits every supported filesystem.
+    """
+    if EMPTY_STEM_RE.fullmatch(name):
+        return "INVALID (empty name)"
+    n = len(name)
+    if n > MAX_NAME_LEN or (
+        n > MAX_NAME_LEN // 4 and len(name.encode("utf-8", "surrogateescape")) > MAX_NAME_LEN
+    ):
+        return "INVALID (name too long)"
+    if ILLEGAL_CHARS_RE.search(name):
+        return "INVALID (illegal characters)"
+    dot = name.find(".")
+    base = name if dot < 0 else name[:dot]
+    if len(base) <= 5 and base.rstrip(" ").upper() in RESERVED_NAMES:
+        return "INVALID (reserved name)"
+    return None
+
+
+def validate_new_names(
+    pairs: list[tuple[Path, str]], index: NameIndex | None = None, fs: FileSystem = LOCAL
+) -> list[dict]:
+    """Check each rename for conflicts, invalid names, no-change and empty names.
+
+    Names are compared through a NameIndex of each target folder, so two
+    names conflict exactly when that folder's filesystem treats them as the
+    same entry (case and Unicode normalization are probed once per folder).
+    index, if given, is used for every pair (all in one folder) instead of
+    listing and probing each folder through fs.
+    Returns a list of dicts with keys: original, new_name, status.
+    """
+    with PROFILER.span("validate_new_names", files=len(pairs)):
+        results = []
+        indexes: dict[tuple[str, ...], NameIndex] = {}
+        first_row: dict[tuple, int] = {}
+        collided: set[tuple] = set()
+        unchecked = []  # rows that passed the name checks: (row, index, slot, original name)
+
+        for row, (original, new_name) in enumerate(pairs):
+            name = original.name
+            status = "NO CHANGE" if new_name == name else check_name(new_name)
+            if index is not None:
+                idx = index
+                slot = (idx.key(new_name),)
+            else:
+                # Path.parts is cached on the path; str(path) or path.parent would
+                # format or allocate a new path for every file
+                folder = original.parts[:-1]
+                idx = indexes.get(folder)
+                if idx is None:
+                    idx = indexes[folder] = NameIndex.for_folder(original.parent, fs=fs)
+                slot = (folder, idx.key(new_name))
+            if first_row.setdefault(slot, row) != row:
+                collided.add(slot)
+            if status is None:
+                unchecked.append((row, idx, slot, name))
+            results.append({"original": original, "new_name": new_name, "status": status})
+
+        # Planned collisions are only known once every name has been keyed
+        for row, idx, slot, name in unchecked:
+            key = slot[-1]
+            # Same key as the original means the same entry (a case-only or
+            # normalization-only rename on a folder that folds them)
+            if slot in collided or (key != idx.key(name) and idx.has_key(key)):
+                results[row]["status"] = "CONFLICT"
+            else:
+                results[row]["status"] = "OK"
+
+        PROFILER.add(scandir=len(indexes))
+    return results
+
+
+def scan_folder(
+    folder: Path,
+    ext_filter: str | None = None,
+    excluded_names: frozenset[str] = frozenset(),
+    fs: FileSystem = LOCAL,
+) -> tuple[int, frozenset[str], list[Path]]:
+    """Return (folder mtime_ns, every entry name, list_files() result) from one scan.
+
+    The mtime and names are a directory snapshot for conflict checks.
+    """
+    with PROFILER.span("list_files"):
+        mtime_ns = fs.stat(folder).st_mtime_ns
+        with fs.scandir(folder) as it:
+            files, names = _listable_files(folder, it, ext_filter, excluded_names)
+        PROFILER.add(len(files), scandir=1, stat=len(names) + 1)
+    return mtime_ns, frozenset(names), files
+
+
+def rename_file(
+    src: Path,
+    new_name: str,
+    metrics: ApplyMetrics,
+    *,
+    verify: bool = False,
+    fs: FileSystem = LOCAL,
+) -> None:
+    """Rename src to new_name in the same folder, timing each call into metrics.
+
+    new_name may also be a path below src's folder (see organize.py). If that
+    is on another filesystem, the file is copied and the source removed (see
+    transfer.move_across_devices; verify also compares content hashes).
+    Every call goes through fs.
+    Raises FileExistsError rather than overwriting a different existing file
+    (new_name may be another spelling of src itself, e.g. a case-only rename
+    on a case-insensitive folder), and OSError for any other failure. The
+    rename itself refuses to replace the target, so only a refused rename
+    costs the stats that tell those cases apart.
+    """
+    dst = src.parent / new_name
+    try:
+        try:
+            with metrics.timed("rename"):
+                fs.rename_noreplace(src, dst)
+        except FileExistsError:
+            with metrics.timed("stat"):
+                same = os.path.samestat(fs.lstat(dst), fs.lstat(src))
+            if not same:
+                raise FileExistsError(errno.EEXIST, "Target already exists", str(dst)) from None
+            with metrics.timed("rename"):
+                fs.rename(src, dst)
+    except OSError as e:
+        if e.errno != errno.EXDEV:
+            raise
+        with metrics.timed("copy"):
+            fs.move(src, dst, verify=verify)
+
+
+def apply_one(
+    item: dict, metrics: ApplyMetrics, *, verify: bool = False, fs: FileSystem = LOCAL
+) -> dict:
+    """Rename one validate_new_names() row and return its outcome.
+
+    Outcomes have keys original, new_name, status ("RENAMED" or "ERROR") and
+    error. The result is recorded in metrics either way. verify and fs are
+    passed to rename_file().
+    """
+    outcome = {"original": item["original"], "new_name": item["new_name"]}
+    try:
+        rename_file(item["original"], item["new_name"], metrics, verify=verify, fs=fs)
+    except OSError as e:
+        metrics.record(False)
+        return {**outcome, "status": "ERROR", "error": str(e)}
+    metrics.record(True)
+    return {**outcome, "status": "RENAMED", "error": None}
+
+
+def save_undo_map(folder: Path, undo_map: list[dict], fs: FileSystem = LOCAL) -> None:
+    """Write rename pairs to UNDO_FILE in folder.
+
+    undo_map is a list of {"old": "original.txt", "new": "renamed.txt"} dicts,
+    representing the rename that was just applied (old → new).  The file can
+    later be read by load_undo_map() to reverse those renames.
+    """
+    with PROFILER.span("save_undo_map", files=len(undo_map)):
+        fs.write_text(folder / UNDO_FILE, json.dumps(undo_map, indent=2))
+        PROFILER.add(open=1)
+
+
+def load_undo_map(folder: Path, fs: FileSystem = LOCAL) -> list[dict] | None:
+    """Read and return the undo map from folder, or None if not found/unreadable."""
+    undo_path = folder / UNDO_FILE
+    try:
+        if not fs.exists(undo_path):
+            return None
+        return json.loads(fs.read_text(undo_path))
+    except (json.JSONDecodeError, OSError):
+        return None
+
+
+def clear_undo_map(folder: Path, fs: FileSystem = LOCAL) -> None:
+    """Delete UNDO_FILE from folder (if present), so a finished undo cannot be replayed."""
+    try:
+        fs.unlink(folder / UNDO_FILE)
+    except FileNotFoundError:
+        pass
+
+
+def undo_renames(folder: Path, undo_map: list[dict], fs: FileSystem = LOCAL) -> list[dict]:
+    """Reverse each rename in undo_map (new → old), continuing past failures.
+
+    Returns one dict per entry with keys old, new, status ("RESTORED",
+    "MISSING", "CONFLICT" or "ERROR") and error. A file now occupying an old
+    name is never overwritten: that entry is a CONFLICT (unless it is the
+    renamed file itself, e.g. undoing a case-only rename on a case-insensitive
+    folder). A new path in a subfolder (see organize.py) is moved back, and
+    the subfolders it leaves empty are removed.
+    """
+    outcomes = []
+    for entry in undo_map:
+        src = folder / entry["new"]
+        dst = folder / entry["old"]
+        outcome = {"old": entry["old"], "new": entry["new"], "status": "RESTORED", "error": None}
+        try:
+            missing = not fs.exists(src)
+        except OSError:
+            missing = False  # let the rename report the error
+        if missing:
+            outcome["status"] = "MISSING"
+        else:
+            try:
+                try:
+                    try:
+                        fs.rename_noreplace(src, dst)
+                    except FileExistsError:
+                        if not os.path.samestat(fs.lstat(dst), fs.lstat(src)):
+                            raise
+                        fs.rename(src, dst)
+                except OSError as e:
+                    if e.errno != errno.EXDEV:
+                        raise
+                    fs.move(src, dst)
+            except FileExistsError:
+                outcome.update(status="CONFLICT", error=f"{entry['old']} already exists")
+            except OSError as e:
+                outcome.update(status="ERROR", error=str(e))
+            else:
+                _remove_empty_parents(src.parent, folder, fs)
+        outcomes.append(outcome)
+    return outcomes
+
+
+def _remove_empty_parents(path: Path, stop: Path, fs: FileSystem = LOCAL) -> None:
+    """Remove path and its ancestors below stop for as long as they are empty."""
+    while path != stop and stop in path.parents:
+        try:
+            fs.rmdir(path)
+        except OSError:
+            return
+        path = path.parent
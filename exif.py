@@ -0,0 +1,259 @@
+"""Header-only EXIF reading for photo renaming.
+
+Only the metadata region of each file is read: the JPEG segments before the
+image data, the first HEADER_READ_LIMIT bytes of a TIFF-based file, or the
+HEIF ``meta`` box plus the Exif item it points to. No image payload is loaded.
+"""
+
+import struct
+from datetime import datetime
+from pathlib import Path
+
+from filecache import DEFAULT_WORKERS, FileCache, map_cached
+
+EXIF_CACHE_FILE = ".renametool_exif.json"
+HEADER_READ_LIMIT = 256 * 1024
+MAX_JPEG_SEGMENTS = 64
+MAX_IFD_ENTRIES = 512
+
+TAG_MAKE = 0x010F
+TAG_MODEL = 0x0110
+TAG_DATETIME = 0x0132
+TAG_EXIF_IFD = 0x8769
+TAG_DATETIME_ORIGINAL = 0x9003
+
+EXIF_DATE_FORMAT = "%Y:%m:%d %H:%M:%S"
+TAKEN_FORMAT = "%Y-%m-%d %H:%M:%S"
+
+
+def _read_ifd(data: bytes, offset: int, endian: str) -> dict[int, object]:
+    """Return {tag: value} for the ASCII, SHORT and LONG entries of one IFD."""
+    if offset + 2 > len(data):
+        return {}
+    (count,) = struct.unpack_from(endian + "H", data, offset)
+    values: dict[int, object] = {}
+    for i in range(min(count, MAX_IFD_ENTRIES)):
+        pos = offset + 2 + 12 * i
+        if pos + 12 > len(data):
+            break
+        tag, typ, n = struct.unpack_from(endian + "HHI", data, pos)
+        if typ == 2:  # ASCII
+            if n <= 4:
+                raw = data[pos + 8 : pos + 8 + n]
+            else:
+                (value_offset,) = struct.unpack_from(endian + "I", data, pos + 8)
+                raw = data[value_offset : value_offset + n]
+            values[tag] = raw.split(b"\0", 1)[0].decode("latin-1").strip()
+        elif typ == 3 and n == 1:  # SHORT
+            values[tag] = struct.unpack_from(endian + "H", data, pos + 8)[0]
+        elif typ == 4 and n == 1:  # LONG
+            values[tag] = struct.unpack_from(endian + "I", data, pos + 8)[0]
+    return values
+
+
+def _normalize_date(raw) -> str | None:
+    if not isinstance(raw, str):
+        return None
+    try:
+        return datetime.strptime(raw[:19], EXIF_DATE_FORMAT).strftime(TAKEN_FORMAT)
+    except ValueError:
+        return None
+
+
+def parse_tiff(data: bytes) -> dict:
+    """Extract taken/make/model from a TIFF-structured EXIF block.
+
+    Returns a dict with any of the keys taken ("YYYY-MM-DD HH:MM:SS"), make, model.
+    """
+    if data[:4] == b"II*\0":
+        endian = "<"
+    elif data[:4] == b"MM\0*":
+        endian = ">"
+    else:
+        return {}
+    (ifd0_offset,) = struct.unpack_from(endian + "I", data, 4)
+    ifd0 = _read_ifd(data, ifd0_offset, endian)
+    exif_ifd = {}
+    if isinstance(ifd0.get(TAG_EXIF_IFD), int):
+        exif_ifd = _read_ifd(data, ifd0[TAG_EXIF_IFD], endian)
+
+    info = {}
+    taken = _normalize_date(exif_ifd.get(TAG_DATETIME_ORIGINAL)) or _normalize_date(
+        ifd0.get(TAG_DATETIME)
+    )
+    if taken:
+        info["taken"] = taken
+    for key, tag in (("make", TAG_MAKE), ("model", TAG_MODEL)):
+        if isinstance(ifd0.get(tag), str) and ifd0[tag]:
+            info[key] = ifd0[tag]
+    return info
+
+
+def _jpeg_exif_block(f) -> bytes | None:
+    """Walk JPEG segments up to the image data and return the APP1 EXIF payload."""
+    f.seek(2)
+    for _ in range(MAX_JPEG_SEGMENTS):
+        header = f.read(4)
+        if len(header) < 4 or header[0] != 0xFF:
+            return None
+        marker = header[1]
+        if marker in (0xDA, 0xD9):  # start of scan / end of image
+            return None
+        (length,) = struct.unpack(">H", header[2:])
+        if marker == 0xE1:
+            payload = f.read(length - 2)
+            if payload.startswith(b"Exif\0\0"):
+                return payload[6:]
+        else:
+            f.seek(length - 2, 1)
+    return None
+
+
+def _find_box(data: bytes, start: int, end: int, box_type: bytes) -> tuple[int, int] | None:
+    """Return (payload_start, box_end) of the first ISOBMFF box of box_type."""
+    pos = start
+    while pos + 8 <= end:
+        size, typ = struct.unpack_from(">I4s", data, pos)
+        header = 8
+        if size == 1:
+            if pos + 16 > end:
+                return None
+            (size,) = struct.unpack_from(">Q", data, pos + 8)
+            header = 16
+        elif size == 0:
+            size = end - pos
+        if size < header:
+            return None
+        if typ == box_type:
+            return pos + header, min(pos + size, end)
+        pos += size
+    return None
+
+
+def _read_uint(data: bytes, pos: int, size: int) -> int:
+    return int.from_bytes(data[pos : pos + size], "big") if size else 0
+
+
+def _heif_exif_item_id(data: bytes, iinf: tuple[int, int]) -> int | None:
+    start, end = iinf
+    version = data[start]
+    pos = start + 4 + (2 if version == 0 else 4)
+    while True:
+        infe = _find_box(data, pos, end, b"infe")
+        if infe is None:
+            return None
+        infe_start, infe_end = infe
+        infe_version = data[infe_start]
+        if infe_version >= 2:
+            id_size = 2 if infe_version == 2 else 4
+            item_id = _read_uint(data, infe_start + 4, id_size)
+            item_type = data[infe_start + 4 + id_size + 2 : infe_start + 4 + id_size + 6]
+            if item_type == b"Exif":
+                return item_id
+        pos = infe_end
+
+
+def _heif_item_extent(data: bytes, iloc: tuple[int, int], item_id: int) -> tuple[int, int] | None:
+    """Return (file_offset, length) of the first extent of item_id from an iloc box."""
+    start, _ = iloc
+    version = data[start]
+    pos = start + 4
+    offset_size, length_size = data[pos] >> 4, data[pos] & 0x0F
+    base_offset_size, index_size = data[pos + 1] >> 4, data[pos + 1] & 0x0F
+    pos += 2
+    id_size = 2 if version < 2 else 4
+    item_count = _read_uint(data, pos, id_size)
+    pos += id_size
+    for _ in range(item_count):
+        current_id = _read_uint(data, pos, id_size)
+        pos += id_size
+        construction_method = 0
+        if version in (1, 2):
+            construction_method = _read_uint(data, pos, 2) & 0x0F
+            pos += 2
+        pos += 2  # data_reference_index
+        base_offset = _read_uint(data, pos, base_offset_size)
+        pos += base_offset_size
+        extent_count = _read_uint(data, pos, 2)
+        pos += 2
+        extents = []
+        for _ in range(extent_count):
+            if version in (1, 2):
+                pos += index_size
+            extent_offset = _read_uint(data, pos, offset_size)
+            pos += offset_size
+            extent_length = _read_uint(data, pos, length_size)
+            pos += length_size
+            extents.append((base_offset + extent_offset, extent_length))
+        if current_id == item_id:
+            if construction_method != 0 or not extents:
+                return None
+            return extents[0]
+    return None
+
+
+def _heif_exif_block(f) -> bytes | None:
+    """Locate the Exif item through the meta box and read just that item."""
+    f.seek(0)
+    data = f.read(HEADER_READ_LIMIT)
+    meta = _find_box(data, 0, len(data), b"meta")
+    if meta is None:
+        return None
+    meta_start, meta_end = meta[0] + 4, meta[1]  # skip FullBox version/flags
+    iinf = _find_box(data, meta_start, meta_end, b"iinf")
+    iloc = _find_box(data, meta_start, meta_end, b"iloc")
+    if iinf is None or iloc is None:
+        return None
+    item_id = _heif_exif_item_id(data, iinf)
+    if item_id is None:
+        return None
+    extent = _heif_item_extent(data, iloc, item_id)
+    if extent is None:
+        return None
+    offset, length = extent
+    f.seek(offset)
+    blob = f.read(min(length, HEADER_READ_LIMIT))
+    if len(blob) < 4:
+        return None
+    (tiff_offset,) = struct.unpack_from(">I", blob)
+    return blob[4 + tiff_offset :]
+
+
+def read_exif(path: Path) -> dict | None:
+    """Read capture date and camera fields from a JPEG, TIFF-based or HEIF file.
+
+    Returns a dict with any of the keys taken, make, model, or None if the
+    file has no readable EXIF data.
+    """
+    try:
+        with open(path, "rb") as f:
+            magic = f.read(12)
+            if magic[:2] == b"\xff\xd8":
+                block = _jpeg_exif_block(f)
+            elif magic[:4] in (b"II*\0", b"MM\0*"):
+                f.seek(0)
+                block = f.read(HEADER_READ_LIMIT)
+            elif magic[4:8] == b"ftyp":
+                block = _heif_exif_block(f)
+            else:
+                return None
+        info = parse_tiff(block) if block else {}
+    except (OSError, struct.error, IndexError):
+        return None
+    return info or None
+
+
+def read_exif_batch(
+    files: list[Path],
+    cache: FileCache | None = None,
+    workers: int = DEFAULT_WORKERS,
+) -> dict[Path, dict]:
+    """Read EXIF for many files in parallel; files without EXIF are omitted.
+
+    Negative results are cached too (as empty dicts), so re-runs over a card
+    dump only touch files that changed.
+    """
+    infos = map_cached(files, lambda p: read_exif(p) or {}, cache, workers)
+    if cache is not None:
+        cache.save()
+    return {p: info for p, info in infos.items() if info}
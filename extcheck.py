@@ -0,0 +1,208 @@
+"""Conflict checks for batches too large to validate in memory.
+
+validate_new_names() keeps a key for every planned name, every folder's
+existing names and every result row in memory, which stops scaling somewhere
+in the millions of files. iter_validated() gives the same statuses in
+bounded memory: rows and existing names are spilled to a temporary SQLite
+database, and Bloom filters over the planned and existing name keys keep
+nearly every row off the exact (on-disk) lookups. Only keys the planned
+filter has already seen are written to a small suspects table; the planned
+duplicates are then found with one join of the rows against it, and the
+results stream back in input order.
+
+validate_names() picks the in-memory or the disk-backed check by batch size.
+"""
+
+import math
+import sqlite3
+import tempfile
+from collections.abc import Iterable, Iterator
+from pathlib import Path
+
+from engine import check_name, validate_new_names
+from fsbackend import LOCAL, FileSystem
+from nameindex import NameIndex
+from profiling import PROFILER
+
+EXTERNAL_THRESHOLD = 1_000_000  # files; larger batches are checked on disk
+BLOOM_ERROR_RATE = 0.01
+BATCH_ROWS = 10_000  # rows per executemany()
+CACHE_KIB = 64 * 1024  # SQLite page cache, the main memory bound
+
+_SCHEMA = f"""
+PRAGMA journal_mode = OFF;
+PRAGMA synchronous = OFF;
+PRAGMA temp_store = FILE;
+PRAGMA cache_size = -{CACHE_KIB};
+CREATE TABLE rows (
+    row INTEGER PRIMARY KEY, original TEXT, new_name TEXT, status TEXT, slot TEXT, moved INTEGER
+);
+CREATE TABLE existing (slot TEXT PRIMARY KEY) WITHOUT ROWID;
+CREATE TABLE suspects (slot TEXT PRIMARY KEY) WITHOUT ROWID;
+CREATE TABLE collided (slot TEXT PRIMARY KEY) WITHOUT ROWID;
+"""
+
+
+class BloomFilter:
+    """A fixed-size Bloom filter of strings: no false negatives, error_rate false positives.
+
+    Positions come from Python's string hash, so a filter is only valid
+    within the process that built it (it is never persisted).
+    """
+
+    __slots__ = ("bits", "size", "hashes")
+
+    def __init__(self, capacity: int, error_rate: float = BLOOM_ERROR_RATE):
+        capacity = max(1, capacity)
+        self.size = max(64, math.ceil(-capacity * math.log(error_rate) / math.log(2) ** 2))
+        self.hashes = max(1, round(self.size / capacity * math.log(2)))
+        self.bits = bytearray((self.size + 7) // 8)
+
+    def _positions(self, key: str) -> list[int]:
+        h = hash(key) & 0xFFFFFFFFFFFFFFFF
+        h1, h2 = h & 0xFFFFFFFF, (h >> 32) | 1
+        size = self.size
+        return [(h1 + i * h2) % size for i in range(self.hashes)]
+
+    def add(self, key: str) -> bool:
+        """Add key; return True if it may have been added before."""
+        seen = True
+        bits = self.bits
+        for pos in self._positions(key):
+            mask = 1 << (pos & 7)
+            if not bits[pos >> 3] & mask:
+                seen = False
+                bits[pos >> 3] |= mask
+        return seen
+
+    def __contains__(self, key: str) -> bool:
+        bits = self.bits
+        return all(bits[pos >> 3] & (1 << (pos & 7)) for pos in self._positions(key))
+
+
+class _Spill:
+    """The temporary database and filters behind one iter_validated() run."""
+
+    def __init__(self, db: sqlite3.Connection, capacity: int, fs: FileSystem):
+        self.db = db
+        self.fs = fs
+        self.planned = BloomFilter(capacity)
+        self.existing = BloomFilter(capacity)
+        self.indexes: dict[str, NameIndex] = {}
+        self.rows: list[tuple] = []
+        self.suspects: list[tuple[str]] = []
+
+    def index(self, folder: str, original: Path) -> NameIndex:
+        """Return the key function of original's folder, streaming its names to disk once."""
+        idx = self.indexes.get(folder)
+        if idx is not None:
+            return idx
+        path = original.parent
+        # No names: probing must not list a folder that may hold millions of entries
+        case_sensitive, normalizes = self.fs.probe(path, ())
+        idx = self.indexes[folder] = NameIndex(
+            case_sensitive=case_sensitive, normalizes=normalizes, folder=path
+        )
+        batch = []
+        try:
+            with self.fs.scandir(path) as it:
+                for entry in it:
+                    slot = f"{folder}\0{idx.key(entry.name)}"
+                    self.existing.add(slot)
+                    batch.append((slot,))
+                    if len(batch) >= BATCH_ROWS:
+                        self._insert_existing(batch)
+        except OSError:
+            pass
+        self._insert_existing(batch)
+        PROFILER.add(scandir=1)
+        return idx
+
+    def _insert_existing(self, batch: list[tuple[str]]) -> None:
+        self.db.executemany("INSERT OR IGNORE INTO existing VALUES (?)", batch)
+        batch.clear()
+
+    def add(self, row: int, original: Path, new_name: str) -> None:
+        name = original.name
+        status = "NO CHANGE" if new_name == name else check_name(new_name)
+        path = str(original)
+        folder = path[: len(path) - len(name)]
+        idx = self.index(folder, original)
+        key = idx.key(new_name)
+        slot = f"{folder}\0{key}"
+        if self.planned.add(slot):
+            self.suspects.append((slot,))
+        self.rows.append((row, path, new_name, status, slot, key != idx.key(name)))
+        if len(self.rows) >= BATCH_ROWS:
+            self.flush()
+
+    def flush(self) -> None:
+        self.db.executemany("INSERT INTO rows VALUES (?, ?, ?, ?, ?, ?)", self.rows)
+        self.db.executemany("INSERT OR IGNORE INTO suspects VALUES (?)", self.suspects)
+        self.rows.clear()
+        self.suspects.clear()
+
+    def results(self) -> Iterator[dict]:
+        db = self.db
+        # Only suspect keys can be shared; the join touches each row once
+        db.execute(
+            "INSERT INTO collided SELECT r.slot FROM rows r JOIN suspects s ON s.slot = r.slot"
+            " GROUP BY r.slot HAVING COUNT(*) > 1"
+        )
+        lookup = db.cursor()
+        query = (
+            "SELECT original, new_name, status, slot, moved,"
+            " EXISTS (SELECT 1 FROM collided c WHERE c.slot = r.slot)"
+            " FROM rows r ORDER BY row"
+        )
+        for original, new_name, status, slot, moved, collided in db.execute(query):
+            if status is None:
+                # The filter answers "not there" for nearly every name without touching disk
+                exists = (
+                    moved
+                    and slot in self.existing
+                    and lookup.execute("SELECT 1 FROM existing WHERE slot = ?", (slot,)).fetchone()
+                )
+                status = "CONFLICT" if collided or exists else "OK"
+            yield {"original": Path(original), "new_name": new_name, "status": status}
+
+
+def iter_validated(
+    pairs: Iterable[tuple[Path, str]],
+    count: int,
+    workdir: Path | None = None,
+    fs: FileSystem = LOCAL,
+) -> Iterator[dict]:
+    """Yield validate_new_names() results for pairs, in order, in bounded memory.
+
+    count is the expected number of pairs (it sizes the Bloom filters; a
+    wrong count only costs more disk lookups). The temporary database lives
+    in workdir (default: the system temp folder) and is removed afterwards;
+    the folders being checked are listed and probed through fs.
+    """
+    with tempfile.TemporaryDirectory(prefix="renametool-check-", dir=workdir) as tmp:
+        db = sqlite3.connect(Path(tmp) / "check.db")
+        try:
+            db.executescript(_SCHEMA)
+            spill = _Spill(db, count, fs)
+            with PROFILER.span("spill_names", files=count):
+                for row, (original, new_name) in enumerate(pairs):
+                    spill.add(row, original, new_name)
+                spill.flush()
+            with PROFILER.span("check_spilled", files=count):
+                yield from spill.results()
+        finally:
+            db.close()
+
+
+def validate_names(
+    pairs: Iterable[tuple[Path, str]],
+    count: int,
+    threshold: int = EXTERNAL_THRESHOLD,
+    workdir: Path | None = None,
+    fs: FileSystem = LOCAL,
+) -> Iterator[dict]:
+    """Yield validate_new_names() results, checking on disk when count exceeds threshold."""
+    if count > threshold:
+        return iter_validated(pairs, count, workdir, fs)
+    return iter(validate_new_names(list(pairs), fs=fs))
@@ -0,0 +1,92 @@
+"""Persistent per-file metadata cache and parallel cached lookups.
+
+Values are keyed by (device, inode, size, mtime_ns) rather than by name, so an
+entry stays valid across renames and is invalidated as soon as the file's
+content could have changed. Caches are stored as JSON next to the files they
+describe (dot-prefixed, so list_files() never shows them).
+"""
+
+import json
+import os
+from concurrent.futures import ThreadPoolExecutor
+from pathlib import Path
+
+DEFAULT_WORKERS = min(32, (os.cpu_count() or 1) * 4)
+
+
+def file_key(st: os.stat_result) -> str:
+    """Return the cache key for a stat result."""
+    return f"{st.st_dev}:{st.st_ino}:{st.st_size}:{st.st_mtime_ns}"
+
+
+class FileCache:
+    """A JSON-backed mapping of file_key() -> value.
+
+    Reads and writes are plain dict operations, so a single FileCache can be
+    shared between worker threads.
+    """
+
+    def __init__(self, path: Path | None = None):
+        self.path = path
+        self.entries: dict = {}
+        self.dirty = False
+        if path is not None and path.exists():
+            try:
+                with open(path, encoding="utf-8") as f:
+                    data = json.load(f)
+                if isinstance(data, dict):
+                    self.entries = data
+            except (json.JSONDecodeError, OSError):
+                self.entries = {}
+
+    def get(self, st: os.stat_result):
+        return self.entries.get(file_key(st))
+
+    def put(self, st: os.stat_result, value) -> None:
+        self.entries[file_key(st)] = value
+        self.dirty = True
+
+    def save(self) -> None:
+        """Write the cache back to disk if it changed; failures are ignored."""
+        if self.path is None or not self.dirty:
+            return
+        try:
+            with open(self.path, "w", encoding="utf-8") as f:
+                json.dump(self.entries, f)
+            self.dirty = False
+        except OSError:
+            pass
+
+
+def map_cached(
+    files: list[Path],
+    func,
+    cache: FileCache | None = None,
+    workers: int = DEFAULT_WORKERS,
+) -> dict[Path, object]:
+    """Compute func(path) for every file in a thread pool, reusing cached values.
+
+    Files that cannot be stat'ed are omitted from the result. Exceptions raised
+    by func propagate to the caller.
+    """
+    cache = cache if cache is not None else FileCache()
+
+    def lookup(file: Path):
+        try:
+            st = file.stat()
+        except OSError:
+            return file, None, None
+        cached = cache.get(st)
+        if cached is not None:
+            return file, st, cached
+        value = func(file)
+        if value is not None:
+            cache.put(st, value)
+        return file, st, value
+
+    results: dict[Path, object] = {}
+    with ThreadPoolExecutor(max_workers=max(1, workers)) as pool:
+        for file, st, value in pool.map(lookup, files):
+            if st is not None:
+                results[file] = value
+    return results
@@ -0,0 +1,669 @@
+"""Filesystem backends for the engine: the real disk, memory, and a fault injector.
+
+Every engine function that lists, stats or renames takes an ``fs`` backend,
+LOCAL (the real filesystem) by default:
+
+- LocalFileSystem passes each call straight to os and pathlib.
+- MemoryFileSystem is a tree of names in memory. A plan over a million files
+  dry-runs in seconds, it can mirror a real folder's listing, and fail()
+  makes any operation on any path raise an exact errno. Names compare as in
+  nameindex.NameIndex, so it can be case-insensitive or normalize Unicode
+  like a macOS or SMB share.
+- FaultyFileSystem wraps another backend and adds per-operation latency and
+  random failures from a seeded generator, so a slow or flaky NAS can be
+  reproduced in a benchmark or test.
+
+Only listing, metadata and renames go through a backend. Name computation
+that reads file contents (templates' stat fields, EXIF and tag reads,
+hashing) and cross-volume copies of a real file still use the real files.
+"""
+
+import ctypes
+import ctypes.util
+import errno
+import os
+import random
+import stat
+import sys
+import threading
+import time
+from abc import ABC, abstractmethod
+from collections import Counter
+from contextlib import nullcontext
+from itertools import count
+from pathlib import Path
+from typing import NamedTuple
+
+from nameindex import NameIndex, probe_folder, probe_normalization
+from transfer import move_across_devices
+
+OPERATIONS = (
+    "scandir",
+    "listdir",
+    "stat",
+    "exists",
+    "rename",
+    "move",
+    "mkdir",
+    "rmdir",
+    "unlink",
+    "read_text",
+    "write_text",
+)
+
+
+_AT_FDCWD = -100
+_RENAME_NOREPLACE = 1  # renameat2() flag on Linux
+_RENAME_EXCL = 4  # renamex_np() flag on macOS
+
+
+def _exclusive_rename():
+    """Return libc's no-replace rename as f(src, dst) -> 0 or -1 (with errno set), or None."""
+    try:
+        libc = ctypes.CDLL(ctypes.util.find_library("c"), use_errno=True)
+        if sys.platform.startswith("linux"):
+            renameat2 = libc.renameat2
+            return lambda src, dst: renameat2(_AT_FDCWD, src, _AT_FDCWD, dst, _RENAME_NOREPLACE)
+        if sys.platform == "darwin":
+            renamex_np = libc.renamex_np
+            return lambda src, dst: renamex_np(src, dst, _RENAME_EXCL)
+    except (OSError, AttributeError):
+        pass
+    return None
+
+
+_exclusive = _exclusive_rename()
+# errno values meaning the kernel or filesystem cannot rename without replacing
+_UNSUPPORTED_FLAG = {errno.EINVAL, errno.ENOSYS, errno.EOPNOTSUPP, getattr(errno, "ENOTSUP", 0)}
+
+
+def rename_noreplace(src: Path, dst: Path) -> None:
+    """Rename src to dst on the real filesystem, raising FileExistsError if dst exists.
+
+    Uses renameat2(RENAME_NOREPLACE) on Linux and renamex_np(RENAME_EXCL) on
+    macOS, so the check costs no extra round trip; os.rename() never replaces
+    a file on Windows. Elsewhere, or where the filesystem does not support
+    the flag, dst is checked first.
+    """
+    if _exclusive is not None:
+        if _exclusive(os.fsencode(src), os.fsencode(dst)) == 0:
+            return
+        code = ctypes.get_errno()
+        if code not in _UNSUPPORTED_FLAG:
+            raise OSError(code, os.strerror(code), str(src), None, str(dst))
+    # Windows' rename never replaces a file; anywhere else, check first
+    if sys.platform != "win32" and os.path.lexists(dst):
+        raise FileExistsError(errno.EEXIST, os.strerror(errno.EEXIST), str(src), None, str(dst))
+    os.rename(src, dst)
+
+
+class FileSystem(ABC):
+    """The operations the engine needs from a filesystem; see LocalFileSystem.
+
+    Paths are pathlib.Path objects. Failures raise OSError subclasses, as
+    the os functions of the same name do. Every method is abstract, so a
+    backend that misses one fails when it is instantiated, not mid-apply.
+    """
+
+    @abstractmethod
+    def scandir(self, folder: Path):
+        """Return a context manager that iterates folder's entries (as os.scandir)."""
+        raise NotImplementedError
+
+    @abstractmethod
+    def listdir(self, folder: Path) -> list[str]:
+        raise NotImplementedError
+
+    @abstractmethod
+    def stat(self, path: Path):
+        raise NotImplementedError
+
+    @abstractmethod
+    def lstat(self, path: Path):
+        raise NotImplementedError
+
+    @abstractmethod
+    def exists(self, path: Path) -> bool:
+        raise NotImplementedError
+
+    @abstractmethod
+    def rename(self, src: Path, dst: Path) -> None:
+        """Rename src to dst, replacing a file at dst (as os.rename on POSIX)."""
+        raise NotImplementedError
+
+    @abstractmethod
+    def rename_noreplace(self, src: Path, dst: Path) -> None:
+        """Rename src to dst, raising FileExistsError if dst exists, even as src itself."""
+        raise NotImplementedError
+
+    @abstractmethod
+    def move(self, src: Path, dst: Path, verify: bool = False) -> None:
+        """Move src to dst on another volume (after rename() failed with EXDEV)."""
+        raise NotImplementedError
+
+    @abstractmethod
+    def mkdir(self, path: Path, parents: bool = False, exist_ok: bool = False) -> None:
+        raise NotImplementedError
+
+    @abstractmethod
+    def rmdir(self, path: Path) -> None:
+        raise NotImplementedError
+
+    @abstractmethod
+    def unlink(self, path: Path) -> None:
+        raise NotImplementedError
+
+    @abstractmethod
+    def read_text(self, path: Path) -> str:
+        raise NotImplementedError
+
+    @abstractmethod
+    def write_text(self, path: Path, text: str) -> None:
+        raise NotImplementedError
+
+    @abstractmethod
+    def probe(self, folder: Path, names=None) -> tuple[bool, bool | None]:
+        """Return (case_sensitive, normalizes_unicode) for folder, as nameindex.probe_folder."""
+        raise NotImplementedError
+
+
+class LocalFileSystem(FileSystem):
+    """The real filesystem."""
+
+    def scandir(self, folder: Path):
+        return os.scandir(folder)
+
+    def listdir(self, folder: Path) -> list[str]:
+        return os.listdir(folder)
+
+    def stat(self, path: Path) -> os.stat_result:
+        return os.stat(path)
+
+    def lstat(self, path: Path) -> os.stat_result:
+        return os.lstat(path)
+
+    def exists(self, path: Path) -> bool:
+        return path.exists()
+
+    def rename(self, src: Path, dst: Path) -> None:
+        src.rename(dst)
+
+    def rename_noreplace(self, src: Path, dst: Path) -> None:
+        rename_noreplace(src, dst)
+
+    def move(self, src: Path, dst: Path, verify: bool = False) -> None:
+        move_across_devices(src, dst, verify=verify)
+
+    def mkdir(self, path: Path, parents: bool = False, exist_ok: bool = False) -> None:
+        path.mkdir(parents=parents, exist_ok=exist_ok)
+
+    def rmdir(self, path: Path) -> None:
+        path.rmdir()
+
+    def unlink(self, path: Path) -> None:
+        path.unlink()
+
+    def read_text(self, path: Path) -> str:
+        with open(path, encoding="utf-8") as f:
+            return f.read()
+
+    def write_text(self, path: Path, text: str) -> None:
+        with open(path, "w", encoding="utf-8") as f:
+            f.write(text)
+
+    def probe(self, folder: Path, names=None) -> tuple[bool, bool | None]:
+        return probe_folder(folder, names)
+
+
+LOCAL = LocalFileSystem()
+DEVICE = 0  # st_dev of every MemoryFileSystem entry
+
+
+class MemoryStat(NamedTuple):
+    """The stat fields the engine reads, for a MemoryFileSystem entry."""
+
+    st_mode: int
+    st_ino: int
+    st_dev: int
+    st_size: int
+    st_mtime_ns: int
+
+    @property
+    def st_mtime(self) -> float:
+        return self.st_mtime_ns / 1e9
+
+
+class _Node:
+    __slots__ = ("name", "ino", "mtime_ns", "data", "children")
+
+    def __init__(self, name: str, ino: int, mtime_ns: int, data=None, children=None):
+        self.name = name
+        self.ino = ino
+        self.mtime_ns = mtime_ns
+        self.data = data  # file: str contents or int size; None for a folder
+        self.children = children  # folder: {name key: _Node}
+
+    @property
+    def size(self) -> int:
+        if self.children is not None:
+            return 0
+        return self.data if isinstance(self.data, int) else len(self.data.encode("utf-8"))
+
+    def stat(self) -> MemoryStat:
+        if self.children is not None:
+            return MemoryStat(stat.S_IFDIR | 0o755, self.ino, DEVICE, 0, self.mtime_ns)
+        return MemoryStat(stat.S_IFREG | 0o644, self.ino, DEVICE, self.size, self.mtime_ns)
+
+
+class MemoryEntry:
+    """A MemoryFileSystem folder entry, with the os.DirEntry methods the engine uses."""
+
+    __slots__ = ("name", "path", "_node")
+
+    def __init__(self, name: str, path: str, node: _Node):
+        self.name = name
+        self.path = path
+        self._node = node
+
+    def is_file(self) -> bool:
+        return self._node.children is None
+
+    def is_dir(self) -> bool:
+        return self._node.children is not None
+
+    def stat(self) -> MemoryStat:
+        return self._node.stat()
+
+
+def _error(code: int, path: Path) -> OSError:
+    return OSError(code, os.strerror(code), str(path))
+
+
+class MemoryFileSystem(FileSystem):
+    """Files and folders held in memory, for dry runs and failure simulation.
+
+    case_sensitive and normalizes decide which spellings name the same entry
+    (as NameIndex keys them); probe() reports them, so conflict checks agree.
+    Files have a size and, if written with write_text(), text contents (a
+    file created with only a size reads as empty). Thread-safe, so asyncapi
+    can apply against it.
+    """
+
+    def __init__(self, case_sensitive: bool = True, normalizes: bool = False):
+        self.case_sensitive = case_sensitive
+        self.normalizes = normalizes
+        self._key = NameIndex(case_sensitive=case_sensitive, normalizes=normalizes).key
+        self._inodes = count(1)
+        self._clock = 0
+        self._lock = threading.RLock()
+        self._root = _Node("", next(self._inodes), self._now(), children={})
+        # Resolved folders by path parts; cleared whenever a folder is removed or moved
+        self._folders: dict[tuple[str, ...], _Node] = {}
+        self._failures: dict[tuple[str, tuple[str, ...]], int] = {}
+
+    @classmethod
+    def mirror(cls, folder: Path) -> "MemoryFileSystem":
+        """Return a backend holding folder's current entries (names, sizes and mtimes only).
+
+        Case sensitivity and normalization are probed from the real folder.
+        """
+        case_sensitive, _ = probe_folder(folder)
+        fs = cls(case_sensitive, probe_normalization(folder))
+        fs.mkdir(folder, parents=True)
+        with os.scandir(folder) as it:
+            for entry in it:
+                path = folder / entry.name
+                try:
+                    if entry.is_dir():
+                        fs.mkdir(path)
+                        continue
+                    st = entry.stat()
+                except OSError:
+                    continue
+                fs.add_file(path, st.st_size, st.st_mtime_ns)
+        return fs
+
+    def _now(self) -> int:
+        self._clock = max(time.time_ns(), self._clock + 1)
+        return self._clock
+
+    # -- failure injection
+
+    def fail(self, path: Path, op: str, code: int | None = errno.EACCES) -> None:
+        """Make every op (see OPERATIONS) on path raise OSError(code); None clears it.
+
+        A rename or move fails when either its source or its target is path.
+        """
+        if op not in OPERATIONS:
+            raise ValueError(f"Unknown operation: {op!r}")
+        key = (op, self._path_key(Path(path)))
+        if code is None:
+            self._failures.pop(key, None)
+        else:
+            self._failures[key] = code
+
+    def _check(self, op: str, *paths: Path) -> None:
+        if self._failures:
+            for path in paths:
+                code = self._failures.get((op, self._path_key(path)))
+                if code is not None:
+                    raise _error(code, path)
+
+    # -- path resolution
+
+    @staticmethod
+    def _parts(path: Path) -> tuple[str, ...]:
+        parts = path.parts
+        return parts[1:] if path.anchor else parts
+
+    def _path_key(self, path: Path) -> tuple[str, ...]:
+        return tuple(map(self._key, self._parts(path)))
+
+    def _folder_at(self, parts: tuple[str, ...], path: Path) -> _Node:
+        """Return the folder at parts (path is only for error messages)."""
+        node = self._folders.get(parts)
+        if node is not None:
+            return node
+        node = self._root
+        for part in parts:
+            if node.children is None:
+                raise _error(errno.ENOTDIR, path)
+            node = node.children.get(self._key(part))
+            if node is None:
+                raise _error(errno.ENOENT, path)
+        if node.children is None:
+            raise _error(errno.ENOTDIR, path)
+        self._folders[parts] = node
+        return node
+
+    def _folder(self, path: Path) -> _Node:
+        return self._folder_at(self._parts(path), path)
+
+    def _parent(self, path: Path) -> tuple[_Node, str]:
+        """Return (the folder holding path, path's name key); the folder must exist."""
+        parts = self._parts(path)
+        if not parts:
+            raise _error(errno.EBUSY, path)  # the root has no parent
+        return self._folder_at(parts[:-1], path.parent), self._key(parts[-1])
+
+    def _lookup(self, path: Path) -> _Node | None:
+        parts = self._parts(path)
+        if not parts:
+            return self._root
+        try:
+            parent = self._folder_at(parts[:-1], path)
+        except OSError:
+            return None
+        return parent.children.get(self._key(parts[-1]))
+
+    def _get(self, path: Path) -> _Node:
+        node = self._lookup(path)
+        if node is None:
+            raise _error(errno.ENOENT, path)
+        return node
+
+    def _attach(self, parent: _Node, key: str, name: str, node: _Node) -> None:
+        node.name = name
+        parent.children[key] = node
+        parent.mtime_ns = self._now()
+
+    def _detach(self, parent: _Node, key: str) -> _Node:
+        node = parent.children.pop(key)
+        if node.children is not None:
+            self._folders.clear()
+        parent.mtime_ns = self._now()
+        return node
+
+    # -- building
+
+    def add_file(self, path: Path, size: int = 0, mtime_ns: int | None = None) -> None:
+        """Create (or replace) a file of size bytes, creating its folders as needed."""
+        path = Path(path)
+        with self._lock:
+            self.mkdir(path.parent, parents=True, exist_ok=True)
+            parent, key = self._parent(path)
+            existing = parent.children.get(key)
+            if existing is not None and existing.children is not None:
+                raise _error(errno.EISDIR, path)
+            node = _Node(path.name, next(self._inodes), mtime_ns or self._now(), data=size)
+            self._attach(parent, key, path.name, node)
+
+    def add_files(self, folder: Path, names, size: int = 0) -> None:
+        """Create a file of size bytes for every name in folder (creating folder)."""
+        folder = Path(folder)
+        key = self._key
+        inodes = self._inodes
+        with self._lock:
+            self.mkdir(folder, parents=True, exist_ok=True)
+            children = self._folder(folder).children
+            now = self._now()
+            for name in names:
+                k = key(name)
+                existing = children.get(k)
+                if existing is not None and existing.children is not None:
+                    raise _error(errno.EISDIR, folder / name)
+                children[k] = _Node(name, next(inodes), now, data=size)
+            self._folder(folder).mtime_ns = self._now()
+
+    # -- FileSystem operations
+
+    def scandir(self, folder: Path):
+        with self._lock:
+            self._check("scandir", folder)
+            children = self._folder(folder).children
+            base = str(folder)
+            sep = "" if base.endswith(os.sep) else os.sep
+            entries = [
+                MemoryEntry(node.name, f"{base}{sep}{node.name}", node)
+                for node in children.values()
+            ]
+        return nullcontext(entries)
+
+    def listdir(self, folder: Path) -> list[str]:
+        with self._lock:
+            self._check("listdir", folder)
+            return [node.name for node in self._folder(folder).children.values()]
+
+    def stat(self, path: Path) -> MemoryStat:
+        with self._lock:
+            self._check("stat", path)
+            return self._get(path).stat()
+
+    lstat = stat  # there are no symlinks
+
+    def exists(self, path: Path) -> bool:
+        with self._lock:
+            self._check("exists", path)
+            return self._lookup(path) is not None
+
+    def rename(self, src: Path, dst: Path) -> None:
+        self._rename("rename", src, dst)
+
+    def rename_noreplace(self, src: Path, dst: Path) -> None:
+        self._rename("rename", src, dst, replace=False)
+
+    def move(self, src: Path, dst: Path, verify: bool = False) -> None:
+        self._rename("move", src, dst)
+
+    def _rename(self, op: str, src: Path, dst: Path, replace: bool = True) -> None:
+        with self._lock:
+            self._check(op, src, dst)
+            src_parent, src_key = self._parent(src)
+            node = src_parent.children.get(src_key)
+            if node is None:
+                raise _error(errno.ENOENT, src)
+            dst_parent, dst_key = self._parent(dst)
+            existing = dst_parent.children.get(dst_key)
+            if existing is not None and not replace:
+                raise _error(errno.EEXIST, dst)
+            if existing is not None and existing is not node:
+                if existing.children is not None:
+                    if node.children is None:
+                        raise _error(errno.EISDIR, dst)
+                    if existing.children:
+                        raise _error(errno.ENOTEMPTY, dst)
+                elif node.children is not None:
+                    raise _error(errno.ENOTDIR, dst)
+                self._detach(dst_parent, dst_key)
+            self._detach(src_parent, src_key)
+            self._attach(dst_parent, dst_key, dst.name, node)
+
+    def mkdir(self, path: Path, parents: bool = False, exist_ok: bool = False) -> None:
+        path = Path(path)
+        with self._lock:
+            self._check("mkdir", path)
+            node = self._lookup(path)
+            if node is not None:
+                if exist_ok and node.children is not None:
+                    return
+                raise _error(errno.EEXIST, path)
+            if parents and self._lookup(path.parent) is None:
+                self.mkdir(path.parent, parents=True, exist_ok=True)
+            parent, key = self._parent(path)
+            node = _Node(path.name, next(self._inodes), self._now(), children={})
+            self._attach(parent, key, path.name, node)
+
+    def rmdir(self, path: Path) -> None:
+        with self._lock:
+            self._check("rmdir", path)
+            if self._folder(path).children:
+                raise _error(errno.ENOTEMPTY, path)
+            self._detach(*self._parent(path))
+
+    def unlink(self, path: Path) -> None:
+        with self._lock:
+            self._check("unlink", path)
+            if self._get(path).children is not None:
+                raise _error(errno.EISDIR, path)
+            self._detach(*self._parent(path))
+
+    def read_text(self, path: Path) -> str:
+        with self._lock:
+            self._check("read_text", path)
+            node = self._get(path)
+            if node.children is not None:
+                raise _error(errno.EISDIR, path)
+            return node.data if isinstance(node.data, str) else ""  # contents unknown
+
+    def write_text(self, path: Path, text: str) -> None:
+        with self._lock:
+            self._check("write_text", path)
+            parent, key = self._parent(path)
+            node = parent.children.get(key)
+            if node is None:
+                node = _Node(path.name, next(self._inodes), self._now())
+                self._attach(parent, key, path.name, node)
+            elif node.children is not None:
+                raise _error(errno.EISDIR, path)
+            node.data = text
+            node.mtime_ns = self._now()
+
+    def probe(self, folder: Path, names=None) -> tuple[bool, bool | None]:
+        return self.case_sensitive, self.normalizes
+
+
+class FaultyFileSystem(FileSystem):
+    """Another backend with injected latency and random failures, reproducibly.
+
+    latency is seconds added to every call, or {operation: seconds} (see
+    OPERATIONS; lstat counts as stat), plus up to jitter more at random.
+    error_rate is the chance (0-1) that a call fails with OSError(error),
+    again either for every operation or per operation. Random draws come
+    from seed, so a run fails the same calls every time. calls counts the
+    calls made per operation.
+    """
+
+    def __init__(
+        self,
+        inner: FileSystem = LOCAL,
+        latency: float | dict[str, float] = 0.0,
+        jitter: float = 0.0,
+        error_rate: float | dict[str, float] = 0.0,
+        error: int = errno.EIO,
+        seed: int = 0,
+        sleep=time.sleep,
+    ):
+        for setting in (latency, error_rate):
+            if isinstance(setting, dict) and not set(setting) <= set(OPERATIONS):
+                raise ValueError(f"Unknown operations: {sorted(set(setting) - set(OPERATIONS))}")
+        self.inner = inner
+        self.latency = latency
+        self.jitter = jitter
+        self.error_rate = error_rate
+        self.error = error
+        self.calls: Counter[str] = Counter()
+        self._random = random.Random(seed)
+        self._lock = threading.Lock()
+        self._sleep = sleep
+
+    def _enter(self, op: str, path: Path) -> None:
+        latency = self.latency if not isinstance(self.latency, dict) else self.latency.get(op, 0.0)
+        rate = (
+            self.error_rate
+            if not isinstance(self.error_rate, dict)
+            else self.error_rate.get(op, 0.0)
+        )
+        with self._lock:
+            self.calls[op] += 1
+            if self.jitter:
+                latency += self._random.random() * self.jitter
+            failed = rate > 0 and self._random.random() < rate
+        if latency > 0:
+            self._sleep(latency)
+        if failed:
+            raise _error(self.error, path)
+
+    def scandir(self, folder: Path):
+        self._enter("scandir", folder)
+        return self.inner.scandir(folder)
+
+    def listdir(self, folder: Path) -> list[str]:
+        self._enter("listdir", folder)
+        return self.inner.listdir(folder)
+
+    def stat(self, path: Path):
+        self._enter("stat", path)
+        return self.inner.stat(path)
+
+    def lstat(self, path: Path):
+        self._enter("stat", path)
+        return self.inner.lstat(path)
+
+    def exists(self, path: Path) -> bool:
+        self._enter("exists", path)
+        return self.inner.exists(path)
+
+    def rename(self, src: Path, dst: Path) -> None:
+        self._enter("rename", src)
+        self.inner.rename(src, dst)
+
+    def rename_noreplace(self, src: Path, dst: Path) -> None:
+        self._enter("rename", src)
+        self.inner.rename_noreplace(src, dst)
+
+    def move(self, src: Path, dst: Path, verify: bool = False) -> None:
+        self._enter("move", src)
+        self.inner.move(src, dst, verify)
+
+    def mkdir(self, path: Path, parents: bool = False, exist_ok: bool = False) -> None:
+        self._enter("mkdir", path)
+        self.inner.mkdir(path, parents, exist_ok)
+
+    def rmdir(self, path: Path) -> None:
+        self._enter("rmdir", path)
+        self.inner.rmdir(path)
+
+    def unlink(self, path: Path) -> None:
+        self._enter("unlink", path)
+        self.inner.unlink(path)
+
+    def read_text(self, path: Path) -> str:
+        self._enter("read_text", path)
+        return self.inner.read_text(path)
+
+    def write_text(self, path: Path, text: str) -> None:
+        self._enter("write_text", path)
+        self.inner.write_text(path, text)
+
+    def probe(self, folder: Path, names=None) -> tuple[bool, bool | None]:
+        return self.inner.probe(folder, names)
@@ -0,0 +1,199 @@
+"""Content hashing for duplicate detection and hash-based naming.
+
+Files are read with a single reusable 1 MiB buffer (hashlib releases the GIL
+on large updates, so a thread pool hashes several files at once). Duplicate
+detection only hashes files that share a size, and only fully hashes files
+whose head+tail partial hash also matches.
+"""
+
+import hashlib
+import os
+from collections import defaultdict
+from concurrent.futures import ThreadPoolExecutor
+from pathlib import Path
+
+from filecache import DEFAULT_WORKERS, FileCache
+from nameindex import NameIndex
+
+HASH_CACHE_FILE = ".renametool_hashes.json"
+DEFAULT_ALGO = "blake2b"
+CHUNK_SIZE = 1024 * 1024
+PARTIAL_SIZE = 64 * 1024
+
+
+def hash_file(path: Path, algo: str = DEFAULT_ALGO, partial: bool = False) -> str:
+    """Return the hex digest of path's content.
+
+    With partial=True only the first and last PARTIAL_SIZE bytes are hashed.
+    For files no larger than PARTIAL_SIZE the partial and full digests are equal.
+    """
+    h = hashlib.new(algo)
+    view = memoryview(bytearray(CHUNK_SIZE))
+    with open(path, "rb", buffering=0) as f:
+        if partial:
+            n = f.readinto(view[:PARTIAL_SIZE])
+            h.update(view[:n])
+            size = os.fstat(f.fileno()).st_size
+            if size > PARTIAL_SIZE:
+                f.seek(max(PARTIAL_SIZE, size - PARTIAL_SIZE))
+                n = f.readinto(view[:PARTIAL_SIZE])
+                h.update(view[:n])
+            return h.hexdigest()
+        while n := f.readinto(view):
+            h.update(view[:n])
+    return h.hexdigest()
+
+
+class Hasher:
+    """Parallel, cached content hasher.
+
+    Cache values are dicts of {kind: digest}, where kind is the algorithm name
+    for full digests and "partial:<algo>" for head+tail digests.
+    """
+
+    def __init__(
+        self,
+        cache: FileCache | None = None,
+        algo: str = DEFAULT_ALGO,
+        workers: int = DEFAULT_WORKERS,
+    ):
+        hashlib.new(algo)  # fail fast on unknown algorithms
+        self.cache = cache if cache is not None else FileCache()
+        self.algo = algo
+        self.workers = max(1, workers)
+
+    @classmethod
+    def for_folder(cls, folder: Path, **kwargs) -> "Hasher":
+        """Return a Hasher whose cache persists to HASH_CACHE_FILE in folder."""
+        return cls(FileCache(folder / HASH_CACHE_FILE), **kwargs)
+
+    def _digest(self, path: Path, st: os.stat_result, partial: bool) -> str:
+        if partial and st.st_size <= PARTIAL_SIZE:
+            partial = False  # the "partial" digest would cover the whole file anyway
+        kind = f"partial:{self.algo}" if partial else self.algo
+        entry = self.cache.get(st) or {}
+        if kind not in entry:
+            entry = dict(entry)
+            entry[kind] = hash_file(path, self.algo, partial=partial)
+            self.cache.put(st, entry)
+        return entry[kind]
+
+    def _map(self, func, items):
+        with ThreadPoolExecutor(max_workers=self.workers) as pool:
+            return list(pool.map(func, items))
+
+    def _stat_all(self, files: list[Path]) -> list[tuple[Path, os.stat_result]]:
+        def stat(file):
+            try:
+                return file, file.stat()
+            except OSError:
+                return file, None
+
+        return [(f, st) for f, st in self._map(stat, files) if st is not None]
+
+    def digests(self, files: list[Path]) -> dict[Path, str]:
+        """Return the full digest of every readable file in files."""
+
+        def work(item):
+            path, st = item
+            try:
+                return path, self._digest(path, st, partial=False)
+            except OSError:
+                return path, None
+
+        result = {p: d for p, d in self._map(work, self._stat_all(files)) if d is not None}
+        self.cache.save()
+        return result
+
+    def duplicate_groups(self, files: list[Path]) -> list[list[Path]]:
+        """Group byte-identical files; only groups of two or more are returned.
+
+        Groups and their members keep the order of files.
+        """
+        by_size: dict[int, list] = defaultdict(list)
+        for path, st in self._stat_all(files):
+            by_size[st.st_size].append((path, st))
+        candidates = [item for items in by_size.values() if len(items) > 1 for item in items]
+
+        # Progressively narrower keys: size -> partial digest -> full digest
+        for partial in (True, False):
+
+            def work(item, partial=partial):
+                path, st = item
+                try:
+                    return item, self._digest(path, st, partial=partial)
+                except OSError:
+                    return item, None
+
+            buckets: dict[tuple, list] = defaultdict(list)
+            for item, digest in self._map(work, candidates):
+                if digest is not None:
+                    buckets[(item[1].st_size, digest)].append(item)
+            candidates = [item for items in buckets.values() if len(items) > 1 for item in items]
+
+        self.cache.save()
+        order = {f: i for i, f in enumerate(files)}
+        groups = [
+            sorted((p for p, _ in items), key=order.__getitem__) for items in buckets.values()
+        ]
+        groups = [g for g in groups if len(g) > 1]
+        groups.sort(key=lambda g: order[g[0]])
+        return groups
+
+
+def dedupe_conflicts(
+    results: list[dict], hasher: Hasher | None = None, index: NameIndex | None = None, *, fs
+) -> list[dict]:
+    """Re-check CONFLICT rows from validate_new_names() for byte-identical duplicates.
+
+    A source identical to the file already occupying its target, or to an
+    earlier source aiming at the same target, is marked "DUPLICATE" (and will
+    be left untouched). If exactly one source remains for a target that does
+    not exist, it becomes "OK". Returns a new list; rows are copied.
+
+    Targets are grouped and compared by NameIndex key, as validate_new_names()
+    does: index, if given, is used for every folder, otherwise each target
+    folder is probed through fs (an fsbackend.FileSystem), which is also
+    asked whether a target exists.
+    """
+    hasher = hasher or Hasher()
+    results = [dict(r) for r in results]
+    indexes: dict[Path, NameIndex] = {}
+
+    def key(path: Path) -> tuple[Path, str]:
+        folder = path.parent
+        idx = index if index is not None else indexes.get(folder)
+        if idx is None:
+            idx = indexes[folder] = NameIndex.for_folder(folder, fs=fs)
+        return folder, idx.key(path.name)
+
+    groups: dict[tuple, list[int]] = defaultdict(list)
+    for i, r in enumerate(results):
+        if r["status"] == "CONFLICT":
+            groups[key(r["original"].parent / r["new_name"])].append(i)
+
+    for idxs in groups.values():
+        sources = [results[i]["original"] for i in idxs]
+        target = sources[0].parent / results[idxs[0]]["new_name"]
+        # Compare whole paths: an organize target in a subfolder may share a source's name
+        source_keys = {key(s) for s in sources}
+        target_exists = fs.exists(target) and key(target) not in source_keys
+
+        files = sources + [target] if target_exists else sources
+        duplicates: set[Path] = set()
+        for group in hasher.duplicate_groups(files):
+            if target_exists and target in group:
+                duplicates.update(p for p in group if p != target)
+            else:
+                duplicates.update(group[1:])
+
+        remaining = []
+        for i in idxs:
+            if results[i]["original"] in duplicates:
+                results[i]["status"] = "DUPLICATE"
+            else:
+                remaining.append(i)
+        if len(remaining) == 1 and not target_exists:
+            results[remaining[0]]["status"] = "OK"
+
+    return results
@@ -0,0 +1,272 @@
+"""Library views: the renamed tree as hard or symbolic links to the originals.
+
+When the originals must keep their names (a torrent client still seeding
+them), the planned names can be materialized in a separate view folder
+instead, as hardlinks (no extra space, same filesystem only) or symlinks.
+
+A manifest in the view root records every link the tool made. Re-running
+plan_links() diffs the desired tree against it and against what is on disk,
+so only new or changed links are created and links that are no longer wanted
+are pruned; files the tool did not create are never touched.
+
+    plan = plan_links(view_targets(files, names, template), view_root, "symlink")
+    summary = sync_links(plan)
+"""
+
+import errno
+import json
+import os
+from pathlib import Path
+
+from engine import check_name
+from nameindex import NameIndex, probe_folder
+from organize import folder_parts
+from profiling import PROFILER
+from templates import compile_template
+
+MANIFEST_FILE = ".renametool_links.json"
+MODES = ("hardlink", "symlink")
+LINK_SUFFIX = ".renametool-link"
+
+
+def view_targets(
+    files: list[Path], names: list[str], template: str | None = None
+) -> list[tuple[Path, str, str | None]]:
+    """Return (source, target path relative to the view root, INVALID status or None).
+
+    names are the computed new names; template, if given, is an organize
+    folder template rendered for each source (see organize.py).
+    """
+    compiled = compile_template(template) if template else None
+    targets = []
+    for i, (source, name) in enumerate(zip(files, names)):
+        parts, status = folder_parts(compiled.render(source, i) if compiled else None)
+        if status is None:
+            status = check_name(name)
+        targets.append((source, "/".join(parts + (name,)), status))
+    return targets
+
+
+def load_manifest(view_root: Path) -> dict[str, tuple[str, str, int]]:
+    """Return {relative link path: (mode, source path, inode)} for the links made in view_root.
+
+    inode identifies a hardlink even after its source is deleted (0 for symlinks).
+    """
+    try:
+        with open(view_root / MANIFEST_FILE, encoding="utf-8") as f:
+            data = json.load(f)
+    except (OSError, json.JSONDecodeError):
+        return {}
+    links = data.get("links") if isinstance(data, dict) else None
+    if not isinstance(links, dict):
+        return {}
+    return {
+        rel: tuple(entry)
+        for rel, entry in links.items()
+        if isinstance(entry, list) and len(entry) == 3 and entry[0] in MODES
+    }
+
+
+def save_manifest(view_root: Path, manifest: dict[str, tuple[str, str, int]]) -> None:
+    """Write the manifest atomically (a crash leaves the previous one in place)."""
+    tmp = view_root / (MANIFEST_FILE + ".tmp")
+    with open(tmp, "w", encoding="utf-8") as f:
+        json.dump({"links": {rel: list(entry) for rel, entry in sorted(manifest.items())}}, f)
+    os.replace(tmp, view_root / MANIFEST_FILE)
+
+
+def _link_matches(target: Path, source: Path, mode: str) -> bool | None:
+    """True if target links to source, False if something else is there, None if nothing is."""
+    try:
+        st = os.lstat(target)
+    except FileNotFoundError:
+        return None
+    except OSError:
+        return False
+    if mode == "symlink":
+        return os.path.islink(target) and os.readlink(target) == str(source)
+    try:
+        return os.path.samestat(st, os.stat(source))
+    except OSError:
+        return False
+
+
+class LinkPlan:
+    """The changes that bring a view folder in line with the desired links.
+
+    create and replace map relative link paths to sources; keep lists links
+    already correct; prune lists stale links the tool made for these sources'
+    folders; forget lists manifest entries whose link is gone or was replaced
+    by something else; conflicts maps relative paths to why they were skipped.
+    """
+
+    __slots__ = (
+        "view_root",
+        "mode",
+        "create",
+        "replace",
+        "keep",
+        "prune",
+        "forget",
+        "conflicts",
+    )
+
+    def __init__(self, view_root: Path, mode: str):
+        self.view_root = view_root
+        self.mode = mode
+        self.create: dict[str, Path] = {}
+        self.replace: dict[str, Path] = {}
+        self.keep: dict[str, Path] = {}
+        self.prune: list[str] = []
+        self.forget: list[str] = []
+        self.conflicts: dict[str, str] = {}
+
+
+def _made_by_us(view_root: Path, rel: str, entry: tuple[str, str, int]) -> bool:
+    """True if the link the manifest recorded for rel is still there, unchanged."""
+    mode, source, inode = entry
+    if mode == "symlink":
+        return bool(_link_matches(view_root / rel, Path(source), mode))
+    try:
+        return os.lstat(view_root / rel).st_ino == inode
+    except OSError:
+        return False
+
+
+def plan_links(
+    targets: list[tuple[Path, str, str | None]], view_root: Path, mode: str = "hardlink"
+) -> LinkPlan:
+    """Diff the desired links (from view_targets()) against view_root's manifest and contents.
+
+    Links the manifest records for sources in the same folders as targets'
+    sources, but that targets no longer want, are pruned; links made for
+    other folders are left alone, so one view can collect several folders.
+    """
+    if mode not in MODES:
+        raise ValueError(f"Unknown link mode: {mode!r}")
+    plan = LinkPlan(view_root, mode)
+    with PROFILER.span("plan_links", files=len(targets)):
+        manifest = load_manifest(view_root)
+        probe_root = view_root if view_root.is_dir() else view_root.parent
+        case_sensitive, normalizes = probe_folder(probe_root)
+        keys = NameIndex(case_sensitive=case_sensitive, normalizes=normalizes, folder=view_root)
+
+        # Group by path key first: two sources claiming one path get neither
+        groups: dict[str, list[tuple[str, Path]]] = {}
+        folders = set()
+        for source, rel, status in targets:
+            source = source.absolute()
+            folders.add(str(source.parent))
+            if status is not None:
+                plan.conflicts[rel] = status
+                continue
+            key = "/".join(keys.key(part) for part in rel.split("/"))
+            groups.setdefault(key, []).append((rel, source))
+
+        for claims in groups.values():
+            if len(claims) > 1:
+                for rel, _ in claims:
+                    plan.conflicts[rel] = "CONFLICT"
+                continue
+            rel, source = claims[0]
+            state = _link_matches(view_root / rel, source, mode)
+            if state is None:
+                plan.create[rel] = source
+            elif state:
+                plan.keep[rel] = source
+            elif rel in manifest and _made_by_us(view_root, rel, manifest[rel]):
+                plan.replace[rel] = source
+            else:
+                plan.conflicts[rel] = "CONFLICT (not made by renametool)"
+
+        wanted = plan.create.keys() | plan.replace.keys() | plan.keep.keys()
+        for rel, entry in sorted(manifest.items()):
+            if rel in wanted or os.path.dirname(entry[1]) not in folders:
+                continue
+            if _made_by_us(view_root, rel, entry):
+                plan.prune.append(rel)
+            else:
+                plan.forget.append(rel)
+        PROFILER.add(stat=len(targets) + len(manifest))
+    return plan
+
+
+def _entry(mode: str, source: Path, target: Path) -> tuple[str, str, int]:
+    return mode, str(source), os.lstat(target).st_ino if mode == "hardlink" else 0
+
+
+def _remove_empty_dirs(dirs: set[Path], view_root: Path) -> None:
+    """Remove each of dirs and its ancestors below view_root while they are empty."""
+    for folder in sorted(dirs, key=lambda p: len(p.parts), reverse=True):
+        while folder != view_root and view_root in folder.parents:
+            try:
+                folder.rmdir()
+            except OSError:
+                break
+            folder = folder.parent
+
+
+def sync_links(plan: LinkPlan) -> dict:
+    """Apply plan: prune stale links, replace changed ones, create new ones, save the manifest.
+
+    Returns {"created", "replaced", "kept", "pruned": counts, "errors": {path: message}}.
+    A hardlink to another filesystem fails with an error (use symlinks there).
+    A changed link is made under a hidden temporary name and renamed over the
+    old one, so the path never goes missing and a failure leaves the old link.
+    """
+    root = plan.view_root
+    manifest = load_manifest(root)
+    errors: dict[str, str] = {}
+    counts = {"created": 0, "replaced": 0, "kept": len(plan.keep), "pruned": 0}
+    link = os.link if plan.mode == "hardlink" else os.symlink
+
+    with PROFILER.span("sync_links", files=len(plan.create) + len(plan.replace) + len(plan.prune)):
+        root.mkdir(parents=True, exist_ok=True)
+        for rel in plan.forget:
+            manifest.pop(rel, None)
+        emptied: set[Path] = set()
+        for rel in plan.prune:
+            try:
+                (root / rel).unlink(missing_ok=True)
+            except OSError as e:
+                errors[rel] = str(e)
+                continue
+            manifest.pop(rel, None)
+            emptied.add((root / rel).parent)
+            counts["pruned"] += 1
+        _remove_empty_dirs(emptied, root)
+
+        made_dirs: set[Path] = set()
+        for bucket, counter in ((plan.replace, "replaced"), (plan.create, "created")):
+            for rel, source in bucket.items():
+                target = root / rel
+                try:
+                    if target.parent not in made_dirs:
+                        target.parent.mkdir(parents=True, exist_ok=True)
+                        made_dirs.add(target.parent)
+                    if counter == "replaced":
+                        tmp = target.with_name(f".{target.name}{LINK_SUFFIX}")
+                        tmp.unlink(missing_ok=True)
+                        link(source, tmp)
+                        try:
+                            os.replace(tmp, target)
+                        except OSError:
+                            tmp.unlink(missing_ok=True)
+                            raise
+                    else:
+                        link(source, target)
+                except OSError as e:
+                    message = str(e)
+                    if e.errno == errno.EXDEV:
+                        message += " (hardlinks cannot cross filesystems; use symlinks)"
+                    errors[rel] = message
+                    continue
+                manifest[rel] = _entry(plan.mode, source, target)
+                counts[counter] += 1
+        for rel, source in plan.keep.items():
+            entry = manifest.get(rel)
+            if entry is None or entry[:2] != (plan.mode, str(source)):
+                manifest[rel] = _entry(plan.mode, source, root / rel)
+        save_manifest(root, manifest)
+        PROFILER.add(open=1)
+    return {**counts, "errors": errors}
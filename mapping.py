@@ -0,0 +1,122 @@
+"""Rename from an explicit old -> new mapping file.
+
+When another system already knows the new names, a mapping file lists them
+as pairs: CSV rows, tab-separated lines, or NUL-delimited ``old\\0new\\0``
+records (as written by ``find -print0``-style tools). iter_mapping() streams
+the pairs without loading the file, and join_mapping() hash-joins them
+against a folder listing that is already in memory: only rows naming a listed
+file are kept, so memory follows the size of the folder, not of the mapping.
+
+The joined names become a ``mapping`` operation, so the preview, conflict
+checks, apply and undo work exactly as for any other operation.
+"""
+
+import csv
+import os
+from collections.abc import Iterable, Iterator
+from pathlib import Path
+
+CHUNK_SIZE = 1 << 20
+SNIFF_SIZE = 1 << 16  # a NUL-delimited file has a NUL within its first record
+MISSING_SAMPLE = 20  # mapping rows not in the folder that are kept for reporting
+
+
+def _iter_nul(f) -> Iterator[str]:
+    tail = b""
+    while chunk := f.read(CHUNK_SIZE):
+        fields = (tail + chunk).split(b"\0")
+        tail = fields.pop()
+        for field in fields:
+            yield os.fsdecode(field)
+    if tail:
+        yield os.fsdecode(tail)
+
+
+def _iter_nul_pairs(path: Path) -> Iterator[tuple[str, str]]:
+    with open(path, "rb") as f:
+        fields = _iter_nul(f)
+        for record, old in enumerate(fields, 1):
+            new = next(fields, None)
+            if new is None:
+                raise ValueError(f"{path}: record {record} has no new name")
+            yield old, new
+
+
+def _iter_text_rows(path: Path) -> Iterator[list[str]]:
+    with open(path, encoding="utf-8", newline="") as f:
+        if path.suffix.lower() == ".csv":
+            yield from csv.reader(f)
+        else:
+            for line in f:
+                yield line.rstrip("\r\n").split("\t")
+
+
+def _is_nul_delimited(path: Path) -> bool:
+    with open(path, "rb") as f:
+        return b"\0" in f.read(SNIFF_SIZE)
+
+
+def iter_mapping(path: Path) -> Iterator[tuple[str, str]]:
+    """Yield (old name, new name) pairs from a mapping file, one row at a time.
+
+    Files containing a NUL byte are read as NUL-delimited pairs; otherwise
+    .csv files are read as CSV and anything else as tab-separated lines.
+    Blank lines, "#" comments and an "old,new" header row are skipped.
+    Raises OSError if the file cannot be read and ValueError for a malformed row.
+    """
+    if _is_nul_delimited(path):
+        yield from _iter_nul_pairs(path)
+        return
+    for line, row in enumerate(_iter_text_rows(path), 1):
+        if not row or not "".join(row).strip() or row[0].startswith("#"):
+            continue
+        if len(row) != 2:
+            raise ValueError(f"{path}:{line}: expected old,new but got {row!r}")
+        if line == 1 and [c.strip().lower() for c in row] == ["old", "new"]:
+            continue  # header
+        yield row[0], row[1]
+
+
+class MappingJoin:
+    """The result of joining mapping rows against a folder listing.
+
+    names maps each listed file's name to its new name. missing counts rows
+    whose old name is not listed (the first few are kept in missing_sample),
+    extra lists the files no row mentions, and duplicates lists names given
+    two different new names (these are left out of names).
+    """
+
+    __slots__ = ("names", "missing", "missing_sample", "extra", "duplicates")
+
+    def __init__(self):
+        self.names: dict[str, str] = {}
+        self.missing = 0
+        self.missing_sample: list[str] = []
+        self.extra: list[Path] = []
+        self.duplicates: list[str] = []
+
+    def operation(self) -> dict:
+        """Return a compute_new_name() operation that applies the joined names."""
+        return {"type": "mapping", "names": self.names}
+
+
+def join_mapping(files: Iterable[Path], rows: Iterable[tuple[str, str]]) -> MappingJoin:
+    """Hash-join mapping rows against files (the build side) in one pass over rows."""
+    listed = {f.name: f for f in files}
+    join = MappingJoin()
+    names = join.names
+    duplicates = set()
+    for old, new in rows:
+        if old not in listed:
+            join.missing += 1
+            if len(join.missing_sample) < MISSING_SAMPLE:
+                join.missing_sample.append(old)
+            continue
+        previous = names.setdefault(old, new)
+        if previous != new:
+            duplicates.add(old)
+    for name in duplicates:
+        del names[name]
+    join.duplicates = sorted(duplicates)
+    join.extra = [f for name, f in listed.items() if name not in names and name not in duplicates]
+    return join
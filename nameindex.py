@@ -0,0 +1,258 @@
+"""Filesystem-aware name keys for conflict detection.
+
+Whether "Photo.jpg" and "photo.jpg", or an NFC and an NFD spelling of
+"Café.jpg", name the same file depends on the filesystem (and on Windows and
+Linux, on the directory). probe_folder() works this out once per directory
+by looking up another spelling of a name already present (in the folder or,
+failing that, the folder's own name in its parent), so a preview never writes
+to the folder; a probe file is only written when asked for. NameIndex turns
+names into keys that compare equal exactly when the filesystem would treat
+them as the same entry.
+"""
+
+import os
+import sys
+import unicodedata
+from collections import OrderedDict
+from collections.abc import Iterable
+from pathlib import Path
+
+PROBE_PREFIX = ".renametool_probe_"
+MAX_PROBES = 4096  # directories whose results are cached; least recently used go first
+
+# (st_dev, st_ino) of a directory -> (case_sensitive, normalizes)
+_PROBES: OrderedDict[tuple[int, int], tuple[bool, bool | None]] = OrderedDict()
+
+
+def _cached(key: tuple[int, int]) -> tuple[bool, bool | None] | None:
+    result = _PROBES.get(key)
+    if result is not None:
+        _PROBES.move_to_end(key)
+    return result
+
+
+def _remember(key: tuple[int, int], result: tuple[bool, bool | None]) -> None:
+    _PROBES[key] = result
+    _PROBES.move_to_end(key)
+    while len(_PROBES) > MAX_PROBES:
+        _PROBES.popitem(last=False)
+
+
+def _platform_default() -> tuple[bool, bool]:
+    if sys.platform == "darwin":
+        return False, True  # APFS/HFS+ defaults
+    if sys.platform == "win32":
+        return False, False  # NTFS
+    return True, False
+
+
+def _alias_exists(folder: Path, names: frozenset[str], variant: str) -> bool | None:
+    """True if variant resolves to an entry listed under another spelling, False if not."""
+    if variant in names:
+        return False  # both spellings exist as separate entries
+    try:
+        os.lstat(folder / variant)
+    except FileNotFoundError:
+        return False
+    except OSError:
+        return None
+    return True
+
+
+def _case_variant(name: str) -> str | None:
+    upper = name.upper()
+    if upper != name and upper.lower() == name.lower():
+        return upper
+    lower = name.lower()
+    return lower if lower != name else None
+
+
+def _norm_variant(name: str) -> str | None:
+    for form in ("NFD", "NFC"):
+        variant = unicodedata.normalize(form, name)
+        if variant != name:
+            return variant
+    return None
+
+
+def _probe_existing(folder: Path, names: frozenset[str], make_variant) -> bool | None:
+    for name in names:
+        variant = make_variant(name)
+        if variant is not None:
+            return _alias_exists(folder, names, variant)
+    return None
+
+
+def _probe_ancestors(folder: Path, make_variant) -> bool | None:
+    """Look up another spelling of folder's name (or its nearest ancestor's) in its parent.
+
+    Only ancestors on folder's device count; None if none has a variant.
+    """
+    path = folder.absolute()
+    try:
+        device = os.lstat(path).st_dev
+        while path.parent != path:
+            if os.lstat(path.parent).st_dev != device:
+                return None  # path is a mount point; its name lives on another filesystem
+            variant = make_variant(path.name)
+            if variant is not None:
+                try:
+                    return os.path.samestat(os.lstat(path.parent / variant), os.lstat(path))
+                except FileNotFoundError:
+                    return False
+            path = path.parent
+    except OSError:
+        return None
+    return None
+
+
+def _probe_with_file(folder: Path, make_variant) -> bool | None:
+    """Create a hidden probe file and report whether make_variant(name) aliases it."""
+    name = unicodedata.normalize("NFC", f"{PROBE_PREFIX}{os.getpid()}_Café")
+    path = folder / name
+    try:
+        path.touch(exist_ok=False)
+    except OSError:
+        return None
+    try:
+        return _alias_exists(folder, frozenset({name}), make_variant(name))
+    finally:
+        try:
+            path.unlink()
+        except OSError:
+            pass
+
+
+def _dir_key(folder: Path) -> tuple[int, int] | None:
+    try:
+        st = folder.stat()
+    except OSError:
+        return None
+    return st.st_dev, st.st_ino
+
+
+def probe_folder(
+    folder: Path, names: Iterable[str] | None = None, write_probe: bool = False
+) -> tuple[bool, bool | None]:
+    """Return (case_sensitive, normalizes_unicode) for folder, cached per directory.
+
+    names (the folder's current entries, if already listed) are probed first
+    by looking up another spelling of one of them. Case sensitivity falls back
+    to another spelling of the folder's own name, then (with write_probe) to a
+    hidden probe file, then to the platform default. Normalization is None
+    when no entry has a decomposable character: it cannot affect the existing
+    names' keys, and probe_normalization() settles it if needed.
+    """
+    cache_key = _dir_key(folder)
+    if cache_key is None:
+        return _platform_default()
+    cached = _cached(cache_key)
+    if cached is not None:
+        return cached
+
+    if names is None:
+        try:
+            names = os.listdir(folder)
+        except OSError:
+            names = ()
+    names = frozenset(names)
+    case_alias = _probe_existing(folder, names, _case_variant)
+    if case_alias is None:
+        case_alias = _probe_ancestors(folder, _case_variant)
+    if case_alias is None and write_probe:
+        case_alias = _probe_with_file(folder, str.upper)
+    if case_alias is None:
+        case_sensitive = _platform_default()[0]
+    else:
+        case_sensitive = not case_alias
+    normalizes = _probe_existing(folder, names, _norm_variant)
+
+    result = (case_sensitive, normalizes)
+    _remember(cache_key, result)
+    return result
+
+
+def probe_normalization(folder: Path, write_probe: bool = False) -> bool:
+    """Return whether folder treats NFC and NFD spellings as one name, if not yet known.
+
+    Falls back to the folder's ancestors' names, then (with write_probe) to a
+    probe file, then to the platform default.
+    """
+    case_sensitive, normalizes = probe_folder(folder)
+    if normalizes is None:
+        normalizes = _probe_ancestors(folder, _norm_variant)
+        if normalizes is None and write_probe:
+            normalizes = _probe_with_file(folder, lambda n: unicodedata.normalize("NFD", n))
+        if normalizes is None:
+            normalizes = _platform_default()[1]
+        cache_key = _dir_key(folder)
+        if cache_key is not None:
+            _remember(cache_key, (case_sensitive, normalizes))
+    return normalizes
+
+
+def _normalization_invariant(name: str) -> bool:
+    return name.isascii() or (
+        unicodedata.is_normalized("NFC", name) and unicodedata.is_normalized("NFD", name)
+    )
+
+
+class NameIndex:
+    """Keys for one directory's existing names, comparing as its filesystem does.
+
+    normalizes may be None (unknown) as long as no name seen so far could be
+    affected by Unicode normalization; the first such name resolves it through
+    probe_normalization(folder), or assumes no normalization without a folder.
+    """
+
+    __slots__ = ("folder", "case_sensitive", "normalizes", "_existing")
+
+    def __init__(
+        self,
+        names: Iterable[str] = (),
+        case_sensitive: bool = True,
+        normalizes: bool | None = False,
+        folder: Path | None = None,
+    ):
+        self.folder = folder
+        self.case_sensitive = case_sensitive
+        self.normalizes = normalizes
+        self._existing = frozenset(self.key(n) for n in names)
+
+    @classmethod
+    def for_folder(cls, folder: Path, names: Iterable[str] | None = None, *, fs) -> "NameIndex":
+        """Probe folder and index names (or the folder's current entries if None).
+
+        fs is the fsbackend.FileSystem to list and probe through (fsbackend.LOCAL
+        for the real folder).
+        """
+        if names is None:
+            try:
+                names = fs.listdir(folder)
+            except OSError:
+                names = ()
+        names = frozenset(names)
+        case_sensitive, normalizes = fs.probe(folder, names)
+        return cls(names, case_sensitive, normalizes, folder)
+
+    def key(self, name: str) -> str:
+        """Return the comparison key for name (name itself on case-sensitive, raw filesystems)."""
+        if not self.case_sensitive:
+            name = name.casefold()
+        if self.normalizes is None:
+            if _normalization_invariant(name):
+                return name
+            self.normalizes = probe_normalization(self.folder) if self.folder is not None else False
+        if self.normalizes:
+            name = unicodedata.normalize("NFC", name)
+        return name
+
+    def has_key(self, key: str) -> bool:
+        """True if an existing name has key (as returned by key())."""
+        return key in self._existing
+
+    def __contains__(self, name: str) -> bool:
+        return self.key(name) in self._existing
+
+    def __len__(self) -> int:
+        return len(self._existing)
@@ -0,0 +1,169 @@
+"""Move files into template-named folders, e.g. Plex's ``Show/Season 01/``.
+
+An ``organize`` operation holds a folder template such as
+``{show}/Season {season:02}``, rendered per file with the same fields as
+naming templates. The other operations still decide the file name;
+plan_organize() joins the two into a path relative to the file's folder
+(``Show/Season 01/Show - S01E01.mkv``) and validates it per target
+directory. Because every row's new_name is relative to the original's
+folder, rename_file(), the undo map and undo_renames() handle moves exactly
+like renames.
+
+Before moving, create_folders() makes every missing directory once, parents
+first, and order_by_folder() groups the moves by target directory so each
+directory is filled in one run.
+"""
+
+import stat
+from pathlib import Path
+
+from engine import check_name
+from fsbackend import LOCAL, FileSystem
+from nameindex import NameIndex
+from profiling import PROFILER
+from templates import compile_template
+
+
+def find_organize(operations: list[dict]) -> dict | None:
+    """Return the last organize operation in operations, or None."""
+    for op in reversed(operations):
+        if op["type"] == "organize":
+            return op
+    return None
+
+
+def folder_parts(rendered: str | None) -> tuple[tuple[str, ...], str | None]:
+    """Split a rendered folder template into path components and an INVALID status.
+
+    None or "" (a template that could not be rendered) means no subfolder.
+    """
+    if not rendered:
+        return (), None
+    parts = tuple(rendered.split("/"))
+    for part in parts:
+        # check_name() also rejects "", "." and "..", so nothing can escape the folder
+        error = check_name(part)
+        if error is not None:
+            return parts, error.replace("INVALID", "INVALID folder", 1)
+    return parts, None
+
+
+def _is_folder(path: Path, fs: FileSystem) -> bool | None:
+    """True if path is a folder (or a link to one), False if it is anything else, None if absent."""
+    try:
+        return stat.S_ISDIR(fs.stat(path).st_mode)
+    except FileNotFoundError:
+        try:
+            fs.lstat(path)  # a dangling symlink is still in the way
+        except OSError:
+            return None
+        return False
+    except OSError:
+        return False
+
+
+def plan_organize(
+    pairs: list[tuple[Path, str]], template: str, fs: FileSystem = LOCAL
+) -> list[dict]:
+    """Validate moving each original to template's folder under its own folder, as new_name.
+
+    pairs are (original, new name) as for validate_new_names(); the template
+    is rendered for each original (a file it cannot be rendered for stays in
+    its folder). Returns validate_new_names()-style dicts whose new_name is
+    the target path relative to the original's folder, using "/" separators.
+    Conflicts are checked per target directory: against its existing entries
+    (as that filesystem compares names) and against other planned moves.
+    Folders are listed and probed through fs.
+    """
+    compiled = compile_template(template)
+    with PROFILER.span("plan_organize", files=len(pairs)):
+        results = []
+        root_probes: dict[Path, tuple[bool, bool | None]] = {}
+        indexes: dict[Path, NameIndex | None] = {}  # None: exists but is not a folder
+        first_row: dict[tuple, int] = {}
+        collided: set[tuple] = set()
+        unchecked = []  # rows that passed the name checks: (row, index, slot, original name)
+
+        for row, (original, new_name) in enumerate(pairs):
+            parts, status = folder_parts(compiled.render(original, row))
+            target = "/".join(parts + (new_name,))
+            if status is None:
+                status = "NO CHANGE" if target == original.name else check_name(new_name)
+            results.append({"original": original, "new_name": target, "status": status})
+            if status is not None and status != "NO CHANGE":
+                continue
+
+            root = original.parent
+            target_dir = root.joinpath(*parts)
+            if target_dir not in indexes:
+                is_folder = _is_folder(target_dir, fs)
+                if is_folder:
+                    indexes[target_dir] = NameIndex.for_folder(target_dir, fs=fs)
+                elif is_folder is not None:
+                    indexes[target_dir] = None
+                else:
+                    # Not created yet: nothing to collide with, and it will
+                    # compare names like the folder it is created in
+                    if root not in root_probes:
+                        root_probes[root] = fs.probe(root)
+                    case_sensitive, normalizes = root_probes[root]
+                    indexes[target_dir] = NameIndex(
+                        case_sensitive=case_sensitive, normalizes=normalizes, folder=root
+                    )
+            idx = indexes[target_dir]
+            if idx is None:
+                results[row]["status"] = "INVALID folder (not a directory)"
+                continue
+            # Folder names are keyed too, so "Show/" and "show/" are the same
+            # target directory where the filesystem folds case
+            slot = (root, tuple(idx.key(p) for p in parts), idx.key(new_name))
+            if first_row.setdefault(slot, row) != row:
+                collided.add(slot)
+            if status is None:
+                unchecked.append((row, idx, slot, original.name if not parts else None))
+
+        for row, idx, slot, name in unchecked:
+            key = slot[-1]
+            # Moving into another folder can never land on the original itself
+            same_entry = name is not None and key == idx.key(name)
+            if slot in collided or (not same_entry and idx.has_key(key)):
+                results[row]["status"] = "CONFLICT"
+            else:
+                results[row]["status"] = "OK"
+    return results
+
+
+def _target_dir(row: dict) -> Path:
+    return (row["original"].parent / row["new_name"]).parent
+
+
+def create_folders(rows: list[dict], fs: FileSystem = LOCAL) -> list[Path]:
+    """Create every missing target directory of rows once, parents first.
+
+    Each distinct directory (and each ancestor) is checked at most once,
+    instead of one mkdir(parents=True) per file. Returns the directories
+    created, in creation order. Raises OSError if one cannot be created.
+    Every call goes through fs.
+    """
+    missing: set[Path] = set()
+    seen: set[Path] = set()
+    for row in rows:
+        folder = _target_dir(row)
+        stop = row["original"].parent
+        while folder != stop and folder not in seen:
+            seen.add(folder)
+            if _is_folder(folder, fs):
+                break
+            missing.add(folder)
+            folder = folder.parent
+    created = sorted(missing, key=lambda p: (len(p.parts), p))
+    with PROFILER.span("create_folders", files=len(created)):
+        for folder in created:
+            fs.mkdir(folder, exist_ok=True)
+        PROFILER.add(stat=len(seen))
+    return created
+
+
+def order_by_folder(rows: list[dict]) -> list[dict]:
+    """Return rows sorted so moves into the same target directory run together."""
+    return sorted(rows, key=lambda r: (_target_dir(r).parts, r["new_name"]))
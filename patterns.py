@@ -1,6 +1,11 @@
 """Pattern detection for batch file renaming."""
 
+import math
 import re
+import unicodedata
+from collections import Counter
+from itertools import chain
+from operator import itemgetter
 from pathlib import Path
 
 PATTERNS = {
@@ -35,6 +40,7 @@ MOVIE_REGEX = re.compile(
 )
 
 THRESHOLD = 2
+CLUSTER_SIMILARITY = 0.8
 
 
 def _clean_name(raw: str) -> str:
@@ -42,6 +48,22 @@ def _clean_name(raw: str) -> str:
     return re.sub(r"[._-]+", " ", raw).strip().title()
 
 
+def normalize_title_key(title: str) -> str:
+    """Return a matching key for a title: casefolded, accents and punctuation removed.
+
+    "The.Office.US", "the office (us)" and "The Office US" all map to "the office us".
+    """
+    decomposed = unicodedata.normalize("NFKD", title.casefold())
+    stripped = "".join(c for c in decomposed if not unicodedata.combining(c))
+    return " ".join(re.sub(r"[\W_]+", " ", stripped).split())
+
+
+def title_trigrams(key: str) -> set[str]:
+    """Return the character trigrams of a normalized key (padded so short keys still match)."""
+    padded = f"  {key} "
+    return {padded[i : i + 3] for i in range(len(padded) - 2)}
+
+
 def parse_tv_filename(filename: str) -> dict | None:
     """Parse a TV episode filename and return extracted components.
 
@@ -83,6 +105,99 @@ def parse_movie_filename(filename: str) -> dict | None:
     return {"title": title, "year": year}
 
 
+def cluster_titles(
+    titles: list[str],
+    years: list[int | None] | None = None,
+    similarity: float = CLUSTER_SIMILARITY,
+) -> list[list[int]]:
+    """Group near-identical titles; returns lists of indexes into titles.
+
+    Titles are first bucketed by normalize_title_key() (and year, if years is
+    given, so remakes stay apart). Distinct keys are then merged when their
+    trigram Dice similarity reaches similarity. Candidates come from prefix
+    filtering: each key's trigrams are ordered rarest-first and only the
+    shortest prefix that any sufficiently similar key must share is indexed,
+    so common trigrams never produce all-pairs work. Groups are ordered by
+    their first member.
+    """
+    buckets: dict[tuple, list[int]] = {}
+    for i, title in enumerate(titles):
+        year = years[i] if years else None
+        buckets.setdefault((normalize_title_key(title), year), []).append(i)
+    keys = list(buckets)
+    grams = [title_trigrams(key) for key, _ in keys]
+
+    frequency: dict[str, int] = {}
+    for k_grams in grams:
+        for gram in k_grams:
+            frequency[gram] = frequency.get(gram, 0) + 1
+    # Dice >= s is equivalent to Jaccard >= s / (2 - s)
+    jaccard = similarity / (2 - similarity)
+
+    parent = list(range(len(keys)))
+
+    def find(x):
+        while parent[x] != x:
+            parent[x] = parent[parent[x]]
+            x = parent[x]
+        return x
+
+    index: dict[str, list[int]] = {}
+    for k, k_grams in enumerate(grams):
+        ordered = sorted(k_grams, key=lambda g: (frequency[g], g))
+        prefix = ordered[: len(ordered) - math.ceil(jaccard * len(ordered)) + 1]
+        checked = set()
+        for gram in prefix:
+            for other in index.get(gram, ()):
+                if other in checked or keys[other][1] != keys[k][1]:
+                    continue
+                checked.add(other)
+                common = len(k_grams & grams[other])
+                if 2 * common / (len(k_grams) + len(grams[other])) >= similarity:
+                    parent[find(k)] = find(other)
+            index.setdefault(gram, []).append(k)
+
+    groups: dict[int, list[int]] = {}
+    for k, key in enumerate(keys):
+        groups.setdefault(find(k), []).extend(buckets[key])
+    return sorted((sorted(g) for g in groups.values()), key=lambda g: g[0])
+
+
+def group_movie_files(filenames: list[str]) -> tuple[list[dict], list[str]]:
+    """Parse every filename as a movie and cluster the results by title and year.
+
+    Returns (groups, undetected). Each group is a dict with keys title, year
+    and filenames; the title is the most common parsed spelling in the group.
+    undetected lists filenames parse_movie_filename() could not parse.
+    """
+    parsed = []
+    undetected = []
+    for name in filenames:
+        info = parse_movie_filename(name)
+        if info:
+            parsed.append((name, info))
+        else:
+            undetected.append(name)
+
+    clusters = cluster_titles(
+        [info["title"] for _, info in parsed], [info["year"] for _, info in parsed]
+    )
+    groups = []
+    for members in clusters:
+        spellings: dict[str, int] = {}
+        for i in members:
+            title = parsed[i][1]["title"]
+            spellings[title] = spellings.get(title, 0) + 1
+        groups.append(
+            {
+                "title": max(spellings, key=spellings.__getitem__),
+                "year": parsed[members[0]][1]["year"],
+                "filenames": [parsed[i][0] for i in members],
+            }
+        )
+    return groups, undetected
+
+
 def detect_patterns(filenames: list[str]) -> list[dict]:
     """Detect common patterns across filenames.
 
@@ -114,3 +229,137 @@ def detect_patterns(filenames: list[str]) -> list[dict]:
             )
 
     return results
+
+
+MINE_MAX_TOKENS = 3  # longest token n-gram the miner counts
+MINE_MIN_SHARE = 0.01  # an n-gram must occur in this share of the stems (or THRESHOLD)
+MINE_LIMIT = 8
+
+_DIGIT = "\x01"  # stands in for any digit while counting; cannot occur in a filename
+_DIGIT_TABLE = str.maketrans("0123456789", _DIGIT * 10)
+# A token is a bracketed group or a word, each with the separators before it,
+# so "_FINAL_v3" tokenizes as "_FINAL", "_v3" and deleting a match drops both
+_TOKEN_RE = re.compile(r"[._ -]*(?:\[[^\]]*\]|\([^)]*\)|[^._ \[(-]+)|[._ -]+")
+
+
+def _count_ngrams(shapes: Counter, support: int) -> tuple[dict[tuple, int], Counter, Counter]:
+    """Count token n-grams across stem shapes ({token tuple: stems}), level by level.
+
+    After the single tokens are counted, the rare ones are masked out and the
+    shapes that became identical are merged, so rare tokens (hashes, unique
+    titles) never fan out into longer candidates. Returns the frequent
+    n-grams with the number of stems containing them, and how many stems
+    each n-gram starts and ends.
+    """
+    frequent: dict[tuple, int] = {}
+    starts: Counter = Counter()
+    ends: Counter = Counter()
+    for size in range(1, MINE_MAX_TOKENS + 1):
+        # Shapes seen once are counted in bulk; only repeated ones need weights
+        ones = [tokens for tokens, n in shapes.items() if n == 1 and len(tokens) >= size]
+        shifted = [map(itemgetter(slice(i, None)), ones) for i in range(size)]
+        level = Counter(chain.from_iterable(map(set, map(zip, *shifted))))
+        starts.update(map(itemgetter(slice(0, size)), ones))
+        ends.update(map(itemgetter(slice(-size, None)), ones))
+        for tokens, n in shapes.items():
+            if n > 1 and len(tokens) >= size:
+                for gram in set(zip(*(tokens[i:] for i in range(size)))):
+                    level[gram] += n
+                starts[tokens[:size]] += n
+                ends[tokens[-size:]] += n
+        found = {gram: n for gram, n in level.items() if n >= support and None not in gram}
+        if not found:
+            break
+        frequent.update(found)
+        if size == 1:
+            keep = {gram[0]: gram[0] for gram in found}
+            masked: Counter = Counter()
+            for tokens, n in shapes.items():
+                masked[tuple(map(keep.get, tokens))] += n
+            shapes = masked
+    return frequent, starts, ends
+
+
+def _gram_regex(text: str) -> str:
+    """Return the regex for an n-gram's text: literal, with \\d+ for each digit run."""
+    # re.escape() also escapes spaces and hyphens, which only makes the regex harder to read
+    literals = (
+        re.escape(lit).replace("\\ ", " ").replace("\\-", "-") for lit in text.split(_DIGIT)
+    )
+    return r"\d+".join(literals)
+
+
+def mine_patterns(
+    filenames: list[str], min_count: int = THRESHOLD, limit: int = MINE_LIMIT
+) -> list[dict]:
+    """Find recurring tokens and token runs in these filenames and propose regexes for them.
+
+    Complements detect_patterns() with folder-specific noise such as
+    "[SubsPlease]" or "_FINAL_v3". Digit runs are generalized first, so
+    stems that differ only in their numbers are tokenized once, with a
+    weight, and their n-grams are counted level by level. An n-gram that
+    always starts (or ends) a stem becomes an anchored prefix (or suffix),
+    and one only ever seen as a whole stem is dropped. Only closed n-grams
+    (no longer one occurs as often) containing a letter are kept; bare
+    numbers and dates are detect_patterns()' job.
+
+    Returns up to limit detect_patterns()-style dicts (name, regex,
+    match_count, examples), most text removed first. An n-gram must occur in
+    min_count stems and in MINE_MIN_SHARE of them.
+    """
+    # As Path.stem, without building a Path per name
+    stems = [f[:i] if (i := f.rfind(".")) > 0 else f for f in filenames]
+    if not stems:
+        return []
+    support = max(min_count, math.ceil(len(stems) * MINE_MIN_SHARE))
+    # Work on all stems at once (NUL cannot occur in a name): each replace
+    # pass halves every run of digit placeholders
+    joined = "\0".join(stems).translate(_DIGIT_TABLE)
+    while _DIGIT * 2 in joined:
+        joined = joined.replace(_DIGIT * 2, _DIGIT)
+    shapes: Counter = Counter()
+    for shape, n in Counter(joined.split("\0")).items():
+        shapes[tuple(_TOKEN_RE.findall(shape))] += n
+    frequent, starts, ends = _count_ngrams(shapes, support)
+
+    closed = dict(frequent)
+    for gram, n in frequent.items():
+        if len(gram) > 1:
+            for sub in (gram[:-1], gram[1:]):
+                if frequent[sub] == n:
+                    closed.pop(sub, None)
+
+    candidates = []
+    for gram, n in closed.items():
+        text = "".join(gram)
+        if shapes.get(gram) == n or not any(c.isalpha() for c in text):
+            continue
+        anchor = "prefix" if starts[gram] == n else "suffix" if ends[gram] == n else "token"
+        candidates.append((n * len(text), text, anchor))
+    candidates.sort(key=lambda c: -c[0])
+
+    results = []
+    for _, text, anchor in candidates[: limit * 2]:
+        regex = _gram_regex(text)
+        regex = "^" + regex if anchor == "prefix" else regex + "$" if anchor == "suffix" else regex
+        compiled = re.compile(regex)
+        matches = list(filter(None, map(compiled.search, stems)))
+        if len(matches) >= support:
+            examples: list[str] = []
+            for m in matches:
+                if m.group() not in examples:
+                    examples.append(m.group())
+                    if len(examples) == 3:
+                        break
+            name = text.strip("._ -").replace(_DIGIT, "#")
+            results.append(
+                {
+                    "name": f"Recurring {anchor}: {name}",
+                    "regex": regex,
+                    "match_count": len(matches),
+                    "examples": examples,
+                }
+            )
+            if len(results) == limit:
+                break
+    return results
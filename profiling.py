@@ -0,0 +1,132 @@
+"""Stage-level timing spans for the wizard and engine.
+
+The module-level PROFILER is disabled by default; span() then returns a shared
+no-op context and add() returns immediately, so instrumented code pays one
+attribute check per call. main() enables it for --profile runs and writes the
+recorded spans as a Chrome trace (chrome://tracing, Perfetto) with a per-stage
+summary under "otherData".
+"""
+
+import cProfile
+import json
+import os
+import threading
+import time
+from contextlib import contextmanager, nullcontext
+from pathlib import Path
+
+# Stages wrapped with cProfile when Profiler(cprofile=True)
+HOT_STAGES = frozenset({"compute_new_name", "validate_new_names", "apply_renames"})
+
+
+class Span:
+    """One timed stage: start/duration in seconds since the profiler started."""
+
+    __slots__ = ("name", "start", "duration", "files", "syscalls")
+
+    def __init__(self, name: str, start: float, files: int):
+        self.name = name
+        self.start = start
+        self.duration = 0.0
+        self.files = files
+        self.syscalls: dict[str, int] = {}
+
+    def add(self, files: int = 0, **syscalls: int) -> None:
+        """Add to this span's file count and named syscall counts."""
+        self.files += files
+        for name, n in syscalls.items():
+            self.syscalls[name] = self.syscalls.get(name, 0) + n
+
+
+class Profiler:
+    def __init__(self, enabled: bool = False, cprofile: bool = False):
+        self.reset(cprofile)
+        self.enabled = enabled
+
+    def reset(self, cprofile: bool = False) -> None:
+        """Discard recorded spans and restart the clock."""
+        self.spans: list[Span] = []
+        self.cprofile = cProfile.Profile() if cprofile else None
+        self._stack: list[Span] = []
+        self._origin = time.perf_counter()
+        self._thread = threading.get_ident()
+        self._profiling = False
+
+    def start(self, cprofile: bool = False) -> None:
+        """Enable recording from now on (optionally with cProfile on HOT_STAGES)."""
+        self.reset(cprofile)
+        self.enabled = True
+
+    @contextmanager
+    def _span(self, name: str, files: int):
+        span = Span(name, time.perf_counter() - self._origin, files)
+        self._stack.append(span)
+        start_cprofile = self.cprofile is not None and name in HOT_STAGES and not self._profiling
+        if start_cprofile:
+            self._profiling = True
+            self.cprofile.enable()
+        try:
+            yield span
+        finally:
+            if start_cprofile:
+                self.cprofile.disable()
+                self._profiling = False
+            span.duration = time.perf_counter() - self._origin - span.start
+            self._stack.pop()
+            self.spans.append(span)
+
+    def span(self, name: str, files: int = 0):
+        """Context manager timing one stage; yields a Span (or None when disabled)."""
+        if not self.enabled:
+            return nullcontext()
+        return self._span(name, files)
+
+    def add(self, files: int = 0, **syscalls: int) -> None:
+        """Attribute a file count and syscall counts to the innermost open span."""
+        if self.enabled and self._stack:
+            self._stack[-1].add(files, **syscalls)
+
+    def summary(self) -> list[dict]:
+        """Aggregate spans by name, in order of first appearance."""
+        stages: dict[str, dict] = {}
+        for span in sorted(self.spans, key=lambda s: s.start):
+            stage = stages.setdefault(
+                span.name,
+                {"stage": span.name, "calls": 0, "seconds": 0.0, "files": 0, "syscalls": {}},
+            )
+            stage["calls"] += 1
+            stage["seconds"] += span.duration
+            stage["files"] += span.files
+            for name, n in span.syscalls.items():
+                stage["syscalls"][name] = stage["syscalls"].get(name, 0) + n
+        return list(stages.values())
+
+    def chrome_trace(self) -> dict:
+        """Return the spans in Chrome Trace Event format (complete "X" events)."""
+        events = [
+            {
+                "name": span.name,
+                "ph": "X",
+                "ts": round(span.start * 1e6, 3),
+                "dur": round(span.duration * 1e6, 3),
+                "pid": os.getpid(),
+                "tid": self._thread,
+                "args": {"files": span.files, **span.syscalls},
+            }
+            for span in sorted(self.spans, key=lambda s: s.start)
+        ]
+        return {
+            "traceEvents": events,
+            "displayTimeUnit": "ms",
+            "otherData": {"stages": self.summary()},
+        }
+
+    def write(self, path: Path) -> None:
+        """Write the Chrome trace to path, and cProfile stats to path + ".pstats" if enabled."""
+        with open(path, "w", encoding="utf-8") as f:
+            json.dump(self.chrome_trace(), f, indent=1)
+        if self.cprofile is not None:
+            self.cprofile.dump_stats(str(path) + ".pstats")
+
+
+PROFILER = Profiler()
@@ -0,0 +1,514 @@
+"""Static checks and a time budget for user-supplied regex operations.
+
+Python's backtracking engine can take exponential time on patterns such as
+``(a+)+$`` or ``(a|ab)*c`` against a long non-matching stem, and it cannot be
+interrupted from another thread. analyze_regex() flags the constructs that
+cause this before a pattern is used, and compute_names() runs any batch that
+contains a regex operation in a long-lived worker process that is killed
+once the batch exceeds its budget, reporting which pattern and file it was
+stuck on. Patterns are parsed here rather than with the re module's private
+parser, whose internals change between Python versions.
+"""
+
+import multiprocessing
+import re
+import threading
+from pathlib import Path
+
+from engine import compute_new_name
+
+DEFAULT_BUDGET = 10.0  # seconds per batch
+WORKER_START_TIMEOUT = 60.0  # seconds for a new worker process to import the engine
+LARGE_REPEAT = 10  # a bounded repeat with this many or more copies can backtrack exponentially
+
+# Pattern tree nodes, as (kind, value) pairs:
+#   ("char", chars)      one character: a frozenset of the inclusive (first, last)
+#                        code point ranges it can be, or None for a negated class,
+#                        category, "." or anything else
+#   ("at", None)         a zero-width anchor: ^ $ \A \Z \b \B
+#   ("group", items)     a capturing, non-capturing or scoped-flag group
+#   ("atomic", items)    (?>...)
+#   ("assert", items)    a lookahead or lookbehind
+#   ("branch", [items])  an alternation
+#   ("repeat", (min, max, items, possessive))  max None means unbounded
+#   ("backref", None)    a backreference or (?(group)yes|no) conditional
+_ESCAPES = {"a": "\a", "f": "\f", "n": "\n", "r": "\r", "t": "\t", "v": "\v"}
+_CATEGORIES = set("dDsSwW")
+_ANCHORS = set("AZbB")
+_OCTAL = set("01234567")
+_QUANTIFIER_RE = re.compile(r"\{(\d*)(,?)(\d*)\}")
+
+
+class _Parser:
+    """Parse a pattern re.compile() accepted into the node tree above.
+
+    Only the structure analyze_regex() looks at is kept: literal characters
+    and classes of literals and ranges keep their code points, anything else
+    is None. With ignorecase, every character also matches its other case.
+    """
+
+    def __init__(self, pattern: str, verbose: bool, ignorecase: bool = False):
+        self.p = pattern
+        self.i = 0
+        self.verbose = verbose
+        self.ignorecase = ignorecase
+
+    def parse(self) -> list:
+        return self._alternation()
+
+    def _peek(self) -> str:
+        return self.p[self.i] if self.i < len(self.p) else ""
+
+    def _alternation(self) -> list:
+        branches = [self._sequence()]
+        while self._peek() == "|":
+            self.i += 1
+            branches.append(self._sequence())
+        return branches[0] if len(branches) == 1 else [("branch", branches)]
+
+    def _sequence(self) -> list:
+        items = []
+        while self.i < len(self.p) and self.p[self.i] not in "|)":
+            c = self.p[self.i]
+            if self.verbose and (c.isspace() or c == "#"):
+                self._skip_verbose()
+                continue
+            atom = self._atom()
+            if atom is None:  # a comment or flags; a quantifier after it applies to the last item
+                if items:
+                    items[-1] = self._quantified(items[-1])
+                continue
+            atom = self._quantified(atom)
+            if atom[0] == "inline":
+                items.extend(atom[1])  # an unquantified (?:...) is just its contents
+            else:
+                items.append(atom)
+        return items
+
+    def _skip_verbose(self) -> None:
+        if self.p[self.i] == "#":
+            end = self.p.find("\n", self.i)
+            self.i = len(self.p) if end < 0 else end + 1
+        else:
+            self.i += 1
+
+    def _quantified(self, atom: tuple) -> tuple:
+        while True:
+            while self.verbose and self._peek() and (self._peek().isspace() or self._peek() == "#"):
+                self._skip_verbose()
+            c = self._peek()
+            if c in ("*", "+", "?"):
+                lo, hi = {"*": (0, None), "+": (1, None), "?": (0, 1)}[c]
+                self.i += 1
+            elif c == "{" and (m := _QUANTIFIER_RE.match(self.p, self.i)):
+                lo = int(m[1]) if m[1] else 0
+                hi = int(m[3]) if m[3] else (None if m[2] else lo)
+                self.i = m.end()
+            else:
+                return atom
+            possessive = False
+            if self._peek() == "?":
+                self.i += 1  # lazy still backtracks
+            elif self._peek() == "+":
+                self.i += 1
+                possessive = True
+            if atom[0] == "inline":
+                atom = ("group", atom[1])
+            atom = ("repeat", (lo, hi, [atom], possessive))
+
+    def _atom(self) -> tuple | None:
+        c = self.p[self.i]
+        self.i += 1
+        if c == "(":
+            return self._group()
+        if c == "[":
+            return ("char", self._fold(self._class()))
+        if c == ".":
+            return ("char", None)
+        if c in "^$":
+            return ("at", None)
+        if c == "\\":
+            atom = self._escape()
+            return ("char", self._fold(atom[1])) if atom[0] == "char" else atom
+        return ("char", self._fold(frozenset(((ord(c), ord(c)),))))
+
+    def _fold(self, chars: frozenset | None) -> frozenset | None:
+        """Add the other case of every character when matching ignores case."""
+        if chars is None or not self.ignorecase:
+            return chars
+        folded = set(chars)
+        for first, last in chars:
+            if last - first > 256:
+                return None  # too wide to fold one by one; treat as anything
+            for code in range(first, last + 1):
+                for variant in (chr(code).lower(), chr(code).upper()):
+                    if len(variant) == 1:
+                        folded.add((ord(variant), ord(variant)))
+        return frozenset(folded)
+
+    def _group(self) -> tuple | None:
+        p = self.p
+        if p[self.i] != "?":
+            return self._close("group")
+        self.i += 1
+        c = p[self.i]
+        if c == ":":
+            self.i += 1
+            return self._close("inline")
+        if c == ">":
+            self.i += 1
+            return self._close("atomic")
+        if c in "=!" or (c == "<" and p[self.i + 1] in "=!"):
+            self.i += 1 if c in "=!" else 2
+            return self._close("assert")
+        if c == "#":
+            self.i = p.index(")", self.i) + 1
+            return None
+        if c == "P" and p[self.i + 1] == "<":
+            self.i = p.index(">", self.i) + 1
+            return self._close("group")
+        if c == "P" and p[self.i + 1] == "=":
+            self.i = p.index(")", self.i) + 1
+            return ("backref", None)
+        if c == "(":
+            self.i = p.index(")", self.i) + 1
+            self._close("group")
+            return ("backref", None)
+        # Inline flags: (?aiLmsux) applies to the whole pattern, (?i-s:...) is a group
+        end = self.i
+        while p[end] not in ":)":
+            end += 1
+        self.i = end + 1
+        return self._close("group") if p[end] == ":" else None
+
+    def _close(self, kind: str) -> tuple:
+        items = self._alternation()
+        self.i += 1  # the ")"
+        return (kind, items)
+
+    def _class(self) -> frozenset | None:
+        """Parse a [...] class; its code point ranges if it is only literals and ranges."""
+        p = self.p
+        ranges = []
+        simple = True
+        if p[self.i] == "^":
+            simple = False
+            self.i += 1
+        first = True
+        while p[self.i] != "]" or first:
+            first = False
+            code = self._class_char()
+            if code is None:
+                simple = False
+            elif p[self.i] == "-" and p[self.i + 1] != "]":
+                self.i += 1
+                ranges.append((code, self._class_char()))
+            else:
+                ranges.append((code, code))
+        self.i += 1
+        return frozenset(ranges) if simple and ranges else None
+
+    def _class_char(self) -> int | None:
+        """Consume one class member; its code point, or None for a category."""
+        c = self.p[self.i]
+        self.i += 1
+        if c != "\\":
+            return ord(c)
+        if self.p[self.i] == "b":
+            self.i += 1
+            return 8  # backspace inside a class
+        return self._escape_char()
+
+    def _escape(self) -> tuple:
+        c = self.p[self.i]
+        if c in _ANCHORS:
+            self.i += 1
+            return ("at", None)
+        if c in "123456789":
+            digits = self.p[self.i : self.i + 3]
+            if not (len(digits) == 3 and set(digits) <= _OCTAL):
+                self.i += 2 if self.p[self.i + 1 : self.i + 2].isdigit() else 1
+                return ("backref", None)
+        code = self._escape_char()
+        return ("char", None if code is None else frozenset(((code, code),)))
+
+    def _escape_char(self) -> int | None:
+        """Consume the escape after a backslash; its code point, or None for a category."""
+        p = self.p
+        c = p[self.i]
+        self.i += 1
+        if c in _CATEGORIES:
+            return None
+        if c in _ESCAPES:
+            return ord(_ESCAPES[c])
+        width = {"x": 2, "u": 4, "U": 8}.get(c)
+        if width:
+            self.i += width
+            return int(p[self.i - width : self.i], 16)
+        if c == "N":
+            end = p.index("}", self.i)
+            self.i = end + 1
+            return None  # a named character; not worth resolving here
+        if c in _OCTAL:
+            end = self.i
+            while end < len(p) and end - self.i < 2 and p[end] in _OCTAL:
+                end += 1
+            code = int(p[self.i - 1 : end], 8)
+            self.i = end
+            return code
+        return ord(c)
+
+
+class RegexTimeout(Exception):
+    """A regex operation exceeded the batch time budget."""
+
+    def __init__(self, pattern: str, file: Path, budget: float):
+        self.pattern = pattern
+        self.file = file
+        self.budget = budget
+        super().__init__(f"Regex {pattern!r} exceeded the {budget:g}s budget on {file.name!r}")
+
+
+def _first_chars(items) -> frozenset | None:
+    """Return the code point ranges items can start with, or None if unknown/anything."""
+    for kind, value in items:
+        if kind == "at":
+            continue  # anchors are zero-width
+        if kind == "char":
+            return value
+        if kind in ("group", "atomic"):
+            return _first_chars(value)
+        if kind == "branch":
+            firsts = [_first_chars(b) for b in value]
+            if any(f is None or not f for f in firsts):
+                return None
+            return frozenset().union(*firsts)
+        if kind == "repeat":
+            return _first_chars(value[2]) if value[0] else None
+        return None
+    return frozenset()
+
+
+def _overlap(a: frozenset | None, b: frozenset | None) -> bool:
+    if a is None or b is None:
+        return True
+    return any(
+        a_first <= b_last and b_first <= a_last for a_first, a_last in a for b_first, b_last in b
+    )
+
+
+def _backtracks(kind: str, value) -> bool:
+    """True for an unbounded greedy or lazy repeat."""
+    return kind == "repeat" and value[1] is None and not value[3]
+
+
+def _has_unbounded(items) -> bool:
+    for kind, value in items:
+        if kind == "repeat" and not value[3]:
+            if value[1] is None or _has_unbounded(value[2]):
+                return True
+        elif kind == "group":
+            if _has_unbounded(value):
+                return True
+        elif kind == "branch":
+            if any(_has_unbounded(b) for b in value):
+                return True
+    return False
+
+
+def _has_variable(items) -> bool:
+    """True if items contain a backtracking repeat whose count can vary."""
+    for kind, value in items:
+        if kind == "repeat" and not value[3]:
+            if value[0] != value[1] or _has_variable(value[2]):
+                return True
+        elif kind == "group":
+            if _has_variable(value):
+                return True
+        elif kind == "branch":
+            if any(_has_variable(b) for b in value):
+                return True
+    return False
+
+
+def _ambiguous_branch(items) -> bool:
+    """True if items contain an alternation whose branches can start the same way."""
+    for kind, value in items:
+        if kind == "group" and _ambiguous_branch(value):
+            return True
+        if kind == "branch":
+            if any(not b for b in value):
+                return True
+            firsts = [_first_chars(b) for b in value]
+            for i, a in enumerate(firsts):
+                if any(_overlap(a, b) for b in firsts[i + 1 :]):
+                    return True
+    return False
+
+
+def _scan(items, findings: list[str]) -> None:
+    for i, (kind, value) in enumerate(items):
+        if kind == "repeat":
+            if value[3]:
+                continue  # possessive repeats never backtrack into themselves
+            body = value[2]
+            if value[1] is None:
+                if _has_unbounded(body):
+                    findings.append("nested unbounded quantifier, e.g. (a+)+")
+                if _ambiguous_branch(body):
+                    findings.append("repeated alternation with overlapping branches, e.g. (a|ab)*")
+                if i + 1 < len(items):
+                    next_kind, next_value = items[i + 1]
+                    if _backtracks(next_kind, next_value) and _overlap(
+                        _first_chars(body), _first_chars(next_value[2])
+                    ):
+                        findings.append("adjacent overlapping unbounded quantifiers, e.g. .*.*")
+            elif value[1] >= LARGE_REPEAT:
+                if _has_variable(body):
+                    findings.append(
+                        "large bounded repeat of a variable-length body, e.g. (a?){30} or (.*a){20}"
+                    )
+                if _ambiguous_branch(body):
+                    findings.append("repeated alternation with overlapping branches, e.g. (a|ab)*")
+            _scan(body, findings)
+        elif kind in ("group", "assert"):
+            _scan(value, findings)
+        elif kind == "branch":
+            for branch in value:
+                _scan(branch, findings)
+        elif kind == "backref":
+            findings.append("backreference")
+        # Atomic groups never backtrack into themselves
+
+
+def analyze_regex(pattern: str) -> list[str]:
+    """Return descriptions of constructs in pattern that can backtrack catastrophically.
+
+    An empty list means none were found. Raises re.error if pattern is invalid.
+    """
+    flags = re.compile(pattern).flags
+    findings: list[str] = []
+    _scan(_Parser(pattern, bool(flags & re.VERBOSE), bool(flags & re.IGNORECASE)).parse(), findings)
+    return list(dict.fromkeys(findings))
+
+
+def has_regex_op(operations: list[dict]) -> bool:
+    return any(op["type"] == "find_replace" and op["regex"] for op in operations)
+
+
+def _worker(conn, progress) -> None:
+    """Serve compute_new_name() batches on conn until it closes (runs in the worker process).
+
+    Messages are ("operations", operations), which the following batches
+    use, and ("names", paths), answered with ("ok", names) or ("error",
+    exception). progress holds the file and operation index being worked on.
+    """
+
+    def trace(op_index: int) -> None:
+        progress[1] = op_index
+
+    operations: list[dict] = []
+    conn.send(("ready", None))
+    while True:
+        try:
+            kind, payload = conn.recv()
+        except EOFError:
+            break
+        if kind == "operations":
+            operations = payload
+            continue
+        try:
+            names = []
+            for i, path in enumerate(payload):
+                progress[0] = i
+                names.append(compute_new_name(Path(path), operations, i, trace))
+            reply = ("ok", names)
+        except Exception as e:
+            reply = ("error", e)
+        try:
+            conn.send(reply)
+        except Exception as e:  # an exception that cannot be pickled
+            conn.send(("error", RuntimeError(f"{type(reply[1]).__name__}: {reply[1]}: {e}")))
+    conn.close()
+
+
+class _RegexWorker:
+    """The worker process compute_names() sends regex batches to.
+
+    It is started from a fresh interpreter ("spawn"), never forked from a
+    process that may be running other threads, and lives until a batch
+    times out or the parent exits. Its template and media caches stay warm
+    between batches, and operations are only sent again when they change.
+    """
+
+    def __init__(self):
+        ctx = multiprocessing.get_context("spawn")
+        self.progress = ctx.Array("q", 2, lock=False)  # file index, operation index
+        self.conn, child_conn = ctx.Pipe()
+        self.process = ctx.Process(
+            target=_worker, args=(child_conn, self.progress), name="renametool-regex", daemon=True
+        )
+        self.process.start()
+        child_conn.close()
+        self.operations: list[dict] | None = None
+        if not self.conn.poll(WORKER_START_TIMEOUT):
+            self.close()
+            raise RuntimeError("Name computation worker did not start")
+        self.conn.recv()
+
+    def compute(self, files: list[Path], operations: list[dict], budget: float) -> list[str]:
+        if operations != self.operations:
+            self.conn.send(("operations", operations))
+            self.operations = [dict(op) for op in operations]
+        self.progress[0] = self.progress[1] = 0
+        self.conn.send(("names", [str(f) for f in files]))
+        if not self.conn.poll(budget):
+            self.close()
+            op = operations[self.progress[1]]
+            pattern = op["find"] if op["type"] == "find_replace" else op["type"]
+            raise RegexTimeout(pattern, files[self.progress[0]], budget)
+        status, payload = self.conn.recv()
+        if status == "error":
+            raise payload
+        return payload
+
+    def close(self) -> None:
+        self.process.kill()
+        self.process.join()
+        self.conn.close()
+
+
+_regex_worker: _RegexWorker | None = None
+_regex_worker_lock = threading.Lock()
+
+
+def compute_names(
+    files: list[Path],
+    operations: list[dict],
+    budget: float | None = DEFAULT_BUDGET,
+) -> list[str]:
+    """Return compute_new_name() for each file, bounding the time regex operations may take.
+
+    Batches without regex operations (or with budget None) run inline. Otherwise
+    the batch runs in a long-lived worker process, one batch at a time; if it
+    has not finished within budget seconds the worker is killed (a new one
+    starts for the next batch) and RegexTimeout names the pattern and file it
+    was working on.
+    """
+    if budget is None or not has_regex_op(operations):
+        return [compute_new_name(f, operations, i) for i, f in enumerate(files)]
+
+    global _regex_worker
+    with _regex_worker_lock:
+        if _regex_worker is None or not _regex_worker.process.is_alive():
+            _regex_worker = _RegexWorker()
+        worker = _regex_worker
+        try:
+            return worker.compute(files, operations, budget)
+        except RegexTimeout:
+            _regex_worker = None
+            raise
+        except (EOFError, OSError):
+            worker.close()
+            _regex_worker = None
+            raise RuntimeError("Name computation worker exited unexpectedly") from None
@@ -1,24 +1,71 @@
 """Batch file rename TUI wizard."""
 
-import json
+import argparse
 import re
+import signal
+import sqlite3
 import sys
+import time
+import tomllib
 from datetime import datetime
 from pathlib import Path
 
 import questionary
-import tomllib
 from rich.console import Console
+from rich.progress import BarColumn, MofNCompleteColumn, Progress, TextColumn
 from rich.table import Table
-
-from patterns import detect_patterns, parse_movie_filename, parse_tv_filename
+from rich.text import Text
+
+from audiotags import TAGS_CACHE_FILE, read_tags_batch
+from catalog import Catalog
+from client import default_socket
+from daemon import FolderWatcher, RenameDaemon, serve
+from engine import (  # noqa: F401 - re-exported for scripts and tests
+    HIDDEN_NAMES,
+    INVALID_CHARS,
+    MAX_NAME_LEN,
+    UNDO_FILE,
+    FolderListing,
+    apply_case,
+    apply_find_replace,
+    apply_prefix,
+    apply_suffix,
+    check_name,
+    clear_undo_map,
+    compute_new_name,
+    format_movie_name,
+    format_music_name,
+    format_photo_name,
+    format_tv_name,
+    list_files,
+    load_undo_map,
+    normalize_extension,
+    rename_file,
+    save_undo_map,
+    undo_renames,
+    validate_extension,
+    validate_new_names,
+)
+from exif import EXIF_CACHE_FILE, read_exif_batch
+from extcheck import EXTERNAL_THRESHOLD, validate_names
+from filecache import FileCache
+from fsbackend import LOCAL, FileSystem
+from hashing import Hasher, dedupe_conflicts
+from linkview import plan_links, sync_links, view_targets
+from mapping import iter_mapping, join_mapping
+from metrics import ApplyMetrics, MetricsExporter, format_duration
+from namediff import change_spans
+from organize import create_folders, find_organize, order_by_folder, plan_organize
+from patterns import detect_patterns, group_movie_files, mine_patterns, parse_tv_filename
+from profiling import PROFILER
+from regexguard import DEFAULT_BUDGET, RegexTimeout, analyze_regex, compute_names
+from replacetable import load_table
+from templates import FIELDS, compile_template
+from titleindex import TitleIndex, open_title_index, resolve_movie_info, resolve_tv_info
 
 console = Console()
 
-HIDDEN_NAMES = {"desktop.ini", "thumbs.db"}
-INVALID_CHARS = set('<>:"/\\|?*')
-MAX_NAME_LEN = 255
-UNDO_FILE = ".renametool_undo.json"
+PROFILE_FILE = "renametool-profile.json"
 BACK = "BACK"
 GO_BACK = "<< Go back"
 
@@ -40,6 +87,89 @@ def load_config() -> dict:
         return {}
 
 
+# Open title indexes by dataset path, with the dataset mtime they were opened at
+_title_indexes: dict[Path, tuple[int, TitleIndex]] = {}
+
+
+def load_title_index(config: dict) -> TitleIndex | None:
+    """Open the title index named by config["title_index"], building it if needed.
+
+    Relative paths are resolved against the script directory. The index stays
+    open for the life of the process and is reopened only if the dataset
+    changes. Returns None if the key is absent, and prints a warning (then
+    returns None) if the dataset or index cannot be read.
+    """
+    tsv = config.get("title_index")
+    if not tsv:
+        return None
+    tsv_path = Path(tsv).expanduser()
+    if not tsv_path.is_absolute():
+        tsv_path = Path(__file__).parent / tsv_path
+    try:
+        mtime_ns = tsv_path.stat().st_mtime_ns
+        cached = _title_indexes.get(tsv_path)
+        if cached is not None and cached[0] == mtime_ns:
+            return cached[1]
+        index = open_title_index(tsv_path)
+    except (OSError, ValueError) as e:
+        console.print(f"[yellow]Warning: could not load title index {tsv_path}: {e}[/yellow]")
+        return None
+    if cached is not None:
+        cached[1].close()
+    _title_indexes[tsv_path] = (mtime_ns, index)
+    return index
+
+
+def catalog_path(config: dict) -> Path | None:
+    """Return the rename catalog named by config["catalog"] (relative to the script), or None."""
+    path = config.get("catalog")
+    if not path:
+        return None
+    path = Path(path).expanduser()
+    return path if path.is_absolute() else Path(__file__).parent / path
+
+
+def record_in_catalog(config: dict, renames: list[tuple[Path, Path]], kind: str = "rename") -> None:
+    """Record (old path, new path) renames in the configured catalog, if there is one.
+
+    A catalog that cannot be opened or written only prints a warning: the
+    renames themselves have already happened and are in the folder's log.
+    """
+    path = catalog_path(config)
+    if path is None or not renames:
+        return
+    try:
+        with Catalog(path) as catalog:
+            count = catalog.record(renames, kind)
+    except (OSError, sqlite3.Error) as e:
+        console.print(f"[yellow]Warning: could not record renames in {path}: {e}[/yellow]")
+        return
+    console.print(f"[dim]{count} rename(s) recorded in {path}[/dim]")
+
+
+def show_history(path: Path, name: str) -> None:
+    """Print every catalogued rename from or to name, and the names that led to it."""
+    if not path.exists():
+        console.print(f"[red]No rename catalog at {path}[/red]")
+        return
+    with Catalog(path) as catalog:
+        rows = catalog.lookup(name)
+        chain = catalog.trace(name)
+    if not rows:
+        console.print(f"[yellow]No renames of {name} recorded.[/yellow]")
+        return
+    table = Table(title=f"Renames of {name}")
+    for column in ("When", "Kind", "Folder", "Old", "New"):
+        table.add_column(column)
+    for r in rows:
+        new = r["new"] if r["new_folder"] == r["folder"] else str(Path(r["new_folder"], r["new"]))
+        table.add_row(r["when"], r["kind"], r["folder"], r["old"], new)
+    console.print(table)
+    if len(chain) > 1:
+        names = [chain[0]["old"]] + [r["new"] for r in chain]
+        console.print(f"Earlier names of {name}: " + " -> ".join(names))
+
+
 def ask_folder(default_folder: str = "") -> Path:  # pragma: no cover
     """Prompt for a folder path and validate it exists."""
     path_str = questionary.text(
@@ -55,31 +185,13 @@ def ask_folder(default_folder: str = "") -> Path:  # pragma: no cover
     return folder
 
 
-def list_files(
-    folder: Path,
-    ext_filter: str | None = None,
-    excluded_names: frozenset[str] = frozenset(),
-) -> list[Path]:
-    """Return non-hidden files in folder, filtered by extension if given, sorted alphabetically."""
-    files = []
-    for entry in folder.iterdir():
-        if not entry.is_file():
-            continue
-        name = entry.name
-        if name.startswith(".") or name.lower() in HIDDEN_NAMES:
-            continue
-        if name.lower() in excluded_names:
-            continue
-        if ext_filter and entry.suffix.lower() != ext_filter.lower():
-            continue
-        files.append(entry)
-    files.sort(key=lambda p: p.name.lower())
-    return files
-
-
 def ask_pattern_operation(filenames: list[str]) -> dict | None:  # pragma: no cover
     """Run pattern detection, let user pick a pattern, and choose action."""
-    detected = detect_patterns(filenames)
+    with PROFILER.span("detect_patterns", files=len(filenames)):
+        detected = detect_patterns(filenames)
+    with PROFILER.span("mine_patterns", files=len(filenames)):
+        known = {p["regex"] for p in detected}
+        detected += [p for p in mine_patterns(filenames) if p["regex"] not in known]
 
     if detected:
         table = Table(title="Detected Patterns")
@@ -104,10 +216,7 @@ def ask_pattern_operation(filenames: list[str]) -> dict | None:  # pragma: no co
         regex_str = questionary.text("Enter regex pattern:").ask()
         if regex_str is None:
             sys.exit(0)
-        try:
-            re.compile(regex_str)
-        except re.error as e:
-            console.print(f"[red]Invalid regex: {e}[/red]")
+        if not confirm_regex(regex_str):
             return None
     else:
         regex_str = next(p["regex"] for p in detected if p["name"] == pick)
@@ -128,8 +237,31 @@ def ask_pattern_operation(filenames: list[str]) -> dict | None:  # pragma: no co
     return {"type": "find_replace", "find": regex_str, "replace": replace, "regex": True}
 
 
-def ask_media_rename(selected_files: list) -> list[dict] | None:  # pragma: no cover
-    """Run media library rename sub-flow. Returns a list of per-file operations."""
+def confirm_regex(pattern: str) -> bool:  # pragma: no cover
+    """Reject an invalid regex; warn about risky constructs and ask before accepting."""
+    try:
+        findings = analyze_regex(pattern)
+    except re.error as e:
+        console.print(f"[red]Invalid regex: {e}[/red]")
+        return False
+    if not findings:
+        return True
+    console.print("[yellow]This pattern may backtrack catastrophically on long names:[/yellow]")
+    for finding in findings:
+        console.print(f"[yellow]  - {finding}[/yellow]")
+    use = questionary.confirm("Use it anyway?", default=False).ask()
+    if use is None:
+        sys.exit(0)
+    return use
+
+
+def ask_media_rename(
+    selected_files: list, title_index: TitleIndex | None = None
+) -> list[dict] | None:  # pragma: no cover
+    """Run media library rename sub-flow. Returns a list of per-file operations.
+
+    If title_index is given, detected titles are replaced by their canonical names.
+    """
     media_type = questionary.select(
         "Media type:",
         choices=["TV Show", "Movie"],
@@ -138,16 +270,20 @@ def ask_media_rename(selected_files: list) -> list[dict] | None:  # pragma: no c
         sys.exit(0)
 
     if media_type == "TV Show":
-        return _ask_tv_rename(selected_files)
+        return _ask_tv_rename(selected_files, title_index)
     else:
-        return _ask_movie_rename(selected_files)
+        return _ask_movie_rename(selected_files, title_index)
 
 
-def _ask_tv_rename(selected_files: list) -> list[dict] | None:  # pragma: no cover
+def _ask_tv_rename(
+    selected_files: list, title_index: TitleIndex | None = None
+) -> list[dict] | None:  # pragma: no cover
     """Parse TV filenames, show detected components, let user confirm."""
     parsed = []
     for f in selected_files:
         info = parse_tv_filename(f.name)
+        if info and title_index:
+            info = resolve_tv_info(info, title_index)
         parsed.append((f, info))
 
     # Show detection results
@@ -193,14 +329,73 @@ def _ask_tv_rename(selected_files: list) -> list[dict] | None:  # pragma: no cov
     return operations
 
 
-def _ask_movie_rename(selected_files: list) -> list[dict] | None:  # pragma: no cover
-    """Parse movie filenames, let user confirm or override title/year."""
-    # Try to detect from the first file
-    first_info = parse_movie_filename(selected_files[0].name) if selected_files else None
+def _ask_movie_rename(
+    selected_files: list, title_index: TitleIndex | None = None
+) -> list[dict] | None:  # pragma: no cover
+    """Parse every movie filename, group them by title, let user confirm groups in bulk."""
+    groups, undetected = group_movie_files([f.name for f in selected_files])
+    if title_index:
+        for g in groups:
+            g.update(resolve_movie_info({"title": g["title"], "year": g["year"]}, title_index))
+    if not groups:
+        console.print("[yellow]No movie titles detected. Enter one title for all files.[/yellow]")
+        return _ask_single_movie(selected_files)
 
-    default_title = first_info["title"] if first_info else ""
-    default_year = str(first_info["year"]) if first_info else ""
+    table = Table(title="Detected Movies")
+    table.add_column("#", style="dim")
+    table.add_column("Title")
+    table.add_column("Year", justify="right")
+    table.add_column("Files", justify="right")
+    table.add_column("Example", style="cyan")
+    for i, g in enumerate(groups, 1):
+        table.add_row(
+            str(i), g["title"], str(g["year"]), str(len(g["filenames"])), g["filenames"][0]
+        )
+    console.print(table)
+    if undetected:
+        console.print(
+            f"[yellow]{len(undetected)} file(s) not detected and will be skipped.[/yellow]"
+        )
 
+    action = questionary.select(
+        "Apply movie rename:",
+        choices=["Apply all groups", "Review each group", "Use one title for all files"],
+    ).ask()
+    if action is None:
+        sys.exit(0)
+    if action == "Use one title for all files":
+        return _ask_single_movie(selected_files, groups[0]["title"], str(groups[0]["year"]))
+
+    movies = {}
+    for i, g in enumerate(groups, 1):
+        title, year = g["title"], g["year"]
+        if action == "Review each group":
+            console.print(f"[dim]Group {i}/{len(groups)}: {len(g['filenames'])} file(s)[/dim]")
+            title = questionary.text("Movie title (empty to skip):", default=title).ask()
+            if title is None:
+                sys.exit(0)
+            if not title:
+                continue
+            year_str = questionary.text("Movie year:", default=str(year)).ask()
+            if year_str is None:
+                sys.exit(0)
+            try:
+                year = int(year_str)
+            except ValueError:
+                console.print("[red]Invalid year, group skipped.[/red]")
+                continue
+        for name in g["filenames"]:
+            movies[name] = {"title": title, "year": year}
+
+    if not movies:
+        return None
+    return [{"type": "media_movies", "movies": movies}]
+
+
+def _ask_single_movie(
+    selected_files: list, default_title: str = "", default_year: str = ""
+) -> list[dict] | None:  # pragma: no cover
+    """Prompt for one title/year and apply it to every selected file."""
     title = questionary.text("Movie title:", default=default_title).ask()
     if title is None:
         sys.exit(0)
@@ -215,150 +410,50 @@ def _ask_movie_rename(selected_files: list) -> list[dict] | None:  # pragma: no
         return None
 
     info = {"title": title, "year": year}
-    # Apply the same movie info to all selected files
-    return [{"type": "media_movie", "info": info, "file": f.name} for f in selected_files]
-
-
-def apply_find_replace(stem: str, find: str, replace: str, use_regex: bool) -> str:
-    if use_regex:
-        return re.sub(find, replace, stem)
-    return stem.replace(find, replace)
-
+    return [{"type": "media_movies", "movies": {f.name: info for f in selected_files}}]
 
-def apply_prefix(stem: str, prefix: str) -> str:
-    return prefix + stem
 
+class _NameChange:
+    """A preview cell pair whose changed spans are computed only when rich renders them.
 
-def apply_suffix(stem: str, suffix: str) -> str:
-    return stem + suffix
-
-
-def apply_case(stem: str, mode: str) -> str:
-    if mode == "uppercase":
-        return stem.upper()
-    elif mode == "lowercase":
-        return stem.lower()
-    elif mode == "title":
-        return stem.title()
-    elif mode == "snake_case":
-        return re.sub(r"[\s\-]+", "_", stem.lower())
-    return stem
-
-
-def format_tv_name(info: dict, ext: str) -> str:
-    """Build a Plex/Jellyfin-compatible TV episode filename.
-
-    Format: Show - S01E01 - Episode Title.ext (title omitted if empty).
+    rich resolves __rich__ while printing the table, so rows that are never
+    rendered never pay for the diff, and the two cells of a row share one.
     """
-    name = f"{info['show']} - S{info['season']:02d}E{info['episode']:02d}"
-    if info.get("title"):
-        name += f" - {info['title']}"
-    return name + ext
 
+    __slots__ = ("old", "new", "_spans")
 
-def format_movie_name(info: dict, ext: str) -> str:
-    """Build a Plex/Jellyfin-compatible movie filename.
+    def __init__(self, old: str, new: str):
+        self.old = old
+        self.new = new
+        self._spans = None
 
-    Format: Title (Year).ext
-    """
-    return f"{info['title']} ({info['year']}){ext}"
-
-
-def normalize_extension(raw: str) -> str:
-    """Normalize user input to a single leading-dot extension (e.g. '..jpg' → '.jpg')."""
-    stripped = raw.lstrip(".")
-    return "." + stripped if stripped else ""
-
-
-def validate_extension(ext: str) -> str | None:
-    """Return an error message if ext is invalid, or None if OK."""
-    if not ext or ext == ".":
-        return "Extension cannot be empty."
-    body = ext.lstrip(".")
-    if not body:
-        return "Extension cannot be empty."
-    if any(c in INVALID_CHARS for c in body):
-        return f"Extension contains invalid characters: {ext}"
-    if " " in body:
-        return f"Extension contains spaces: {ext}"
-    return None
-
-
-def compute_new_name(file: Path, operations: list[dict]) -> str:
-    """Apply all operations sequentially to the stem, reattach extension."""
-    stem = file.stem
-    ext = file.suffix
-
-    for op in operations:
-        if op["type"] == "find_replace":
-            stem = apply_find_replace(stem, op["find"], op["replace"], op["regex"])
-        elif op["type"] == "prefix":
-            stem = apply_prefix(stem, op["prefix"])
-        elif op["type"] == "suffix":
-            stem = apply_suffix(stem, op["suffix"])
-        elif op["type"] == "case":
-            stem = apply_case(stem, op["mode"])
-        elif op["type"] == "ext_change":
-            ext = op["ext"]
-        elif op["type"] == "media_tv":
-            if op.get("file") and op["file"] != file.name:
-                continue
-            return format_tv_name(op["info"], ext)
-        elif op["type"] == "media_movie":
-            if op.get("file") and op["file"] != file.name:
-                continue
-            return format_movie_name(op["info"], ext)
+    def spans(self):
+        if self._spans is None:
+            self._spans = change_spans(self.old, self.new)
+        return self._spans
 
-    return stem + ext
+    def cell(self, side: int) -> "_ChangeCell":
+        return _ChangeCell(self, side)
 
 
-def validate_new_names(pairs: list[tuple[Path, str]]) -> list[dict]:
-    """Check each rename for conflicts, invalid chars, no-change, empty names.
+class _ChangeCell:
+    __slots__ = ("change", "side")
 
-    Returns a list of dicts with keys: original, new_name, status.
-    """
-    results = []
-    new_name_counts: dict[str, int] = {}
-
-    # Count occurrences of each new name (case-insensitive for Windows)
-    for _, new_name in pairs:
-        key = new_name.lower()
-        new_name_counts[key] = new_name_counts.get(key, 0) + 1
-
-    for original, new_name in pairs:
-        status = "OK"
-
-        # Check for empty stem: split on the last dot to find the part before
-        # the extension. Names like ".txt" or "..." have no meaningful stem.
-        parts = new_name.rsplit(".", 1) if new_name else [""]
-        stem_before_ext = parts[0] if len(parts) == 2 else new_name
-        stem_empty = not new_name or not stem_before_ext.rstrip(".")
-        if new_name == original.name:
-            status = "NO CHANGE"
-        elif stem_empty:
-            status = "INVALID (empty name)"
-        elif len(new_name) > MAX_NAME_LEN:
-            status = "INVALID (name too long)"
-        elif any(c in INVALID_CHARS for c in Path(new_name).stem):
-            status = "INVALID (illegal characters)"
-        elif new_name_counts.get(new_name.lower(), 0) > 1:
-            status = "CONFLICT"
-        elif (original.parent / new_name).exists() and new_name.lower() != original.name.lower():
-            status = "CONFLICT"
-
-        results.append(
-            {
-                "original": original,
-                "new_name": new_name,
-                "status": status,
-            }
-        )
+    _STYLES = ("bold red", "bold green")  # removed from the original, added to the new name
+
+    def __init__(self, change: _NameChange, side: int):
+        self.change = change
+        self.side = side
 
-    return results
+    def __rich__(self) -> Text:
+        text = Text(self.change.new if self.side else self.change.old)
+        for start, end in self.change.spans()[self.side]:
+            text.stylize(self._STYLES[self.side], start, end)
+        return text
 
 
 def show_preview(results: list[dict]) -> None:
-    """Display a rich table with color-coded status per row."""
+    """Display a rich table with color-coded status per row and changed text highlighted."""
     table = Table(title="Rename Preview")
     table.add_column("Original", style="cyan")
     table.add_column("New Name", style="white")
@@ -367,6 +462,7 @@ def show_preview(results: list[dict]) -> None:
     style_map = {
         "OK": "green",
         "NO CHANGE": "yellow",
+        "DUPLICATE": "yellow",
         "CONFLICT": "red",
     }
 
@@ -377,7 +473,8 @@ def show_preview(results: list[dict]) -> None:
             style = "red"
         else:
             style = style_map.get(status, "red")
-        table.add_row(r["original"].name, r["new_name"], f"[{style}]{status}[/{style}]")
+        change = _NameChange(r["original"].name, r["new_name"])
+        table.add_row(change.cell(0), change.cell(1), f"[{style}]{status}[/{style}]")
 
     console.print(table)
 
@@ -387,6 +484,46 @@ def show_preview(results: list[dict]) -> None:
     console.print(f"[yellow]{skip_count} skipped.[/yellow]")
 
 
+def apply_renames(
+    items: list[dict],
+    metrics: ApplyMetrics | None = None,
+    on_progress=None,
+    verify: bool = False,
+    fs: FileSystem = LOCAL,
+) -> tuple[int, int]:
+    """Rename each item's original to its new_name in the same folder.
+
+    items are validate_new_names() results (normally only the OK ones). A
+    target that appeared since validation is reported as an error instead of
+    being overwritten. Per-file errors are printed and the batch continues.
+    on_progress(metrics) is called after every file; if it raises, a warning is
+    printed and it is not called again, so it can never stop the batch halfway.
+    verify and fs are passed to rename_file(). Returns (success, errors).
+    """
+    metrics = metrics or ApplyMetrics(len(items))
+    success = 0
+    errors = 0
+    with PROFILER.span("apply_renames", files=len(items)):
+        for r in items:
+            src: Path = r["original"]
+            try:
+                rename_file(src, r["new_name"], metrics, verify=verify, fs=fs)
+                success += 1
+                metrics.record(True)
+            except OSError as e:
+                console.print(f"[red]Error renaming {src.name}: {e}[/red]")
+                errors += 1
+                metrics.record(False)
+            if on_progress is not None:
+                try:
+                    on_progress(metrics)
+                except Exception as e:
+                    console.print(f"[yellow]Warning: progress updates stopped: {e}[/yellow]")
+                    on_progress = None
+        PROFILER.add(**{name: h.count for name, h in metrics.latency.items()})
+    return success, errors
+
+
 def write_log(folder: Path, results: list[dict]) -> None:
     """Append a timestamped rename record to .renametool.log in folder.
 
@@ -395,59 +532,39 @@ def write_log(folder: Path, results: list[dict]) -> None:
     """
     log_path = folder / ".renametool.log"
     ts = datetime.now().strftime("%Y-%m-%d %H:%M:%S")
-    with open(log_path, "a", encoding="utf-8") as f:
+    with PROFILER.span("write_log", files=len(results)), open(log_path, "a", encoding="utf-8") as f:
         f.write(f"=== {ts} ===\n")
         for r in results:
             f.write(f"{r['original'].name} -> {r['new_name']} [{r['status']}]\n")
         f.write("\n")
+        PROFILER.add(open=1)
     console.print(f"[dim]Log written to {log_path}[/dim]")
 
 
-def save_undo_map(folder: Path, undo_map: list[dict]) -> None:
-    """Write rename pairs to UNDO_FILE in folder.
+def apply_undo(folder: Path, undo_map: list[dict], fs: FileSystem = LOCAL) -> list[dict]:
+    """Reverse each rename in undo_map (new → old); skip missing files with a warning.
 
-    undo_map is a list of {"old": "original.txt", "new": "renamed.txt"} dicts,
-    representing the rename that was just applied (old → new).  The file can
-    later be read by load_undo_map() to reverse those renames.
+    Returns the undo_renames() outcomes.
     """
-    undo_path = folder / UNDO_FILE
-    with open(undo_path, "w", encoding="utf-8") as f:
-        json.dump(undo_map, f, indent=2)
-
-
-def load_undo_map(folder: Path) -> list[dict] | None:
-    """Read and return the undo map from folder, or None if not found/unreadable."""
-    undo_path = folder / UNDO_FILE
-    if not undo_path.exists():
-        return None
-    try:
-        with open(undo_path, encoding="utf-8") as f:
-            return json.load(f)
-    except (json.JSONDecodeError, OSError):
-        return None
-
-
-def apply_undo(folder: Path, undo_map: list[dict]) -> None:
-    """Reverse each rename in undo_map (new → old); skip missing files with a warning."""
     success = 0
     skipped = 0
-    for entry in undo_map:
-        src = folder / entry["new"]
-        dst = folder / entry["old"]
-        if not src.exists():
-            console.print(f"[yellow]Skipping (not found): {entry['new']}[/yellow]")
-            skipped += 1
-            continue
-        try:
-            src.rename(dst)
+    outcomes = undo_renames(folder, undo_map, fs)
+    for outcome in outcomes:
+        if outcome["status"] == "RESTORED":
             success += 1
-        except OSError as e:
-            console.print(f"[red]Error undoing {entry['new']}: {e}[/red]")
-            skipped += 1
+            continue
+        skipped += 1
+        if outcome["status"] == "MISSING":
+            console.print(f"[yellow]Skipping (not found): {outcome['new']}[/yellow]")
+        elif outcome["status"] == "CONFLICT":
+            console.print(f"[yellow]Skipping (name taken): {outcome['old']}[/yellow]")
+        else:
+            console.print(f"[red]Error undoing {outcome['new']}: {outcome['error']}[/red]")
 
     console.print(f"\n[green]{success} file(s) restored.[/green]")
     if skipped:
         console.print(f"[yellow]{skipped} skipped.[/yellow]")
+    return outcomes
 
 
 def step_folder(state, config, excluded_names):  # pragma: no cover
@@ -462,8 +579,14 @@ def step_folder(state, config, excluded_names):  # pragma: no cover
         if do_undo is None:
             sys.exit(0)
         if do_undo:
-            apply_undo(folder, undo_map)
-            (folder / UNDO_FILE).unlink()
+            outcomes = apply_undo(folder, undo_map)
+            restored = [
+                (folder / o["new"], folder / o["old"])
+                for o in outcomes
+                if o["status"] == "RESTORED"
+            ]
+            record_in_catalog(config, restored, "undo")
+            clear_undo_map(folder)
             console.print("[green]Undo complete. Undo file deleted.[/green]")
             sys.exit(0)
 
@@ -471,27 +594,56 @@ def step_folder(state, config, excluded_names):  # pragma: no cover
     return state
 
 
+def format_size(size: int) -> str:
+    """Format a byte count as B, KB, MB or GB."""
+    if size < 1024:
+        return f"{size} B"
+    for unit in ("KB", "MB"):
+        size /= 1024
+        if size < 1024:
+            return f"{size:.1f} {unit}"
+    return f"{size / 1024:.1f} GB"
+
+
 def step_ext_filter(state, config, excluded_names):  # pragma: no cover
     """Step 2: Extension filter selection with Go back."""
     folder = state["folder"]
-    all_files = list_files(folder, excluded_names=excluded_names)
-    if not all_files:
+    # One scan serves the histogram, every filter choice and the size table;
+    # it is kept across Go back unless the folder changes
+    listing = state.get("listing")
+    if listing is None or listing.folder != folder or not listing.is_current():
+        listing = state["listing"] = FolderListing(folder, excluded_names)
+    if not listing.files:
         console.print(f"[yellow]No eligible files found in {folder}[/yellow]")
         sys.exit(0)
 
-    extensions = sorted({f.suffix.lower() for f in all_files if f.suffix})
-    if not extensions:
+    histogram = listing.histogram()
+    histogram.pop("", None)
+    if not histogram:
         # No extensions to filter by — skip filter, show all files
         state["ext_filter"] = None
-        state["all_files"] = all_files
+        state["all_files"] = listing.select()
         return state
 
+    def ext_choice(ext, checked=False):
+        count, size = histogram[ext]
+        title = f"{ext}  ({count} file{'s' if count != 1 else ''}, {format_size(size)})"
+        return questionary.Choice(title, value=ext, checked=checked)
+
     no_filter = "No filter (all files)"
-    choices = [GO_BACK, no_filter] + extensions
-    prev_ext = state.get("ext_filter")
-    default_ext = config.get("default_extension_filter")
-    preferred = prev_ext or default_ext
-    default_choice = preferred if preferred in choices else no_filter
+    several = "Several extensions…"
+    choices = [GO_BACK, no_filter] + [ext_choice(ext) for ext in histogram]
+    if len(histogram) > 1:
+        choices.append(several)
+    prev = state.get("ext_filter")
+    if prev is None and config.get("default_extension_filter"):
+        prev = (config["default_extension_filter"].lower(),)
+    if prev and len(prev) > 1:
+        default_choice = several
+    elif prev and prev[0] in histogram:
+        default_choice = prev[0]
+    else:
+        default_choice = no_filter
 
     answer = questionary.select(
         "Filter by extension?",
@@ -503,31 +655,33 @@ def step_ext_filter(state, config, excluded_names):  # pragma: no cover
     if answer == GO_BACK:
         return BACK
 
-    ext_filter = None if answer == no_filter else answer
+    if answer == no_filter:
+        ext_filter = None
+    elif answer == several:
+        picked = questionary.checkbox(
+            "Extensions to include:",
+            choices=[ext_choice(ext, checked=ext in (prev or ())) for ext in histogram],
+        ).ask()
+        if picked is None:
+            sys.exit(0)
+        if not picked:
+            console.print("[yellow]No extensions selected.[/yellow]")
+            return step_ext_filter(state, config, excluded_names)
+        ext_filter = tuple(picked)
+    else:
+        ext_filter = (answer,)
     state["ext_filter"] = ext_filter
 
-    if ext_filter:
-        all_files = list_files(folder, ext_filter, excluded_names=excluded_names)
-        if not all_files:
-            console.print(f"[yellow]No {ext_filter} files found.[/yellow]")
-            return BACK
-
-    state["all_files"] = all_files
+    indexes = listing.indexes(ext_filter)
+    state["all_files"] = [listing.files[i] for i in indexes]
 
     # Show file table
     table = Table(title=f"Files in {folder}")
     table.add_column("#", style="dim")
     table.add_column("Filename")
     table.add_column("Size", justify="right")
-    for i, f in enumerate(all_files, 1):
-        size = f.stat().st_size
-        if size < 1024:
-            size_str = f"{size} B"
-        elif size < 1024 * 1024:
-            size_str = f"{size / 1024:.1f} KB"
-        else:
-            size_str = f"{size / (1024 * 1024):.1f} MB"
-        table.add_row(str(i), f.name, size_str)
+    for n, i in enumerate(indexes, 1):
+        table.add_row(str(n), listing.files[i].name, format_size(listing.sizes[i]))
     console.print(table)
     console.print()
 
@@ -589,7 +743,14 @@ def step_operations(state, config, excluded_names):  # pragma: no cover
             "Add Suffix (before extension)",
             "Change Case",
             "Change Extension",
+            "Apply Template",
+            "Apply Replacement Table",
+            "Apply Mapping File",
+            "Rename to Content Hash",
+            "Rename Photos by EXIF Date",
+            "Rename Music by Tags",
             "Media Library Rename",
+            "Organize into Folders",
             "Pattern Group Detection",
         ]
         op_type = questionary.select(
@@ -606,6 +767,8 @@ def step_operations(state, config, excluded_names):  # pragma: no cover
             find = questionary.text("Find what:").ask()
             if find is None:
                 sys.exit(0)
+            if use_regex and not confirm_regex(find):
+                continue
             replace = questionary.text("Replace with (leave empty to delete):").ask()
             if replace is None:
                 sys.exit(0)
@@ -646,12 +809,126 @@ def step_operations(state, config, excluded_names):  # pragma: no cover
                 "snake_case": "snake_case",
             }
             operations.append({"type": "case", "mode": mode_map[case_mode]})
+        elif op_type == "Apply Template":
+            console.print(f"[dim]Fields: {', '.join('{' + f + '}' for f in FIELDS)}[/dim]")
+            template = questionary.text("Template (e.g. {show} - S{season:02}E{episode:02}):").ask()
+            if template is None:
+                sys.exit(0)
+            try:
+                compile_template(template)
+            except ValueError as e:
+                console.print(f"[red]{e}[/red]")
+                continue
+            operations.append({"type": "template", "template": template})
+        elif op_type == "Apply Replacement Table":
+            raw_path = questionary.text(
+                "Replacement table (.csv or .toml):",
+                default=config.get("replacement_table", ""),
+            ).ask()
+            if raw_path is None:
+                sys.exit(0)
+            table_path = Path(raw_path.strip()).expanduser()
+            if not table_path.is_absolute() and not table_path.exists():
+                table_path = Path(__file__).parent / table_path
+            try:
+                table = load_table(table_path)
+            except (OSError, ValueError) as e:
+                console.print(f"[red]Could not load replacement table: {e}[/red]")
+                continue
+            console.print(f"[dim]Loaded {len(table)} replacement(s) from {table_path}[/dim]")
+            operations.append({"type": "replace_table", "table": table, "source": str(table_path)})
+        elif op_type == "Apply Mapping File":
+            raw_path = questionary.text("Mapping file (.csv, .tsv or NUL-delimited):").ask()
+            if raw_path is None:
+                sys.exit(0)
+            mapping_path = Path(raw_path.strip()).expanduser()
+            try:
+                with console.status("Joining mapping against the file list..."):
+                    join = join_mapping(state["selected"], iter_mapping(mapping_path))
+            except (OSError, ValueError) as e:
+                console.print(f"[red]Could not read mapping file: {e}[/red]")
+                continue
+            console.print(f"[dim]Matched {len(join.names)} file(s).[/dim]")
+            if join.missing:
+                sample = ", ".join(join.missing_sample)
+                more = "…" if join.missing > len(join.missing_sample) else ""
+                console.print(
+                    f"[yellow]{join.missing} mapping row(s) name files not in the selection: "
+                    f"{sample}{more}[/yellow]"
+                )
+            if join.extra:
+                console.print(
+                    f"[yellow]{len(join.extra)} selected file(s) are not mapped.[/yellow]"
+                )
+            if join.duplicates:
+                console.print(
+                    f"[red]Skipping {len(join.duplicates)} file(s) mapped to more than one name: "
+                    f"{', '.join(join.duplicates)}[/red]"
+                )
+            if not join.names:
+                continue
+            operations.append(join.operation())
+        elif op_type == "Rename to Content Hash":
+            length_str = questionary.text("Hash length (hex characters):", default="16").ask()
+            if length_str is None:
+                sys.exit(0)
+            try:
+                length = int(length_str)
+            except ValueError:
+                console.print("[red]Invalid length.[/red]")
+                continue
+            with console.status("Hashing files..."):
+                digests = Hasher.for_folder(state["folder"]).digests(state["selected"])
+            hashes = {f.name: d[:length] for f, d in digests.items()}
+            operations.append({"type": "content_hash", "hashes": hashes})
+        elif op_type == "Rename Photos by EXIF Date":
+            with console.status("Reading EXIF headers..."):
+                cache = FileCache(state["folder"] / EXIF_CACHE_FILE)
+                infos = read_exif_batch(state["selected"], cache)
+            photos = {f.name: info for f, info in infos.items() if info.get("taken")}
+            if not photos:
+                console.print("[yellow]No EXIF capture dates found in selected files.[/yellow]")
+                continue
+            console.print(f"[green]Capture date found for {len(photos)} file(s).[/green]")
+            operations.append({"type": "photo_date", "photos": photos})
+        elif op_type == "Rename Music by Tags":
+            with console.status("Reading audio tags..."):
+                cache = FileCache(state["folder"] / TAGS_CACHE_FILE)
+                infos = read_tags_batch(state["selected"], cache)
+            tracks = {f.name: info for f, info in infos.items() if info.get("title")}
+            if not tracks:
+                console.print("[yellow]No audio tags found in selected files.[/yellow]")
+                continue
+            console.print(f"[green]Tags found for {len(tracks)} file(s).[/green]")
+            operations.append({"type": "music_tags", "tracks": tracks})
         elif op_type == "Media Library Rename":
-            media_ops = ask_media_rename(state["selected"])
+            try:
+                media_ops = ask_media_rename(state["selected"], load_title_index(config))
+            except ValueError as e:
+                console.print(f"[red]Could not look up titles: {e}[/red]")
+                continue
             if media_ops is None:
                 continue
             operations.extend(media_ops)
             break  # Media rename replaces the entire name; skip "add another?"
+        elif op_type == "Organize into Folders":
+            console.print(
+                "[dim]Folders are created under the current folder; "
+                "use / between levels. Fields as for templates.[/dim]"
+            )
+            template = questionary.text(
+                "Folder template:", default="{show}/Season {season:02}"
+            ).ask()
+            if template is None:
+                sys.exit(0)
+            try:
+                compile_template(template)
+            except ValueError as e:
+                console.print(f"[red]{e}[/red]")
+                continue
+            # Only one folder layout applies; a new one replaces the old
+            operations[:] = [op for op in operations if op["type"] != "organize"]
+            operations.append({"type": "organize", "template": template})
         else:
             pattern_op = ask_pattern_operation(filenames)
             if pattern_op is None:
@@ -670,48 +947,167 @@ def step_operations(state, config, excluded_names):  # pragma: no cover
     return state
 
 
+def build_link_view(config, targets) -> bool:  # pragma: no cover
+    """Ask for a view folder and link mode, then sync the links; False if cancelled."""
+    raw_root = questionary.text(
+        "Library view folder (originals are left untouched):",
+        default=config.get("link_view_root", ""),
+    ).ask()
+    if raw_root is None:
+        sys.exit(0)
+    if not raw_root.strip():
+        return False
+    view_root = Path(raw_root.strip()).expanduser()
+    mode_default = config.get("link_mode", "hardlink")
+    mode = questionary.select(
+        "Link type:",
+        choices=["hardlink", "symlink"],
+        default=mode_default if mode_default in ("hardlink", "symlink") else "hardlink",
+    ).ask()
+    if mode is None:
+        sys.exit(0)
+
+    plan = plan_links(targets, view_root, mode)
+    for rel, reason in plan.conflicts.items():
+        console.print(f"[red]Skipping {rel}: {reason}[/red]")
+    console.print(
+        f"{len(plan.create)} to create, {len(plan.replace)} to update, "
+        f"{len(plan.prune)} stale to remove, {len(plan.keep)} already up to date."
+    )
+    if not (plan.create or plan.replace or plan.prune or plan.forget):
+        console.print("[green]Library view is up to date.[/green]")
+        return True
+    confirm = questionary.confirm(f"Sync {view_root}?", default=True).ask()
+    if confirm is None:
+        sys.exit(0)
+    if not confirm:
+        return False
+    with console.status("Syncing links..."):
+        summary = sync_links(plan)
+    for rel, error in summary["errors"].items():
+        console.print(f"[red]Error linking {rel}: {error}[/red]")
+    console.print(
+        f"\n[green]{summary['created']} created, {summary['replaced']} updated, "
+        f"{summary['pruned']} removed, {summary['kept']} unchanged.[/green]"
+    )
+    return True
+
+
 def step_preview(state, config, excluded_names):  # pragma: no cover
     """Step 5: Preview renames and apply, go back, or abort."""
-    pairs = [(f, compute_new_name(f, state["operations"])) for f in state["selected"]]
-    results = validate_new_names(pairs)
+    files = state["selected"]
+    budget = config.get("regex_budget", DEFAULT_BUDGET)
+    try:
+        with PROFILER.span("compute_new_name", files=len(files)):
+            names = compute_names(files, state["operations"], budget)
+    except RegexTimeout as e:
+        console.print(f"[red]{e}. Choose a simpler pattern or raise regex_budget.[/red]")
+        return BACK
+    organize = find_organize(state["operations"])
+    if organize is None:
+        threshold = config.get("external_check_threshold", EXTERNAL_THRESHOLD)
+        results = list(validate_names(zip(files, names), len(files), threshold))
+    else:
+        results = plan_organize(list(zip(files, names)), organize["template"])
 
-    console.print()
-    show_preview(results)
-    console.print()
+    while True:
+        console.print()
+        show_preview(results)
+        console.print()
 
+        if not any(r["status"] == "CONFLICT" for r in results):
+            break
+        check = questionary.confirm("Check conflicting files for duplicates?", default=False).ask()
+        if check is None:
+            sys.exit(0)
+        if not check:
+            break
+        with console.status("Hashing conflicting files..."):
+            checked = dedupe_conflicts(results, Hasher.for_folder(state["folder"]), fs=LOCAL)
+        if checked == results:
+            console.print("[yellow]No duplicates found among conflicting files.[/yellow]")
+            break
+        results = checked
+
+    link_view = "Build library view (links)"
     ok_items = [r for r in results if r["status"] == "OK"]
     if not ok_items:
         console.print("[yellow]Nothing to rename.[/yellow]")
         action = questionary.select(
             "What would you like to do?",
-            choices=[GO_BACK, "Abort"],
+            choices=[link_view, GO_BACK, "Abort"],
         ).ask()
         if action is None or action == "Abort":
             sys.exit(0)
-        return BACK
-
-    action = questionary.select(
-        "What would you like to do?",
-        choices=["Apply renames", GO_BACK, "Abort"],
-    ).ask()
-    if action is None or action == "Abort":
-        console.print("[yellow]Aborted. No files were changed.[/yellow]")
-        sys.exit(0)
-    if action == GO_BACK:
-        return BACK
+        if action == GO_BACK:
+            return BACK
+    else:
+        action = questionary.select(
+            "What would you like to do?",
+            choices=["Apply renames", link_view, GO_BACK, "Abort"],
+        ).ask()
+        if action is None or action == "Abort":
+            console.print("[yellow]Aborted. No files were changed.[/yellow]")
+            sys.exit(0)
+        if action == GO_BACK:
+            return BACK
+    if action == link_view:
+        template = organize["template"] if organize is not None else None
+        return state if build_link_view(config, view_targets(files, names, template)) else BACK
 
     # Apply renames
-    success = 0
-    errors = 0
-    for r in ok_items:
-        src: Path = r["original"]
-        dst = src.parent / r["new_name"]
+    if organize is not None:
         try:
-            src.rename(dst)
-            success += 1
+            created = create_folders(ok_items)
         except OSError as e:
-            console.print(f"[red]Error renaming {src.name}: {e}[/red]")
-            errors += 1
+            console.print(f"[red]Could not create folders: {e}[/red]")
+            return BACK
+        if created:
+            console.print(f"[dim]Created {len(created)} folder(s).[/dim]")
+        ok_items = order_by_folder(ok_items)
+    metrics = ApplyMetrics(len(ok_items))
+    exporter = None
+    if config.get("metrics_file"):
+        metrics_path = Path(config["metrics_file"]).expanduser()
+        exporter = MetricsExporter(metrics, metrics_path, config.get("metrics_interval", 5.0))
+    with Progress(
+        TextColumn("Renaming"),
+        BarColumn(),
+        MofNCompleteColumn(),
+        TextColumn("{task.fields[rate]} files/s"),
+        TextColumn("ETA {task.fields[eta]}"),
+        TextColumn("{task.fields[errors]}"),
+        console=console,
+    ) as progress:
+        task = progress.add_task("rename", total=len(ok_items), rate="0", eta="--:--", errors="")
+        last_update = 0.0
+
+        def on_progress(m: ApplyMetrics) -> None:
+            nonlocal last_update
+            now = time.monotonic()
+            if now - last_update < 0.1 and m.done < m.total:
+                return  # keep per-file overhead negligible on large batches
+            last_update = now
+            progress.update(
+                task,
+                completed=m.done,
+                rate=f"{m.rate:.0f}",
+                eta=format_duration(m.eta),
+                errors=f"[red]{m.errors} failed ({m.error_rate:.1%})[/red]" if m.errors else "",
+            )
+            if exporter is not None:
+                exporter.maybe_export()
+
+        success, errors = apply_renames(
+            ok_items, metrics, on_progress, verify=config.get("verify_moves", False)
+        )
+    if exporter is not None and exporter.export():
+        console.print(f"[dim]Metrics written to {exporter.path}[/dim]")
+    for name, hist in metrics.latency.items():
+        console.print(
+            f"[dim]{name}: {hist.count} call(s), p50 ≤ {hist.quantile(0.5) * 1000:g} ms, "
+            f"p99 ≤ {hist.quantile(0.99) * 1000:g} ms[/dim]"
+        )
 
     console.print(f"\n[green]{success} file(s) renamed successfully.[/green]")
     if errors:
@@ -720,6 +1116,9 @@ def step_preview(state, config, excluded_names):  # pragma: no cover
     if success > 0:
         folder = ok_items[0]["original"].parent
         write_log(folder, results)
+        record_in_catalog(
+            config, [(r["original"], r["original"].parent / r["new_name"]) for r in ok_items]
+        )
         undo_map = [{"old": r["original"].name, "new": r["new_name"]} for r in ok_items]
         try:
             save_undo_map(folder, undo_map)
@@ -733,7 +1132,7 @@ def step_preview(state, config, excluded_names):  # pragma: no cover
 # State keys set by each step (for clearing downstream state on back navigation)
 _STEP_FUNCTIONS = [step_folder, step_ext_filter, step_select_files, step_operations, step_preview]
 _STEP_STATE_KEYS = [
-    ["folder"],  # step 0
+    ["folder", "listing"],  # step 0
     ["ext_filter", "all_files"],  # step 1
     ["selected"],  # step 2
     ["operations"],  # step 3
@@ -741,6 +1140,7 @@ _STEP_STATE_KEYS = [
 ]
 _STATE_DEFAULTS = {
     "folder": None,
+    "listing": None,
     "ext_filter": None,
     "all_files": [],
     "selected": [],
@@ -748,7 +1148,101 @@ _STATE_DEFAULTS = {
 }
 
 
-def main():  # pragma: no cover
+def parse_args(argv: list[str] | None = None) -> argparse.Namespace:
+    """Parse the optional command-line flags (the wizard itself needs none)."""
+    parser = argparse.ArgumentParser(description="Batch File Rename Tool")
+    parser.add_argument(
+        "--profile",
+        nargs="?",
+        const=PROFILE_FILE,
+        metavar="PATH",
+        help=f"record stage timings and write a Chrome trace (default: {PROFILE_FILE})",
+    )
+    parser.add_argument(
+        "--history",
+        metavar="NAME",
+        help="show the catalogued renames from or to a file name, then exit",
+    )
+    parser.add_argument(
+        "--catalog",
+        metavar="PATH",
+        help="rename catalog for --history (default: the catalog config key)",
+    )
+    parser.add_argument(
+        "--serve",
+        nargs="?",
+        const="",
+        metavar="SOCKET",
+        help="run the rename daemon on a Unix socket (default: a per-user path), see client.py",
+    )
+    parser.add_argument(
+        "--cprofile",
+        action="store_true",
+        help="with --profile, also run cProfile over the hot stages (PATH.pstats)",
+    )
+    return parser.parse_args(argv)
+
+
+def show_profile_summary(stages: list[dict]) -> None:
+    """Display the per-stage profile summary from PROFILER.summary()."""
+    table = Table(title="Profile")
+    table.add_column("Stage")
+    table.add_column("Calls", justify="right")
+    table.add_column("Time", justify="right")
+    table.add_column("Files", justify="right")
+    table.add_column("Syscalls")
+    for stage in stages:
+        syscalls = ", ".join(f"{name}={n}" for name, n in stage["syscalls"].items())
+        table.add_row(
+            stage["stage"],
+            str(stage["calls"]),
+            f"{stage['seconds'] * 1000:.1f} ms",
+            str(stage["files"]),
+            syscalls,
+        )
+    console.print(table)
+
+
+def main(argv: list[str] | None = None):  # pragma: no cover
+    args = parse_args(argv)
+    if args.history is not None:
+        path = Path(args.catalog) if args.catalog else catalog_path(load_config())
+        if path is None:
+            console.print(
+                "[red]No rename catalog: set catalog in renametool.toml or pass --catalog[/red]"
+            )
+            sys.exit(1)
+        show_history(path, args.history)
+        return
+    if args.serve is not None:
+        run_daemon(Path(args.serve) if args.serve else None)
+        return
+    if args.profile:
+        PROFILER.start(cprofile=args.cprofile)
+    try:
+        run_wizard()
+    finally:
+        if args.profile:
+            show_profile_summary(PROFILER.summary())
+            PROFILER.write(Path(args.profile))
+            console.print(f"[dim]Profile written to {args.profile}[/dim]")
+
+
+def run_daemon(socket_path: Path | None) -> None:  # pragma: no cover
+    config = load_config()
+    config["catalog"] = catalog_path(config)
+    server = RenameDaemon(config, FolderWatcher.create())
+    signal.signal(signal.SIGTERM, lambda *_: sys.exit(0))
+    path = socket_path or default_socket()
+    try:
+        serve(server, path, lambda: console.print(f"[dim]Listening on {path}[/dim]"))
+    except KeyboardInterrupt:
+        pass
+    finally:
+        server.close()
+
+
+def run_wizard():  # pragma: no cover
     console.print("[bold blue]═══ Batch File Rename Tool ═══[/bold blue]\n")
 
     config = load_config()
@@ -0,0 +1,166 @@
+"""Bulk literal replacement tables.
+
+A replacement table maps many literal strings (group tags, misspellings,
+scene abbreviations) to their replacements. ReplacementTable compiles them
+once into an Aho-Corasick automaton, and apply() replaces every match in a
+single left-to-right pass over a stem, so the cost per file does not grow
+with the number of entries. Matches are leftmost-longest and do not overlap:
+at the earliest position where any entry matches, the longest matching entry
+wins, and scanning resumes after it.
+
+Tables are loaded from CSV (``find,replace`` rows) or TOML (string keys and
+values, optionally under a ``[replacements]`` table).
+"""
+
+import csv
+import tomllib
+from collections import deque
+from pathlib import Path
+
+
+class ReplacementTable:
+    """Aho-Corasick automaton over the keys of a find -> replace mapping."""
+
+    __slots__ = ("replacements", "_goto", "_fail", "_depth", "_longest", "_output")
+
+    def __init__(self, replacements: dict[str, str]):
+        if "" in replacements:
+            raise ValueError("Replacement table entries cannot have an empty find string")
+        self.replacements = dict(replacements)
+        # Per state: transitions, failure link, depth, length of the longest
+        # entry ending here (0 if none) and that entry's replacement
+        goto: list[dict[str, int]] = [{}]
+        fail = [0]
+        depth = [0]
+        longest = [0]
+        output: list[str | None] = [None]
+        for find, replace in self.replacements.items():
+            state = 0
+            for ch in find:
+                nxt = goto[state].get(ch)
+                if nxt is None:
+                    nxt = goto[state][ch] = len(goto)
+                    goto.append({})
+                    fail.append(0)
+                    depth.append(depth[state] + 1)
+                    longest.append(0)
+                    output.append(None)
+                state = nxt
+            longest[state] = len(find)
+            output[state] = replace
+
+        queue = deque(goto[0].values())
+        while queue:
+            state = queue.popleft()
+            for ch, nxt in goto[state].items():
+                queue.append(nxt)
+                f = fail[state]
+                while f and ch not in goto[f]:
+                    f = fail[f]
+                target = goto[f].get(ch, 0)
+                fail[nxt] = target if target != nxt else 0
+                if not longest[nxt] and longest[fail[nxt]]:
+                    # A shorter entry ends here as a suffix of this state
+                    longest[nxt] = longest[fail[nxt]]
+                    output[nxt] = output[fail[nxt]]
+
+        self._goto = goto
+        self._fail = fail
+        self._depth = depth
+        self._longest = longest
+        self._output = output
+
+    def __len__(self) -> int:
+        return len(self.replacements)
+
+    def apply(self, text: str) -> str:
+        """Return text with every leftmost-longest match replaced."""
+        goto, fail, depth, longest, output = (
+            self._goto,
+            self._fail,
+            self._depth,
+            self._longest,
+            self._output,
+        )
+        pieces = []
+        copied = 0  # text[:copied] has been emitted
+        i = 0
+        n = len(text)
+        state = 0
+        best_start = -1  # best match so far: earliest start, then longest
+        best_end = 0
+        best_output = None
+        while True:
+            while i < n:
+                ch = text[i]
+                edges = goto[state]
+                while state and ch not in edges:
+                    state = fail[state]
+                    edges = goto[state]
+                state = edges.get(ch, 0)
+                i += 1
+                length = longest[state]
+                if length:
+                    start = i - length
+                    if (
+                        best_start < 0
+                        or start < best_start
+                        or (start == best_start and i > best_end)
+                    ):
+                        best_start, best_end, best_output = start, i, output[state]
+                # Once the automaton only tracks text starting after the best
+                # match, no earlier or longer match can still be found
+                if best_start >= 0 and i - depth[state] > best_start:
+                    break
+            if best_start < 0:
+                break
+            pieces.append(text[copied:best_start])
+            pieces.append(best_output)
+            copied = i = best_end
+            state = 0
+            best_start = -1
+        if not pieces:
+            return text
+        pieces.append(text[copied:])
+        return "".join(pieces)
+
+
+def _load_csv(path: Path) -> dict[str, str]:
+    replacements = {}
+    with open(path, encoding="utf-8", newline="") as f:
+        for row in csv.reader(f):
+            if not row or not "".join(row).strip() or row[0].startswith("#"):
+                continue
+            if len(row) != 2:
+                raise ValueError(f"{path}: expected find,replace but got {row!r}")
+            if not replacements and [c.strip().lower() for c in row] == ["find", "replace"]:
+                continue  # header
+            replacements[row[0]] = row[1]
+    return replacements
+
+
+def _load_toml(path: Path) -> dict[str, str]:
+    with open(path, "rb") as f:
+        data = tomllib.load(f)
+    table = data.get("replacements", data)
+    if not isinstance(table, dict) or not all(isinstance(v, str) for v in table.values()):
+        raise ValueError(f"{path}: replacements must map strings to strings")
+    return table
+
+
+def load_table(path: Path) -> ReplacementTable:
+    """Load and compile a .csv or .toml replacement table.
+
+    Raises OSError if the file cannot be read and ValueError if it is malformed.
+    """
+    suffix = path.suffix.lower()
+    if suffix == ".csv":
+        replacements = _load_csv(path)
+    elif suffix == ".toml":
+        try:
+            replacements = _load_toml(path)
+        except tomllib.TOMLDecodeError as e:
+            raise ValueError(f"{path}: {e}") from None
+    else:
+        raise ValueError(f"Unsupported replacement table format: {path.suffix or path.name}")
+    return ReplacementTable(replacements)
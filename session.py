@@ -0,0 +1,295 @@
+"""Programmatic rename sessions for scripts and services.
+
+A RenameSession owns everything the wizard otherwise threads through its
+state dict: the folder listing, a directory snapshot, the operation list and
+the validated plan. Each is computed on first use and reused until one of its
+inputs changes, so iterating on a plan costs only the recomputation the change
+actually needs:
+
+    session = RenameSession(folder, ext_filter=".jpg")
+    session.add_operation({"type": "case", "mode": "lowercase"})
+    for row in session.preview():
+        print(row["original"].name, "->", row["new_name"], row["status"])
+    session.apply()
+    session.undo()
+
+The plan is recomputed after add/remove/select calls, and after the folder's
+mtime changes (a file was added, removed or renamed). Edits to file contents
+do not change the folder mtime; call refresh() if templates read stat or
+metadata fields that may have changed.
+
+Listing, renames and the undo map go through the session's fs backend (see
+fsbackend.py), so a plan can be dry-run against a MemoryFileSystem.
+"""
+
+import re
+import sqlite3
+import warnings
+from collections.abc import Iterable
+from pathlib import Path
+
+from catalog import Catalog
+from engine import (
+    apply_one,
+    clear_undo_map,
+    load_undo_map,
+    save_undo_map,
+    scan_folder,
+    undo_renames,
+    validate_new_names,
+)
+from fsbackend import LOCAL, FileSystem
+from metrics import ApplyMetrics
+from nameindex import NameIndex
+from profiling import PROFILER
+from regexguard import DEFAULT_BUDGET, compute_names
+from templates import compile_template
+
+# Operation types compute_new_name() understands
+OPERATION_TYPES = frozenset(
+    {
+        "find_replace",
+        "prefix",
+        "suffix",
+        "case",
+        "ext_change",
+        "template",
+        "replace_table",
+        "content_hash",
+        "photo_date",
+        "music_tags",
+        "media_tv",
+        "media_movie",
+        "media_movies",
+        "mapping",
+    }
+)
+# The ones made only of strings and booleans; the rest carry Python objects or
+# per-file data the wizard builds, so they cannot arrive as JSON
+JSON_OPERATION_TYPES = frozenset(
+    {"find_replace", "prefix", "suffix", "case", "ext_change", "template"}
+)
+
+
+def compile_operation(op: dict, from_json: bool = False) -> dict:
+    """Validate op and warm the caches compute_new_name() will use for it.
+
+    Returns a shallow copy so later edits to the caller's dict cannot change
+    the session's plan. Raises ValueError for an unknown type, an invalid
+    template or regex, and for an organize operation, which moves files into
+    subfolders and so needs organize.plan_organize() rather than a rename plan.
+    With from_json, only JSON_OPERATION_TYPES are accepted.
+    """
+    if not isinstance(op, dict):
+        raise ValueError("An operation must be a dict")
+    if "type" not in op:
+        raise ValueError("Operation has no type")
+    if op["type"] == "organize":
+        raise ValueError("organize operations are not supported here; use organize.plan_organize()")
+    if op["type"] not in OPERATION_TYPES:
+        raise ValueError(f"Unknown operation type: {op['type']!r}")
+    if from_json and op["type"] not in JSON_OPERATION_TYPES:
+        raise ValueError(f"{op['type']} operations cannot be sent as JSON")
+    if op["type"] == "template":
+        compile_template(op["template"])
+    elif op["type"] == "find_replace" and op["regex"]:
+        try:
+            re.compile(op["find"])
+        except re.error as e:
+            raise ValueError(f"Invalid regex {op['find']!r}: {e}") from None
+    return dict(op)
+
+
+class RenameSession:
+    """Reusable listing, snapshot and plan for renaming files in one folder."""
+
+    __slots__ = (
+        "folder",
+        "ext_filter",
+        "excluded_names",
+        "regex_budget",
+        "catalog",
+        "fs",
+        "_operations",
+        "_selected",
+        "_snapshot",
+        "_listed",
+        "_files",
+        "_results",
+        "_undo_map",
+    )
+
+    def __init__(
+        self,
+        folder: Path,
+        operations: Iterable[dict] = (),
+        *,
+        ext_filter: str | None = None,
+        excluded_names: frozenset[str] = frozenset(),
+        regex_budget: float | None = DEFAULT_BUDGET,
+        catalog: Catalog | None = None,
+        fs: FileSystem = LOCAL,
+    ):
+        self.folder = Path(folder)
+        self.ext_filter = ext_filter
+        self.excluded_names = excluded_names
+        self.regex_budget = regex_budget
+        self.catalog = catalog
+        self.fs = fs
+        self._operations = [compile_operation(op) for op in operations]
+        self._selected: frozenset[str] | None = None
+        self._snapshot: tuple[int, NameIndex] | None = None
+        self._listed: list[Path] = []
+        self._files: list[Path] | None = None
+        self._results: list[dict] | None = None
+        self._undo_map: list[dict] | None = None
+
+    @property
+    def operations(self) -> tuple[dict, ...]:
+        return tuple(self._operations)
+
+    def add_operation(self, op: dict) -> None:
+        """Append op to the operation stack (see compile_operation for validation)."""
+        self._operations.append(compile_operation(op))
+        self._results = None
+
+    def remove_operation(self, index: int = -1) -> dict:
+        """Remove and return the operation at index (the last one by default)."""
+        op = self._operations.pop(index)
+        self._results = None
+        return op
+
+    def clear_operations(self) -> None:
+        self._operations.clear()
+        self._results = None
+
+    def select(self, names: Iterable[str] | None) -> None:
+        """Restrict the plan to the given file names (None selects every listed file)."""
+        selected = None if names is None else frozenset(names)
+        if selected == self._selected:
+            return
+        self._selected = selected
+        self._files = None
+        self._results = None
+
+    def refresh(self) -> None:
+        """Drop the cached listing, snapshot and plan so the next call rescans the folder."""
+        self._snapshot = None
+        self._files = None
+        self._results = None
+
+    def _check_snapshot(self) -> None:
+        if self._snapshot is not None:
+            if self.fs.stat(self.folder).st_mtime_ns == self._snapshot[0]:
+                return
+            self.refresh()
+        mtime_ns, names, self._listed = scan_folder(
+            self.folder, self.ext_filter, self.excluded_names, self.fs
+        )
+        self._snapshot = (mtime_ns, NameIndex.for_folder(self.folder, names, fs=self.fs))
+
+    @property
+    def files(self) -> list[Path]:
+        """The listed files in the plan (after extension filter, exclusions and selection)."""
+        self._check_snapshot()
+        if self._files is None:
+            files = self._listed
+            if self._selected is not None:
+                files = [f for f in files if f.name in self._selected]
+            self._files = files
+        return list(self._files)
+
+    def preview(self) -> list[dict]:
+        """Return validate_new_names() results for the current plan (cached until it changes).
+
+        Raises regexguard.RegexTimeout if regex operations exceed regex_budget.
+        """
+        files = self.files
+        if self._results is None:
+            with PROFILER.span("compute_new_name", files=len(files)):
+                names = compute_names(files, self._operations, self.regex_budget)
+            self._results = validate_new_names(list(zip(files, names)), index=self._snapshot[1])
+        return [dict(r) for r in self._results]
+
+    @property
+    def plan_token(self) -> object | None:
+        """An object identifying the cached plan, or None if there is none.
+
+        While the token stays the same (compared with ``is``), preview()
+        returns the same rows, so callers can keep anything derived from them.
+        """
+        self._check_snapshot()
+        return self._results
+
+    def apply(self, metrics: ApplyMetrics | None = None) -> list[dict]:
+        """Rename every OK row of the current plan and return one outcome per file.
+
+        Outcomes are engine.apply_one() dicts. The successful renames are saved
+        as the folder's undo map; if that file cannot be written, undo() still
+        works for this session from the in-memory copy. With a catalog, they
+        (and later undos) are also recorded there.
+        """
+        items = [r for r in self.preview() if r["status"] == "OK"]
+        metrics = metrics or ApplyMetrics(len(items))
+        with PROFILER.span("apply_renames", files=len(items)):
+            outcomes = [apply_one(item, metrics, fs=self.fs) for item in items]
+        undo_map = [
+            {"old": o["original"].name, "new": o["new_name"]}
+            for o in outcomes
+            if o["status"] == "RENAMED"
+        ]
+        if undo_map:
+            self._undo_map = undo_map
+            try:
+                save_undo_map(self.folder, undo_map, self.fs)
+            except OSError:
+                pass
+            self._record(undo_map, "rename")
+        self.refresh()
+        return outcomes
+
+    def _record(self, renames: list[dict], kind: str) -> None:
+        """Record renames in the catalog, if any; a catalog error is only a warning."""
+        if self.catalog is None or not renames:
+            return
+        try:
+            self.catalog.record(
+                [(self.folder / r["old"], self.folder / r["new"]) for r in renames], kind, self.fs
+            )
+        except sqlite3.Error as e:
+            warnings.warn(f"Could not record renames in the catalog: {e}", stacklevel=3)
+
+    def undo(self) -> list[dict]:
+        """Reverse the last apply() (or the folder's saved undo map) and return the outcomes.
+
+        Outcomes are engine.undo_renames() dicts; an empty list means there was
+        nothing to undo. Afterwards the undo map only keeps the entries that
+        failed (ERROR or CONFLICT), so calling undo() again retries just those
+        and never replays a finished undo; with none left it is deleted.
+        """
+        undo_map = self._undo_map
+        if undo_map is None:
+            undo_map = load_undo_map(self.folder, self.fs)
+        if not undo_map:
+            return []
+        outcomes = undo_renames(self.folder, undo_map, self.fs)
+        self._record(
+            [{"old": o["new"], "new": o["old"]} for o in outcomes if o["status"] == "RESTORED"],
+            "undo",
+        )
+        remaining = [
+            {"old": o["old"], "new": o["new"]}
+            for o in outcomes
+            if o["status"] in ("ERROR", "CONFLICT")
+        ]
+        self._undo_map = remaining or None
+        try:
+            if remaining:
+                save_undo_map(self.folder, remaining, self.fs)
+            else:
+                clear_undo_map(self.folder, self.fs)
+        except OSError:
+            # The file on disk is stale; never fall back to it from this session
+            self._undo_map = remaining
+        self.refresh()
+        return outcomes
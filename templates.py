@@ -0,0 +1,204 @@
+"""Compiled naming templates for batch file renaming.
+
+A template such as ``{show} - S{season:02}E{episode:02} - {title}`` is parsed
+once into a ``CompiledTemplate``. Rendering only computes the field sources the
+template actually references, so a template without ``{mtime}`` or ``{size}``
+never stats the file and one without ``{show}`` never runs the TV parser.
+"""
+
+import string
+from datetime import datetime
+from functools import lru_cache
+from pathlib import Path
+
+from audiotags import read_tags
+from exif import TAKEN_FORMAT, read_exif
+from patterns import parse_movie_filename, parse_tv_filename
+
+MEDIA_CACHE_SIZE = 100_000  # parsed names kept per parser
+
+
+def _path_fields(file: Path, index: int) -> dict:
+    return {"stem": file.stem, "parent": file.parent.name}
+
+
+# Parsing depends only on the name, so results are kept for the life of the
+# process: re-rendering a plan (or a daemon serving the same library again)
+# skips the regexes. render() copies the fields out, so sharing them is safe.
+@lru_cache(maxsize=MEDIA_CACHE_SIZE)
+def _tv_fields_for(name: str) -> dict | None:
+    return parse_tv_filename(name)
+
+
+@lru_cache(maxsize=MEDIA_CACHE_SIZE)
+def _movie_fields_for(name: str) -> dict | None:
+    info = parse_movie_filename(name)
+    if info is None:
+        return None
+    return {"movie": info["title"], "year": info["year"]}
+
+
+def _tv_fields(file: Path, index: int) -> dict | None:
+    return _tv_fields_for(file.name)
+
+
+def _movie_fields(file: Path, index: int) -> dict | None:
+    return _movie_fields_for(file.name)
+
+
+def _stat_fields(file: Path, index: int) -> dict | None:
+    try:
+        st = file.stat()
+    except OSError:
+        return None
+    return {
+        "mtime": datetime.fromtimestamp(st.st_mtime),
+        "size": st.st_size,
+        "size_kb": st.st_size / 1024,
+        "size_mb": st.st_size / (1024 * 1024),
+    }
+
+
+def _exif_fields(file: Path, index: int) -> dict | None:
+    info = read_exif(file)
+    if not info or "taken" not in info:
+        return None
+    return {
+        "taken": datetime.strptime(info["taken"], TAKEN_FORMAT),
+        "camera": info.get("model", ""),
+    }
+
+
+def _tag_fields(file: Path, index: int) -> dict | None:
+    info = read_tags(file)
+    if not info:
+        return None
+    return {
+        "artist": info.get("artist") or info.get("albumartist", ""),
+        "album": info.get("album", ""),
+        "track": info.get("track", 0),
+        "track_title": info.get("title", ""),
+    }
+
+
+def _counter_fields(file: Path, index: int) -> dict:
+    return {"counter": index + 1}
+
+
+# Source name -> loader returning a dict of field values (or None if unavailable)
+SOURCES = {
+    "path": _path_fields,
+    "tv": _tv_fields,
+    "movie": _movie_fields,
+    "stat": _stat_fields,
+    "exif": _exif_fields,
+    "tags": _tag_fields,
+    "counter": _counter_fields,
+}
+
+# Field name -> (source, default format spec used when the template gives none)
+FIELDS = {
+    "stem": ("path", ""),
+    "parent": ("path", ""),
+    "show": ("tv", ""),
+    "season": ("tv", "02"),
+    "episode": ("tv", "02"),
+    "title": ("tv", ""),
+    "movie": ("movie", ""),
+    "year": ("movie", ""),
+    "mtime": ("stat", "%Y-%m-%d"),
+    "size": ("stat", ""),
+    "size_kb": ("stat", ".1f"),
+    "size_mb": ("stat", ".1f"),
+    "taken": ("exif", "%Y-%m-%d_%H%M%S"),
+    "camera": ("exif", ""),
+    "artist": ("tags", ""),
+    "album": ("tags", ""),
+    "track": ("tags", "02"),
+    "track_title": ("tags", ""),
+    "counter": ("counter", ""),
+}
+
+_DATE = datetime(2000, 1, 1)
+# Field name -> a value of the field's type, to check format specs at compile time
+_SAMPLES = {
+    "season": 1,
+    "episode": 1,
+    "year": 2000,
+    "mtime": _DATE,
+    "size": 0,
+    "size_kb": 0.0,
+    "size_mb": 0.0,
+    "taken": _DATE,
+    "track": 1,
+    "counter": 1,
+}
+
+
+class CompiledTemplate:
+    """A parsed template that renders a new stem for a file.
+
+    Use compile_template() rather than constructing this directly so that
+    repeated lookups of the same template string share one compiled object.
+    """
+
+    __slots__ = ("template", "fields", "_segments", "_loaders")
+
+    def __init__(self, template: str):
+        self.template = template
+        try:
+            parsed = list(string.Formatter().parse(template))
+        except ValueError as e:
+            raise ValueError(f"Invalid template: {e}") from None
+
+        segments = []
+        sources: list[str] = []
+        for literal, field, spec, conversion in parsed:
+            if field is None:
+                segments.append((literal, None, ""))
+                continue
+            if conversion:
+                raise ValueError(f"Conversions are not supported: {{{field}!{conversion}}}")
+            if field not in FIELDS:
+                raise ValueError(f"Unknown template field: {{{field}}}")
+            if spec and "{" in spec:
+                raise ValueError(f"Nested fields are not supported: {{{field}}}")
+            source, default_spec = FIELDS[field]
+            if spec:
+                try:
+                    format(_SAMPLES.get(field, ""), spec)
+                except (ValueError, TypeError) as e:
+                    raise ValueError(f"Invalid format for {{{field}:{spec}}}: {e}") from None
+            if source not in sources:
+                sources.append(source)
+            segments.append((literal, field, spec or default_spec))
+        self.fields = tuple(f for _, f, _ in segments if f is not None)
+        self._segments = tuple(segments)
+        self._loaders = tuple(SOURCES[s] for s in sources)
+
+    def render(self, file: Path, index: int = 0) -> str | None:
+        """Render the template for file (index is its 0-based position in the batch).
+
+        Returns None if a referenced source is unavailable for this file, e.g.
+        ``{show}`` on a name that parse_tv_filename() does not recognise.
+        """
+        values: dict = {}
+        for loader in self._loaders:
+            loaded = loader(file, index)
+            if loaded is None:
+                return None
+            values.update(loaded)
+
+        parts = []
+        for literal, field, spec in self._segments:
+            parts.append(literal)
+            if field is not None:
+                value = values[field]
+                parts.append(format(value, spec) if spec else str(value))
+        return "".join(parts)
+
+
+@lru_cache(maxsize=128)
+def compile_template(template: str) -> CompiledTemplate:
+    """Parse template once; raises ValueError for unknown fields or bad syntax."""
+    return CompiledTemplate(template)
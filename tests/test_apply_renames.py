@@ -0,0 +1,130 @@
+"""Tests for renamer.apply_renames()."""
+
+import ctypes
+import errno
+
+import pytest
+
+import fsbackend
+from metrics import ApplyMetrics, MetricsExporter
+from renamer import apply_renames, rename_file
+
+
+def item(directory, old, new):
+    return {"original": directory / old, "new_name": new, "status": "OK"}
+
+
+class TestApplyRenames:
+    def test_renames_files(self, tmp_path):
+        (tmp_path / "a.txt").write_text("a")
+        (tmp_path / "b.txt").write_text("b")
+        result = apply_renames([item(tmp_path, "a.txt", "x.txt"), item(tmp_path, "b.txt", "y.txt")])
+        assert result == (2, 0)
+        assert (tmp_path / "x.txt").read_text() == "a"
+        assert (tmp_path / "y.txt").read_text() == "b"
+
+    def test_missing_source_counts_as_error(self, tmp_path):
+        (tmp_path / "b.txt").write_text("b")
+        result = apply_renames([item(tmp_path, "a.txt", "x.txt"), item(tmp_path, "b.txt", "y.txt")])
+        assert result == (1, 1)
+
+    def test_does_not_overwrite_target_created_after_validation(self, tmp_path):
+        (tmp_path / "a.txt").write_text("a")
+        (tmp_path / "x.txt").write_text("keep me")
+        assert apply_renames([item(tmp_path, "a.txt", "x.txt")]) == (0, 1)
+        assert (tmp_path / "x.txt").read_text() == "keep me"
+        assert (tmp_path / "a.txt").exists()
+
+    def test_case_only_rename_allowed(self, tmp_path):
+        (tmp_path / "photo.JPG").write_text("a")
+        assert apply_renames([item(tmp_path, "photo.JPG", "photo.jpg")]) == (1, 0)
+        assert [p.name for p in tmp_path.iterdir()] == ["photo.jpg"]
+
+    def test_records_metrics(self, tmp_path):
+        (tmp_path / "a.txt").write_text("a")
+        metrics = ApplyMetrics(2)
+        apply_renames([item(tmp_path, "a.txt", "x.txt"), item(tmp_path, "b.txt", "y.txt")], metrics)
+        assert (metrics.done, metrics.errors) == (2, 1)
+        assert metrics.latency["rename"].count == 2
+        assert "stat" not in metrics.latency  # no existence check before each rename
+
+    def test_progress_callback_per_file(self, tmp_path):
+        (tmp_path / "a.txt").write_text("a")
+        (tmp_path / "b.txt").write_text("b")
+        seen = []
+        apply_renames(
+            [item(tmp_path, "a.txt", "x.txt"), item(tmp_path, "b.txt", "y.txt")],
+            on_progress=lambda m: seen.append(m.done),
+        )
+        assert seen == [1, 2]
+
+    def test_failing_progress_callback_does_not_stop_the_batch(self, tmp_path, capsys):
+        for name in ("a.txt", "b.txt", "c.txt"):
+            (tmp_path / name).write_text(name)
+        calls = []
+
+        def broken(m):
+            calls.append(m.done)
+            raise FileNotFoundError(2, "No such file or directory")
+
+        items = [item(tmp_path, n, f"y_{n}") for n in ("a.txt", "b.txt", "c.txt")]
+        assert apply_renames(items, on_progress=broken) == (3, 0)
+        assert calls == [1]
+        assert sorted(p.name for p in tmp_path.iterdir()) == ["y_a.txt", "y_b.txt", "y_c.txt"]
+        assert "progress updates stopped" in capsys.readouterr().out
+
+    def test_unwritable_metrics_file_does_not_stop_the_batch(self, tmp_path):
+        for name in ("a.txt", "b.txt"):
+            (tmp_path / name).write_text(name)
+        metrics = ApplyMetrics(2)
+        exporter = MetricsExporter(metrics, tmp_path / "missing" / "m.prom", interval=0)
+        items = [item(tmp_path, n, f"y_{n}") for n in ("a.txt", "b.txt")]
+        with pytest.warns(UserWarning, match="disabled") as caught:
+            result = apply_renames(items, metrics, lambda m: exporter.maybe_export())
+        assert result == (2, 0)
+        assert len(caught) == 1
+        assert isinstance(exporter.error, FileNotFoundError)
+        assert not exporter.export()
+
+    def test_empty(self):
+        assert apply_renames([]) == (0, 0)
+
+
+class TestRenameFile:
+    def test_case_only_rename_allowed(self, tmp_path):
+        (tmp_path / "Photo.jpg").write_text("p")
+        rename_file(tmp_path / "Photo.jpg", "photo.jpg", ApplyMetrics(1))
+        assert [p.name for p in tmp_path.iterdir()] == ["photo.jpg"]
+
+    def test_case_variant_of_other_file_not_overwritten(self, tmp_path):
+        (tmp_path / "Photo.jpg").write_text("upper")
+        (tmp_path / "photo.jpg").write_text("lower")
+        if len(list(tmp_path.iterdir())) == 1:
+            pytest.skip("case-insensitive filesystem")
+        metrics = ApplyMetrics(1)
+        with pytest.raises(FileExistsError):
+            rename_file(tmp_path / "Photo.jpg", "photo.jpg", metrics)
+        assert (tmp_path / "photo.jpg").read_text() == "lower"
+        assert metrics.latency["stat"].count == 1  # only a refused rename is checked
+
+    def test_fallback_without_exclusive_rename(self, tmp_path, monkeypatch):
+        monkeypatch.setattr(fsbackend, "_exclusive", None)
+        (tmp_path / "a.txt").write_text("a")
+        (tmp_path / "b.txt").write_text("b")
+        with pytest.raises(FileExistsError):
+            rename_file(tmp_path / "a.txt", "b.txt", ApplyMetrics(1))
+        rename_file(tmp_path / "a.txt", "c.txt", ApplyMetrics(1))
+        assert sorted(p.name for p in tmp_path.iterdir()) == ["b.txt", "c.txt"]
+
+    def test_unsupported_flag_falls_back(self, tmp_path, monkeypatch):
+        def unsupported(src, dst):
+            ctypes.set_errno(errno.EINVAL)
+            return -1
+
+        monkeypatch.setattr(fsbackend, "_exclusive", unsupported)
+        (tmp_path / "a.txt").write_text("a")
+        (tmp_path / "b.txt").write_text("b")
+        with pytest.raises(FileExistsError):
+            rename_file(tmp_path / "a.txt", "b.txt", ApplyMetrics(1))
+        rename_file(tmp_path / "a.txt", "c.txt", ApplyMetrics(1))
+        assert (tmp_path / "c.txt").read_text() == "a"
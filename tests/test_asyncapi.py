@@ -0,0 +1,139 @@
+"""Tests for asyncapi.plan() and asyncapi.apply()."""
+
+import asyncio
+import threading
+from concurrent.futures import ThreadPoolExecutor
+
+import pytest
+
+from asyncapi import apply, default_executor, plan
+from metrics import ApplyMetrics
+
+LOWER = [{"type": "case", "mode": "lowercase"}]
+
+
+def collect(results, **kwargs):
+    async def run():
+        return [outcome async for outcome in apply(results, **kwargs)]
+
+    return asyncio.run(run())
+
+
+class TestPlan:
+    def test_plans_folder(self, tmp_path):
+        (tmp_path / "A.txt").write_text("")
+        (tmp_path / "b.txt").write_text("")
+        results = asyncio.run(plan(tmp_path, LOWER))
+        assert [(r["original"].name, r["new_name"], r["status"]) for r in results] == [
+            ("A.txt", "a.txt", "OK"),
+            ("b.txt", "b.txt", "NO CHANGE"),
+        ]
+
+    def test_ext_filter_and_exclusions(self, tmp_path):
+        for name in ("A.txt", "B.txt", "C.jpg"):
+            (tmp_path / name).write_text("")
+        results = asyncio.run(
+            plan(tmp_path, LOWER, ext_filter=".txt", excluded_names=frozenset({"b.txt"}))
+        )
+        assert [r["original"].name for r in results] == ["A.txt"]
+
+    def test_organize_rejected(self, tmp_path):
+        with pytest.raises(ValueError, match="plan_organize"):
+            asyncio.run(plan(tmp_path, [{"type": "organize", "template": "{stem}"}]))
+
+    def test_does_not_run_on_event_loop_thread(self, tmp_path, monkeypatch):
+        threads = []
+
+        def spy(*args):
+            threads.append(threading.get_ident())
+            return []
+
+        monkeypatch.setattr("asyncapi._plan_sync", spy)
+
+        async def run():
+            await plan(tmp_path, LOWER)
+            return threading.get_ident()
+
+        loop_thread = asyncio.run(run())
+        assert threads and threads[0] != loop_thread
+
+    def test_many_folders_concurrently(self, tmp_path):
+        folders = []
+        for i in range(5):
+            folder = tmp_path / f"f{i}"
+            folder.mkdir()
+            (folder / "X.txt").write_text("")
+            folders.append(folder)
+
+        async def run():
+            return await asyncio.gather(*(plan(f, LOWER) for f in folders))
+
+        assert all(r[0]["new_name"] == "x.txt" for r in asyncio.run(run()))
+
+
+class TestApply:
+    def test_renames_ok_rows_only(self, tmp_path):
+        (tmp_path / "A.txt").write_text("")
+        (tmp_path / "b.txt").write_text("")
+        results = asyncio.run(plan(tmp_path, LOWER))
+        outcomes = collect(results)
+        assert [(o["new_name"], o["status"]) for o in outcomes] == [("a.txt", "RENAMED")]
+        assert sorted(p.name for p in tmp_path.iterdir()) == ["a.txt", "b.txt"]
+
+    def test_errors_are_reported_per_file(self, tmp_path):
+        results = [{"original": tmp_path / "ghost.txt", "new_name": "x.txt", "status": "OK"}]
+        (outcome,) = collect(results)
+        assert outcome["status"] == "ERROR"
+        assert outcome["error"]
+
+    def test_window_bounds_in_flight_work(self, tmp_path):
+        for i in range(20):
+            (tmp_path / f"F{i:02d}.txt").write_text("")
+        results = asyncio.run(plan(tmp_path, LOWER))
+        in_flight = 0
+        peak = 0
+        lock = threading.Lock()
+
+        class CountingExecutor(ThreadPoolExecutor):
+            def submit(self, fn, *args):
+                def wrapped():
+                    nonlocal in_flight, peak
+                    with lock:
+                        in_flight += 1
+                        peak = max(peak, in_flight)
+                    try:
+                        return fn(*args)
+                    finally:
+                        with lock:
+                            in_flight -= 1
+
+                return super().submit(wrapped)
+
+        with CountingExecutor(max_workers=8) as executor:
+            outcomes = collect(results, executor=executor, window=3)
+        assert len(outcomes) == 20
+        assert peak <= 3
+
+    def test_early_break_stops_scheduling(self, tmp_path):
+        for i in range(10):
+            (tmp_path / f"F{i}.txt").write_text("")
+        results = asyncio.run(plan(tmp_path, LOWER))
+
+        async def run():
+            async for _ in apply(results, window=2):
+                break
+
+        asyncio.run(run())
+        renamed = [p for p in tmp_path.iterdir() if p.name.startswith("f")]
+        assert 1 <= len(renamed) <= 2
+
+    def test_metrics_updated(self, tmp_path):
+        (tmp_path / "A.txt").write_text("")
+        metrics = ApplyMetrics(1)
+        collect(asyncio.run(plan(tmp_path, LOWER)), metrics=metrics)
+        assert metrics.done == 1
+        assert metrics.latency["rename"].count == 1
+
+
+def test_default_executor_is_shared():
+    assert default_executor() is default_executor()
@@ -0,0 +1,203 @@
+"""Tests for audiotags.read_tags(), read_tags_batch(), and music renaming."""
+
+import struct
+from pathlib import Path
+
+from audiotags import read_tags, read_tags_batch
+from filecache import FileCache
+from renamer import compute_new_name, format_music_name
+from templates import compile_template
+
+FIELDS = {"title": "Song", "artist": "Band", "album": "Record", "track": "3/12"}
+EXPECTED = {"title": "Song", "artist": "Band", "album": "Record", "track": 3}
+
+# ---------------------------------------------------------------------------
+# Helpers
+# ---------------------------------------------------------------------------
+
+
+def syncsafe(n: int) -> bytes:
+    return bytes([(n >> 21) & 0x7F, (n >> 14) & 0x7F, (n >> 7) & 0x7F, n & 0x7F])
+
+
+def frame_size(major: int, n: int) -> bytes:
+    return syncsafe(n) if major == 4 else n.to_bytes(4, "big")
+
+
+def make_id3(major: int = 3, encoding: int = 3, padding: int = 100) -> bytes:
+    ids = {"title": "TIT2", "artist": "TPE1", "album": "TALB", "track": "TRCK"}
+    if major == 2:
+        ids = {"title": "TT2", "artist": "TP1", "album": "TAL", "track": "TRK"}
+    codecs = {0: "latin-1", 1: "utf-16", 3: "utf-8"}
+    frames = b""
+    # An artwork frame the reader must skip without loading
+    artwork = b"\0image/jpeg\0\x03\0" + b"\xff" * 5000
+    if major != 2:
+        frames += b"APIC" + frame_size(major, len(artwork)) + b"\0\0" + artwork
+    for key, value in FIELDS.items():
+        body = bytes([encoding]) + value.encode(codecs[encoding])
+        if major == 2:
+            frames += ids[key].encode() + len(body).to_bytes(3, "big") + body
+        else:
+            frames += ids[key].encode() + frame_size(major, len(body)) + b"\0\0" + body
+    frames += b"\0" * padding
+    return b"ID3" + bytes([major, 0, 0]) + syncsafe(len(frames)) + frames + b"\xff\xfb" * 1000
+
+
+def make_flac() -> bytes:
+    streaminfo = b"\0" * 34
+    comments = [f"{k.upper() if k != 'track' else 'TRACKNUMBER'}={v}" for k, v in FIELDS.items()]
+    vorbis = struct.pack("<I", 6) + b"vendor" + struct.pack("<I", len(comments))
+    for c in comments:
+        vorbis += struct.pack("<I", len(c.encode())) + c.encode()
+    picture = b"\0" * 4000
+    return (
+        b"fLaC"
+        + bytes([0])
+        + len(streaminfo).to_bytes(3, "big")
+        + streaminfo
+        + bytes([6])
+        + len(picture).to_bytes(3, "big")
+        + picture
+        + bytes([0x80 | 4])
+        + len(vorbis).to_bytes(3, "big")
+        + vorbis
+        + b"\0" * 1000
+    )
+
+
+def atom(atom_type: bytes, payload: bytes) -> bytes:
+    return struct.pack(">I", len(payload) + 8) + atom_type + payload
+
+
+def make_mp4() -> bytes:
+    def text_item(name, value):
+        return atom(name, atom(b"data", struct.pack(">II", 1, 0) + value.encode()))
+
+    items = (
+        text_item(b"\xa9nam", "Song")
+        + text_item(b"\xa9ART", "Band")
+        + text_item(b"\xa9alb", "Record")
+        + atom(b"trkn", atom(b"data", struct.pack(">II", 0, 0) + struct.pack(">HHHH", 0, 3, 12, 0)))
+    )
+    meta = atom(b"meta", b"\0\0\0\0" + atom(b"hdlr", b"\0" * 25) + atom(b"ilst", items))
+    moov = atom(b"moov", atom(b"mvhd", b"\0" * 100) + atom(b"udta", meta))
+    return atom(b"ftyp", b"M4A \0\0\0\0") + atom(b"mdat", b"\0" * 5000) + moov
+
+
+# ---------------------------------------------------------------------------
+# read_tags
+# ---------------------------------------------------------------------------
+
+
+class TestReadTags:
+    def test_id3v23(self, tmp_path):
+        f = tmp_path / "a.mp3"
+        f.write_bytes(make_id3(3))
+        assert read_tags(f) == EXPECTED
+
+    def test_id3v24(self, tmp_path):
+        f = tmp_path / "a.mp3"
+        f.write_bytes(make_id3(4))
+        assert read_tags(f) == EXPECTED
+
+    def test_id3v22(self, tmp_path):
+        f = tmp_path / "a.mp3"
+        f.write_bytes(make_id3(2))
+        assert read_tags(f) == EXPECTED
+
+    def test_id3_utf16(self, tmp_path):
+        f = tmp_path / "a.mp3"
+        f.write_bytes(make_id3(3, encoding=1))
+        assert read_tags(f) == EXPECTED
+
+    def test_id3_latin1(self, tmp_path):
+        f = tmp_path / "a.mp3"
+        f.write_bytes(make_id3(4, encoding=0, padding=0))
+        assert read_tags(f) == EXPECTED
+
+    def test_id3_unsynchronised_tag(self, tmp_path):
+        data = bytearray(make_id3(3))
+        data[5] = 0x80
+        f = tmp_path / "a.mp3"
+        f.write_bytes(bytes(data))
+        assert read_tags(f) == EXPECTED
+
+    def test_flac(self, tmp_path):
+        f = tmp_path / "a.flac"
+        f.write_bytes(make_flac())
+        assert read_tags(f) == EXPECTED
+
+    def test_mp4(self, tmp_path):
+        f = tmp_path / "a.m4a"
+        f.write_bytes(make_mp4())
+        assert read_tags(f) == EXPECTED
+
+    def test_mp4_without_tags(self, tmp_path):
+        f = tmp_path / "a.m4a"
+        f.write_bytes(atom(b"ftyp", b"M4A \0\0\0\0") + atom(b"moov", atom(b"mvhd", b"\0" * 8)))
+        assert read_tags(f) is None
+
+    def test_unknown_format(self, tmp_path):
+        f = tmp_path / "a.txt"
+        f.write_text("hello")
+        assert read_tags(f) is None
+
+    def test_missing_file(self, tmp_path):
+        assert read_tags(tmp_path / "ghost.mp3") is None
+
+    def test_zero_track_is_dropped(self, tmp_path):
+        f = tmp_path / "a.flac"
+        f.write_bytes(make_flac().replace(b"TRACKNUMBER=3/12", b"TRACKNUMBER=0/12"))
+        assert "track" not in read_tags(f)
+
+
+class TestReadTagsBatch:
+    def test_omits_untagged_and_caches(self, tmp_path):
+        song = tmp_path / "a.flac"
+        song.write_bytes(make_flac())
+        other = tmp_path / "b.txt"
+        other.write_text("x")
+        cache = FileCache(tmp_path / ".tags.json")
+        assert read_tags_batch([song, other], cache) == {song: EXPECTED}
+        assert (tmp_path / ".tags.json").exists()
+
+
+# ---------------------------------------------------------------------------
+# Naming
+# ---------------------------------------------------------------------------
+
+
+class TestFormatMusicName:
+    def test_full(self):
+        assert format_music_name(EXPECTED, ".mp3") == "Band - Record - 03 Song.mp3"
+
+    def test_without_album_and_track(self):
+        assert format_music_name({"title": "Song", "artist": "Band"}, ".mp3") == "Band - Song.mp3"
+
+    def test_strips_invalid_characters(self):
+        info = {"title": "What?", "artist": "AC/DC"}
+        assert format_music_name(info, ".flac") == "ACDC - What.flac"
+
+
+class TestComputeNewNameMusic:
+    def test_renames_tagged_file(self):
+        ops = [{"type": "music_tags", "tracks": {"track03.mp3": EXPECTED}}]
+        assert compute_new_name(Path("/tmp/track03.mp3"), ops) == "Band - Record - 03 Song.mp3"
+
+    def test_leaves_untagged_file(self):
+        ops = [{"type": "music_tags", "tracks": {}}]
+        assert compute_new_name(Path("/tmp/track03.mp3"), ops) == "track03.mp3"
+
+
+class TestTemplateTagFields:
+    def test_fields(self, tmp_path):
+        f = tmp_path / "a.flac"
+        f.write_bytes(make_flac())
+        t = compile_template("{track} {artist} - {track_title} [{album}]")
+        assert t.render(f) == "03 Band - Song [Record]"
+
+    def test_untagged_returns_none(self, tmp_path):
+        f = tmp_path / "a.flac"
+        f.write_text("nope")
+        assert compile_template("{artist}").render(f) is None
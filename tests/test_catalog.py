@@ -0,0 +1,193 @@
+"""Tests for catalog.Catalog and the renamer's catalog helpers."""
+
+import sqlite3
+
+import pytest
+
+import renamer
+from catalog import Catalog
+from filecache import file_key
+from fsbackend import MemoryFileSystem
+from session import RenameSession
+
+
+@pytest.fixture()
+def catalog(tmp_path):
+    with Catalog(tmp_path / "catalog.db") as c:
+        yield c
+
+
+def rename(src, new_name):
+    dst = src.parent / new_name
+    src.rename(dst)
+    return src, dst
+
+
+class TestRecord:
+    def test_records_renames_with_fingerprint(self, tmp_path, catalog):
+        (tmp_path / "a.txt").write_text("x")
+        assert catalog.record([rename(tmp_path / "a.txt", "b.txt")]) == 1
+        [row] = catalog.lookup("a.txt")
+        assert (row["folder"], row["old"], row["new"]) == (str(tmp_path), "a.txt", "b.txt")
+        assert row["kind"] == "rename"
+        st = (tmp_path / "b.txt").stat()
+        assert row["fingerprint"] == f"{st.st_dev}:{st.st_ino}:{st.st_size}:{st.st_mtime_ns}"
+
+    def test_failed_renames_are_skipped(self, tmp_path, catalog):
+        assert catalog.record([(tmp_path / "a.txt", tmp_path / "never.txt")]) == 0
+        assert catalog.db.execute("SELECT COUNT(*) FROM sessions").fetchone()[0] == 0
+
+    def test_moves_record_both_folders(self, tmp_path, catalog):
+        (tmp_path / "Show").mkdir()
+        (tmp_path / "e1.mkv").write_text("")
+        catalog.record([rename(tmp_path / "e1.mkv", "Show/Show - S01E01.mkv")])
+        [row] = catalog.lookup("Show - S01E01.mkv")
+        assert row["folder"] == str(tmp_path)
+        assert row["new_folder"] == str(tmp_path / "Show")
+
+    def test_large_runs_are_batched(self, tmp_path, catalog, monkeypatch):
+        monkeypatch.setattr("catalog.BATCH_ROWS", 3)
+        pairs = []
+        for i in range(10):
+            (tmp_path / f"{i}.txt").write_text("")
+            pairs.append(rename(tmp_path / f"{i}.txt", f"n{i}.txt"))
+        assert catalog.record(pairs) == 10
+        assert catalog.db.execute("SELECT COUNT(*) FROM renames").fetchone()[0] == 10
+
+    def test_uses_wal_mode(self, catalog):
+        assert catalog.db.execute("PRAGMA journal_mode").fetchone()[0] == "wal"
+
+    def test_reopening_keeps_history(self, tmp_path):
+        (tmp_path / "a.txt").write_text("")
+        with Catalog(tmp_path / "c.db") as c:
+            c.record([rename(tmp_path / "a.txt", "b.txt")])
+        with Catalog(tmp_path / "c.db") as c:
+            assert len(c.lookup("b.txt")) == 1
+
+
+class TestLookup:
+    def test_finds_old_and_new_names_newest_first(self, tmp_path, catalog):
+        (tmp_path / "a.txt").write_text("")
+        catalog.record([rename(tmp_path / "a.txt", "b.txt")])
+        catalog.record([rename(tmp_path / "b.txt", "c.txt")])
+        assert [(r["old"], r["new"]) for r in catalog.lookup("b.txt")] == [
+            ("b.txt", "c.txt"),
+            ("a.txt", "b.txt"),
+        ]
+
+    def test_limit(self, tmp_path, catalog):
+        (tmp_path / "a.txt").write_text("")
+        for _ in range(3):
+            catalog.record([rename(tmp_path / "a.txt", "b.txt")])
+            catalog.record([rename(tmp_path / "b.txt", "a.txt")])
+        assert len(catalog.lookup("a.txt", limit=4)) == 4
+
+    def test_unknown_name(self, catalog):
+        assert catalog.lookup("nothing.txt") == []
+
+
+class TestTrace:
+    def test_follows_every_earlier_name(self, tmp_path, catalog):
+        (tmp_path / "IMG_1.jpg").write_text("")
+        catalog.record([rename(tmp_path / "IMG_1.jpg", "beach.jpg")])
+        catalog.record([rename(tmp_path / "beach.jpg", "2024 beach.jpg")])
+        chain = catalog.trace("2024 beach.jpg")
+        assert [(r["old"], r["new"]) for r in chain] == [
+            ("IMG_1.jpg", "beach.jpg"),
+            ("beach.jpg", "2024 beach.jpg"),
+        ]
+
+    def test_stays_in_the_files_folder(self, tmp_path, catalog):
+        for sub in ("one", "two"):
+            (tmp_path / sub).mkdir()
+            (tmp_path / sub / "a.txt").write_text("")
+        catalog.record([rename(tmp_path / "one" / "a.txt", "b.txt")])
+        (tmp_path / "two" / "x.txt").write_text("")
+        catalog.record([rename(tmp_path / "two" / "x.txt", "a.txt.bak")])
+        catalog.record([rename(tmp_path / "two" / "a.txt", "b.txt")])
+        chain = catalog.trace("b.txt", tmp_path / "one")
+        assert [r["old"] for r in chain] == ["a.txt"]
+        assert chain[0]["folder"] == str(tmp_path / "one")
+
+    def test_name_reused_later_is_not_followed_forward(self, tmp_path, catalog):
+        (tmp_path / "a.txt").write_text("")
+        catalog.record([rename(tmp_path / "a.txt", "b.txt")])
+        catalog.record([rename(tmp_path / "b.txt", "a.txt")])
+        chain = catalog.trace("a.txt")
+        assert [(r["old"], r["new"]) for r in chain] == [("a.txt", "b.txt"), ("b.txt", "a.txt")]
+
+    def test_unknown_folder(self, tmp_path, catalog):
+        assert catalog.trace("a.txt", tmp_path / "missing") == []
+
+
+class TestRenamerCatalog:
+    def test_catalog_path_is_relative_to_the_script(self):
+        assert renamer.catalog_path({}) is None
+        assert renamer.catalog_path({"catalog": "c.db"}).name == "c.db"
+        assert renamer.catalog_path({"catalog": "c.db"}).is_absolute()
+
+    def test_record_in_catalog(self, tmp_path):
+        (tmp_path / "a.txt").write_text("")
+        config = {"catalog": str(tmp_path / "c.db")}
+        renamer.record_in_catalog(config, [rename(tmp_path / "a.txt", "b.txt")])
+        with Catalog(tmp_path / "c.db") as c:
+            assert len(c.lookup("a.txt")) == 1
+
+    def test_record_warns_on_database_errors(self, tmp_path, capsys, monkeypatch):
+        def broken(path):
+            raise sqlite3.OperationalError("disk I/O error")
+
+        monkeypatch.setattr(renamer, "Catalog", broken)
+        renamer.record_in_catalog({"catalog": str(tmp_path / "c.db")}, [(tmp_path, tmp_path)])
+        assert "could not record" in capsys.readouterr().out
+
+    def test_show_history(self, tmp_path, capsys):
+        (tmp_path / "a.txt").write_text("")
+        with Catalog(tmp_path / "c.db") as c:
+            c.record([rename(tmp_path / "a.txt", "b.txt")])
+            c.record([rename(tmp_path / "b.txt", "c.txt")])
+        renamer.show_history(tmp_path / "c.db", "c.txt")
+        out = capsys.readouterr().out
+        assert "a.txt -> b.txt -> c.txt" in out
+
+    def test_show_history_without_catalog(self, tmp_path, capsys):
+        renamer.show_history(tmp_path / "none.db", "a.txt")
+        assert "No rename catalog" in capsys.readouterr().out
+
+    def test_history_flag(self):
+        args = renamer.parse_args(["--history", "a.txt", "--catalog", "c.db"])
+        assert (args.history, args.catalog) == ("a.txt", "c.db")
+
+
+class TestSessionCatalog:
+    def test_apply_and_undo_are_recorded(self, tmp_path, catalog):
+        (tmp_path / "Photo.jpg").write_text("")
+        session = RenameSession(tmp_path, catalog=catalog)
+        session.add_operation({"type": "case", "mode": "lowercase"})
+        session.apply()
+        session.undo()
+        rows = catalog.lookup("photo.jpg")
+        assert [(r["kind"], r["old"], r["new"]) for r in rows] == [
+            ("undo", "photo.jpg", "Photo.jpg"),
+            ("rename", "Photo.jpg", "photo.jpg"),
+        ]
+
+    def test_memory_filesystem_session_is_recorded(self, tmp_path, catalog):
+        fs = MemoryFileSystem()
+        fs.add_file(tmp_path / "Photo.jpg", size=3)
+        session = RenameSession(tmp_path, catalog=catalog, fs=fs)
+        session.add_operation({"type": "case", "mode": "lowercase"})
+        session.apply()
+        [row] = catalog.lookup("photo.jpg")
+        assert row["fingerprint"] == file_key(fs.stat(tmp_path / "photo.jpg"))
+        assert not (tmp_path / "photo.jpg").exists()
+
+    def test_catalog_error_is_a_warning(self, tmp_path, catalog):
+        (tmp_path / "Photo.jpg").write_text("")
+        session = RenameSession(tmp_path, ext_filter=".jpg", catalog=catalog)
+        session.add_operation({"type": "case", "mode": "lowercase"})
+        catalog.close()
+        with pytest.warns(UserWarning, match="Could not record renames"):
+            outcomes = session.apply()
+        assert outcomes[0]["status"] == "RENAMED"
+        assert [r["status"] for r in session.preview()] == ["NO CHANGE"]
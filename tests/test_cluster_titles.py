@@ -0,0 +1,65 @@
+"""Tests for patterns.cluster_titles() and group_movie_files()."""
+
+import random
+
+from patterns import cluster_titles, group_movie_files
+
+
+class TestClusterTitles:
+    def test_identical_keys_group(self):
+        assert cluster_titles(["The Matrix", "the.matrix", "THE MATRIX"]) == [[0, 1, 2]]
+
+    def test_near_identical_titles_group(self):
+        titles = ["Blade Runner 2049", "Inception", "Blade Runer 2049"]
+        assert cluster_titles(titles) == [[0, 2], [1]]
+
+    def test_different_titles_stay_apart(self):
+        assert cluster_titles(["Alien", "Aliens Vs Predator"]) == [[0], [1]]
+
+    def test_years_keep_remakes_apart(self):
+        assert cluster_titles(["Dune", "Dune", "Dune"], [1984, 2021, 1984]) == [[0, 2], [1]]
+
+    def test_similarity_threshold(self):
+        titles = ["The Office", "The Offices"]
+        assert cluster_titles(titles, similarity=1.0) == [[0], [1]]
+        assert cluster_titles(titles, similarity=0.5) == [[0, 1]]
+
+    def test_empty(self):
+        assert cluster_titles([]) == []
+
+    def test_every_title_lands_in_one_group(self):
+        rng = random.Random(1)
+        letters = "abcdefghijklmnopqrstuvwxyz"
+        words = ["".join(rng.choices(letters, k=rng.randint(3, 9))) for _ in range(300)]
+        titles = [" ".join(rng.choices(words, k=rng.randint(1, 4))) for _ in range(2_000)]
+        groups = cluster_titles(titles)
+        assert sorted(i for g in groups for i in g) == list(range(2_000))
+
+
+class TestGroupMovieFiles:
+    def test_groups_by_title_and_year(self):
+        names = [
+            "The.Matrix.1999.1080p.mkv",
+            "Inception.2010.mkv",
+            "The Matrix (1999).srt",
+            "Dune.1984.mkv",
+            "Dune.2021.mkv",
+        ]
+        groups, undetected = group_movie_files(names)
+        assert undetected == []
+        assert [(g["title"], g["year"], len(g["filenames"])) for g in groups] == [
+            ("The Matrix", 1999, 2),
+            ("Inception", 2010, 1),
+            ("Dune", 1984, 1),
+            ("Dune", 2021, 1),
+        ]
+
+    def test_most_common_spelling_wins(self):
+        names = ["Amelie.2001.mkv", "Amelie.2001.srt", "Amelie.2001.Extras.2001.mkv"]
+        groups, _ = group_movie_files(names)
+        assert groups[0]["title"] == "Amelie"
+
+    def test_undetected_files_reported(self):
+        groups, undetected = group_movie_files(["notes.txt", "Alien.1979.mkv"])
+        assert undetected == ["notes.txt"]
+        assert groups[0]["filenames"] == ["Alien.1979.mkv"]
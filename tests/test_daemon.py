@@ -0,0 +1,348 @@
+"""Tests for daemon.RenameDaemon, daemon.serve() and the client."""
+
+import json
+import os
+import socket
+import sys
+import threading
+
+import pytest
+
+import client
+import daemon
+from catalog import Catalog
+from client import Client, DaemonError
+from daemon import FolderWatcher, RenameDaemon, serve
+
+LOWER = [{"type": "case", "mode": "lowercase"}]
+SIZE = [{"type": "template", "template": "{stem}_{size}"}]
+
+linux_only = pytest.mark.skipif(
+    not sys.platform.startswith("linux"), reason="inotify is Linux-only"
+)
+
+
+@pytest.fixture()
+def folder(tmp_path):
+    media = tmp_path / "media"
+    media.mkdir()
+    for name in ("A.txt", "B.txt", "c.txt"):
+        (media / name).write_text("x")
+    return media
+
+
+@pytest.fixture()
+def server(tmp_path):
+    """A daemon served on a thread; yields the socket path."""
+    path = tmp_path / "d.sock"
+    d = RenameDaemon({}, FolderWatcher.create())
+    ready = threading.Event()
+    thread = threading.Thread(target=serve, args=(d, path, ready.set), daemon=True)
+    thread.start()
+    assert ready.wait(10)
+    yield path
+    if thread.is_alive():
+        with Client(path) as c:
+            c.shutdown()
+    thread.join(10)
+    d.close()
+    assert not thread.is_alive()
+
+
+class TestHandle:
+    def test_plan_rows_use_plain_names(self, folder):
+        reply = RenameDaemon().handle({"op": "plan", "folder": str(folder), "operations": LOWER})
+        assert reply["ok"]
+        assert [(r["original"], r["new_name"], r["status"]) for r in reply["rows"]] == [
+            ("A.txt", "a.txt", "OK"),
+            ("B.txt", "b.txt", "OK"),
+            ("c.txt", "c.txt", "NO CHANGE"),
+        ]
+        json.dumps(reply)
+
+    def test_session_is_reused(self, folder):
+        d = RenameDaemon()
+        request = {"op": "plan", "folder": str(folder), "operations": LOWER}
+        d.handle(request)
+        session = d.session(str(folder))
+        results = session._results
+        d.handle(request)
+        assert d.session(str(folder)) is session
+        assert session._results is results  # the cached plan answered
+
+    def test_encoded_plan_is_reused_until_it_changes(self, folder):
+        d = RenameDaemon()
+        request = {"op": "plan", "folder": str(folder), "operations": LOWER}
+        first = d.handle(request)
+        line = d.encode(first)
+        assert json.loads(line) == first
+        again = d.handle(request)
+        assert again["rows"] is first["rows"]
+        assert d.encode(again) is line
+        (folder / "D.txt").write_text("")
+        changed = d.handle(request)
+        assert [r["original"] for r in changed["rows"]] == ["A.txt", "B.txt", "c.txt", "D.txt"]
+        assert d.encode(changed) != line
+
+    def test_changed_operations_replan(self, folder):
+        d = RenameDaemon()
+        d.handle({"op": "plan", "folder": str(folder), "operations": LOWER})
+        reply = d.handle(
+            {
+                "op": "plan",
+                "folder": str(folder),
+                "operations": [{"type": "case", "mode": "uppercase"}],
+            }
+        )
+        assert [r["new_name"] for r in reply["rows"]] == ["A.txt", "B.txt", "C.txt"]
+
+    def test_select_and_ext_filter(self, folder):
+        (folder / "D.md").write_text("")
+        d = RenameDaemon()
+        reply = d.handle(
+            {
+                "op": "plan",
+                "folder": str(folder),
+                "operations": LOWER,
+                "ext_filter": ".txt",
+                "select": ["A.txt"],
+            }
+        )
+        assert [r["original"] for r in reply["rows"]] == ["A.txt"]
+        assert len(d.sessions) == 1
+
+    def test_apply_and_undo(self, folder):
+        d = RenameDaemon()
+        reply = d.handle({"op": "apply", "folder": str(folder), "operations": LOWER})
+        assert [(r["original"], r["status"]) for r in reply["rows"]] == [
+            ("A.txt", "RENAMED"),
+            ("B.txt", "RENAMED"),
+        ]
+        assert {"a.txt", "b.txt"} <= {p.name for p in folder.iterdir()}
+        reply = d.handle({"op": "undo", "folder": str(folder)})
+        assert {r["status"] for r in reply["rows"]} == {"RESTORED"}
+        assert (folder / "A.txt").exists()
+
+    def test_second_undo_is_a_no_op(self, folder):
+        d = RenameDaemon()
+        d.handle({"op": "apply", "folder": str(folder), "operations": LOWER})
+        assert {r["status"] for r in d.handle({"op": "undo", "folder": str(folder)})["rows"]} == {
+            "RESTORED"
+        }
+        (folder / "a.txt").write_text("new data")
+        assert d.handle({"op": "undo", "folder": str(folder)})["rows"] == []
+        assert (folder / "A.txt").read_text() == "x"
+
+    def test_apply_is_catalogued(self, tmp_path, folder):
+        d = RenameDaemon({"catalog": tmp_path / "catalog.db"})
+        d.handle({"op": "apply", "folder": str(folder), "operations": LOWER})
+        d.close()
+        with Catalog(tmp_path / "catalog.db") as catalog:
+            assert catalog.lookup("A.txt")[0]["new"] == "a.txt"
+
+    def test_excluded_files(self, folder):
+        d = RenameDaemon({"excluded_files": ["B.TXT"]})
+        reply = d.handle({"op": "plan", "folder": str(folder), "operations": LOWER})
+        assert [r["original"] for r in reply["rows"]] == ["A.txt", "c.txt"]
+
+    @pytest.mark.parametrize(
+        "request_, error",
+        [
+            ({"op": "nope"}, "Unknown op: 'nope'"),
+            ({"op": "plan"}, "Missing field: folder"),
+            ({"op": "plan", "folder": "/no/such/folder"}, "Not a directory"),
+            ({"op": "plan", "folder": ".", "operations": "x"}, "operations must be a list"),
+            ({"op": "plan", "folder": ".", "operations": [{}]}, "Operation has no type"),
+            ({"op": "plan", "folder": ".", "operations": [{"type": "organize"}]}, "plan_organize"),
+            ({"op": "plan", "folder": ".", "operations": [{"type": "nope"}]}, "Unknown operation"),
+            ({"op": "plan", "folder": ".", "operations": ["x"]}, "must be a dict"),
+            ({"op": "plan", "folder": ".", "operations": [{"type": "mapping"}]}, "sent as JSON"),
+        ],
+    )
+    def test_errors(self, request_, error):
+        reply = RenameDaemon().handle(request_)
+        assert not reply["ok"]
+        assert error in reply["error"]
+
+    def test_unexpected_errors_are_replies(self, folder, monkeypatch):
+        def broken(self):
+            raise RuntimeError("boom")
+
+        monkeypatch.setattr(daemon.RenameSession, "preview", broken)
+        reply = RenameDaemon().handle({"op": "plan", "folder": str(folder), "operations": LOWER})
+        assert reply == {"ok": False, "error": "Internal error: RuntimeError: boom"}
+
+    def test_ping_and_shutdown(self):
+        d = RenameDaemon()
+        assert d.handle({"op": "ping"})["sessions"] == 0
+        assert d.handle({"op": "shutdown"}) == {"ok": True}
+        assert not d.running
+
+    def test_least_recently_used_sessions_are_dropped(self, tmp_path, monkeypatch):
+        monkeypatch.setattr(daemon, "MAX_SESSIONS", 2)
+        d = RenameDaemon()
+        for name in ("a", "b", "c"):
+            (tmp_path / name).mkdir()
+            d.session(str(tmp_path / name))
+        assert [f for f, _ in d.sessions] == [str(tmp_path / "b"), str(tmp_path / "c")]
+
+
+@linux_only
+class TestFolderWatcher:
+    def test_reports_changed_folders(self, tmp_path):
+        watcher = FolderWatcher.create()
+        try:
+            assert watcher.watch(str(tmp_path))
+            assert watcher.changed() == set()
+            (tmp_path / "new.txt").write_text("")
+            assert watcher.changed() == {str(tmp_path)}
+            watcher.unwatch(str(tmp_path))
+            (tmp_path / "other.txt").write_text("")
+            assert watcher.changed() == set()
+        finally:
+            watcher.close()
+
+    def test_removed_folder_drops_its_watch(self, tmp_path):
+        sub = tmp_path / "sub"
+        sub.mkdir()
+        watcher = FolderWatcher.create()
+        try:
+            watcher.watch(str(sub))
+            sub.rmdir()
+            assert watcher.changed() == {str(sub)}
+            assert watcher._watches == {}
+            assert not watcher.watch(str(sub))
+        finally:
+            watcher.close()
+
+    def test_content_change_invalidates_plan(self, folder):
+        d = RenameDaemon({}, FolderWatcher.create())
+        try:
+            request = {"op": "plan", "folder": str(folder), "operations": SIZE}
+            assert d.handle(request)["rows"][0]["new_name"] == "A_1.txt"
+            # Rewriting a file leaves the folder mtime alone; only the watch sees it
+            (folder / "A.txt").write_text("xyz")
+            d.invalidate(d.watcher.changed())
+            assert d.handle(request)["rows"][0]["new_name"] == "A_3.txt"
+        finally:
+            d.close()
+
+
+class TestServe:
+    def test_client_round_trips(self, server, folder):
+        with Client(server) as c:
+            assert c.ping()["sessions"] == 0
+            rows = c.plan(folder, LOWER)
+            assert [r["new_name"] for r in rows] == ["a.txt", "b.txt", "c.txt"]
+            assert c.plan(folder, LOWER) == rows
+            assert [r["status"] for r in c.apply(folder, LOWER)] == ["RENAMED", "RENAMED"]
+            assert {r["status"] for r in c.undo(folder)} == {"RESTORED"}
+            with pytest.raises(DaemonError, match="Not a directory"):
+                c.plan(folder / "missing", LOWER)
+            assert c.ping()["sessions"] == 1  # the connection survives an error
+
+    @linux_only
+    def test_sees_content_changes(self, server, folder):
+        with Client(server) as c:
+            assert c.plan(folder, SIZE)[0]["new_name"] == "A_1.txt"
+            (folder / "A.txt").write_text("xyz")
+            assert c.plan(folder, SIZE)[0]["new_name"] == "A_3.txt"
+
+    def test_bad_lines_get_errors(self, server):
+        with socket.socket(socket.AF_UNIX, socket.SOCK_STREAM) as s:
+            s.connect(str(server))
+            reader = s.makefile("rb")
+            s.sendall(b"not json\n[1]\n")
+            assert json.loads(reader.readline())["error"].startswith("Bad request")
+            assert "JSON object" in json.loads(reader.readline())["error"]
+            reader.close()
+
+    def test_client_gone_before_reply(self, tmp_path):
+        closed = threading.Event()
+
+        class SlowDaemon(RenameDaemon):
+            def handle(self, request):
+                if request["op"] == "ping":
+                    closed.wait(10)  # answer only after the client has hung up
+                return super().handle(request)
+
+        path = tmp_path / "d.sock"
+        ready = threading.Event()
+        thread = threading.Thread(target=serve, args=(SlowDaemon(), path, ready.set))
+        thread.start()
+        try:
+            assert ready.wait(10)
+            with socket.socket(socket.AF_UNIX, socket.SOCK_STREAM) as s:
+                s.connect(str(path))
+                s.sendall(b'{"op": "ping"}\n' * 100)
+            closed.set()
+            with Client(path) as c:
+                assert c.ping()["ok"]
+                c.shutdown()
+        finally:
+            closed.set()
+            thread.join(10)
+        assert not thread.is_alive()
+
+    def test_second_daemon_is_refused(self, server):
+        with pytest.raises(OSError, match="already listening"):
+            serve(RenameDaemon(), server)
+
+    def test_stale_socket_is_replaced(self, tmp_path):
+        path = tmp_path / "d.sock"
+        stale = socket.socket(socket.AF_UNIX, socket.SOCK_STREAM)
+        stale.bind(str(path))
+        stale.close()
+        d = RenameDaemon()
+        d.running = False  # stop right after binding
+        serve(d, path)
+        assert not path.exists()
+
+    @pytest.mark.parametrize("kind", ["file", "dir", "symlink"])
+    def test_non_socket_path_is_kept(self, tmp_path, kind):
+        path = tmp_path / "d.sock"
+        if kind == "file":
+            path.write_text("notes")
+        elif kind == "dir":
+            path.mkdir()
+        else:
+            stale = socket.socket(socket.AF_UNIX, socket.SOCK_STREAM)
+            stale.bind(str(tmp_path / "real.sock"))
+            stale.close()
+            path.symlink_to(tmp_path / "real.sock")
+        with pytest.raises(FileExistsError, match="not a socket"):
+            serve(RenameDaemon(), path)
+        assert os.path.lexists(path)
+        if kind == "file":
+            assert path.read_text() == "notes"
+
+    def test_unreachable_daemon(self, tmp_path):
+        with pytest.raises(DaemonError, match="Cannot reach"):
+            Client(tmp_path / "none.sock").ping()
+
+
+class TestClientMain:
+    def test_plan_prints_json(self, server, folder, capsys):
+        assert client.main(["--socket", str(server), "plan", str(folder), json.dumps(LOWER)]) == 0
+        rows = json.loads(capsys.readouterr().out)
+        assert rows[0]["new_name"] == "a.txt"
+
+    def test_apply_undo_and_ping(self, server, folder, capsys):
+        sock = ["--socket", str(server)]
+        assert client.main([*sock, "apply", str(folder), json.dumps(LOWER), "--ext", ".txt"]) == 0
+        assert (folder / "a.txt").exists()
+        assert client.main([*sock, "undo", str(folder)]) == 0
+        assert (folder / "A.txt").exists()
+        assert client.main([*sock, "ping"]) == 0
+        assert "pid" in capsys.readouterr().out
+
+    def test_errors_exit_1(self, server, capsys):
+        assert client.main(["--socket", str(server), "plan", "/no/such", "[]"]) == 1
+        assert "Not a directory" in capsys.readouterr().err
+
+    def test_shutdown(self, server):
+        assert client.main(["--socket", str(server), "shutdown"]) == 0
+
+    def test_default_socket(self, monkeypatch, tmp_path):
+        monkeypatch.setenv("XDG_RUNTIME_DIR", str(tmp_path))
+        assert client.default_socket().parent == tmp_path
@@ -0,0 +1,240 @@
+"""Tests for exif.read_exif(), read_exif_batch(), and photo renaming."""
+
+import struct
+from pathlib import Path
+
+import pytest
+
+import exif
+from exif import parse_tiff, read_exif, read_exif_batch
+from filecache import FileCache
+from renamer import compute_new_name, format_photo_name
+from templates import compile_template
+
+# ---------------------------------------------------------------------------
+# Helpers
+# ---------------------------------------------------------------------------
+
+
+def make_tiff(make=None, model=None, taken=None, endian="<") -> bytes:
+    """Build a minimal TIFF/EXIF block with ASCII Make/Model and DateTimeOriginal."""
+    ifd0 = [(t, v) for t, v in ((0x010F, make), (0x0110, model)) if v]
+    exif_entries = [(0x9003, taken)] if taken else []
+    n0 = len(ifd0) + (1 if exif_entries else 0)
+    exif_offset = 8 + 2 + 12 * n0 + 4
+    data_offset = exif_offset + (2 + 12 * len(exif_entries) + 4 if exif_entries else 0)
+    data = bytearray()
+
+    def ifd(entries, extra=b""):
+        out = struct.pack(endian + "H", len(entries) + (1 if extra else 0))
+        for tag, value in entries:
+            raw = value.encode() + b"\0"
+            out += struct.pack(endian + "HHII", tag, 2, len(raw), data_offset + len(data))
+            data.extend(raw.ljust(max(len(raw), 5), b"\0"))
+        return out + extra + b"\0\0\0\0"
+
+    pointer = struct.pack(endian + "HHII", 0x8769, 4, 1, exif_offset) if exif_entries else b""
+    magic = b"II*\0" if endian == "<" else b"MM\0*"
+    head = magic + struct.pack(endian + "I", 8) + ifd(ifd0, pointer)
+    if exif_entries:
+        head += ifd(exif_entries)
+    return head + bytes(data)
+
+
+def make_jpeg(tiff: bytes) -> bytes:
+    app0 = b"JFIF\0" + b"\0" * 9
+    app1 = b"Exif\0\0" + tiff
+    return (
+        b"\xff\xd8"
+        + b"\xff\xe0"
+        + struct.pack(">H", len(app0) + 2)
+        + app0
+        + b"\xff\xe1"
+        + struct.pack(">H", len(app1) + 2)
+        + app1
+        + b"\xff\xda\x00\x02"
+        + b"\x00" * 1000
+    )
+
+
+def box(box_type: bytes, payload: bytes) -> bytes:
+    return struct.pack(">I", len(payload) + 8) + box_type + payload
+
+
+def make_heic(tiff: bytes) -> bytes:
+    """Build a minimal HEIF file whose Exif item lives in mdat."""
+    ftyp = box(b"ftyp", b"heic\0\0\0\0mif1heic")
+    exif_item = struct.pack(">I", 6) + b"Exif\0\0" + tiff
+
+    def meta_box(exif_offset):
+        infe_image = box(b"infe", b"\x02\0\0\0" + struct.pack(">HH", 1, 0) + b"hvc1" + b"\0")
+        infe_exif = box(b"infe", b"\x02\0\0\0" + struct.pack(">HH", 2, 0) + b"Exif" + b"\0")
+        iinf = box(b"iinf", b"\0\0\0\0" + struct.pack(">H", 2) + infe_image + infe_exif)
+        items = struct.pack(">HHHII", 1, 0, 1, 0, 0)
+        items += struct.pack(">HHHII", 2, 0, 1, exif_offset, len(exif_item))
+        iloc = box(b"iloc", b"\0\0\0\0" + bytes([0x44, 0x00]) + struct.pack(">H", 2) + items)
+        hdlr = box(b"hdlr", b"\0" * 4 + b"\0" * 4 + b"pict" + b"\0" * 13)
+        return box(b"meta", b"\0\0\0\0" + hdlr + iinf + iloc)
+
+    placeholder = meta_box(0)
+    offset = len(ftyp) + len(placeholder) + 8
+    return ftyp + meta_box(offset) + box(b"mdat", exif_item)
+
+
+TIFF = make_tiff(make="Canon", model="Canon EOS R5", taken="2024:05:06 07:08:09")
+EXPECTED = {"taken": "2024-05-06 07:08:09", "make": "Canon", "model": "Canon EOS R5"}
+
+
+# ---------------------------------------------------------------------------
+# parse_tiff / read_exif
+# ---------------------------------------------------------------------------
+
+
+class TestParseTiff:
+    def test_little_endian(self):
+        assert parse_tiff(TIFF) == EXPECTED
+
+    def test_big_endian(self):
+        tiff = make_tiff(
+            make="Canon", model="Canon EOS R5", taken="2024:05:06 07:08:09", endian=">"
+        )
+        assert parse_tiff(tiff) == EXPECTED
+
+    def test_not_tiff(self):
+        assert parse_tiff(b"garbage!") == {}
+
+    def test_invalid_date_is_dropped(self):
+        assert parse_tiff(make_tiff(model="X100", taken="0000:00:00 00:00:00")) == {"model": "X100"}
+
+
+class TestReadExif:
+    def test_jpeg(self, tmp_path):
+        f = tmp_path / "IMG_001.jpg"
+        f.write_bytes(make_jpeg(TIFF))
+        assert read_exif(f) == EXPECTED
+
+    def test_tiff(self, tmp_path):
+        f = tmp_path / "DSC00234.tif"
+        f.write_bytes(TIFF + b"\0" * 100)
+        assert read_exif(f) == EXPECTED
+
+    def test_heic(self, tmp_path):
+        f = tmp_path / "IMG_0001.heic"
+        f.write_bytes(make_heic(TIFF))
+        assert read_exif(f) == EXPECTED
+
+    def test_jpeg_without_exif(self, tmp_path):
+        f = tmp_path / "plain.jpg"
+        f.write_bytes(b"\xff\xd8\xff\xda\x00\x02" + b"\0" * 10)
+        assert read_exif(f) is None
+
+    def test_heic_without_meta(self, tmp_path):
+        f = tmp_path / "x.heic"
+        f.write_bytes(box(b"ftyp", b"heic\0\0\0\0") + box(b"mdat", b"\0" * 10))
+        assert read_exif(f) is None
+
+    def test_unknown_format(self, tmp_path):
+        f = tmp_path / "notes.txt"
+        f.write_text("hello")
+        assert read_exif(f) is None
+
+    def test_truncated_file(self, tmp_path):
+        f = tmp_path / "broken.jpg"
+        f.write_bytes(make_jpeg(TIFF)[:30])
+        assert read_exif(f) is None
+
+    def test_missing_file(self, tmp_path):
+        assert read_exif(tmp_path / "ghost.jpg") is None
+
+    def test_jpeg_reads_only_headers(self, tmp_path, monkeypatch):
+        f = tmp_path / "big.jpg"
+        f.write_bytes(make_jpeg(TIFF) + b"\0" * 5_000_000)
+        real_open = open
+        read_sizes = []
+
+        class Spy:
+            def __init__(self, fh):
+                self.fh = fh
+
+            def __enter__(self):
+                return self
+
+            def __exit__(self, *args):
+                self.fh.close()
+
+            def read(self, n=-1):
+                read_sizes.append(n)
+                return self.fh.read(n)
+
+            def seek(self, *args):
+                return self.fh.seek(*args)
+
+        monkeypatch.setattr(exif, "open", lambda *a: Spy(real_open(*a)), raising=False)
+        assert read_exif(f) == EXPECTED
+        assert all(0 <= n <= exif.HEADER_READ_LIMIT for n in read_sizes)
+
+
+class TestReadExifBatch:
+    def test_omits_files_without_exif(self, tmp_path):
+        photo = tmp_path / "a.jpg"
+        photo.write_bytes(make_jpeg(TIFF))
+        other = tmp_path / "b.txt"
+        other.write_text("x")
+        assert read_exif_batch([photo, other]) == {photo: EXPECTED}
+
+    def test_caches_negative_results(self, tmp_path):
+        other = tmp_path / "b.txt"
+        other.write_text("x")
+        cache = FileCache(tmp_path / ".cache.json")
+        read_exif_batch([other], cache)
+        assert cache.get(other.stat()) == {}
+        assert (tmp_path / ".cache.json").exists()
+
+
+# ---------------------------------------------------------------------------
+# Naming
+# ---------------------------------------------------------------------------
+
+
+class TestFormatPhotoName:
+    def test_with_model(self):
+        assert format_photo_name(EXPECTED, ".jpg") == "2024-05-06_070809_Canon-EOS-R5.jpg"
+
+    def test_without_model(self):
+        assert (
+            format_photo_name({"taken": "2024-05-06 07:08:09"}, ".jpg") == "2024-05-06_070809.jpg"
+        )
+
+    def test_strips_invalid_characters(self):
+        info = {"taken": "2024-05-06 07:08:09", "model": "A/B:C"}
+        assert format_photo_name(info, ".jpg") == "2024-05-06_070809_ABC.jpg"
+
+
+class TestComputeNewNamePhotoDate:
+    def test_renames_matching_file(self):
+        ops = [{"type": "photo_date", "photos": {"IMG_001.jpg": EXPECTED}}]
+        assert (
+            compute_new_name(Path("/tmp/IMG_001.jpg"), ops) == "2024-05-06_070809_Canon-EOS-R5.jpg"
+        )
+
+    def test_leaves_other_files(self):
+        ops = [{"type": "photo_date", "photos": {"IMG_001.jpg": EXPECTED}}]
+        assert compute_new_name(Path("/tmp/IMG_002.jpg"), ops) == "IMG_002.jpg"
+
+
+class TestTemplateExifFields:
+    def test_taken_and_camera(self, tmp_path):
+        f = tmp_path / "IMG_001.jpg"
+        f.write_bytes(make_jpeg(TIFF))
+        assert compile_template("{taken:%Y%m%d}-{camera}").render(f) == "20240506-Canon EOS R5"
+
+    def test_default_taken_format(self, tmp_path):
+        f = tmp_path / "IMG_001.jpg"
+        f.write_bytes(make_jpeg(TIFF))
+        assert compile_template("{taken}").render(f) == "2024-05-06_070809"
+
+    @pytest.mark.parametrize("content", [b"not a photo"])
+    def test_missing_exif_returns_none(self, tmp_path, content):
+        f = tmp_path / "a.jpg"
+        f.write_bytes(content)
+        assert compile_template("{taken}").render(f) is None
@@ -0,0 +1,135 @@
+"""Tests for extcheck: disk-backed conflict checks for very large batches."""
+
+from pathlib import Path
+
+import extcheck
+from extcheck import BloomFilter, iter_validated, validate_names
+from fsbackend import MemoryFileSystem
+from renamer import validate_new_names
+
+
+def make_folder(tmp_path: Path, names: list[str]) -> Path:
+    for name in names:
+        (tmp_path / name).write_text("")
+    return tmp_path
+
+
+def statuses(results) -> list[str]:
+    return [r["status"] for r in results]
+
+
+class TestBloomFilter:
+    def test_no_false_negatives(self):
+        bloom = BloomFilter(1000)
+        keys = [f"file{i}.txt" for i in range(1000)]
+        for key in keys:
+            bloom.add(key)
+        assert all(key in bloom for key in keys)
+
+    def test_false_positive_rate_is_near_the_target(self):
+        bloom = BloomFilter(10_000, error_rate=0.01)
+        for i in range(10_000):
+            bloom.add(f"in{i}")
+        false_positives = sum(f"out{i}" in bloom for i in range(10_000))
+        assert false_positives < 300
+
+    def test_add_reports_keys_already_seen(self):
+        bloom = BloomFilter(100)
+        assert bloom.add("a.txt") is False
+        assert bloom.add("a.txt") is True
+
+    def test_empty_capacity_still_works(self):
+        bloom = BloomFilter(0)
+        bloom.add("x")
+        assert "x" in bloom
+
+
+class TestIterValidated:
+    def test_matches_in_memory_validation(self, tmp_path):
+        folder = make_folder(tmp_path, [f"f{i}.txt" for i in range(50)] + ["taken.txt"])
+        files = sorted(p for p in folder.iterdir() if p.name != "taken.txt")
+        names = [f"g{i % 40}.txt" for i in range(len(files))]  # 10 planned duplicates
+        names[0] = "taken.txt"  # an existing file
+        names[1] = files[1].name  # no change
+        names[2] = "bad|name.txt"  # invalid
+        names[3] = "con.txt"  # reserved
+        pairs = list(zip(files, names))
+        assert list(iter_validated(pairs, len(pairs))) == validate_new_names(pairs)
+
+    def test_statuses(self, tmp_path):
+        folder = make_folder(tmp_path, ["a.txt", "b.txt", "c.txt", "d.txt", "existing.txt"])
+        pairs = [
+            (folder / "a.txt", "new.txt"),
+            (folder / "b.txt", "dup.txt"),
+            (folder / "c.txt", "dup.txt"),
+            (folder / "d.txt", "existing.txt"),
+        ]
+        assert statuses(iter_validated(pairs, 4)) == ["OK", "CONFLICT", "CONFLICT", "CONFLICT"]
+
+    def test_results_stream_in_input_order(self, tmp_path):
+        folder = make_folder(tmp_path, [f"{i}.txt" for i in range(30)])
+        pairs = [(folder / f"{i}.txt", f"n{i}.txt") for i in reversed(range(30))]
+        results = list(iter_validated(iter(pairs), 30))  # any iterable, read once
+        assert [(r["original"], r["new_name"]) for r in results] == pairs
+
+    def test_same_name_in_different_folders_is_not_a_conflict(self, tmp_path):
+        (tmp_path / "one").mkdir()
+        (tmp_path / "two").mkdir()
+        make_folder(tmp_path / "one", ["a.txt"])
+        make_folder(tmp_path / "two", ["a.txt"])
+        pairs = [(tmp_path / "one" / "a.txt", "b.txt"), (tmp_path / "two" / "a.txt", "b.txt")]
+        assert statuses(iter_validated(pairs, 2)) == ["OK", "OK"]
+
+    def test_case_insensitive_folder(self, tmp_path):
+        fs = MemoryFileSystem(case_sensitive=False)
+        folder = tmp_path / "media"
+        fs.add_files(folder, ["a.txt", "b.txt", "c.txt", "Photo.jpg"])
+        pairs = [
+            (folder / "a.txt", "Same.txt"),
+            (folder / "b.txt", "same.TXT"),
+            (folder / "c.txt", "A.TXT"),  # another existing file
+            (folder / "Photo.jpg", "photo.jpg"),  # case-only rename of the same entry
+        ]
+        expected = ["CONFLICT", "CONFLICT", "CONFLICT", "OK"]
+        assert statuses(iter_validated(pairs, 4, fs=fs)) == expected
+        assert statuses(validate_names(pairs, 4, threshold=0, fs=fs)) == expected
+        assert statuses(validate_names(pairs, 4, fs=fs)) == expected
+        assert not folder.exists()
+
+    def test_undercounted_batch_is_still_exact(self, tmp_path, monkeypatch):
+        monkeypatch.setattr(extcheck, "BATCH_ROWS", 7)
+        folder = make_folder(tmp_path, [f"f{i}.txt" for i in range(100)])
+        pairs = [(folder / f"f{i}.txt", f"g{i % 60}.txt") for i in range(100)]
+        assert list(iter_validated(pairs, 1)) == validate_new_names(pairs)
+
+    def test_missing_folder(self, tmp_path):
+        pairs = [(tmp_path / "gone" / "a.txt", "b.txt")]
+        assert statuses(iter_validated(pairs, 1)) == ["OK"]
+
+    def test_temporary_database_is_removed(self, tmp_path):
+        work = tmp_path / "work"
+        work.mkdir()
+        folder = make_folder(tmp_path, ["a.txt"])
+        results = iter_validated([(folder / "a.txt", "b.txt")], 1, workdir=work)
+        next(results)
+        assert len(list(work.iterdir())) == 1
+        results.close()
+        assert list(work.iterdir()) == []
+
+
+class TestValidateNames:
+    def test_small_batches_are_checked_in_memory(self, tmp_path, monkeypatch):
+        monkeypatch.setattr(extcheck, "iter_validated", None)  # must not be used
+        folder = make_folder(tmp_path, ["a.txt"])
+        assert statuses(validate_names([(folder / "a.txt", "b.txt")], 1)) == ["OK"]
+
+    def test_large_batches_are_checked_on_disk(self, tmp_path, monkeypatch):
+        calls = []
+        real = extcheck.iter_validated
+        monkeypatch.setattr(
+            extcheck, "iter_validated", lambda *args: calls.append(args[1]) or real(*args)
+        )
+        folder = make_folder(tmp_path, ["a.txt", "b.txt"])
+        pairs = [(folder / "a.txt", "x.txt"), (folder / "b.txt", "x.txt")]
+        assert statuses(validate_names(pairs, 2, threshold=1)) == ["CONFLICT", "CONFLICT"]
+        assert calls == [2]
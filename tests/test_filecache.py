@@ -0,0 +1,94 @@
+"""Tests for filecache.FileCache and map_cached()."""
+
+import json
+
+from filecache import FileCache, file_key, map_cached
+
+
+class TestFileCache:
+    def test_missing_file_starts_empty(self, tmp_path):
+        assert FileCache(tmp_path / "cache.json").entries == {}
+
+    def test_round_trip(self, tmp_path):
+        f = tmp_path / "a.txt"
+        f.write_text("x")
+        cache = FileCache(tmp_path / "cache.json")
+        cache.put(f.stat(), {"v": 1})
+        cache.save()
+        assert FileCache(tmp_path / "cache.json").get(f.stat()) == {"v": 1}
+
+    def test_entry_survives_rename(self, tmp_path):
+        f = tmp_path / "a.txt"
+        f.write_text("x")
+        cache = FileCache()
+        cache.put(f.stat(), "value")
+        renamed = f.rename(tmp_path / "b.txt")
+        assert cache.get(renamed.stat()) == "value"
+
+    def test_entry_invalidated_by_content_change(self, tmp_path):
+        f = tmp_path / "a.txt"
+        f.write_text("x")
+        cache = FileCache()
+        cache.put(f.stat(), "value")
+        f.write_text("longer content")
+        assert cache.get(f.stat()) is None
+
+    def test_malformed_cache_is_ignored(self, tmp_path):
+        (tmp_path / "cache.json").write_text("not json", encoding="utf-8")
+        assert FileCache(tmp_path / "cache.json").entries == {}
+
+    def test_save_skipped_when_clean(self, tmp_path):
+        FileCache(tmp_path / "cache.json").save()
+        assert not (tmp_path / "cache.json").exists()
+
+    def test_save_ignores_unwritable_path(self, tmp_path):
+        f = tmp_path / "a.txt"
+        f.write_text("x")
+        cache = FileCache(tmp_path / "missing_dir" / "cache.json")
+        cache.put(f.stat(), 1)
+        cache.save()  # must not raise
+        assert cache.dirty
+
+    def test_key_format(self, tmp_path):
+        f = tmp_path / "a.txt"
+        f.write_text("x")
+        st = f.stat()
+        assert file_key(st) == f"{st.st_dev}:{st.st_ino}:{st.st_size}:{st.st_mtime_ns}"
+
+
+class TestMapCached:
+    def test_computes_values(self, tmp_path):
+        files = [tmp_path / "a.txt", tmp_path / "b.txt"]
+        for f in files:
+            f.write_text(f.stem)
+        assert map_cached(files, lambda p: p.read_text(), workers=2) == {
+            files[0]: "a",
+            files[1]: "b",
+        }
+
+    def test_uses_cache_on_second_call(self, tmp_path):
+        f = tmp_path / "a.txt"
+        f.write_text("x")
+        calls = []
+        cache = FileCache()
+        map_cached([f], lambda p: calls.append(p) or "v", cache)
+        map_cached([f], lambda p: calls.append(p) or "v", cache)
+        assert calls == [f]
+
+    def test_missing_files_are_omitted(self, tmp_path):
+        assert map_cached([tmp_path / "ghost.txt"], lambda p: "v") == {}
+
+    def test_none_values_are_not_cached(self, tmp_path):
+        f = tmp_path / "a.txt"
+        f.write_text("x")
+        cache = FileCache()
+        assert map_cached([f], lambda p: None, cache) == {f: None}
+        assert cache.entries == {}
+
+    def test_cache_file_is_json_dict(self, tmp_path):
+        f = tmp_path / "a.txt"
+        f.write_text("x")
+        cache = FileCache(tmp_path / "cache.json")
+        map_cached([f], lambda p: 1, cache)
+        cache.save()
+        assert isinstance(json.loads((tmp_path / "cache.json").read_text()), dict)
@@ -0,0 +1,87 @@
+"""Tests for engine.FolderListing and renamer.format_size()."""
+
+import os
+
+from engine import FolderListing, list_files
+from renamer import format_size
+
+
+class TestFolderListing:
+    def test_files_match_list_files(self, sample_dir):
+        listing = FolderListing(sample_dir)
+        assert listing.files == list_files(sample_dir)
+        assert listing.select() == list_files(sample_dir)
+
+    def test_excluded_names(self, sample_dir):
+        excluded = frozenset({"notes.txt"})
+        listing = FolderListing(sample_dir, excluded)
+        assert listing.files == list_files(sample_dir, excluded_names=excluded)
+
+    def test_single_extension_matches_list_files(self, sample_dir):
+        listing = FolderListing(sample_dir)
+        for ext in (".jpg", ".JPG", ".txt", ".docx", ".png"):
+            assert listing.select([ext]) == list_files(sample_dir, ext)
+
+    def test_several_extensions_keep_listing_order(self, tmp_path):
+        for name in ("b.txt", "a.jpg", "C.JPG", "d.txt", "e.png"):
+            (tmp_path / name).write_text("")
+        listing = FolderListing(tmp_path)
+        assert [f.name for f in listing.select([".txt", ".jpg"])] == [
+            "a.jpg",
+            "b.txt",
+            "C.JPG",
+            "d.txt",
+        ]
+
+    def test_histogram_counts_and_sizes(self, tmp_path):
+        (tmp_path / "a.jpg").write_bytes(b"x" * 10)
+        (tmp_path / "b.JPG").write_bytes(b"x" * 5)
+        (tmp_path / "c.txt").write_bytes(b"x" * 3)
+        (tmp_path / "README").write_bytes(b"")
+        listing = FolderListing(tmp_path)
+        assert listing.histogram() == {"": (1, 0), ".jpg": (2, 15), ".txt": (1, 3)}
+        sizes = dict(zip((f.name for f in listing.files), listing.sizes))
+        assert sizes == {"a.jpg": 10, "b.JPG": 5, "c.txt": 3, "README": 0}
+
+    def test_indexes(self, tmp_path):
+        for name in ("a.txt", "b.jpg", "c.txt"):
+            (tmp_path / name).write_text("")
+        listing = FolderListing(tmp_path)
+        assert listing.indexes() == [0, 1, 2]
+        assert listing.indexes([".txt"]) == [0, 2]
+        assert listing.indexes([".txt", ".TXT"]) == [0, 2]
+
+    def test_is_current(self, tmp_path):
+        (tmp_path / "a.txt").write_text("")
+        listing = FolderListing(tmp_path)
+        assert listing.is_current()
+        (tmp_path / "b.txt").write_text("")
+        st = os.stat(tmp_path)
+        os.utime(tmp_path, ns=(st.st_atime_ns, listing.mtime_ns + 1_000_000_000))
+        assert not listing.is_current()
+
+    def test_is_current_after_folder_removed(self, tmp_path):
+        folder = tmp_path / "sub"
+        folder.mkdir()
+        listing = FolderListing(folder)
+        folder.rmdir()
+        assert not listing.is_current()
+
+    def test_single_scan(self, sample_dir, monkeypatch):
+        calls = []
+        real_scandir = os.scandir
+        monkeypatch.setattr(os, "scandir", lambda p: calls.append(p) or real_scandir(p))
+        listing = FolderListing(sample_dir)
+        listing.histogram()
+        listing.select([".jpg"])
+        listing.select([".txt", ".docx"])
+        assert len(calls) == 1
+
+
+class TestFormatSize:
+    def test_units(self):
+        assert format_size(0) == "0 B"
+        assert format_size(1023) == "1023 B"
+        assert format_size(1536) == "1.5 KB"
+        assert format_size(5 * 1024 * 1024) == "5.0 MB"
+        assert format_size(3 * 1024**3) == "3.0 GB"
@@ -0,0 +1,337 @@
+"""Tests for the fsbackend filesystem backends and the engine running on them."""
+
+import asyncio
+import errno
+import json
+from pathlib import Path
+
+import pytest
+
+import asyncapi
+from engine import (
+    UNDO_FILE,
+    FolderListing,
+    apply_one,
+    list_files,
+    load_undo_map,
+    undo_renames,
+    validate_new_names,
+)
+from fsbackend import LOCAL, OPERATIONS, FaultyFileSystem, FileSystem, MemoryFileSystem
+from metrics import ApplyMetrics
+from organize import create_folders, plan_organize
+from session import RenameSession
+
+ROOT = Path("/lib")
+LOWER = {"type": "case", "mode": "lowercase"}
+
+
+@pytest.fixture()
+def fs():
+    fs = MemoryFileSystem()
+    fs.add_files(ROOT, ["A.txt", "B.txt", "c.jpg"], size=3)
+    return fs
+
+
+def statuses(rows):
+    return [(r["original"].name, r["new_name"], r["status"]) for r in rows]
+
+
+def test_incomplete_backend_cannot_be_instantiated():
+    class ListOnly(FileSystem):
+        def listdir(self, folder):
+            return []
+
+    with pytest.raises(TypeError, match="abstract"):
+        ListOnly()
+
+
+class TestMemoryFileSystem:
+    def test_listing_and_stat(self, fs):
+        fs.mkdir(ROOT / "sub")
+        assert sorted(fs.listdir(ROOT)) == ["A.txt", "B.txt", "c.jpg", "sub"]
+        with fs.scandir(ROOT) as it:
+            entries = {e.name: e for e in it}
+        assert entries["A.txt"].is_file() and not entries["A.txt"].is_dir()
+        assert entries["sub"].is_dir()
+        assert entries["A.txt"].path == str(ROOT / "A.txt")
+        assert fs.stat(ROOT / "A.txt").st_size == 3
+        assert fs.exists(ROOT / "sub") and not fs.exists(ROOT / "nope")
+
+    def test_missing_paths_raise(self, fs):
+        with pytest.raises(FileNotFoundError):
+            fs.stat(ROOT / "nope")
+        with pytest.raises(FileNotFoundError):
+            fs.listdir(Path("/other"))
+        with pytest.raises(NotADirectoryError):
+            fs.listdir(ROOT / "A.txt")
+        with pytest.raises(FileNotFoundError):
+            fs.rename(ROOT / "nope", ROOT / "x")
+        with pytest.raises(FileNotFoundError):
+            fs.rename(ROOT / "A.txt", ROOT / "missing" / "A.txt")
+
+    def test_rename_changes_folder_mtime(self, fs):
+        before = fs.stat(ROOT).st_mtime_ns
+        ino = fs.stat(ROOT / "A.txt").st_ino
+        fs.rename(ROOT / "A.txt", ROOT / "a.txt")
+        assert fs.stat(ROOT).st_mtime_ns > before
+        assert fs.stat(ROOT / "a.txt").st_ino == ino
+        assert not fs.exists(ROOT / "A.txt")
+
+    def test_rename_replaces_a_file_but_not_a_folder(self, fs):
+        fs.rename(ROOT / "A.txt", ROOT / "B.txt")
+        assert sorted(fs.listdir(ROOT)) == ["B.txt", "c.jpg"]
+        fs.mkdir(ROOT / "d")
+        with pytest.raises(IsADirectoryError):
+            fs.rename(ROOT / "B.txt", ROOT / "d")
+        fs.add_file(ROOT / "d" / "x")
+        fs.mkdir(ROOT / "e")
+        with pytest.raises(OSError) as e:
+            fs.rename(ROOT / "e", ROOT / "d")
+        assert e.value.errno == errno.ENOTEMPTY
+        with pytest.raises(NotADirectoryError):
+            fs.rename(ROOT / "e", ROOT / "B.txt")
+        fs.rename(ROOT / "d", ROOT / "f")
+        assert fs.listdir(ROOT / "f") == ["x"]
+
+    def test_rename_noreplace(self, fs):
+        with pytest.raises(FileExistsError):
+            fs.rename_noreplace(ROOT / "A.txt", ROOT / "B.txt")
+        fs.rename_noreplace(ROOT / "A.txt", ROOT / "a.txt")
+        assert sorted(fs.listdir(ROOT)) == ["B.txt", "a.txt", "c.jpg"]
+
+    def test_case_insensitive_names(self):
+        fs = MemoryFileSystem(case_sensitive=False)
+        fs.add_file(ROOT / "Photo.JPG")
+        assert fs.exists(ROOT / "photo.jpg")
+        fs.rename(ROOT / "Photo.JPG", ROOT / "photo.jpg")
+        assert fs.listdir(ROOT) == ["photo.jpg"]
+        assert fs.probe(ROOT) == (False, False)
+
+    def test_normalizing_names(self):
+        fs = MemoryFileSystem(normalizes=True)
+        fs.add_file(ROOT / "Café.txt")
+        assert fs.exists(ROOT / "Café.txt")
+        assert not fs.exists(ROOT / "café.txt")
+
+    def test_mkdir_rmdir_unlink(self, fs):
+        with pytest.raises(FileNotFoundError):
+            fs.mkdir(ROOT / "a" / "b")
+        fs.mkdir(ROOT / "a" / "b", parents=True)
+        fs.mkdir(ROOT / "a", exist_ok=True)
+        with pytest.raises(FileExistsError):
+            fs.mkdir(ROOT / "a")
+        with pytest.raises(FileExistsError):
+            fs.mkdir(ROOT / "A.txt", exist_ok=True)
+        with pytest.raises(NotADirectoryError):
+            fs.mkdir(ROOT / "A.txt" / "x")
+        with pytest.raises(OSError) as e:
+            fs.rmdir(ROOT / "a")
+        assert e.value.errno == errno.ENOTEMPTY
+        fs.rmdir(ROOT / "a" / "b")
+        fs.rmdir(ROOT / "a")
+        with pytest.raises(IsADirectoryError):
+            fs.unlink(ROOT)
+        fs.unlink(ROOT / "A.txt")
+        assert not fs.exists(ROOT / "A.txt")
+
+    def test_text_files(self, fs):
+        fs.write_text(ROOT / "notes.md", "héllo")
+        assert fs.read_text(ROOT / "notes.md") == "héllo"
+        assert fs.stat(ROOT / "notes.md").st_size == 6
+        assert fs.read_text(ROOT / "A.txt") == ""
+        with pytest.raises(IsADirectoryError):
+            fs.read_text(ROOT)
+        fs.mkdir(ROOT / "d")
+        with pytest.raises(IsADirectoryError):
+            fs.write_text(ROOT / "d", "x")
+
+    def test_injected_failures(self, fs):
+        fs.fail(ROOT / "B.txt", "rename", errno.EBUSY)
+        with pytest.raises(OSError) as e:
+            fs.rename(ROOT / "B.txt", ROOT / "b.txt")
+        assert e.value.errno == errno.EBUSY
+        assert e.value.filename == str(ROOT / "B.txt")
+        with pytest.raises(OSError):
+            fs.rename(ROOT / "A.txt", ROOT / "B.txt")  # the target counts too
+        fs.fail(ROOT / "B.txt", "rename", None)
+        fs.rename(ROOT / "B.txt", ROOT / "b.txt")
+        with pytest.raises(ValueError, match="Unknown operation"):
+            fs.fail(ROOT, "chmod")
+
+    def test_mirror(self, tmp_path):
+        (tmp_path / "a.txt").write_text("abc")
+        (tmp_path / "sub").mkdir()
+        fs = MemoryFileSystem.mirror(tmp_path)
+        assert sorted(fs.listdir(tmp_path)) == ["a.txt", "sub"]
+        assert fs.stat(tmp_path / "a.txt").st_size == 3
+        assert fs.stat(tmp_path / "a.txt").st_mtime_ns == (tmp_path / "a.txt").stat().st_mtime_ns
+        fs.rename(tmp_path / "a.txt", tmp_path / "b.txt")
+        assert (tmp_path / "a.txt").exists()  # the real folder is untouched
+
+
+class TestFaultyFileSystem:
+    def test_latency_per_operation(self, fs):
+        slept = []
+        faulty = FaultyFileSystem(fs, latency={"rename": 0.01}, sleep=slept.append)
+        faulty.listdir(ROOT)
+        faulty.rename(ROOT / "A.txt", ROOT / "a.txt")
+        assert slept == [0.01]
+        assert faulty.calls == {"listdir": 1, "rename": 1}
+
+    def test_jitter_and_failures_are_reproducible(self, fs):
+        def run():
+            slept = []
+            faulty = FaultyFileSystem(
+                fs, latency=0.001, jitter=0.002, error_rate=0.5, seed=7, sleep=slept.append
+            )
+            failed = []
+            for i in range(20):
+                try:
+                    faulty.exists(ROOT / f"{i}")
+                except OSError as e:
+                    assert e.errno == errno.EIO
+                    failed.append(i)
+            return slept, failed
+
+        slept, failed = run()
+        assert all(0.001 <= s <= 0.003 for s in slept)
+        assert 0 < len(failed) < 20
+        assert run() == (slept, failed)
+
+    def test_unknown_operation(self):
+        with pytest.raises(ValueError, match="chmod"):
+            FaultyFileSystem(error_rate={"chmod": 1.0})
+
+    def test_delegates_every_operation(self, fs):
+        faulty = FaultyFileSystem(fs)
+        faulty.mkdir(ROOT / "d")
+        faulty.write_text(ROOT / "d" / "t", "x")
+        assert faulty.read_text(ROOT / "d" / "t") == "x"
+        assert faulty.lstat(ROOT / "d" / "t").st_size == 1
+        faulty.move(ROOT / "d" / "t", ROOT / "t")
+        faulty.unlink(ROOT / "t")
+        faulty.rmdir(ROOT / "d")
+        with faulty.scandir(ROOT) as it:
+            assert len(list(it)) == 3
+        assert faulty.probe(ROOT) == (True, False)
+        assert set(faulty.calls) <= set(OPERATIONS)
+
+    def test_wraps_the_real_filesystem(self, tmp_path):
+        faulty = FaultyFileSystem(error_rate={"rename": 1.0})
+        (tmp_path / "a").write_text("")
+        with pytest.raises(OSError):
+            faulty.rename(tmp_path / "a", tmp_path / "b")
+        assert faulty.inner is LOCAL
+        assert (tmp_path / "a").exists()
+
+
+class TestEngineOnMemory:
+    def test_session_dry_run(self, fs):
+        s = RenameSession(ROOT, [LOWER], fs=fs)
+        assert statuses(s.preview()) == [
+            ("A.txt", "a.txt", "OK"),
+            ("B.txt", "b.txt", "OK"),
+            ("c.jpg", "c.jpg", "NO CHANGE"),
+        ]
+        assert [o["status"] for o in s.apply()] == ["RENAMED", "RENAMED"]
+        assert sorted(fs.listdir(ROOT)) == [UNDO_FILE, "a.txt", "b.txt", "c.jpg"]
+        assert load_undo_map(ROOT, fs) == [
+            {"old": "A.txt", "new": "a.txt"},
+            {"old": "B.txt", "new": "b.txt"},
+        ]
+        assert {o["status"] for o in RenameSession(ROOT, fs=fs).undo()} == {"RESTORED"}
+        assert "A.txt" in fs.listdir(ROOT)
+
+    def test_session_sees_memory_changes(self, fs):
+        s = RenameSession(ROOT, [LOWER], fs=fs)
+        s.preview()
+        fs.add_file(ROOT / "D.txt")
+        assert "D.txt" in [r["original"].name for r in s.preview()]
+
+    def test_conflicts_follow_the_backend(self):
+        fs = MemoryFileSystem(case_sensitive=False)
+        fs.add_files(ROOT, ["A.txt", "b.TXT"])
+        s = RenameSession(ROOT, [{"type": "prefix", "prefix": ""}], fs=fs)
+        pairs = [(ROOT / "A.txt", "B.txt")]
+        assert validate_new_names(pairs, fs=fs)[0]["status"] == "CONFLICT"
+        pairs = [(ROOT / "b.TXT", "b.txt")]  # a case-only rename of the same entry
+        assert validate_new_names(pairs, fs=fs)[0]["status"] == "OK"
+        assert [r["status"] for r in s.preview()] == ["NO CHANGE", "NO CHANGE"]
+
+    def test_exact_failure_simulation(self, fs):
+        fs.fail(ROOT / "B.txt", "rename", errno.EACCES)
+        s = RenameSession(ROOT, [LOWER], fs=fs)
+        outcomes = s.apply()
+        assert [o["status"] for o in outcomes] == ["RENAMED", "ERROR"]
+        assert "Permission denied" in outcomes[1]["error"]
+
+    def test_unwritable_undo_map_is_ignored(self, fs):
+        fs.fail(ROOT / UNDO_FILE, "write_text")
+        s = RenameSession(ROOT, [LOWER], fs=fs)
+        s.apply()
+        assert not fs.exists(ROOT / UNDO_FILE)
+        assert {o["status"] for o in s.undo()} == {"RESTORED"}
+
+    def test_unreadable_undo_map(self, fs):
+        fs.write_text(ROOT / UNDO_FILE, json.dumps([{"old": "x", "new": "y"}]))
+        fs.fail(ROOT / UNDO_FILE, "read_text")
+        assert load_undo_map(ROOT, fs) is None
+
+    def test_list_files_and_listing(self, fs):
+        fs.add_files(ROOT, [".hidden", "desktop.ini"])
+        fs.mkdir(ROOT / "sub")
+        assert [f.name for f in list_files(ROOT, ".TXT", fs=fs)] == ["A.txt", "B.txt"]
+        listing = FolderListing(ROOT, fs=fs)
+        assert listing.histogram() == {".jpg": (1, 3), ".txt": (2, 6)}
+        assert listing.is_current()
+        fs.unlink(ROOT / "A.txt")
+        assert not listing.is_current()
+
+    def test_undo_reports_missing_and_errors(self, fs):
+        fs.fail(ROOT / "B.txt", "exists")
+        undo_map = [{"old": "x", "new": "gone.txt"}, {"old": "y", "new": "B.txt"}]
+        fs.fail(ROOT / "B.txt", "rename")
+        outcomes = undo_renames(ROOT, undo_map, fs)
+        assert [o["status"] for o in outcomes] == ["MISSING", "ERROR"]
+
+    def test_cross_device_fallback_uses_move(self, fs):
+        fs.fail(ROOT / "A.txt", "rename", errno.EXDEV)
+        item = {"original": ROOT / "A.txt", "new_name": "a.txt", "status": "OK"}
+        assert apply_one(item, ApplyMetrics(1), fs=fs)["status"] == "RENAMED"
+        assert fs.exists(ROOT / "a.txt")
+
+    def test_organize_in_memory(self, fs):
+        fs.add_file(ROOT / "Show" / "poster.jpg")
+        fs.add_file(ROOT / "blocked")
+        pairs = [(ROOT / "A.txt", "A.txt"), (ROOT / "B.txt", "B.txt"), (ROOT / "c.jpg", "c.jpg")]
+        rows = plan_organize(pairs, "Show/{stem}", fs)
+        assert [r["status"] for r in rows] == ["OK", "OK", "OK"]
+        assert plan_organize(pairs[:1], "blocked", fs)[0]["status"].startswith("INVALID folder")
+        assert create_folders(rows, fs) == [
+            ROOT / "Show" / "A",
+            ROOT / "Show" / "B",
+            ROOT / "Show" / "c",
+        ]
+        outcomes = [apply_one(r, ApplyMetrics(3), fs=fs) for r in rows]
+        assert [o["status"] for o in outcomes] == ["RENAMED"] * 3
+        undo_map = [{"old": o["original"].name, "new": o["new_name"]} for o in outcomes]
+        assert {o["status"] for o in undo_renames(ROOT, undo_map, fs)} == {"RESTORED"}
+        assert fs.listdir(ROOT / "Show") == ["poster.jpg"]  # emptied folders removed
+
+    def test_asyncapi(self, fs):
+        async def run():
+            results = await asyncapi.plan(ROOT, [LOWER], fs=fs)
+            return [o async for o in asyncapi.apply(results, fs=fs)]
+
+        outcomes = asyncio.run(run())
+        assert sorted(o["new_name"] for o in outcomes) == ["a.txt", "b.txt"]
+        assert sorted(fs.listdir(ROOT)) == ["a.txt", "b.txt", "c.jpg"]
+
+    def test_latency_reaches_the_engine(self, fs):
+        slept = []
+        faulty = FaultyFileSystem(fs, latency={"rename": 0.005}, sleep=slept.append)
+        s = RenameSession(ROOT, [LOWER], fs=faulty)
+        s.apply()
+        assert slept == [0.005, 0.005]
+        assert faulty.calls["scandir"] == 1  # one scan serves the snapshot and the listing
@@ -0,0 +1,166 @@
+"""Tests for hashing.hash_file(), Hasher, and dedupe_conflicts()."""
+
+import hashlib
+from pathlib import Path
+
+import pytest
+
+import hashing
+from fsbackend import LOCAL, MemoryFileSystem
+from hashing import HASH_CACHE_FILE, Hasher, dedupe_conflicts, hash_file
+from nameindex import NameIndex
+from renamer import compute_new_name, validate_new_names
+
+
+def write(path: Path, data: bytes) -> Path:
+    path.write_bytes(data)
+    return path
+
+
+class TestHashFile:
+    def test_full_digest_matches_hashlib(self, tmp_path):
+        data = b"abc" * 500_000
+        f = write(tmp_path / "a.bin", data)
+        assert hash_file(f) == hashlib.blake2b(data).hexdigest()
+
+    def test_other_algorithm(self, tmp_path):
+        f = write(tmp_path / "a.bin", b"hello")
+        assert hash_file(f, "sha256") == hashlib.sha256(b"hello").hexdigest()
+
+    def test_partial_equals_full_for_small_files(self, tmp_path):
+        f = write(tmp_path / "a.bin", b"small")
+        assert hash_file(f, partial=True) == hash_file(f)
+
+    def test_partial_ignores_middle_of_large_files(self, tmp_path):
+        size = hashing.PARTIAL_SIZE * 4
+        a = write(tmp_path / "a.bin", b"\0" * size)
+        middle = bytearray(size)
+        middle[size // 2] = 1
+        b = write(tmp_path / "b.bin", bytes(middle))
+        assert hash_file(a, partial=True) == hash_file(b, partial=True)
+        assert hash_file(a) != hash_file(b)
+
+
+class TestHasher:
+    def test_unknown_algorithm_raises(self):
+        with pytest.raises(ValueError):
+            Hasher(algo="not-an-algo")
+
+    def test_digests(self, tmp_path):
+        a = write(tmp_path / "a.bin", b"a")
+        assert Hasher().digests([a, tmp_path / "ghost"]) == {a: hash_file(a)}
+
+    def test_digests_persist_to_folder_cache(self, tmp_path):
+        a = write(tmp_path / "a.bin", b"a")
+        Hasher.for_folder(tmp_path).digests([a])
+        assert (tmp_path / HASH_CACHE_FILE).exists()
+
+    def test_cached_digest_skips_reading(self, tmp_path, monkeypatch):
+        a = write(tmp_path / "a.bin", b"a")
+        hasher = Hasher()
+        hasher.digests([a])
+        monkeypatch.setattr(hashing, "hash_file", lambda *a, **k: pytest.fail("re-hashed"))
+        hasher.digests([a])
+
+    def test_duplicate_groups(self, tmp_path):
+        a = write(tmp_path / "a.bin", b"same")
+        b = write(tmp_path / "b.bin", b"diff")
+        c = write(tmp_path / "c.bin", b"same")
+        d = write(tmp_path / "d.bin", b"unique size")
+        assert Hasher().duplicate_groups([a, b, c, d]) == [[a, c]]
+
+    def test_unique_sizes_are_never_hashed(self, tmp_path, monkeypatch):
+        a = write(tmp_path / "a.bin", b"1")
+        b = write(tmp_path / "b.bin", b"22")
+        monkeypatch.setattr(hashing, "hash_file", lambda *a, **k: pytest.fail("hashed"))
+        assert Hasher().duplicate_groups([a, b]) == []
+
+    def test_large_files_differing_in_middle_are_not_duplicates(self, tmp_path):
+        size = hashing.PARTIAL_SIZE * 4
+        a = write(tmp_path / "a.bin", b"\0" * size)
+        middle = bytearray(size)
+        middle[size // 2] = 1
+        b = write(tmp_path / "b.bin", bytes(middle))
+        c = write(tmp_path / "c.bin", b"\0" * size)
+        assert Hasher(workers=2).duplicate_groups([a, b, c]) == [[a, c]]
+
+
+class TestDedupeConflicts:
+    def test_identical_sources_keep_one_ok(self, tmp_path):
+        a = write(tmp_path / "a.txt", b"same")
+        b = write(tmp_path / "b.txt", b"same")
+        results = validate_new_names([(a, "x.txt"), (b, "x.txt")])
+        checked = dedupe_conflicts(results, fs=LOCAL)
+        assert [r["status"] for r in checked] == ["OK", "DUPLICATE"]
+
+    def test_different_sources_stay_conflict(self, tmp_path):
+        a = write(tmp_path / "a.txt", b"one")
+        b = write(tmp_path / "b.txt", b"two")
+        results = validate_new_names([(a, "x.txt"), (b, "x.txt")])
+        checked = dedupe_conflicts(results, fs=LOCAL)
+        assert [r["status"] for r in checked] == ["CONFLICT", "CONFLICT"]
+
+    def test_source_identical_to_existing_target(self, tmp_path):
+        a = write(tmp_path / "a.txt", b"same")
+        write(tmp_path / "x.txt", b"same")
+        results = validate_new_names([(a, "x.txt")])
+        assert dedupe_conflicts(results, fs=LOCAL)[0]["status"] == "DUPLICATE"
+
+    def test_existing_target_different_content_stays_conflict(self, tmp_path):
+        a = write(tmp_path / "a.txt", b"one")
+        b = write(tmp_path / "b.txt", b"one")
+        write(tmp_path / "x.txt", b"two")
+        results = validate_new_names([(a, "x.txt"), (b, "x.txt")])
+        checked = dedupe_conflicts(results, fs=LOCAL)
+        assert [r["status"] for r in checked] == ["CONFLICT", "DUPLICATE"]
+
+    def test_does_not_mutate_input(self, tmp_path):
+        a = write(tmp_path / "a.txt", b"same")
+        b = write(tmp_path / "b.txt", b"same")
+        results = validate_new_names([(a, "x.txt"), (b, "x.txt")])
+        dedupe_conflicts(results, fs=LOCAL)
+        assert results[1]["status"] == "CONFLICT"
+
+    def test_non_conflict_rows_untouched(self, tmp_path):
+        a = write(tmp_path / "a.txt", b"same")
+        results = validate_new_names([(a, "y.txt")])
+        assert dedupe_conflicts(results, fs=LOCAL) == results
+
+    def test_case_sensitive_folder_keeps_case_variants_apart(self, tmp_path):
+        a = write(tmp_path / "a.txt", b"same")
+        b = write(tmp_path / "b.txt", b"same")
+        results = [
+            {"original": a, "new_name": "X.txt", "status": "CONFLICT"},
+            {"original": b, "new_name": "x.txt", "status": "CONFLICT"},
+        ]
+        checked = dedupe_conflicts(results, index=NameIndex(case_sensitive=True), fs=LOCAL)
+        assert [r["status"] for r in checked] == ["OK", "OK"]
+
+    def test_normalizing_folder_groups_nfc_and_nfd(self, tmp_path):
+        a = write(tmp_path / "a.txt", b"same")
+        b = write(tmp_path / "b.txt", b"same")
+        nfc, nfd = "Caf\u00e9.txt", "Cafe\u0301.txt"
+        index = NameIndex(case_sensitive=True, normalizes=True)
+        results = validate_new_names([(a, nfc), (b, nfd)], index=index)
+        checked = dedupe_conflicts(results, index=index, fs=LOCAL)
+        assert [r["status"] for r in checked] == ["OK", "DUPLICATE"]
+
+    def test_existence_is_checked_through_fs(self, tmp_path):
+        a = write(tmp_path / "a.txt", b"same")
+        b = write(tmp_path / "b.txt", b"same")
+        write(tmp_path / "x.txt", b"other")  # on disk, but not in the backend
+        fs = MemoryFileSystem()
+        fs.add_files(tmp_path, ["a.txt", "b.txt"])
+        results = validate_new_names([(a, "x.txt"), (b, "x.txt")], fs=fs)
+        checked = dedupe_conflicts(results, fs=fs)
+        assert [r["status"] for r in checked] == ["OK", "DUPLICATE"]
+
+
+class TestComputeNewNameContentHash:
+    def test_uses_hash_for_file(self):
+        ops = [{"type": "content_hash", "hashes": {"a.jpg": "deadbeef"}}]
+        assert compute_new_name(Path("/tmp/a.jpg"), ops) == "deadbeef.jpg"
+
+    def test_missing_hash_leaves_stem(self):
+        ops = [{"type": "content_hash", "hashes": {}}]
+        assert compute_new_name(Path("/tmp/a.jpg"), ops) == "a.jpg"
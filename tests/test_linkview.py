@@ -0,0 +1,184 @@
+"""Tests for linkview.py: planning and syncing a hard/symlinked library view."""
+
+import json
+import os
+from pathlib import Path
+
+import pytest
+
+import linkview
+from linkview import MANIFEST_FILE, load_manifest, plan_links, sync_links, view_targets
+
+TV = "{show}/Season {season:02}"
+
+
+def make(folder: Path, *names: str) -> list[Path]:
+    folder.mkdir(parents=True, exist_ok=True)
+    paths = []
+    for name in names:
+        (folder / name).write_text(name)
+        paths.append(folder / name)
+    return paths
+
+
+def sync(files, names, view, mode="hardlink", template=TV):
+    plan = plan_links(view_targets(files, names, template), view, mode)
+    return plan, sync_links(plan)
+
+
+class TestViewTargets:
+    def test_targets(self, tmp_path):
+        files = make(tmp_path / "src", "show.s01e02.mkv", "notes.txt")
+        targets = view_targets(files, ["Show - S01E02.mkv", "notes.txt"], TV)
+        assert targets == [
+            (files[0], "Show/Season 01/Show - S01E02.mkv", None),
+            (files[1], "notes.txt", None),
+        ]
+
+    def test_invalid(self, tmp_path):
+        files = make(tmp_path / "src", "a.txt", "b.txt")
+        targets = view_targets(files, ["a?.txt", "b.txt"], "x/..")
+        assert [t[2] for t in targets] == [
+            "INVALID folder (empty name)",
+            "INVALID folder (empty name)",
+        ]
+        assert view_targets(files[:1], ["a?.txt"])[0][2] == "INVALID (illegal characters)"
+
+
+class TestSync:
+    @pytest.mark.parametrize("mode", ["hardlink", "symlink"])
+    def test_creates_links_and_leaves_originals(self, tmp_path, mode):
+        files = make(tmp_path / "src", "show.s01e01.mkv", "show.s01e02.mkv")
+        view = tmp_path / "view"
+        plan, summary = sync(files, ["Show - S01E01.mkv", "Show - S01E02.mkv"], view, mode)
+        assert summary == {"created": 2, "replaced": 0, "kept": 0, "pruned": 0, "errors": {}}
+        link = view / "Show" / "Season 01" / "Show - S01E01.mkv"
+        assert link.read_text() == "show.s01e01.mkv"
+        assert all(f.exists() for f in files)
+        if mode == "hardlink":
+            assert os.path.samefile(link, files[0])
+        else:
+            assert os.readlink(link) == str(files[0].absolute())
+        assert set(load_manifest(view)) == {
+            "Show/Season 01/Show - S01E01.mkv",
+            "Show/Season 01/Show - S01E02.mkv",
+        }
+
+    @pytest.mark.parametrize("mode", ["hardlink", "symlink"])
+    def test_rerun_is_incremental(self, tmp_path, mode):
+        files = make(tmp_path / "src", "show.s01e01.mkv", "show.s01e02.mkv")
+        view = tmp_path / "view"
+        names = ["Show - S01E01.mkv", "Show - S01E02.mkv"]
+        sync(files, names, view, mode)
+        plan, summary = sync(files, names, view, mode)
+        assert (plan.create, plan.replace, plan.prune) == ({}, {}, [])
+        assert summary["kept"] == 2
+
+    def test_renamed_target_replaces_and_prunes(self, tmp_path):
+        files = make(tmp_path / "src", "show.s01e01.mkv", "show.s02e01.mkv")
+        view = tmp_path / "view"
+        sync(files, ["Show - S01E01.mkv", "Show - S02E01.mkv"], view)
+        # The S02 file is gone from the source; S01 gets a new name
+        files[1].unlink()
+        plan, summary = sync(files[:1], ["Show - S01E01 - Pilot.mkv"], view)
+        assert list(plan.create) == ["Show/Season 01/Show - S01E01 - Pilot.mkv"]
+        assert plan.prune == [
+            "Show/Season 01/Show - S01E01.mkv",
+            "Show/Season 02/Show - S02E01.mkv",
+        ]
+        assert summary["pruned"] == 2
+        assert not (view / "Show" / "Season 02").exists()
+        assert sorted(load_manifest(view)) == ["Show/Season 01/Show - S01E01 - Pilot.mkv"]
+
+    def test_changed_source_replaces_link(self, tmp_path):
+        files = make(tmp_path / "src", "a.mkv", "b.mkv")
+        view = tmp_path / "view"
+        sync(files[:1], ["movie.mkv"], view, template=None)
+        plan, summary = sync(files[1:], ["movie.mkv"], view, template=None)
+        assert list(plan.replace) == ["movie.mkv"]
+        assert (view / "movie.mkv").read_text() == "b.mkv"
+        assert summary["replaced"] == 1
+
+    def test_failed_replace_keeps_old_link(self, tmp_path, monkeypatch):
+        files = make(tmp_path / "src", "a.mkv", "b.mkv")
+        view = tmp_path / "view"
+        sync(files[:1], ["movie.mkv"], view, template=None)
+
+        real_replace = os.replace
+
+        def fail_on_link(src, dst):
+            if Path(dst).name == "movie.mkv":
+                raise OSError(5, "Input/output error")
+            real_replace(src, dst)
+
+        monkeypatch.setattr(linkview.os, "replace", fail_on_link)
+        _, summary = sync(files[1:], ["movie.mkv"], view, template=None)
+        monkeypatch.undo()
+        assert "Input/output error" in summary["errors"]["movie.mkv"]
+        assert (view / "movie.mkv").read_text() == "a.mkv"
+        assert sorted(p.name for p in view.iterdir()) == [MANIFEST_FILE, "movie.mkv"]
+        assert load_manifest(view)["movie.mkv"][1] == str(files[0])
+
+    def test_foreign_files_are_never_touched(self, tmp_path):
+        files = make(tmp_path / "src", "a.mkv")
+        view = tmp_path / "view"
+        make(view, "movie.mkv")
+        plan, summary = sync(files, ["movie.mkv"], view, template=None)
+        assert plan.conflicts == {"movie.mkv": "CONFLICT (not made by renametool)"}
+        assert (view / "movie.mkv").read_text() == "movie.mkv"
+
+    def test_replaced_link_is_forgotten_not_deleted(self, tmp_path):
+        files = make(tmp_path / "src", "a.mkv")
+        view = tmp_path / "view"
+        sync(files, ["old.mkv"], view, template=None)
+        (view / "old.mkv").unlink()
+        (view / "old.mkv").write_text("user file")
+        plan, summary = sync(files, ["new.mkv"], view, template=None)
+        assert plan.prune == [] and plan.forget == ["old.mkv"]
+        assert (view / "old.mkv").read_text() == "user file"
+        assert sorted(load_manifest(view)) == ["new.mkv"]
+
+    def test_other_source_folders_are_not_pruned(self, tmp_path):
+        a = make(tmp_path / "a", "x.mkv")
+        b = make(tmp_path / "b", "y.mkv")
+        view = tmp_path / "view"
+        sync(a, ["X.mkv"], view, template=None)
+        plan, _ = sync(b, ["Y.mkv"], view, template=None)
+        assert plan.prune == []
+        assert sorted(load_manifest(view)) == ["X.mkv", "Y.mkv"]
+
+    def test_hardlink_of_deleted_source_is_pruned(self, tmp_path):
+        files = make(tmp_path / "src", "a.mkv", "b.mkv")
+        view = tmp_path / "view"
+        sync(files, ["A.mkv", "B.mkv"], view, template=None)
+        files[1].unlink()
+        plan, _ = sync(files[:1], ["A.mkv"], view, template=None)
+        assert plan.prune == ["B.mkv"]
+        assert not (view / "B.mkv").exists()
+
+    def test_duplicate_targets_conflict(self, tmp_path):
+        files = make(tmp_path / "src", "a.mkv", "b.mkv")
+        plan, summary = sync(files, ["same.mkv", "same.mkv"], tmp_path / "view", template=None)
+        assert plan.conflicts == {"same.mkv": "CONFLICT"}
+        assert summary["created"] == 0
+
+    def test_link_errors_are_reported(self, tmp_path, monkeypatch):
+        files = make(tmp_path / "src", "a.mkv")
+
+        def fail(src, dst):
+            raise OSError(18, "Invalid cross-device link")
+
+        monkeypatch.setattr(os, "link", fail)
+        _, summary = sync(files, ["A.mkv"], tmp_path / "view", template=None)
+        assert "use symlinks" in summary["errors"]["A.mkv"]
+        assert load_manifest(tmp_path / "view") == {}
+
+    def test_unknown_mode(self, tmp_path):
+        with pytest.raises(ValueError):
+            plan_links([], tmp_path, "copy")
+
+    def test_corrupt_manifest_is_ignored(self, tmp_path):
+        (tmp_path / MANIFEST_FILE).write_text("{not json", encoding="utf-8")
+        assert load_manifest(tmp_path) == {}
+        (tmp_path / MANIFEST_FILE).write_text(json.dumps({"links": {"a": ["copy", "x", 0]}}))
+        assert load_manifest(tmp_path) == {}
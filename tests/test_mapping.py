@@ -0,0 +1,134 @@
+"""Tests for mapping.iter_mapping() and join_mapping()."""
+
+import tracemalloc
+
+import pytest
+
+from engine import compute_new_name, list_files, validate_new_names
+from mapping import MISSING_SAMPLE, iter_mapping, join_mapping
+
+
+class TestIterMapping:
+    def test_csv(self, tmp_path):
+        path = tmp_path / "map.csv"
+        path.write_text('old,new\n# comment\n\na.txt,b.txt\n"c,1.txt",d.txt\n', encoding="utf-8")
+        assert list(iter_mapping(path)) == [("a.txt", "b.txt"), ("c,1.txt", "d.txt")]
+
+    def test_tsv(self, tmp_path):
+        path = tmp_path / "map.tsv"
+        path.write_text("a.txt\tb.txt\r\nc d.txt\te.txt\n", encoding="utf-8")
+        assert list(iter_mapping(path)) == [("a.txt", "b.txt"), ("c d.txt", "e.txt")]
+
+    def test_header_only_skipped_on_first_line(self, tmp_path):
+        path = tmp_path / "map.csv"
+        path.write_text("a,b\nold,new\n", encoding="utf-8")
+        assert list(iter_mapping(path)) == [("a", "b"), ("old", "new")]
+
+    def test_bad_row(self, tmp_path):
+        path = tmp_path / "map.tsv"
+        path.write_text("a.txt\tb.txt\nc.txt\n", encoding="utf-8")
+        with pytest.raises(ValueError, match=":2: expected old,new"):
+            list(iter_mapping(path))
+
+    def test_nul_delimited(self, tmp_path):
+        path = tmp_path / "map"
+        path.write_bytes(b"a\nb.txt\0c.txt\0d,e.txt\0f\tg.txt\0")
+        assert list(iter_mapping(path)) == [("a\nb.txt", "c.txt"), ("d,e.txt", "f\tg.txt")]
+
+    def test_nul_without_trailing_terminator(self, tmp_path):
+        path = tmp_path / "map"
+        path.write_bytes(b"a.txt\0b.txt")
+        assert list(iter_mapping(path)) == [("a.txt", "b.txt")]
+
+    def test_nul_across_chunks(self, tmp_path, monkeypatch):
+        monkeypatch.setattr("mapping.CHUNK_SIZE", 3)
+        path = tmp_path / "map"
+        path.write_bytes(b"abcdef\0ghijk\0lm\0no\0")
+        assert list(iter_mapping(path)) == [("abcdef", "ghijk"), ("lm", "no")]
+
+    def test_nul_odd_field_count(self, tmp_path):
+        path = tmp_path / "map"
+        path.write_bytes(b"a\0b\0c\0")
+        with pytest.raises(ValueError, match="record 2 has no new name"):
+            list(iter_mapping(path))
+
+    def test_missing_file(self, tmp_path):
+        with pytest.raises(OSError):
+            list(iter_mapping(tmp_path / "missing.csv"))
+
+
+class TestJoinMapping:
+    def test_join(self, sample_dir):
+        files = list_files(sample_dir)
+        rows = [
+            ("IMG_001.jpg", "one.jpg"),
+            ("gone.jpg", "x.jpg"),
+            ("notes.txt", "readme.txt"),
+            ("desktop.ini", "x.ini"),  # not listed
+        ]
+        join = join_mapping(files, iter(rows))
+        assert join.names == {"IMG_001.jpg": "one.jpg", "notes.txt": "readme.txt"}
+        assert join.missing == 2
+        assert join.missing_sample == ["gone.jpg", "desktop.ini"]
+        assert [f.name for f in join.extra] == [
+            f.name for f in files if f.name not in ("IMG_001.jpg", "notes.txt")
+        ]
+        assert join.duplicates == []
+
+    def test_duplicates_are_dropped(self, sample_dir):
+        files = list_files(sample_dir)
+        rows = [
+            ("IMG_001.jpg", "a.jpg"),
+            ("IMG_001.jpg", "b.jpg"),
+            ("IMG_001.jpg", "a.jpg"),
+            ("IMG_002.jpg", "c.jpg"),
+            ("IMG_002.jpg", "c.jpg"),  # repeated identical row is fine
+        ]
+        join = join_mapping(files, rows)
+        assert join.names == {"IMG_002.jpg": "c.jpg"}
+        assert join.duplicates == ["IMG_001.jpg"]
+        assert "IMG_001.jpg" not in {f.name for f in join.extra}
+
+    def test_missing_sample_is_bounded(self, tmp_path):
+        join = join_mapping([], ((f"{i}.txt", "x") for i in range(1000)))
+        assert join.missing == 1000
+        assert len(join.missing_sample) == MISSING_SAMPLE
+
+    def test_operation_renames_through_validation(self, sample_dir):
+        files = list_files(sample_dir)
+        join = join_mapping(
+            files,
+            [("IMG_001.jpg", "IMG_002.jpg"), ("notes.txt", "NOTES.md"), ("IMG_003.jpg", "a/b")],
+        )
+        ops = [join.operation()]
+        names = [compute_new_name(f, ops, i) for i, f in enumerate(files)]
+        statuses = {
+            r["original"].name: r["status"] for r in validate_new_names(list(zip(files, names)))
+        }
+        assert statuses["IMG_001.jpg"] == "CONFLICT"
+        assert statuses["notes.txt"] == "OK"
+        assert statuses["IMG_003.jpg"] not in ("OK", "CONFLICT", "NO CHANGE")
+        assert statuses["report_2024-01-15.txt"] == "NO CHANGE"
+
+    def test_mapping_overrides_earlier_operations_only_for_mapped_files(self, tmp_path):
+        ops = [{"type": "prefix", "prefix": "x_"}, {"type": "mapping", "names": {"a.txt": "b.txt"}}]
+        assert compute_new_name(tmp_path / "a.txt", ops) == "b.txt"
+        assert compute_new_name(tmp_path / "c.txt", ops) == "x_c.txt"
+
+    def test_large_mapping_streams_in_bounded_memory(self, tmp_path):
+        for i in range(10):
+            (tmp_path / f"file{i}.txt").write_text("")
+        path = tmp_path / "map.tsv"
+        with open(path, "w", encoding="utf-8") as f:
+            for i in range(200_000):
+                f.write(f"file{i}.txt\trenamed{i}.txt\n")
+        files = list_files(tmp_path, ".txt")
+        tracemalloc.start()
+        try:
+            join = join_mapping(files, iter_mapping(path))
+            peak = tracemalloc.get_traced_memory()[1]
+        finally:
+            tracemalloc.stop()
+        assert len(join.names) == 10
+        assert join.missing == 199_990
+        assert peak < 2_000_000
@@ -1,6 +1,11 @@
 """Tests for media filename parsing (TV and Movie patterns)."""
 
-from patterns import parse_movie_filename, parse_tv_filename
+from patterns import (
+    normalize_title_key,
+    parse_movie_filename,
+    parse_tv_filename,
+    title_trigrams,
+)
 
 # --- parse_tv_filename ---
 
@@ -143,3 +148,25 @@ class TestParseMovieFilename:
 
     def test_returns_none_for_plain_name(self):
         assert parse_movie_filename("mydocument.pdf") is None
+
+
+class TestNormalizeTitleKey:
+    def test_dotted_and_parenthesised_forms_match(self):
+        assert normalize_title_key("The.Office.US") == normalize_title_key("the office (us)")
+
+    def test_strips_accents_and_case(self):
+        assert normalize_title_key("Amélie") == "amelie"
+
+    def test_collapses_separators(self):
+        assert normalize_title_key("  Mad_Max -- Fury  Road ") == "mad max fury road"
+
+    def test_empty(self):
+        assert normalize_title_key("...") == ""
+
+
+class TestTitleTrigrams:
+    def test_padded_trigrams(self):
+        assert title_trigrams("ab") == {"  a", " ab", "ab "}
+
+    def test_similar_keys_share_trigrams(self):
+        assert title_trigrams("the office") & title_trigrams("the offise")
@@ -126,3 +126,19 @@ class TestComputeNewNameMedia:
         ]
         result = compute_new_name(f, ops)
         assert result == "My Show - S05E10.mkv"
+
+    def test_media_movies_mapping(self):
+        ops = [
+            {
+                "type": "media_movies",
+                "movies": {
+                    "Alien.1979.mkv": {"title": "Alien", "year": 1979},
+                    "Heat.1995.mkv": {"title": "Heat", "year": 1995},
+                },
+            }
+        ]
+        assert compute_new_name(Path("/tmp/Heat.1995.mkv"), ops) == "Heat (1995).mkv"
+
+    def test_media_movies_skips_unmapped_file(self):
+        ops = [{"type": "media_movies", "movies": {"Alien.1979.mkv": {"title": "A", "year": 1}}}]
+        assert compute_new_name(Path("/tmp/notes.txt"), ops) == "notes.txt"
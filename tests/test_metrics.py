@@ -0,0 +1,163 @@
+"""Tests for metrics.LatencyHistogram, ApplyMetrics, and MetricsExporter."""
+
+import json
+import warnings
+from concurrent.futures import ThreadPoolExecutor
+
+import pytest
+
+from metrics import (
+    LATENCY_BUCKETS,
+    ApplyMetrics,
+    LatencyHistogram,
+    MetricsExporter,
+    format_duration,
+)
+
+
+class FakeClock:
+    def __init__(self):
+        self.now = 100.0
+
+    def __call__(self):
+        return self.now
+
+
+class TestLatencyHistogram:
+    def test_observe_buckets(self):
+        h = LatencyHistogram()
+        h.observe(0.00001)
+        h.observe(0.003)
+        h.observe(60)
+        assert h.count == 3
+        assert h.counts[0] == 1
+        assert h.counts[LATENCY_BUCKETS.index(0.005)] == 1
+        assert h.counts[-1] == 1
+
+    def test_quantile(self):
+        h = LatencyHistogram()
+        for _ in range(99):
+            h.observe(0.0002)
+        h.observe(2.0)
+        assert h.quantile(0.5) == 0.00025
+        assert h.quantile(1.0) == 2.5
+
+    def test_quantile_empty(self):
+        assert LatencyHistogram().quantile(0.5) is None
+
+    def test_quantile_overflow_bucket(self):
+        h = LatencyHistogram()
+        h.observe(100)
+        assert h.quantile(0.5) == float("inf")
+
+    def test_cumulative(self):
+        h = LatencyHistogram()
+        h.observe(0.00001)
+        h.observe(0.0002)
+        cumulative = h.cumulative()
+        assert cumulative[0] == ("5e-05", 1)
+        assert cumulative[2] == ("0.00025", 2)
+        assert cumulative[-1] == ("+Inf", 2)
+
+
+class TestApplyMetrics:
+    def test_rate_eta_error_rate(self):
+        clock = FakeClock()
+        m = ApplyMetrics(10, clock=clock)
+        assert m.eta is None
+        for ok in (True, True, True, False):
+            m.record(ok)
+        clock.now += 2
+        assert m.rate == 2.0
+        assert m.eta == 3.0
+        assert m.error_rate == 0.25
+
+    def test_zero_elapsed(self):
+        m = ApplyMetrics(1, clock=FakeClock())
+        assert m.rate == 0.0
+        assert m.error_rate == 0.0
+
+    def test_timed_records_even_on_error(self):
+        clock = FakeClock()
+        m = ApplyMetrics(1, clock=clock)
+        with pytest.raises(OSError), m.timed("rename"):
+            clock.now += 0.002
+            raise OSError
+        assert m.latency["rename"].count == 1
+        assert m.latency["rename"].total == pytest.approx(0.002)
+
+    def test_concurrent_updates_are_not_lost(self):
+        m = ApplyMetrics(8 * 2000)
+
+        def work():
+            for i in range(2000):
+                with m.timed("rename"):
+                    pass
+                m.record(i % 2 == 0)
+
+        with ThreadPoolExecutor(8) as pool:
+            for future in [pool.submit(work) for _ in range(8)]:
+                future.result()
+        assert (m.done, m.errors) == (16_000, 8000)
+        assert m.latency["rename"].count == sum(m.latency["rename"].counts) == 16_000
+
+    def test_snapshot_is_json_serializable(self):
+        m = ApplyMetrics(2)
+        with m.timed("stat"):
+            pass
+        m.record(True)
+        data = json.loads(json.dumps(m.snapshot()))
+        assert data["done"] == 1
+        assert data["latency"]["stat"]["count"] == 1
+
+    def test_prometheus_format(self):
+        m = ApplyMetrics(5)
+        with m.timed("rename"):
+            pass
+        m.record(False)
+        text = m.to_prometheus()
+        assert "renametool_files_planned 5" in text
+        assert "renametool_files_done_total 1" in text
+        assert "renametool_files_failed_total 1" in text
+        assert 'renametool_syscall_seconds_bucket{syscall="rename",le="+Inf"} 1' in text
+        assert 'renametool_syscall_seconds_count{syscall="rename"} 1' in text
+
+
+class TestMetricsExporter:
+    def test_json_export(self, tmp_path):
+        path = tmp_path / "metrics.json"
+        MetricsExporter(ApplyMetrics(3), path).export()
+        assert json.loads(path.read_text())["total"] == 3
+
+    def test_prometheus_export(self, tmp_path):
+        path = tmp_path / "renametool.prom"
+        MetricsExporter(ApplyMetrics(3), path).export()
+        assert "renametool_files_planned 3" in path.read_text()
+
+    def test_interval_throttles(self, tmp_path):
+        exporter = MetricsExporter(ApplyMetrics(1), tmp_path / "m.json", interval=3600)
+        assert exporter.maybe_export()
+        assert not exporter.maybe_export()
+
+    def test_unwritable_path_warns_once_and_disables(self, tmp_path):
+        exporter = MetricsExporter(ApplyMetrics(1), tmp_path / "missing" / "m.prom")
+        with pytest.warns(UserWarning, match="disabled"):
+            assert not exporter.export()
+        assert isinstance(exporter.error, FileNotFoundError)
+        (tmp_path / "missing").mkdir()
+        with warnings.catch_warnings():
+            warnings.simplefilter("error")  # no second warning
+            assert not exporter.export()
+        assert not (tmp_path / "missing" / "m.prom").exists()
+
+    def test_no_temp_files_left(self, tmp_path):
+        MetricsExporter(ApplyMetrics(1), tmp_path / "m.json").export()
+        assert [p.name for p in tmp_path.iterdir()] == ["m.json"]
+
+
+@pytest.mark.parametrize(
+    "seconds, expected",
+    [(None, "--:--"), (0, "0:00:00"), (59.9, "0:00:59"), (3725, "1:02:05")],
+)
+def test_format_duration(seconds, expected):
+    assert format_duration(seconds) == expected
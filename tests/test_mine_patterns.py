@@ -0,0 +1,82 @@
+"""Tests for patterns.mine_patterns()."""
+
+import re
+
+from patterns import mine_patterns
+
+
+def _by_regex(results):
+    return {r["regex"]: r for r in results}
+
+
+def test_finds_recurring_prefix():
+    shows = ("Frieren", "Dandadan", "Oshi no Ko", "Spy x Family")
+    files = [f"[SubsPlease] {show} - {n:02d}.mkv" for show in shows for n in range(1, 4)]
+    found = _by_regex(mine_patterns(files))
+    assert found[r"^\[SubsPlease\]"]["match_count"] == 12
+    assert found[r"^\[SubsPlease\]"]["name"] == "Recurring prefix: [SubsPlease]"
+
+
+def test_suffix_generalizes_digit_widths():
+    files = ["report_FINAL_v3.docx", "budget_FINAL_v12.xlsx", "memo_FINAL_v1.docx"]
+    found = _by_regex(mine_patterns(files))
+    assert r"_FINAL_v\d+$" in found
+    assert found[r"_FINAL_v\d+$"]["name"] == "Recurring suffix: FINAL_v#"
+    assert found[r"_FINAL_v\d+$"]["match_count"] == 3
+
+
+def test_only_closed_ngrams_are_proposed():
+    # "_FINAL" never occurs without "_v#" after it, so only the longer run is proposed
+    files = ["a_FINAL_v1.txt", "b_FINAL_v2.txt", "c_FINAL_v3.txt"]
+    regexes = [r["regex"] for r in mine_patterns(files)]
+    assert r"_FINAL_v\d+$" in regexes
+    assert "_FINAL" not in regexes
+
+
+def test_token_in_the_middle_is_unanchored():
+    files = ["alpha.PROOF.one.txt", "beta.PROOF.two.txt", "gamma.PROOF.three.txt"]
+    found = _by_regex(mine_patterns(files))
+    assert found[r"\.PROOF"]["name"] == "Recurring token: PROOF"
+
+
+def test_whole_stems_are_not_proposed():
+    assert mine_patterns(["notes.txt", "notes.md", "notes.bak"]) == []
+
+
+def test_bare_numbers_are_not_proposed():
+    assert mine_patterns(["a 2024.txt", "b 2023.txt", "c 1999.txt"]) == []
+
+
+def test_below_threshold_not_returned():
+    assert mine_patterns(["one_DRAFT.txt", "two.txt", "three.txt"]) == []
+
+
+def test_support_scales_with_folder_size():
+    files = [f"file{chr(97 + i % 26)}{i // 26}x.txt" for i in range(400)]
+    files[:3] = ["a_RARE.txt", "b_RARE.txt", "c_RARE.txt"]  # 3 of 400 is under 1%
+    assert all("RARE" not in r["regex"] for r in mine_patterns(files))
+    assert any("RARE" in r["regex"] for r in mine_patterns(files[:100]))
+
+
+def test_returns_empty_for_no_files():
+    assert mine_patterns([]) == []
+
+
+def test_limit():
+    files = [f"{w}_{t}.txt" for w in ("red", "green", "blue") for t in ("ONE", "TWO", "SIX")]
+    assert len(mine_patterns(files, limit=2)) == 2
+
+
+def test_examples_are_distinct_matched_text():
+    files = [f"clip_take{n}_SELECT.mov" for n in range(1, 10)]
+    for result in mine_patterns(files):
+        assert len(result["examples"]) <= 3
+        assert len(set(result["examples"])) == len(result["examples"])
+        for example in result["examples"]:
+            assert re.search(result["regex"], example)
+
+
+def test_regex_removes_the_token():
+    files = [f"[Group] {title}.mkv" for title in ("Alpha", "Beta", "Gamma")]
+    regex = mine_patterns(files)[0]["regex"]
+    assert re.sub(regex, "", "[Group] Delta") == " Delta"
@@ -0,0 +1,52 @@
+"""Tests for namediff.change_spans()."""
+
+from namediff import change_spans
+
+
+def changed(old: str, new: str) -> tuple[list[str], list[str]]:
+    removed, added = change_spans(old, new)
+    return [old[s:e] for s, e in removed], [new[s:e] for s, e in added]
+
+
+class TestChangeSpans:
+    def test_equal_names_have_no_spans(self):
+        assert change_spans("same.txt", "same.txt") == ([], [])
+
+    def test_appended_text(self):
+        assert changed("report.txt", "report_final.txt") == ([], ["_final"])
+
+    def test_removed_text(self):
+        assert changed("report (1).txt", "report.txt") == ([" (1)"], [])
+
+    def test_changed_digit_only(self):
+        assert changed("IMG_001.jpg", "IMG_002.jpg") == (["1"], ["2"])
+
+    def test_completely_different(self):
+        assert changed("abc", "xyz") == (["abc"], ["xyz"])
+
+    def test_words_kept_in_the_middle_are_not_marked(self):
+        removed, added = changed("Show.Name.S01E02.mkv", "Show Name S01E02.mkv")
+        assert removed == [".", "."]
+        assert added == [" ", " "]
+
+    def test_moved_word_is_not_marked(self):
+        assert changed("2024 Trip Paris", "Trip Paris 2024") == ([], [])
+
+    def test_adjacent_changed_tokens_are_merged(self):
+        assert changed("a.mkv", "a.1080p.WEB.mkv") == ([], ["1080p.WEB."])
+
+    def test_repeated_words_are_counted(self):
+        # One "x" is kept, the second is new
+        assert changed("a_x_b", "a_x_x_b") == ([], ["x_"])
+
+    def test_spans_index_the_original_strings(self):
+        old, new = "The.Movie.2019.1080p.BluRay", "The Movie (2019)"
+        removed, added = change_spans(old, new)
+        for s, e in removed:
+            assert 0 <= s < e <= len(old)
+        for s, e in added:
+            assert 0 <= s < e <= len(new)
+        assert [new[s:e] for s, e in added] == [" ", " (", ")"]
+
+    def test_unicode_names(self):
+        assert changed("Café.txt", "Café.txt") == (["é"], ["é"])
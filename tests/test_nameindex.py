@@ -0,0 +1,163 @@
+"""Tests for nameindex.probe_folder() and NameIndex."""
+
+import os
+import unicodedata
+from collections import OrderedDict
+
+import pytest
+
+import nameindex
+from fsbackend import LOCAL
+from nameindex import NameIndex, probe_folder, probe_normalization
+
+NFC = unicodedata.normalize("NFC", "Café.txt")
+NFD = unicodedata.normalize("NFD", "Café.txt")
+
+
+@pytest.fixture(autouse=True)
+def fresh_probes(monkeypatch):
+    monkeypatch.setattr(nameindex, "_PROBES", OrderedDict())
+
+
+@pytest.fixture()
+def folding_fs(monkeypatch):
+    """Make lstat behave like a case-insensitive, normalizing filesystem."""
+    real_lstat = os.lstat
+
+    def lstat(path):
+        path = os.fspath(path)
+        folder, name = os.path.split(path)
+        want = unicodedata.normalize("NFC", name).casefold()
+        for entry in os.listdir(folder):
+            if unicodedata.normalize("NFC", entry).casefold() == want:
+                return real_lstat(os.path.join(folder, entry))
+        raise FileNotFoundError(path)
+
+    monkeypatch.setattr(nameindex.os, "lstat", lstat)
+
+
+def no_probe_file(*args, **kwargs):
+    pytest.fail("probe file written")
+
+
+class TestProbeFolder:
+    def test_case_sensitive_from_existing_names(self, tmp_path, monkeypatch):
+        (tmp_path / "Photo.jpg").write_text("")
+        monkeypatch.setattr(nameindex, "_probe_with_file", no_probe_file)
+        assert probe_folder(tmp_path) == (True, None)
+
+    def test_normalization_from_existing_names(self, tmp_path, monkeypatch):
+        (tmp_path / NFC).write_text("")
+        monkeypatch.setattr(nameindex, "_probe_with_file", no_probe_file)
+        assert probe_folder(tmp_path) == (True, False)
+
+    def test_folding_filesystem_detected(self, tmp_path, folding_fs):
+        (tmp_path / NFC).write_text("")
+        assert probe_folder(tmp_path) == (False, True)
+
+    def test_both_spellings_present_means_sensitive(self, tmp_path, folding_fs):
+        (tmp_path / "A.txt").write_text("")
+        assert probe_folder(tmp_path, ["A.txt", "a.txt", "A.TXT"]) == (True, None)
+
+    def test_empty_folder_looks_up_its_own_name(self, tmp_path, monkeypatch):
+        monkeypatch.setattr(nameindex, "_probe_with_file", no_probe_file)
+        assert probe_folder(tmp_path)[0] is True
+        assert os.listdir(tmp_path) == []
+
+    def test_empty_folder_on_folding_filesystem(self, tmp_path, folding_fs, monkeypatch):
+        monkeypatch.setattr(nameindex, "_probe_with_file", no_probe_file)
+        assert probe_folder(tmp_path)[0] is False
+
+    def test_ancestor_with_both_spellings_is_not_an_alias(self, tmp_path):
+        (tmp_path / "x").mkdir()
+        (tmp_path / "X").mkdir()
+        assert nameindex._probe_ancestors(tmp_path / "x", nameindex._case_variant) is False
+
+    def test_write_probe_is_opt_in(self, tmp_path, monkeypatch):
+        monkeypatch.setattr(nameindex, "_probe_ancestors", lambda *a: None)
+        monkeypatch.setattr(nameindex, "_platform_default", lambda: (False, True))
+        monkeypatch.setattr(nameindex, "_probe_with_file", no_probe_file)
+        assert probe_folder(tmp_path) == (False, None)
+        nameindex._PROBES.clear()
+        monkeypatch.setattr(nameindex, "_probe_with_file", lambda *a: False)
+        assert probe_folder(tmp_path, write_probe=True) == (True, None)
+
+    def test_probe_file_is_removed(self, tmp_path):
+        assert nameindex._probe_with_file(tmp_path, str.upper) is False
+        assert os.listdir(tmp_path) == []
+
+    def test_missing_folder_uses_platform_default(self, tmp_path):
+        assert probe_folder(tmp_path / "nope") == nameindex._platform_default()
+
+    def test_result_cached_per_directory(self, tmp_path, monkeypatch):
+        (tmp_path / "Photo.jpg").write_text("")
+        first = probe_folder(tmp_path)
+        monkeypatch.setattr(nameindex, "_probe_existing", no_probe_file)
+        assert probe_folder(tmp_path) == first
+
+    def test_cache_is_bounded(self, tmp_path, monkeypatch):
+        monkeypatch.setattr(nameindex, "MAX_PROBES", 2)
+        for name in ("a", "b", "c"):
+            (tmp_path / name).mkdir()
+            probe_folder(tmp_path / name)
+        assert len(nameindex._PROBES) == 2
+        assert nameindex._dir_key(tmp_path / "a") not in nameindex._PROBES
+
+    def test_probe_normalization_without_writing(self, tmp_path, folding_fs, monkeypatch):
+        monkeypatch.setattr(nameindex, "_probe_with_file", no_probe_file)
+        folder = tmp_path / NFC.removesuffix(".txt")
+        folder.mkdir()
+        (folder / "Photo.jpg").write_text("")
+        assert probe_folder(folder) == (False, None)
+        assert probe_normalization(folder) is True  # from the folder's own name
+        assert probe_folder(folder) == (False, True)
+
+    def test_probe_normalization_falls_back_to_platform(self, tmp_path, monkeypatch):
+        monkeypatch.setattr(nameindex, "_probe_with_file", no_probe_file)
+        monkeypatch.setattr(nameindex, "_platform_default", lambda: (True, True))
+        assert probe_normalization(tmp_path) is True
+
+    def test_probe_normalization_writes_when_asked(self, tmp_path, folding_fs):
+        (tmp_path / "Photo.jpg").write_text("")
+        assert probe_normalization(tmp_path, write_probe=True) is True
+        assert os.listdir(tmp_path) == ["Photo.jpg"]
+
+
+class TestNameIndex:
+    def test_raw_keys_are_identity(self):
+        index = NameIndex(["A.txt"])
+        assert index.key("A.txt") == "A.txt"
+        assert "A.txt" in index
+        assert "a.txt" not in index
+
+    def test_case_insensitive(self):
+        index = NameIndex(["Straße.txt"], case_sensitive=False)
+        assert "STRASSE.TXT" in index
+        assert len(index) == 1
+
+    def test_normalizing(self):
+        index = NameIndex([NFC], normalizes=True)
+        assert NFD in index
+        assert index.has_key(index.key(NFD))
+
+    def test_unknown_normalization_resolved_on_first_decomposable_name(self, tmp_path, folding_fs):
+        folder = tmp_path / NFD.removesuffix(".txt")
+        folder.mkdir()
+        (folder / "Photo.jpg").write_text("")
+        index = NameIndex.for_folder(folder, fs=LOCAL)
+        assert index.normalizes is None
+        assert "photo.JPG" in index
+        assert index.normalizes is None
+        assert index.key(NFD) == index.key(NFC)
+        assert index.normalizes is True
+
+    def test_unknown_normalization_without_folder(self):
+        index = NameIndex([], normalizes=None)
+        assert index.key(NFD) == NFD
+        assert index.normalizes is False
+
+    def test_for_folder_lists_entries(self, tmp_path):
+        (tmp_path / "a.txt").write_text("")
+        (tmp_path / "sub").mkdir()
+        index = NameIndex.for_folder(tmp_path, fs=LOCAL)
+        assert "a.txt" in index and "sub" in index
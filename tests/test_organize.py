@@ -0,0 +1,155 @@
+"""Tests for organize.py: folder templates, per-directory validation and moves."""
+
+from pathlib import Path
+
+from engine import apply_one, compute_new_name, undo_renames
+from fsbackend import MemoryFileSystem
+from metrics import ApplyMetrics
+from organize import create_folders, find_organize, order_by_folder, plan_organize
+
+SEASONS = "{show}/Season {season:02}"
+
+
+def make(folder: Path, *names: str) -> list[Path]:
+    paths = []
+    for name in names:
+        path = folder / name
+        path.parent.mkdir(parents=True, exist_ok=True)
+        path.write_text(name)
+        paths.append(path)
+    return paths
+
+
+def plan(files, template=SEASONS, names=None):
+    names = names or [f.name for f in files]
+    return plan_organize(list(zip(files, names)), template)
+
+
+class TestFindOrganize:
+    def test_last_organize_wins(self):
+        ops = [
+            {"type": "organize", "template": "a"},
+            {"type": "case", "mode": "lowercase"},
+            {"type": "organize", "template": "b"},
+        ]
+        assert find_organize(ops)["template"] == "b"
+
+    def test_none(self):
+        assert find_organize([{"type": "case", "mode": "lowercase"}]) is None
+
+    def test_ignored_by_compute_new_name(self, tmp_path):
+        ops = [{"type": "organize", "template": SEASONS}, {"type": "prefix", "prefix": "x"}]
+        assert compute_new_name(tmp_path / "a.mkv", ops) == "xa.mkv"
+
+
+class TestPlanOrganize:
+    def test_targets(self, tmp_path):
+        files = make(tmp_path, "Show.S01E02.mkv", "Show.S02E01.mkv")
+        results = plan(files)
+        assert [r["new_name"] for r in results] == [
+            "Show/Season 01/Show.S01E02.mkv",
+            "Show/Season 02/Show.S02E01.mkv",
+        ]
+        assert [r["status"] for r in results] == ["OK", "OK"]
+
+    def test_unrenderable_file_stays_in_place(self, tmp_path):
+        files = make(tmp_path, "notes.txt")
+        assert plan(files)[0] == {
+            "original": files[0],
+            "new_name": "notes.txt",
+            "status": "NO CHANGE",
+        }
+        assert plan(files, names=["Notes.txt"])[0]["status"] == "OK"
+
+    def test_invalid_folder_names(self, tmp_path):
+        files = make(tmp_path, "a.txt")
+        for template, status in [
+            ("x/../{stem}", "INVALID folder (empty name)"),
+            ("x//y", "INVALID folder (empty name)"),
+            ("/abs", "INVALID folder (empty name)"),
+            ("{stem}:", "INVALID folder (illegal characters)"),
+            ("CON", "INVALID folder (reserved name)"),
+        ]:
+            assert plan(files, template)[0]["status"] == status, template
+
+    def test_invalid_file_name(self, tmp_path):
+        files = make(tmp_path, "a.txt")
+        assert plan(files, "x", ["b?.txt"])[0]["status"] == "INVALID (illegal characters)"
+
+    def test_target_folder_is_a_file(self, tmp_path):
+        files = make(tmp_path, "a.txt", "x")
+        assert plan(files[:1], "x")[0]["status"] == "INVALID folder (not a directory)"
+
+    def test_conflict_with_existing_file_in_target(self, tmp_path):
+        files = make(tmp_path, "a.txt", "b.txt")
+        make(tmp_path, "dir/a.txt")
+        assert [r["status"] for r in plan(files, "dir")] == ["CONFLICT", "OK"]
+
+    def test_same_name_in_different_folders_is_fine(self, tmp_path):
+        files = make(tmp_path, "A.S01E01.mkv", "B.S01E01.mkv")
+        results = plan(files, "{show}", ["ep.mkv", "ep.mkv"])
+        assert [r["status"] for r in results] == ["OK", "OK"]
+
+    def test_planned_collision_in_one_folder(self, tmp_path):
+        files = make(tmp_path, "A.S01E01.mkv", "A.S01E02.mkv")
+        results = plan(files, "{show}", ["ep.mkv", "ep.mkv"])
+        assert [r["status"] for r in results] == ["CONFLICT", "CONFLICT"]
+
+    def test_folder_names_compare_like_the_filesystem(self, tmp_path):
+        files = make(tmp_path, "Show.a", "show.b")
+        pairs = [(files[0], "ep.txt"), (files[1], "ep.txt")]
+        assert [r["status"] for r in plan_organize(pairs, "{stem}")] == ["OK", "OK"]
+        fs = MemoryFileSystem(case_sensitive=False)
+        fs.add_files(tmp_path, ["Show.a", "show.b"])
+        statuses = [r["status"] for r in plan_organize(pairs, "{stem}", fs)]
+        assert statuses == ["CONFLICT", "CONFLICT"]
+
+    def test_moving_into_folder_with_original_name(self, tmp_path):
+        files = make(tmp_path, "a.txt")
+        make(tmp_path, "dir/other.txt")
+        assert plan(files, "dir")[0]["status"] == "OK"
+
+
+class TestCreateAndMove:
+    def test_create_folders_once_parents_first(self, tmp_path):
+        files = make(tmp_path, "Show.S01E01.mkv", "Show.S01E02.mkv", "Show.S02E01.mkv", "x.txt")
+        make(tmp_path, "Other/keep.txt")
+        results = plan(files)
+        ok = [r for r in results if r["status"] == "OK"]
+        created = create_folders(ok)
+        assert created == [
+            tmp_path / "Show",
+            tmp_path / "Show" / "Season 01",
+            tmp_path / "Show" / "Season 02",
+        ]
+        assert create_folders(ok) == []
+
+    def test_order_by_folder_groups_targets(self, tmp_path):
+        files = make(tmp_path, "B.S01E01.mkv", "A.S01E01.mkv", "B.S01E02.mkv", "A.S01E02.mkv")
+        ordered = order_by_folder(plan(files, "{show}"))
+        assert [r["new_name"] for r in ordered] == [
+            "A/A.S01E01.mkv",
+            "A/A.S01E02.mkv",
+            "B/B.S01E01.mkv",
+            "B/B.S01E02.mkv",
+        ]
+
+    def test_move_and_undo(self, tmp_path):
+        files = make(tmp_path, "Show.S01E01.mkv", "Show.S01E02.mkv")
+        make(tmp_path, "Show/poster.jpg")
+        ok = plan(files)
+        create_folders(ok)
+        metrics = ApplyMetrics(len(ok))
+        outcomes = [apply_one(r, metrics) for r in order_by_folder(ok)]
+        assert [o["status"] for o in outcomes] == ["RENAMED", "RENAMED"]
+        assert (
+            tmp_path / "Show" / "Season 01" / "Show.S01E02.mkv"
+        ).read_text() == "Show.S01E02.mkv"
+
+        undo_map = [{"old": o["original"].name, "new": o["new_name"]} for o in outcomes]
+        restored = undo_renames(tmp_path, undo_map)
+        assert [o["status"] for o in restored] == ["RESTORED", "RESTORED"]
+        assert all(f.exists() for f in files)
+        # The emptied season folder is removed; the show folder still has other files
+        assert not (tmp_path / "Show" / "Season 01").exists()
+        assert (tmp_path / "Show" / "poster.jpg").exists()
@@ -0,0 +1,149 @@
+"""Tests for profiling.Profiler and the renamer --profile instrumentation."""
+
+import json
+import pstats
+
+import pytest
+
+import engine
+import renamer
+from profiling import Profiler
+
+
+@pytest.fixture()
+def profiler(monkeypatch):
+    """An enabled profiler installed as renamer.PROFILER and engine.PROFILER."""
+    prof = Profiler(enabled=True)
+    monkeypatch.setattr(renamer, "PROFILER", prof)
+    monkeypatch.setattr(engine, "PROFILER", prof)
+    return prof
+
+
+class TestProfiler:
+    def test_disabled_span_is_noop(self):
+        prof = Profiler()
+        with prof.span("stage") as span:
+            prof.add(3, stat=1)
+        assert span is None
+        assert prof.spans == []
+
+    def test_records_span(self):
+        prof = Profiler(enabled=True)
+        with prof.span("stage", files=2) as span:
+            span.add(1, stat=4)
+        assert [(s.name, s.files, s.syscalls) for s in prof.spans] == [("stage", 3, {"stat": 4})]
+        assert prof.spans[0].duration >= 0
+
+    def test_add_targets_innermost_span(self):
+        prof = Profiler(enabled=True)
+        with prof.span("outer"):
+            with prof.span("inner"):
+                prof.add(rename=2)
+            prof.add(stat=1)
+        by_name = {s.name: s.syscalls for s in prof.spans}
+        assert by_name == {"inner": {"rename": 2}, "outer": {"stat": 1}}
+
+    def test_add_outside_span_is_ignored(self):
+        prof = Profiler(enabled=True)
+        prof.add(stat=1)
+        assert prof.spans == []
+
+    def test_span_closed_on_exception(self):
+        prof = Profiler(enabled=True)
+        with pytest.raises(RuntimeError), prof.span("boom"):
+            raise RuntimeError
+        assert prof.spans[0].name == "boom"
+
+    def test_summary_aggregates_by_stage(self):
+        prof = Profiler(enabled=True)
+        for _ in range(2):
+            with prof.span("a", files=1):
+                prof.add(stat=2)
+        with prof.span("b"):
+            pass
+        summary = prof.summary()
+        assert [s["stage"] for s in summary] == ["a", "b"]
+        assert summary[0]["calls"] == 2
+        assert summary[0]["files"] == 2
+        assert summary[0]["syscalls"] == {"stat": 4}
+
+    def test_chrome_trace_events(self):
+        prof = Profiler(enabled=True)
+        with prof.span("stage", files=5):
+            prof.add(stat=1)
+        trace = prof.chrome_trace()
+        (event,) = trace["traceEvents"]
+        assert event["name"] == "stage"
+        assert event["ph"] == "X"
+        assert event["args"] == {"files": 5, "stat": 1}
+        assert trace["otherData"]["stages"][0]["stage"] == "stage"
+
+    def test_start_resets(self):
+        prof = Profiler(enabled=True)
+        with prof.span("old"):
+            pass
+        prof.start()
+        assert prof.spans == []
+        assert prof.enabled
+
+    def test_write_trace_and_pstats(self, tmp_path):
+        prof = Profiler(enabled=True, cprofile=True)
+        with prof.span("validate_new_names"):
+            sum(range(1000))
+        with prof.span("not_hot"):
+            pass
+        out = tmp_path / "trace.json"
+        prof.write(out)
+        assert json.loads(out.read_text())["traceEvents"]
+        assert pstats.Stats(str(out) + ".pstats").total_calls > 0
+
+    def test_write_without_cprofile_has_no_pstats(self, tmp_path):
+        prof = Profiler(enabled=True)
+        prof.write(tmp_path / "trace.json")
+        assert not (tmp_path / "trace.json.pstats").exists()
+
+
+class TestInstrumentation:
+    def test_list_files_span(self, sample_dir, profiler):
+        files = renamer.list_files(sample_dir)
+        (span,) = profiler.spans
+        assert span.name == "list_files"
+        assert span.files == len(files)
+        assert span.syscalls == {"scandir": 1, "stat": 11}  # 10 files + subdir
+
+    def test_validate_new_names_lists_each_folder_once(self, tmp_path, profiler):
+        (tmp_path / "a.txt").write_text("")
+        (tmp_path / "b.txt").write_text("")
+        renamer.validate_new_names([(tmp_path / "a.txt", "c.txt"), (tmp_path / "b.txt", "d.txt")])
+        (span,) = profiler.spans
+        assert (span.name, span.files, span.syscalls) == ("validate_new_names", 2, {"scandir": 1})
+
+    def test_write_log_and_undo_spans(self, tmp_path, profiler):
+        renamer.write_log(tmp_path, [])
+        renamer.save_undo_map(tmp_path, [])
+        assert [s.name for s in profiler.spans] == ["write_log", "save_undo_map"]
+
+
+class TestParseArgs:
+    def test_defaults(self):
+        args = renamer.parse_args([])
+        assert args.profile is None
+        assert not args.cprofile
+
+    def test_profile_default_path(self):
+        assert renamer.parse_args(["--profile"]).profile == renamer.PROFILE_FILE
+
+    def test_profile_custom_path(self):
+        args = renamer.parse_args(["--profile", "out.json", "--cprofile"])
+        assert args.profile == "out.json"
+        assert args.cprofile
+
+
+def test_show_profile_summary(capsys):
+    prof = Profiler(enabled=True)
+    with prof.span("list_files", files=3):
+        prof.add(stat=3)
+    renamer.show_profile_summary(prof.summary())
+    out = capsys.readouterr().out
+    assert "list_files" in out
+    assert "stat=3" in out
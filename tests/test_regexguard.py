@@ -0,0 +1,176 @@
+"""Tests for regexguard.analyze_regex() and compute_names()."""
+
+import asyncio
+import multiprocessing
+import re
+import threading
+import time
+from pathlib import Path
+
+import pytest
+
+import regexguard
+from asyncapi import plan
+from patterns import PATTERNS, TV_REGEX
+from regexguard import RegexTimeout, _worker, analyze_regex, compute_names, has_regex_op
+from session import RenameSession
+
+EVIL = r"(a+)+$"
+EVIL_STEM = "a" * 40 + "b"
+
+
+def regex_op(find, replace=""):
+    return {"type": "find_replace", "find": find, "replace": replace, "regex": True}
+
+
+class TestAnalyzeRegex:
+    @pytest.mark.parametrize(
+        "pattern, finding",
+        [
+            (r"(a+)+$", "nested"),
+            (r"(\w+\s?)*x", "nested"),
+            (r"(a|ab)*c", "alternation"),
+            (r"(?:a|a)+", "alternation"),
+            (r"(x|.)*y", "alternation"),
+            (r".*.*=", "adjacent"),
+            (r"\d+\d+x", "adjacent"),
+            (r"(.)\1", "backreference"),
+            (r"(?P<a>x)(?P=a)", "backreference"),
+            (r"(a)(?(1)a|b)", "backreference"),
+            (r"(?x) (a+) + $  # comment", "nested"),
+            (r"(?i:a|ab)+", "alternation"),
+            (r"(?<!a)b+b+", "adjacent"),
+            (r"[\x41]+A+", "adjacent"),
+            (r"\u00e9+é+", "adjacent"),
+            (r"[\n\t]+\012+", "adjacent"),
+            (r"a(?#note)+a+", "adjacent"),
+            (r"[a-z]+[a-c]+", "adjacent"),
+            (r"[0-9a-f]+\d+", "adjacent"),
+            (r"(?i)[A-Z]+[a-c]+", "adjacent"),
+            (r"(.*a){20}", "bounded"),
+            (r"(a?){30}a{30}", "bounded"),
+            (r"(?:\w+\s){10,}", "nested"),
+            (r"(?:a|ab){20}", "alternation"),
+        ],
+    )
+    def test_flags_dangerous_constructs(self, pattern, finding):
+        assert any(finding in f for f in analyze_regex(pattern))
+
+    @pytest.mark.parametrize(
+        "pattern",
+        [
+            r"\d{4}-\d{2}-\d{2}",
+            r"\s*-\s*",
+            r"(a|b)*",
+            r"(?:foo|bar)+",
+            r"^\[.*?\]\s*",
+            r"(?>a+)+b",
+            r"a++b",
+            r"(?:ab){2,5}",
+            r"(?x) a+ \  b+  # escaped space between",
+            r"\N{EM DASH}\s+(?=x)\w+?-",
+            r"[]a-c]+[\d]{2}\b",
+            r"(?i)(?P<year>\d{4})[._ ]\0?",
+            r"\.{2,}x*",
+            r"[a-z]+[0-9]+",
+            r"[A-Z]+[a-z]+",
+            r"[\x00-\x1f]+[ -~]+",
+            r"(?:ab){20}",
+            r"(?:a{2}|b){30}",
+            r"(a?){9}",
+        ],
+    )
+    def test_safe_patterns_pass(self, pattern):
+        assert analyze_regex(pattern) == []
+
+    def test_builtin_patterns_are_safe(self):
+        for pattern in [*PATTERNS.values(), TV_REGEX.pattern]:
+            assert analyze_regex(pattern) == [], pattern
+
+    def test_findings_deduplicated(self):
+        assert len(analyze_regex(r"(a+)+(b+)+")) == 1
+
+    def test_invalid_pattern_raises(self):
+        with pytest.raises(re.error):
+            analyze_regex("(")
+
+
+class TestComputeNames:
+    def test_inline_without_regex_ops(self):
+        files = [Path("/x/A.txt"), Path("/x/B.txt")]
+        ops = [{"type": "case", "mode": "lowercase"}]
+        assert not has_regex_op(ops)
+        assert compute_names(files, ops) == ["a.txt", "b.txt"]
+
+    def test_regex_batch_in_worker(self):
+        files = [Path(f"/x/IMG_{i:03d}.jpg") for i in range(50)]
+        ops = [regex_op(r"IMG_", "photo-"), {"type": "suffix", "suffix": "-x"}]
+        names = compute_names(files, ops, budget=30)
+        assert names[0] == "photo-000-x.jpg"
+        assert names[-1] == "photo-049-x.jpg"
+
+    def test_timeout_names_pattern_and_file(self):
+        files = [Path("/x/fine.txt"), Path(f"/x/{EVIL_STEM}.txt"), Path("/x/never.txt")]
+        ops = [{"type": "prefix", "prefix": ""}, regex_op(r"i"), regex_op(EVIL)]
+        start = time.monotonic()
+        with pytest.raises(RegexTimeout) as info:
+            compute_names(files, ops, budget=0.3)
+        assert time.monotonic() - start < 5
+        assert info.value.pattern == EVIL
+        assert info.value.file == files[1]
+        assert EVIL_STEM in str(info.value)
+
+    def test_budget_none_runs_inline(self):
+        assert compute_names([Path("/x/ab.txt")], [regex_op("b", "c")], budget=None) == ["ac.txt"]
+
+    def test_worker_exception_propagates(self):
+        ops = [regex_op("a"), {"type": "template", "template": "{nope}"}]
+        with pytest.raises(ValueError, match="Unknown template field"):
+            compute_names([Path("/x/a.txt")], ops)
+
+
+class TestWorker:
+    def test_worker_serves_batches_until_closed(self):
+        parent, child = multiprocessing.Pipe()
+        progress = [0, 0]
+        thread = threading.Thread(target=_worker, args=(child, progress))
+        thread.start()
+        assert parent.recv() == ("ready", None)
+        parent.send(("operations", [regex_op("a", "o")]))
+        parent.send(("names", ["/x/cat.txt", "/x/bat.txt"]))
+        assert parent.recv() == ("ok", ["cot.txt", "bot.txt"])
+        parent.send(("operations", [regex_op("a"), {"type": "template", "template": "{nope}"}]))
+        parent.send(("names", ["/x/a.txt"]))
+        status, error = parent.recv()
+        assert status == "error" and "Unknown template field" in str(error)
+        assert progress == [0, 1]
+        parent.close()
+        thread.join(10)
+        assert not thread.is_alive()
+
+    def test_worker_is_reused(self):
+        files = [Path("/x/ab.txt")]
+        assert compute_names(files, [regex_op("b", "c")], budget=30) == ["ac.txt"]
+        worker = regexguard._regex_worker
+        assert compute_names(files, [regex_op("a", "z")], budget=30) == ["zb.txt"]
+        assert regexguard._regex_worker is worker
+
+    def test_timeout_replaces_the_worker(self):
+        files = [Path(f"/x/{EVIL_STEM}.txt")]
+        with pytest.raises(RegexTimeout):
+            compute_names(files, [regex_op(EVIL)], budget=0.3)
+        assert regexguard._regex_worker is None
+        assert compute_names([Path("/x/ab.txt")], [regex_op("b", "c")], budget=30) == ["ac.txt"]
+
+
+class TestCallers:
+    def test_session_preview_times_out(self, tmp_path):
+        (tmp_path / f"{EVIL_STEM}.txt").write_text("")
+        s = RenameSession(tmp_path, [regex_op(EVIL)], regex_budget=0.3)
+        with pytest.raises(RegexTimeout):
+            s.preview()
+
+    def test_async_plan_times_out(self, tmp_path):
+        (tmp_path / f"{EVIL_STEM}.txt").write_text("")
+        with pytest.raises(RegexTimeout):
+            asyncio.run(plan(tmp_path, [regex_op(EVIL)], regex_budget=0.3))
@@ -0,0 +1,134 @@
+"""Tests for replacetable.ReplacementTable and load_table()."""
+
+import pickle
+import random
+import re
+from pathlib import Path
+
+import pytest
+
+from engine import compute_new_name
+from replacetable import ReplacementTable, load_table
+
+
+def longest_first_regex_sub(replacements, text):
+    """Reference leftmost-longest replacement using a longest-first alternation."""
+    alternation = "|".join(sorted(map(re.escape, replacements), key=len, reverse=True))
+    return re.sub(alternation, lambda m: replacements[m.group()], text)
+
+
+class TestApply:
+    def test_basic(self):
+        table = ReplacementTable({"teh": "the", "recieve": "receive"})
+        assert table.apply("teh file to recieve") == "the file to receive"
+
+    def test_no_match_returns_same_string(self):
+        text = "nothing here"
+        assert ReplacementTable({"xyz": "!"}).apply(text) is text
+
+    def test_longest_wins_at_same_start(self):
+        table = ReplacementTable({"WEB": "web", "WEB-DL": "WEBDL", "WEB-DLRip": "rip"})
+        assert table.apply("Show.WEB-DL.x264") == "Show.WEBDL.x264"
+        assert table.apply("Show.WEB-DLRip") == "Show.rip"
+
+    def test_leftmost_wins_over_longer_later_match(self):
+        table = ReplacementTable({"ab": "1", "bcde": "2"})
+        assert table.apply("abcde") == "1cde"
+
+    def test_matches_do_not_overlap_and_scanning_resumes(self):
+        table = ReplacementTable({"aa": "b"})
+        assert table.apply("aaaaa") == "bba"
+
+    def test_suffix_entry_found_inside_longer_prefix(self):
+        table = ReplacementTable({"abcd": "X", "bc": "Y"})
+        assert table.apply("abce") == "aYe"
+
+    def test_unicode_and_deletion(self):
+        table = ReplacementTable({"[RARBG]": "", "Café": "Cafe"})
+        assert table.apply("Café[RARBG]") == "Cafe"
+
+    def test_empty_find_rejected(self):
+        with pytest.raises(ValueError):
+            ReplacementTable({"": "x"})
+
+    def test_matches_reference_semantics(self):
+        rng = random.Random(7)
+        for _ in range(300):
+            replacements = {
+                "".join(rng.choices("abc", k=rng.randint(1, 4))): str(k)
+                for k in range(rng.randint(1, 8))
+            }
+            table = ReplacementTable(replacements)
+            for _ in range(30):
+                text = "".join(rng.choices("abcd", k=rng.randint(0, 15)))
+                assert table.apply(text) == longest_first_regex_sub(replacements, text)
+
+    def test_picklable(self):
+        table = pickle.loads(pickle.dumps(ReplacementTable({"a": "b"})))
+        assert table.apply("aa") == "bb"
+        assert len(table) == 1
+
+    def test_many_patterns(self):
+        rng = random.Random(1)
+        words = {"".join(rng.choices("abcdefghij", k=rng.randint(4, 10))) for _ in range(10_000)}
+        replacements = {w: w.upper() for w in words}
+        table = ReplacementTable(replacements)
+        assert len(table) == len(replacements)
+        stems = ["".join(rng.choices("abcdefghij._ ", k=60)) for _ in range(20)]
+        for stem in stems:
+            assert table.apply(stem) == longest_first_regex_sub(replacements, stem)
+
+
+class TestLoadTable:
+    def test_csv(self, tmp_path):
+        path = tmp_path / "t.csv"
+        path.write_text('find,replace\n# comment\n\nteh,the\n"a,b",c\n', encoding="utf-8")
+        table = load_table(path)
+        assert table.replacements == {"teh": "the", "a,b": "c"}
+
+    def test_csv_without_header(self, tmp_path):
+        path = tmp_path / "t.csv"
+        path.write_text("x264,\n", encoding="utf-8")
+        assert load_table(path).replacements == {"x264": ""}
+
+    def test_csv_bad_row(self, tmp_path):
+        path = tmp_path / "t.csv"
+        path.write_text("a,b,c\n", encoding="utf-8")
+        with pytest.raises(ValueError, match="expected find,replace"):
+            load_table(path)
+
+    def test_toml_table(self, tmp_path):
+        path = tmp_path / "t.toml"
+        path.write_text('[replacements]\n"H.264" = "x264"\n', encoding="utf-8")
+        assert load_table(path).replacements == {"H.264": "x264"}
+
+    def test_toml_top_level(self, tmp_path):
+        path = tmp_path / "t.toml"
+        path.write_text('teh = "the"\n', encoding="utf-8")
+        assert load_table(path).replacements == {"teh": "the"}
+
+    def test_toml_non_string_values(self, tmp_path):
+        path = tmp_path / "t.toml"
+        path.write_text("a = 1\n", encoding="utf-8")
+        with pytest.raises(ValueError, match="strings"):
+            load_table(path)
+
+    def test_toml_syntax_error(self, tmp_path):
+        path = tmp_path / "t.toml"
+        path.write_text("a = \n", encoding="utf-8")
+        with pytest.raises(ValueError):
+            load_table(path)
+
+    def test_unsupported_format(self, tmp_path):
+        with pytest.raises(ValueError, match="Unsupported"):
+            load_table(tmp_path / "t.json")
+
+    def test_missing_file(self, tmp_path):
+        with pytest.raises(OSError):
+            load_table(tmp_path / "missing.csv")
+
+
+def test_compute_new_name_operation():
+    op = {"type": "replace_table", "table": ReplacementTable({"teh": "the"}), "source": "t.csv"}
+    ops = [op, {"type": "case", "mode": "title"}]
+    assert compute_new_name(Path("/x/teh end.txt"), ops) == "The End.txt"
@@ -0,0 +1,233 @@
+"""Tests for session.RenameSession."""
+
+import subprocess
+import sys
+
+import pytest
+
+import fsbackend
+import regexguard
+import session
+from engine import UNDO_FILE, load_undo_map
+from session import RenameSession, compile_operation
+
+LOWER = {"type": "case", "mode": "lowercase"}
+
+
+@pytest.fixture()
+def folder(tmp_path):
+    for name in ("A.txt", "B.txt", "C.jpg"):
+        (tmp_path / name).write_text(name)
+    return tmp_path
+
+
+@pytest.fixture()
+def compute_calls(monkeypatch):
+    calls = []
+    real = regexguard.compute_new_name
+
+    def counting(file, operations, index=0):
+        calls.append(file.name)
+        return real(file, operations, index)
+
+    monkeypatch.setattr(regexguard, "compute_new_name", counting)
+    return calls
+
+
+def names(rows):
+    return [(r["original"].name, r["new_name"], r["status"]) for r in rows]
+
+
+class TestCompileOperation:
+    def test_returns_copy(self):
+        op = {"type": "prefix", "prefix": "x_"}
+        assert compile_operation(op) == op
+        assert compile_operation(op) is not op
+
+    def test_invalid_template_rejected(self):
+        with pytest.raises(ValueError, match="Unknown template field"):
+            compile_operation({"type": "template", "template": "{nope}"})
+
+    def test_invalid_regex_rejected(self):
+        with pytest.raises(ValueError, match="Invalid regex"):
+            compile_operation({"type": "find_replace", "find": "(", "replace": "", "regex": True})
+
+    def test_missing_type_rejected(self):
+        with pytest.raises(ValueError):
+            compile_operation({})
+
+    def test_organize_rejected(self):
+        with pytest.raises(ValueError, match="plan_organize"):
+            compile_operation({"type": "organize", "template": "{stem}"})
+
+
+class TestPreview:
+    def test_preview_plan(self, folder):
+        s = RenameSession(folder, [LOWER], ext_filter=".txt")
+        assert names(s.preview()) == [("A.txt", "a.txt", "OK"), ("B.txt", "b.txt", "OK")]
+
+    def test_no_operations_means_no_change(self, folder):
+        assert {r["status"] for r in RenameSession(folder).preview()} == {"NO CHANGE"}
+
+    def test_preview_is_cached(self, folder, compute_calls):
+        s = RenameSession(folder, [LOWER])
+        first = s.preview()
+        s.preview()
+        assert len(compute_calls) == 3
+        first[0]["status"] = "mutated"
+        assert s.preview()[0]["status"] == "OK"
+
+    def test_add_operation_invalidates_plan(self, folder, compute_calls):
+        s = RenameSession(folder, [LOWER])
+        s.preview()
+        s.add_operation({"type": "prefix", "prefix": "x_"})
+        assert s.preview()[0]["new_name"] == "x_a.txt"
+        assert len(compute_calls) == 6
+
+    def test_remove_and_clear_operations(self, folder):
+        s = RenameSession(folder, [LOWER, {"type": "prefix", "prefix": "x_"}])
+        assert s.remove_operation()["type"] == "prefix"
+        assert s.preview()[0]["new_name"] == "a.txt"
+        s.clear_operations()
+        assert s.operations == ()
+        assert s.preview()[0]["status"] == "NO CHANGE"
+
+    def test_caller_edits_do_not_leak(self, folder):
+        op = {"type": "prefix", "prefix": "x_"}
+        s = RenameSession(folder, [op])
+        op["prefix"] = "y_"
+        assert s.preview()[0]["new_name"] == "x_A.txt"
+
+    def test_select_restricts_files(self, folder):
+        s = RenameSession(folder, [LOWER])
+        s.select(["B.txt"])
+        assert [f.name for f in s.files] == ["B.txt"]
+        s.select(None)
+        assert len(s.files) == 3
+
+    def test_unchanged_selection_keeps_plan(self, folder, compute_calls):
+        s = RenameSession(folder, [LOWER])
+        s.select(["A.txt", "B.txt"])
+        s.preview()
+        s.select(["B.txt", "A.txt"])
+        s.preview()
+        assert len(compute_calls) == 2
+
+    def test_plan_token(self, folder):
+        s = RenameSession(folder, [LOWER])
+        assert s.plan_token is None
+        s.preview()
+        token = s.plan_token
+        assert token is not None
+        s.preview()
+        assert s.plan_token is token
+        (folder / "D.txt").write_text("")
+        assert s.plan_token is None
+
+    def test_folder_change_triggers_relist(self, folder, compute_calls):
+        s = RenameSession(folder, [LOWER])
+        s.preview()
+        (folder / "D.txt").write_text("")
+        assert "D.txt" in [r["original"].name for r in s.preview()]
+
+    def test_conflict_from_snapshot(self, folder):
+        (folder / "x_A.txt").write_text("")
+        s = RenameSession(folder, [{"type": "prefix", "prefix": "x_"}])
+        s.select(["A.txt"])
+        assert s.preview()[0]["status"] == "CONFLICT"
+
+    def test_refresh_forces_recompute(self, folder, compute_calls):
+        s = RenameSession(folder, [LOWER])
+        s.preview()
+        s.refresh()
+        s.preview()
+        assert len(compute_calls) == 6
+
+
+class TestApplyUndo:
+    def test_apply_and_undo(self, folder):
+        s = RenameSession(folder, [LOWER])
+        outcomes = s.apply()
+        assert {o["status"] for o in outcomes} == {"RENAMED"}
+        assert sorted(p.name for p in folder.iterdir() if not p.name.startswith(".")) == [
+            "a.txt",
+            "b.txt",
+            "c.jpg",
+        ]
+        assert s.preview()[0]["status"] == "NO CHANGE"
+
+        restored = s.undo()
+        assert {o["status"] for o in restored} == {"RESTORED"}
+        assert (folder / "A.txt").read_text() == "A.txt"
+
+    def test_apply_writes_undo_map_for_new_session(self, folder):
+        RenameSession(folder, [LOWER]).apply()
+        assert len(RenameSession(folder).undo()) == 3
+        assert (folder / "C.jpg").exists()
+
+    def test_apply_replans_after_folder_change(self, folder):
+        s = RenameSession(folder, [LOWER])
+        s.preview()
+        (folder / "b.txt").write_text("keep me")
+        outcomes = s.apply()
+        assert [o["original"].name for o in outcomes] == ["A.txt", "C.jpg"]
+        assert (folder / "b.txt").read_text() == "keep me"
+
+    def test_apply_reports_errors(self, folder, monkeypatch):
+        real_rename = fsbackend.rename_noreplace
+
+        def flaky(src, dst):
+            if src.name == "B.txt":
+                raise PermissionError("locked")
+            return real_rename(src, dst)
+
+        monkeypatch.setattr(fsbackend, "rename_noreplace", flaky)
+        outcomes = RenameSession(folder, [LOWER]).apply()
+        assert [(o["original"].name, o["status"]) for o in outcomes] == [
+            ("A.txt", "RENAMED"),
+            ("B.txt", "ERROR"),
+            ("C.jpg", "RENAMED"),
+        ]
+
+    def test_second_undo_does_not_replay_the_first(self, folder):
+        s = RenameSession(folder, [{"type": "prefix", "prefix": "x_"}])
+        s.apply()
+        assert {o["status"] for o in s.undo()} == {"RESTORED"}
+        assert not (folder / UNDO_FILE).exists()
+        (folder / "x_A.txt").write_text("new data")
+        assert s.undo() == []
+        assert RenameSession(folder).undo() == []
+        assert (folder / "A.txt").read_text() == "A.txt"
+        assert (folder / "x_A.txt").read_text() == "new data"
+
+    def test_undo_never_overwrites_and_keeps_conflicts(self, folder):
+        s = RenameSession(folder, [{"type": "prefix", "prefix": "x_"}])
+        s.apply()
+        (folder / "A.txt").write_text("new data")
+        outcomes = {o["old"]: o["status"] for o in s.undo()}
+        assert outcomes == {"A.txt": "CONFLICT", "B.txt": "RESTORED", "C.jpg": "RESTORED"}
+        assert (folder / "A.txt").read_text() == "new data"
+        assert (folder / "x_A.txt").read_text() == "A.txt"
+        assert load_undo_map(folder) == [{"old": "A.txt", "new": "x_A.txt"}]
+        (folder / "A.txt").unlink()
+        assert [o["status"] for o in RenameSession(folder).undo()] == ["RESTORED"]
+        assert (folder / "A.txt").read_text() == "A.txt"
+        assert not (folder / UNDO_FILE).exists()
+
+    def test_undo_with_nothing_to_undo(self, folder):
+        assert RenameSession(folder).undo() == []
+
+    def test_apply_survives_unwritable_undo_map(self, folder, monkeypatch):
+        def fail(*args):
+            raise OSError("read-only")
+
+        monkeypatch.setattr(session, "save_undo_map", fail)
+        s = RenameSession(folder, [LOWER])
+        s.apply()
+        assert len(s.undo()) == 3
+
+
+def test_no_ui_imports():
+    code = "import session, sys; print(sorted({'rich', 'questionary'} & set(sys.modules)))"
+    out = subprocess.run([sys.executable, "-c", code], capture_output=True, text=True, check=True)
+    assert out.stdout.strip() == "[]"
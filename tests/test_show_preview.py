@@ -51,3 +51,23 @@ class TestShowPreview:
             make_result("e.txt", "bad<>.txt", "INVALID (illegal characters)"),
         ]
         show_preview(results)
+
+    def test_changed_text_is_highlighted(self):
+        from renamer import _NameChange
+
+        change = _NameChange("IMG_001.jpg", "IMG_002.jpg")
+        old, new = change.cell(0).__rich__(), change.cell(1).__rich__()
+        assert old.plain == "IMG_001.jpg"
+        assert [(s.start, s.end, str(s.style)) for s in old.spans] == [(6, 7, "bold red")]
+        assert [(s.start, s.end, str(s.style)) for s in new.spans] == [(6, 7, "bold green")]
+
+    def test_highlight_is_computed_once_per_row(self, monkeypatch):
+        import renamer
+
+        calls = []
+        monkeypatch.setattr(renamer, "change_spans", lambda o, n: calls.append(o) or ([], []))
+        change = renamer._NameChange("a.txt", "b.txt")
+        assert not calls  # nothing is computed until the cells are rendered
+        change.cell(0).__rich__()
+        change.cell(1).__rich__()
+        assert calls == ["a.txt"]
@@ -0,0 +1,127 @@
+"""Tests for templates.compile_template() and the template operation."""
+
+import os
+from datetime import datetime
+from pathlib import Path
+from unittest import mock
+
+import pytest
+
+from renamer import compute_new_name
+from templates import CompiledTemplate, compile_template
+
+
+class TestCompileTemplate:
+    def test_returns_compiled_template(self):
+        assert isinstance(compile_template("{stem}"), CompiledTemplate)
+
+    def test_same_template_is_cached(self):
+        assert compile_template("{stem}_x") is compile_template("{stem}_x")
+
+    def test_fields_in_order(self):
+        assert compile_template("{show} {season}").fields == ("show", "season")
+
+    def test_unknown_field_raises(self):
+        with pytest.raises(ValueError, match="Unknown template field"):
+            compile_template("{nope}")
+
+    def test_unbalanced_braces_raise(self):
+        with pytest.raises(ValueError, match="Invalid template"):
+            compile_template("{stem")
+
+    def test_conversion_raises(self):
+        with pytest.raises(ValueError, match="Conversions"):
+            compile_template("{stem!r}")
+
+    def test_nested_field_raises(self):
+        with pytest.raises(ValueError, match="Nested"):
+            compile_template("{counter:{size}}")
+
+    @pytest.mark.parametrize("template", ["{title:04d}", "{size:%Y}", "{counter:.2s}"])
+    def test_spec_not_valid_for_field_type_raises(self, template):
+        with pytest.raises(ValueError, match="Invalid format"):
+            compile_template(template)
+
+    @pytest.mark.parametrize(
+        "template", ["{title:>10}", "{size:,}", "{mtime:%d.%m.%Y}", "{size_mb:.3f}", "{year:04}"]
+    )
+    def test_spec_valid_for_field_type(self, template):
+        assert compile_template(template).fields
+
+
+class TestRender:
+    def test_literal_only(self):
+        assert compile_template("fixed").render(Path("/tmp/a.txt")) == "fixed"
+
+    def test_stem_and_parent(self):
+        result = compile_template("{parent}_{stem}").render(Path("/tmp/photos/a.jpg"))
+        assert result == "photos_a"
+
+    def test_tv_fields(self):
+        t = compile_template("{show} - S{season:02}E{episode:02} - {title}")
+        result = t.render(Path("/tmp/Breaking.Bad.S01E02.Cats.In.The.Bag.720p.mkv"))
+        assert result == "Breaking Bad - S01E02 - Cats In The Bag"
+
+    def test_season_default_spec_pads(self):
+        assert compile_template("S{season}").render(Path("/tmp/Show.S1E2.mkv")) == "S01"
+
+    def test_tv_fields_missing_returns_none(self):
+        assert compile_template("{show}").render(Path("/tmp/holiday.jpg")) is None
+
+    def test_movie_fields(self):
+        t = compile_template("{movie} ({year})")
+        assert t.render(Path("/tmp/The.Matrix.1999.1080p.mkv")) == "The Matrix (1999)"
+
+    def test_movie_fields_missing_returns_none(self):
+        assert compile_template("{movie}").render(Path("/tmp/notes.txt")) is None
+
+    def test_counter_is_one_based_and_padded(self):
+        t = compile_template("{counter:04}")
+        assert t.render(Path("/tmp/a.txt"), 0) == "0001"
+        assert t.render(Path("/tmp/a.txt"), 41) == "0042"
+
+    def test_stat_fields(self, tmp_path):
+        f = tmp_path / "a.bin"
+        f.write_bytes(b"x" * 2048)
+        ts = datetime(2024, 5, 6, 7, 8, 9).timestamp()
+        os.utime(f, (ts, ts))
+        t = compile_template("{mtime}_{mtime:%H%M}_{size}_{size_kb}")
+        assert t.render(f) == "2024-05-06_0708_2048_2.0"
+
+    def test_size_mb_default_spec(self, tmp_path):
+        f = tmp_path / "a.bin"
+        f.write_bytes(b"")
+        assert compile_template("{size_mb}").render(f) == "0.0"
+
+    def test_stat_missing_file_returns_none(self, tmp_path):
+        assert compile_template("{size}").render(tmp_path / "ghost.txt") is None
+
+    def test_unreferenced_sources_are_not_computed(self):
+        with (
+            mock.patch("templates.parse_tv_filename") as tv,
+            mock.patch.object(Path, "stat") as stat,
+        ):
+            compile_template("{stem}-{counter}").render(Path("/tmp/Show.S01E01.mkv"))
+        tv.assert_not_called()
+        stat.assert_not_called()
+
+
+class TestComputeNewNameTemplate:
+    def test_template_replaces_stem_and_keeps_extension(self):
+        ops = [{"type": "template", "template": "{show} S{season}E{episode}"}]
+        assert compute_new_name(Path("/tmp/Lost.S03E22.mkv"), ops) == "Lost S03E22.mkv"
+
+    def test_template_uses_index_for_counter(self):
+        ops = [{"type": "template", "template": "img_{counter:03}"}]
+        assert compute_new_name(Path("/tmp/DSC0001.jpg"), ops, 4) == "img_005.jpg"
+
+    def test_unavailable_fields_leave_stem_unchanged(self):
+        ops = [{"type": "template", "template": "{show}"}]
+        assert compute_new_name(Path("/tmp/notes.txt"), ops) == "notes.txt"
+
+    def test_template_stacks_with_other_operations(self):
+        ops = [
+            {"type": "template", "template": "{stem}_{counter:02}"},
+            {"type": "case", "mode": "uppercase"},
+        ]
+        assert compute_new_name(Path("/tmp/a.txt"), ops) == "A_01.txt"
@@ -0,0 +1,188 @@
+"""Tests for titleindex.build_index(), TitleIndex, and renamer.load_title_index()."""
+
+import os
+
+import pytest
+
+import renamer
+from renamer import load_title_index
+from titleindex import (
+    HEADER,
+    U64,
+    TitleIndex,
+    build_index,
+    open_title_index,
+    resolve_movie_info,
+    resolve_tv_info,
+)
+
+DATASET = """# title\tyear\tkind
+The Office (US)\t2005\ttv
+The Office\t2001\ttv
+Dune\t1984\tmovie
+Dune\t2021\tmovie
+Blade Runner 2049\t2017\tmovie
+Amélie\t2001\tmovie
+Untitled\t\t
+"""
+
+
+@pytest.fixture()
+def tsv(tmp_path):
+    path = tmp_path / "titles.tsv"
+    path.write_text(DATASET, encoding="utf-8")
+    return path
+
+
+@pytest.fixture()
+def index(tsv):
+    idx = TitleIndex(build_index(tsv))
+    yield idx
+    idx.close()
+
+
+class TestBuildIndex:
+    def test_default_path(self, tsv):
+        assert build_index(tsv) == tsv.with_name("titles.tsv.idx")
+
+    def test_record_count(self, index):
+        assert index.n_records == 7
+
+    def test_rejects_non_index_file(self, tmp_path):
+        bogus = tmp_path / "bogus.idx"
+        bogus.write_bytes(b"\0" * 64)
+        with pytest.raises(ValueError, match="Not a title index"):
+            TitleIndex(bogus)
+
+    @pytest.mark.parametrize("keep", [10, -5])
+    def test_rejects_truncated_index(self, tsv, keep):
+        path = build_index(tsv)
+        path.write_bytes(path.read_bytes()[:keep])
+        with pytest.raises(ValueError, match="Truncated or corrupt"):
+            TitleIndex(path)
+
+    def test_corrupt_record_raises_value_error(self, tsv):
+        path = build_index(tsv)
+        data = bytearray(path.read_bytes())
+        rec_offs_off = HEADER.unpack_from(data, 0)[4]
+        for i in range(7):  # point every record past the end of the file
+            U64.pack_into(data, rec_offs_off + i * U64.size, len(data))
+        path.write_bytes(bytes(data))
+        with TitleIndex(path) as idx, pytest.raises(ValueError, match="Corrupt title index"):
+            idx.lookup("dune")
+
+    def test_empty_dataset(self, tmp_path):
+        path = tmp_path / "empty.tsv"
+        path.write_text("", encoding="utf-8")
+        with TitleIndex(build_index(path)) as idx:
+            assert idx.lookup("anything") is None
+
+
+class TestLookup:
+    def test_exact_normalized_match(self, index):
+        result = index.lookup("the office (us)")
+        assert result == {"title": "The Office (US)", "year": 2005, "kind": "tv", "score": 1.0}
+
+    def test_dotted_release_name(self, index):
+        assert index.lookup("The.Office.US")["title"] == "The Office (US)"
+
+    def test_accent_insensitive(self, index):
+        assert index.lookup("amelie")["title"] == "Amélie"
+
+    def test_year_picks_closest_remake(self, index):
+        assert index.lookup("Dune", year=2021)["year"] == 2021
+        assert index.lookup("Dune", year=1985)["year"] == 1984
+
+    def test_kind_filter(self, index):
+        assert index.lookup("Dune", kind="tv") is None
+
+    def test_fuzzy_match(self, index):
+        result = index.lookup("Blade Runer 2049")
+        assert result["title"] == "Blade Runner 2049"
+        assert 0.6 <= result["score"] < 1.0
+
+    def test_no_match(self, index):
+        assert index.lookup("Completely Different Thing") is None
+
+    def test_empty_query(self, index):
+        assert index.lookup("...") is None
+
+    def test_missing_year_is_none(self, index):
+        assert index.lookup("Untitled")["year"] is None
+
+
+class TestResolve:
+    def test_resolve_tv_info(self, index):
+        info = {"show": "The Office Us", "season": 2, "episode": 1, "title": ""}
+        assert resolve_tv_info(info, index)["show"] == "The Office (US)"
+
+    def test_resolve_tv_info_no_match(self, index):
+        info = {"show": "Unknown Show", "season": 1, "episode": 1, "title": ""}
+        assert resolve_tv_info(info, index) is info
+
+    def test_resolve_movie_info(self, index):
+        info = {"title": "Blade Runner 2049", "year": 2017}
+        assert resolve_movie_info(info, index) == {"title": "Blade Runner 2049", "year": 2017}
+
+    def test_resolve_movie_info_no_match(self, index):
+        info = {"title": "Nothing Like It", "year": 1999}
+        assert resolve_movie_info(info, index) is info
+
+
+class TestOpenTitleIndex:
+    def test_builds_missing_index(self, tsv):
+        with open_title_index(tsv) as idx:
+            assert idx.n_records == 7
+        assert tsv.with_name("titles.tsv.idx").exists()
+
+    def test_rebuilds_stale_index(self, tsv):
+        open_title_index(tsv).close()
+        idx_path = tsv.with_name("titles.tsv.idx")
+        os.utime(idx_path, (0, 0))
+        tsv.write_text("Alien\t1979\tmovie\n", encoding="utf-8")
+        with open_title_index(tsv) as idx:
+            assert idx.n_records == 1
+
+
+class TestLoadTitleIndex:
+    @pytest.fixture(autouse=True)
+    def fresh_cache(self, monkeypatch):
+        monkeypatch.setattr(renamer, "_title_indexes", {})
+        yield
+        for _, idx in renamer._title_indexes.values():
+            idx.close()
+
+    def test_absent_key(self):
+        assert load_title_index({}) is None
+
+    def test_relative_path_resolved_against_script_dir(self, tsv, monkeypatch):
+        monkeypatch.setattr("renamer.__file__", str(tsv.parent / "renamer.py"))
+        idx = load_title_index({"title_index": "titles.tsv"})
+        assert idx.lookup("dune") is not None
+
+    def test_index_is_opened_once(self, tsv):
+        config = {"title_index": str(tsv)}
+        idx = load_title_index(config)
+        assert load_title_index(config) is idx
+
+    def test_changed_dataset_reopens(self, tsv):
+        config = {"title_index": str(tsv)}
+        old = load_title_index(config)
+        tsv.write_text("Alien\t1979\tmovie\n", encoding="utf-8")
+        os.utime(tsv, ns=(0, tsv.stat().st_mtime_ns + 10**9))
+        new = load_title_index(config)
+        assert new is not old and new.n_records == 1
+        with pytest.raises(ValueError):
+            old.lookup("dune")  # closed
+
+    def test_truncated_index_warns(self, tsv, capsys):
+        idx_path = build_index(tsv)
+        os.utime(idx_path, ns=(0, tsv.stat().st_mtime_ns + 10**9))
+        idx_path.write_bytes(idx_path.read_bytes()[:-5])
+        os.utime(idx_path, ns=(0, tsv.stat().st_mtime_ns + 10**9))
+        assert load_title_index({"title_index": str(tsv)}) is None
+        assert "corrupt title index" in capsys.readouterr().out
+
+    def test_missing_dataset_warns(self, tmp_path, capsys):
+        assert load_title_index({"title_index": str(tmp_path / "nope.tsv")}) is None
+        assert "could not load title index" in capsys.readouterr().out
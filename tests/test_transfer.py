@@ -0,0 +1,264 @@
+"""Tests for transfer.move_across_devices() and the EXDEV fallback in rename_file()."""
+
+import errno
+import os
+from pathlib import Path
+
+import pytest
+
+import fsbackend
+import transfer
+from engine import rename_file, undo_renames
+from metrics import ApplyMetrics
+from transfer import JOURNAL_SUFFIX, PARTIAL_SUFFIX, move_across_devices
+
+DATA = bytes(range(256)) * 40  # 10 KiB
+
+
+@pytest.fixture(autouse=True)
+def small_chunks(monkeypatch):
+    monkeypatch.setattr(transfer, "CHUNK_SIZE", 1024)
+    monkeypatch.setattr(transfer, "_disabled", set())
+
+
+def make_source(tmp_path: Path, data: bytes = DATA) -> Path:
+    src = tmp_path / "src" / "movie.mkv"
+    src.parent.mkdir(exist_ok=True)
+    src.write_bytes(data)
+    os.utime(src, ns=(1_600_000_000_000_000_000, 1_600_000_000_000_000_000))
+    (tmp_path / "dst").mkdir(exist_ok=True)
+    return src
+
+
+def side_files(dst: Path) -> tuple[Path, Path]:
+    return (
+        dst.with_name(f".{dst.name}{PARTIAL_SUFFIX}"),
+        dst.with_name(f".{dst.name}{JOURNAL_SUFFIX}"),
+    )
+
+
+class TestMoveAcrossDevices:
+    @pytest.mark.parametrize("workers", [1, 4])
+    def test_moves_content_and_timestamps(self, tmp_path, workers):
+        src = make_source(tmp_path)
+        dst = tmp_path / "dst" / "movie.mkv"
+        move_across_devices(src, dst, verify=True, workers=workers)
+        assert not src.exists()
+        assert dst.read_bytes() == DATA
+        assert dst.stat().st_mtime_ns == 1_600_000_000_000_000_000
+        assert not any(p.exists() for p in side_files(dst))
+
+    def test_empty_file(self, tmp_path):
+        src = make_source(tmp_path, b"")
+        dst = tmp_path / "dst" / "empty"
+        move_across_devices(src, dst)
+        assert dst.read_bytes() == b""
+
+    def test_resumes_journalled_chunks(self, tmp_path, monkeypatch):
+        src = make_source(tmp_path)
+        dst = tmp_path / "dst" / "movie.mkv"
+        partial, journal = side_files(dst)
+        # A previous attempt copied the first three chunks before stopping
+        partial.write_bytes(DATA[:3072] + b"\0" * (len(DATA) - 3072))
+        journal.write_text(
+            transfer._journal_header(src.stat()) + "0\n1024\n2048\n", encoding="utf-8"
+        )
+        copied = []
+        real_copy_chunk = transfer._copy_chunk
+        monkeypatch.setattr(
+            transfer,
+            "_copy_chunk",
+            lambda s, d, offset, count: (
+                copied.append(offset) or real_copy_chunk(s, d, offset, count)
+            ),
+        )
+        move_across_devices(src, dst, workers=1)
+        assert copied == list(range(3072, len(DATA), 1024))
+        assert dst.read_bytes() == DATA
+
+    def test_stale_journal_starts_over(self, tmp_path):
+        src = make_source(tmp_path)
+        dst = tmp_path / "dst" / "movie.mkv"
+        partial, journal = side_files(dst)
+        partial.write_bytes(b"x" * len(DATA))
+        journal.write_text("1 2 3\n0\n", encoding="utf-8")  # a different source
+        move_across_devices(src, dst)
+        assert dst.read_bytes() == DATA
+
+    def test_falls_back_when_a_primitive_is_unsupported(self, tmp_path, monkeypatch):
+        calls = []
+
+        def unsupported(src_fd, dst_fd, offset, count):
+            calls.append(offset)
+            raise OSError(errno.EXDEV, "cross-device")
+
+        methods = [("fast", unsupported)] + [m for m in transfer._METHODS if m[0] == "read_write"]
+        monkeypatch.setattr(transfer, "_METHODS", methods)
+        src = make_source(tmp_path)
+        dst = tmp_path / "dst" / "movie.mkv"
+        move_across_devices(src, dst, workers=1)
+        assert dst.read_bytes() == DATA
+        assert calls == [0]  # disabled after the first failure
+
+    def test_fallback_is_per_device_pair(self, tmp_path, monkeypatch):
+        calls = []
+
+        def fast(src_fd, dst_fd, offset, count):
+            calls.append(offset)
+            return transfer._read_write(src_fd, dst_fd, offset, count)
+
+        monkeypatch.setattr(transfer, "_METHODS", [("fast", fast)] + transfer._METHODS[-1:])
+        # Disabled for some other pair of filesystems only
+        transfer._disabled.add((-1, -2, "fast"))
+        src = make_source(tmp_path)
+        move_across_devices(src, tmp_path / "dst" / "movie.mkv", workers=1)
+        assert calls == list(range(0, len(DATA), 1024))
+
+    @pytest.mark.parametrize("code", [errno.EBADF, errno.EINVAL])
+    def test_bad_descriptor_or_argument_is_not_a_fallback(self, tmp_path, monkeypatch, code):
+        def fails(src_fd, dst_fd, offset, count):
+            raise OSError(code, os.strerror(code))
+
+        monkeypatch.setattr(transfer, "_METHODS", [("fails", fails)] + transfer._METHODS[-1:])
+        src = make_source(tmp_path)
+        with pytest.raises(OSError) as info:
+            move_across_devices(src, tmp_path / "dst" / "movie.mkv", workers=1)
+        assert info.value.errno == code
+        assert not transfer._disabled
+
+    def test_other_errors_propagate(self, tmp_path, monkeypatch):
+        def broken(src_fd, dst_fd, offset, count):
+            raise OSError(errno.EIO, "I/O error")
+
+        monkeypatch.setattr(transfer, "_METHODS", [("broken", broken)])
+        src = make_source(tmp_path)
+        with pytest.raises(OSError, match="I/O error"):
+            move_across_devices(src, tmp_path / "dst" / "movie.mkv")
+        assert src.read_bytes() == DATA
+
+    def test_short_source_is_an_error(self, tmp_path, monkeypatch):
+        monkeypatch.setattr(transfer, "_METHODS", [("eof", lambda *args: 0)])
+        src = make_source(tmp_path)
+        with pytest.raises(OSError, match="ended early"):
+            move_across_devices(src, tmp_path / "dst" / "movie.mkv")
+        assert src.exists()
+
+    def test_unjournalled_chunk_keeps_source(self, tmp_path, monkeypatch):
+        src = make_source(tmp_path)
+        dst = tmp_path / "dst" / "movie.mkv"
+        partial, journal = side_files(dst)
+        real_copy_chunk = transfer._copy_chunk
+
+        def skip_chunk(s, d, offset, count):
+            if offset == 2048:
+                return  # lost: never written and, below, never journalled
+            real_copy_chunk(s, d, offset, count)
+            lines = journal.read_text(encoding="utf-8").splitlines(keepends=True)
+            journal.write_text("".join(x for x in lines if x != "2048\n"), encoding="utf-8")
+
+        monkeypatch.setattr(transfer, "_copy_chunk", skip_chunk)
+        with pytest.raises(OSError, match="missing 1 chunk"):
+            move_across_devices(src, dst, workers=1)
+        assert src.read_bytes() == DATA
+        assert not dst.exists()
+        assert partial.stat().st_size == len(DATA)  # pre-sized, yet incomplete
+
+        # The next attempt copies only the missing chunk
+        copied = []
+        monkeypatch.setattr(
+            transfer,
+            "_copy_chunk",
+            lambda s, d, offset, count: (
+                copied.append(offset) or real_copy_chunk(s, d, offset, count)
+            ),
+        )
+        move_across_devices(src, dst, workers=1)
+        assert copied == [2048]
+        assert dst.read_bytes() == DATA
+        assert not src.exists()
+
+    def test_verify_mismatch_keeps_source(self, tmp_path, monkeypatch):
+        digests = iter(["a", "b"])
+        monkeypatch.setattr(transfer, "hash_file", lambda path: next(digests))
+        src = make_source(tmp_path)
+        dst = tmp_path / "dst" / "movie.mkv"
+        with pytest.raises(OSError, match="does not match"):
+            move_across_devices(src, dst, verify=True)
+        assert src.read_bytes() == DATA
+        assert not dst.exists()
+        assert not any(p.exists() for p in side_files(dst))
+
+    def test_source_changed_during_copy(self, tmp_path, monkeypatch):
+        src = make_source(tmp_path)
+        real_copy_chunk = transfer._copy_chunk
+
+        def copy_then_touch(s, d, offset, count):
+            real_copy_chunk(s, d, offset, count)
+            os.utime(src, ns=(0, 0))
+
+        monkeypatch.setattr(transfer, "_copy_chunk", copy_then_touch)
+        with pytest.raises(OSError, match="changed"):
+            move_across_devices(src, tmp_path / "dst" / "movie.mkv")
+        assert src.exists()
+
+    def test_target_appeared(self, tmp_path):
+        src = make_source(tmp_path)
+        dst = tmp_path / "dst" / "movie.mkv"
+        dst.write_text("other")
+        with pytest.raises(FileExistsError):
+            move_across_devices(src, dst)
+        assert src.exists()
+        assert dst.read_text() == "other"
+
+    def test_source_cannot_be_removed(self, tmp_path, monkeypatch):
+        src = make_source(tmp_path)
+        dst = tmp_path / "dst" / "movie.mkv"
+
+        real_unlink = os.unlink
+
+        def refuse(path, *args, **kwargs):
+            if Path(path) == src:
+                raise PermissionError(errno.EACCES, "denied")
+            return real_unlink(path, *args, **kwargs)
+
+        monkeypatch.setattr(os, "unlink", refuse)
+        with pytest.raises(OSError, match="could not remove the source"):
+            move_across_devices(src, dst)
+        assert dst.read_bytes() == DATA
+
+
+def exdev_rename(monkeypatch):
+    real_rename = fsbackend.rename_noreplace
+
+    def rename(src, dst):
+        if dst.parent != src.parent:
+            raise OSError(errno.EXDEV, "Invalid cross-device link")
+        return real_rename(src, dst)
+
+    monkeypatch.setattr(fsbackend, "rename_noreplace", rename)
+
+
+class TestRenameFileFallback:
+    def test_cross_device_move_and_undo(self, tmp_path, monkeypatch):
+        exdev_rename(monkeypatch)
+        src = tmp_path / "a.txt"
+        src.write_bytes(DATA)
+        (tmp_path / "mnt").mkdir()
+        metrics = ApplyMetrics(1)
+        rename_file(src, "mnt/a.txt", metrics, verify=True)
+        assert (tmp_path / "mnt" / "a.txt").read_bytes() == DATA
+        assert set(metrics.latency) == {"rename", "copy"}
+
+        outcomes = undo_renames(tmp_path, [{"old": "a.txt", "new": "mnt/a.txt"}])
+        assert outcomes[0]["status"] == "RESTORED"
+        assert src.read_bytes() == DATA
+
+    def test_other_rename_errors_are_not_retried(self, tmp_path, monkeypatch):
+        def rename(src, dst):
+            raise PermissionError(errno.EACCES, "denied")
+
+        monkeypatch.setattr(fsbackend, "rename_noreplace", rename)
+        src = tmp_path / "a.txt"
+        src.write_text("x")
+        with pytest.raises(PermissionError):
+            rename_file(src, "b.txt", ApplyMetrics(1))
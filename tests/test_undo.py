@@ -2,7 +2,15 @@
 
 import json
 
-from renamer import UNDO_FILE, apply_undo, load_undo_map, save_undo_map
+from fsbackend import MemoryFileSystem
+from renamer import (
+    UNDO_FILE,
+    apply_undo,
+    clear_undo_map,
+    load_undo_map,
+    save_undo_map,
+    undo_renames,
+)
 
 # ---------------------------------------------------------------------------
 # Helpers
@@ -151,3 +159,25 @@ class TestApplyUndo:
         undo_map = [make_undo_entry("original.txt", "renamed.txt")]
         apply_undo(tmp_path, undo_map)
         assert (tmp_path / "original.txt").read_text() == "hello world"
+
+    def test_existing_old_name_is_a_conflict_not_overwritten(self, tmp_path):
+        (tmp_path / "renamed.txt").write_text("renamed")
+        (tmp_path / "original.txt").write_text("newer file")
+        outcomes = apply_undo(tmp_path, [make_undo_entry("original.txt", "renamed.txt")])
+        assert outcomes[0]["status"] == "CONFLICT"
+        assert (tmp_path / "original.txt").read_text() == "newer file"
+        assert (tmp_path / "renamed.txt").read_text() == "renamed"
+
+    def test_case_only_undo_on_case_insensitive_folder(self, tmp_path):
+        fs = MemoryFileSystem(case_sensitive=False)
+        fs.add_file(tmp_path / "photo.jpg")
+        outcomes = undo_renames(tmp_path, [make_undo_entry("Photo.jpg", "photo.jpg")], fs)
+        assert outcomes[0]["status"] == "RESTORED"
+        assert fs.listdir(tmp_path) == ["Photo.jpg"]
+
+
+def test_clear_undo_map(tmp_path):
+    save_undo_map(tmp_path, [make_undo_entry("a", "b")])
+    clear_undo_map(tmp_path)
+    assert not (tmp_path / UNDO_FILE).exists()
+    clear_undo_map(tmp_path)  # already gone
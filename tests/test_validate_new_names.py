@@ -1,8 +1,13 @@
 """Tests for renamer.validate_new_names()."""
 
+import unicodedata
 from pathlib import Path
 
-from renamer import validate_new_names
+import pytest
+
+from fsbackend import MemoryFileSystem
+from nameindex import NameIndex, probe_folder
+from renamer import check_name, validate_new_names
 
 
 def make_pair(directory: Path, original_name: str, new_name: str):
@@ -107,14 +112,130 @@ class TestValidateNewNames:
         assert results[1]["new_name"] == "y.txt"
         assert results[2]["new_name"] == "z.txt"
 
-    def test_conflict_is_case_insensitive_on_windows(self, tmp_path):
+    def test_conflict_is_case_insensitive_on_case_insensitive_folder(self, tmp_path):
         # Two files renaming to names that differ only in case count as conflict
+        # when the folder is case-insensitive
         (tmp_path / "a.txt").write_text("")
         (tmp_path / "b.txt").write_text("")
         pairs = [
             make_pair(tmp_path, "a.txt", "Same.txt"),
             make_pair(tmp_path, "b.txt", "same.txt"),
         ]
-        results = validate_new_names(pairs)
+        results = validate_new_names(pairs, NameIndex(["a.txt", "b.txt"], case_sensitive=False))
         assert results[0]["status"] == "CONFLICT"
         assert results[1]["status"] == "CONFLICT"
+
+    @pytest.mark.parametrize("case_sensitive", [True, False])
+    def test_without_index_each_folder_is_probed_through_fs(self, tmp_path, case_sensitive):
+        fs = MemoryFileSystem(case_sensitive=case_sensitive)
+        fs.add_files(tmp_path, ["a.txt", "b.txt", "Taken.txt"])
+        pairs = [
+            make_pair(tmp_path, "a.txt", "Same.txt"),
+            make_pair(tmp_path, "b.txt", "same.txt"),
+            make_pair(tmp_path, "Taken.txt", "taken.txt"),  # case-only rename of itself
+        ]
+        results = validate_new_names(pairs, fs=fs)
+        expected = ["OK", "OK", "OK"] if case_sensitive else ["CONFLICT", "CONFLICT", "OK"]
+        assert [r["status"] for r in results] == expected
+
+    def test_without_index_real_folder_follows_its_probe(self, tmp_path):
+        (tmp_path / "a.txt").write_text("")
+        (tmp_path / "b.txt").write_text("")
+        pairs = [
+            make_pair(tmp_path, "a.txt", "Same.txt"),
+            make_pair(tmp_path, "b.txt", "same.txt"),
+        ]
+        case_sensitive, _ = probe_folder(tmp_path)
+        expected = "OK" if case_sensitive else "CONFLICT"
+        assert [r["status"] for r in validate_new_names(pairs)] == [expected, expected]
+
+    def test_case_variants_distinct_on_case_sensitive_folder(self, tmp_path):
+        pairs = [
+            make_pair(tmp_path, "a.txt", "Same.txt"),
+            make_pair(tmp_path, "b.txt", "same.txt"),
+        ]
+        results = validate_new_names(pairs, NameIndex(["a.txt", "b.txt"], case_sensitive=True))
+        assert [r["status"] for r in results] == ["OK", "OK"]
+
+    def test_case_only_rename_onto_other_file_on_case_sensitive_folder(self, tmp_path):
+        index = NameIndex(["Photo.jpg", "photo.jpg"], case_sensitive=True)
+        results = validate_new_names([make_pair(tmp_path, "Photo.jpg", "photo.jpg")], index)
+        assert results[0]["status"] == "CONFLICT"
+
+    def test_case_only_rename_on_case_insensitive_folder(self, tmp_path):
+        index = NameIndex(["Photo.jpg"], case_sensitive=False)
+        results = validate_new_names([make_pair(tmp_path, "Photo.jpg", "photo.jpg")], index)
+        assert results[0]["status"] == "OK"
+
+    def test_nfc_nfd_collision_on_normalizing_folder(self, tmp_path):
+        nfc = unicodedata.normalize("NFC", "Café.txt")
+        nfd = unicodedata.normalize("NFD", "Café.txt")
+        pairs = [make_pair(tmp_path, "a.txt", nfc), make_pair(tmp_path, "b.txt", nfd)]
+        normalizing = NameIndex(["a.txt", "b.txt"], normalizes=True)
+        raw = NameIndex(["a.txt", "b.txt"], normalizes=False)
+        assert {r["status"] for r in validate_new_names(pairs, normalizing)} == {"CONFLICT"}
+        assert {r["status"] for r in validate_new_names(pairs, raw)} == {"OK"}
+
+    def test_index_replaces_folder_lookups(self, tmp_path):
+        # Targets are checked against the given index, not the disk
+        (tmp_path / "a.txt").write_text("")
+        (tmp_path / "b.txt").write_text("")
+        pairs = [
+            make_pair(tmp_path, "a.txt", "taken.txt"),
+            make_pair(tmp_path, "b.txt", "free.txt"),
+        ]
+        results = validate_new_names(pairs, NameIndex(["a.txt", "b.txt", "taken.txt"]))
+        assert [r["status"] for r in results] == ["CONFLICT", "OK"]
+
+
+class TestCheckName:
+    @pytest.mark.parametrize("name", ["photo.jpg", "Café – 01.jpg", "CONSOLE.txt", "NUL1.txt"])
+    def test_valid(self, name):
+        assert check_name(name) is None
+
+    @pytest.mark.parametrize("name", ["", ".txt", "..", "...jpg"])
+    def test_empty(self, name):
+        assert check_name(name) == "INVALID (empty name)"
+
+    @pytest.mark.parametrize(
+        "name", ["CON", "con.txt", "Nul.tar.gz", "COM1.log", "lpt9", "AUX .txt"]
+    )
+    def test_reserved(self, name):
+        assert check_name(name) == "INVALID (reserved name)"
+
+    @pytest.mark.parametrize("name", ["a/b.txt", "a\\b.txt", "tab\there.txt", "nul\x00.txt"])
+    def test_separators_and_controls_are_illegal(self, name):
+        assert check_name(name) == "INVALID (illegal characters)"
+
+    @pytest.mark.parametrize("name", ["file.", "file ", "file.txt "])
+    def test_trailing_dot_or_space_is_allowed(self, name):
+        assert check_name(name) is None
+
+    def test_length_counts_utf8_bytes(self):
+        # "é" is two bytes in UTF-8
+        assert check_name("é" * 125 + ".txt") is None  # 254 bytes
+        assert check_name("é" * 126 + ".txt") == "INVALID (name too long)"  # 256 bytes, 130 chars
+        assert check_name("a" * 255) is None
+        assert check_name("a" * 256) == "INVALID (name too long)"
+
+
+class TestBatch:
+    def test_later_duplicate_marks_earlier_row(self, tmp_path):
+        pairs = [
+            make_pair(tmp_path, "a.txt", "same.txt"),
+            make_pair(tmp_path, "b.txt", "other.txt"),
+            make_pair(tmp_path, "c.txt", "same.txt"),
+        ]
+        assert [r["status"] for r in validate_new_names(pairs)] == ["CONFLICT", "OK", "CONFLICT"]
+
+    def test_same_name_in_different_folders_is_not_a_conflict(self, tmp_path):
+        (tmp_path / "x").mkdir()
+        (tmp_path / "y").mkdir()
+        pairs = [(tmp_path / "x" / "a.txt", "same.txt"), (tmp_path / "y" / "b.txt", "same.txt")]
+        assert [r["status"] for r in validate_new_names(pairs)] == ["OK", "OK"]
+
+    def test_large_batch(self, tmp_path):
+        pairs = [make_pair(tmp_path, f"f{i}.txt", f"g{i}.txt") for i in range(100_000)]
+        results = validate_new_names(pairs)
+        assert len(results) == len(pairs)
+        assert all(r["status"] == "OK" for r in results)
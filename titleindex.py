@@ -0,0 +1,317 @@
+"""Offline canonical title index for movie and TV names.
+
+A TSV of ``title<TAB>year[<TAB>kind]`` rows (kind is "movie" or "tv", blank
+for either) is compiled once into a binary index file next to it. Lookups
+mmap that file: exact matches go through an open-addressing hash table of
+normalized keys, and misses fall back to a trigram index scored by Dice
+similarity. Nothing is parsed or loaded into memory per lookup beyond the
+records actually touched.
+
+File layout (little-endian):
+    header   MAGIC, record/slot/gram counts, section offsets
+    records  per record: year u16, kind u8, gram count u16, title len u16,
+             title utf-8, key len u16, key utf-8
+    rec_offs u64 offset of each record
+    slots    (key hash u64, record id + 1 u32) open-addressing table
+    grams    (gram hash u64, postings start u32, postings count u32), sorted
+    postings u32 record ids
+"""
+
+import hashlib
+import mmap
+import struct
+import sys
+from pathlib import Path
+
+from patterns import normalize_title_key, title_trigrams
+
+MAGIC = b"RTTIDX01"
+INDEX_SUFFIX = ".idx"
+HEADER = struct.Struct("<8sIIIQQQQ")
+RECORD = struct.Struct("<HBHH")
+SLOT = struct.Struct("<QI")
+GRAM = struct.Struct("<QII")
+U16 = struct.Struct("<H")
+U32 = struct.Struct("<I")
+U64 = struct.Struct("<Q")
+
+KINDS = {"": 0, "movie": 1, "tv": 2}
+KIND_NAMES = {v: k for k, v in KINDS.items()}
+FUZZY_THRESHOLD = 0.6
+MAX_POSTINGS = 50_000  # grams this common carry no signal and are skipped at query time
+
+
+def _hash(text: str) -> int:
+    return int.from_bytes(hashlib.blake2b(text.encode("utf-8"), digest_size=8).digest(), "little")
+
+
+def _read_tsv(tsv_path: Path):
+    with open(tsv_path, encoding="utf-8") as f:
+        for line in f:
+            line = line.rstrip("\n")
+            if not line or line.startswith("#"):
+                continue
+            cols = line.split("\t")
+            title = cols[0].strip()
+            year_str = cols[1].strip() if len(cols) > 1 else ""
+            kind = cols[2].strip().lower() if len(cols) > 2 else ""
+            key = normalize_title_key(title)
+            if not key:
+                continue
+            year = int(year_str) if year_str.isdigit() else 0
+            yield title, year, KINDS.get(kind, 0), key
+
+
+def build_index(tsv_path: Path, index_path: Path | None = None) -> Path:
+    """Compile tsv_path into a binary index (default: tsv_path + ".idx")."""
+    index_path = index_path or tsv_path.with_name(tsv_path.name + INDEX_SUFFIX)
+
+    records = bytearray()
+    rec_offsets = []
+    key_hashes = []
+    postings: dict[int, list[int]] = {}
+    for rec_id, (title, year, kind, key) in enumerate(_read_tsv(tsv_path)):
+        grams = title_trigrams(key)
+        for gram in grams:
+            postings.setdefault(_hash(gram), []).append(rec_id)
+        title_b = title.encode("utf-8")
+        key_b = key.encode("utf-8")
+        rec_offsets.append(len(records))
+        records += RECORD.pack(min(year, 0xFFFF), kind, len(grams), len(title_b))
+        records += title_b + U16.pack(len(key_b)) + key_b
+        key_hashes.append(_hash(key))
+
+    n_records = len(rec_offsets)
+    n_slots = 1
+    while n_slots < max(8, n_records * 2):
+        n_slots *= 2
+    slots = [(0, 0)] * n_slots
+    for rec_id, h in enumerate(key_hashes):
+        i = h & (n_slots - 1)
+        while slots[i][1]:
+            i = (i + 1) & (n_slots - 1)
+        slots[i] = (h, rec_id + 1)
+
+    gram_table = bytearray()
+    posting_data = bytearray()
+    start = 0
+    for gram_hash in sorted(postings):
+        ids = postings[gram_hash]
+        gram_table += GRAM.pack(gram_hash, start, len(ids))
+        posting_data += struct.pack(f"<{len(ids)}I", *ids)
+        start += len(ids)
+
+    records_off = HEADER.size
+    rec_offs_off = records_off + len(records)
+    slots_off = rec_offs_off + U64.size * n_records
+    grams_off = slots_off + SLOT.size * n_slots
+    postings_off = grams_off + len(gram_table)
+
+    tmp_path = index_path.with_name(index_path.name + ".tmp")
+    with open(tmp_path, "wb") as f:
+        f.write(
+            HEADER.pack(
+                MAGIC,
+                n_records,
+                n_slots,
+                len(postings),
+                rec_offs_off,
+                slots_off,
+                grams_off,
+                postings_off,
+            )
+        )
+        f.write(records)
+        f.write(b"".join(U64.pack(records_off + off) for off in rec_offsets))
+        f.write(b"".join(SLOT.pack(h, r) for h, r in slots))
+        f.write(gram_table)
+        f.write(posting_data)
+    tmp_path.replace(index_path)
+    return index_path
+
+
+class TitleIndex:
+    """Read-only, mmap-backed view of a compiled title index."""
+
+    def __init__(self, index_path: Path):
+        with open(index_path, "rb") as f:
+            self._mm = mmap.mmap(f.fileno(), 0, access=mmap.ACCESS_READ)
+        try:
+            (
+                magic,
+                self.n_records,
+                self._n_slots,
+                self._n_grams,
+                self._rec_offs_off,
+                self._slots_off,
+                self._grams_off,
+                self._postings_off,
+            ) = HEADER.unpack_from(self._mm, 0)
+            if magic != MAGIC:
+                raise ValueError(f"Not a title index: {index_path}")
+            if self._size() != len(self._mm):
+                raise ValueError(f"Truncated or corrupt title index: {index_path}")
+        except struct.error:
+            self._mm.close()
+            raise ValueError(f"Truncated or corrupt title index: {index_path}") from None
+        except ValueError:
+            self._mm.close()
+            raise
+
+    def _size(self) -> int:
+        """Return the file size the header's counts and offsets describe."""
+        if not (
+            HEADER.size <= self._rec_offs_off
+            and self._slots_off == self._rec_offs_off + U64.size * self.n_records
+            and self._grams_off == self._slots_off + SLOT.size * self._n_slots
+            and self._postings_off == self._grams_off + GRAM.size * self._n_grams
+        ):
+            return -1
+        n_postings = 0
+        if self._n_grams:
+            last = self._grams_off + (self._n_grams - 1) * GRAM.size
+            _, start, count = GRAM.unpack_from(self._mm, last)
+            n_postings = start + count
+        return self._postings_off + U32.size * n_postings
+
+    def close(self) -> None:
+        self._mm.close()
+
+    def __enter__(self):
+        return self
+
+    def __exit__(self, *exc):
+        self.close()
+
+    def _record(self, rec_id: int) -> tuple[str, int, int, int, str]:
+        """Return (title, year, kind, gram count, key) for rec_id."""
+        mm = self._mm
+        (off,) = U64.unpack_from(mm, self._rec_offs_off + rec_id * U64.size)
+        year, kind, n_grams, title_len = RECORD.unpack_from(mm, off)
+        off += RECORD.size
+        title = mm[off : off + title_len].decode("utf-8")
+        off += title_len
+        (key_len,) = U16.unpack_from(mm, off)
+        key = mm[off + 2 : off + 2 + key_len].decode("utf-8")
+        return title, year, kind, n_grams, key
+
+    def _exact(self, key: str) -> list[int]:
+        h = _hash(key)
+        mask = self._n_slots - 1
+        i = h & mask
+        found = []
+        while True:
+            slot_hash, rec = SLOT.unpack_from(self._mm, self._slots_off + i * SLOT.size)
+            if not rec:
+                return found
+            if slot_hash == h and self._record(rec - 1)[4] == key:
+                found.append(rec - 1)
+            i = (i + 1) & mask
+
+    def _postings(self, gram_hash: int) -> tuple[int, int] | None:
+        lo, hi = 0, self._n_grams
+        while lo < hi:
+            mid = (lo + hi) // 2
+            h, start, count = GRAM.unpack_from(self._mm, self._grams_off + mid * GRAM.size)
+            if h == gram_hash:
+                return start, count
+            if h < gram_hash:
+                lo = mid + 1
+            else:
+                hi = mid
+        return None
+
+    def _fuzzy(self, key: str, threshold: float) -> list[tuple[float, int]]:
+        grams = title_trigrams(key)
+        counts: dict[int, int] = {}
+        for gram in grams:
+            found = self._postings(_hash(gram))
+            if found is None or found[1] > MAX_POSTINGS:
+                continue
+            start, count = found
+            ids = struct.unpack_from(f"<{count}I", self._mm, self._postings_off + start * U32.size)
+            for rec_id in ids:
+                counts[rec_id] = counts.get(rec_id, 0) + 1
+        scored = []
+        for rec_id, common in counts.items():
+            n_grams = self._record(rec_id)[3]
+            score = 2 * common / (len(grams) + n_grams)
+            if score >= threshold:
+                scored.append((score, rec_id))
+        return scored
+
+    def lookup(
+        self,
+        title: str,
+        year: int | None = None,
+        kind: str = "",
+        threshold: float = FUZZY_THRESHOLD,
+    ) -> dict | None:
+        """Resolve title to its canonical entry.
+
+        Returns a dict with keys title, year, kind, score (1.0 for exact key
+        matches), or None if nothing scores at least threshold. When several
+        entries match, one of the requested kind and the closest year wins.
+        Raises ValueError if the index records are corrupt.
+        """
+        key = normalize_title_key(title)
+        if not key:
+            return None
+        try:
+            return self._lookup(key, year, kind, threshold)
+        except (struct.error, UnicodeDecodeError):
+            raise ValueError("Corrupt title index") from None
+
+    def _lookup(self, key: str, year: int | None, kind: str, threshold: float) -> dict | None:
+        candidates = [(1.0, rec_id) for rec_id in self._exact(key)]
+        if not candidates:
+            candidates = self._fuzzy(key, threshold)
+        want_kind = KINDS.get(kind, 0)
+
+        best = None
+        best_rank = None
+        for score, rec_id in candidates:
+            rec_title, rec_year, rec_kind, _, _ = self._record(rec_id)
+            if want_kind and rec_kind and rec_kind != want_kind:
+                continue
+            year_gap = abs(rec_year - year) if year and rec_year else 0
+            rank = (-score, year_gap, rec_id)
+            if best_rank is None or rank < best_rank:
+                best_rank = rank
+                best = {
+                    "title": rec_title,
+                    "year": rec_year or None,
+                    "kind": KIND_NAMES[rec_kind],
+                    "score": score,
+                }
+        return best
+
+
+def open_title_index(tsv_path: Path) -> TitleIndex:
+    """Open the index for tsv_path, (re)building it first if missing or stale."""
+    index_path = tsv_path.with_name(tsv_path.name + INDEX_SUFFIX)
+    if not index_path.exists() or index_path.stat().st_mtime < tsv_path.stat().st_mtime:
+        build_index(tsv_path, index_path)
+    return TitleIndex(index_path)
+
+
+def resolve_tv_info(info: dict, index: TitleIndex) -> dict:
+    """Return a copy of parse_tv_filename() info with the show name made canonical."""
+    match = index.lookup(info["show"], kind="tv")
+    return {**info, "show": match["title"]} if match else info
+
+
+def resolve_movie_info(info: dict, index: TitleIndex) -> dict:
+    """Return a copy of parse_movie_filename() info with canonical title and year."""
+    match = index.lookup(info["title"], year=info.get("year"), kind="movie")
+    if not match:
+        return info
+    return {**info, "title": match["title"], "year": match["year"] or info.get("year")}
+
+
+if __name__ == "__main__":  # pragma: no cover
+    if len(sys.argv) != 2:
+        print("usage: python titleindex.py TITLES.tsv")
+        sys.exit(1)
+    path = build_index(Path(sys.argv[1]))
+    print(f"Index written to {path}")
@@ -0,0 +1,190 @@
+"""Moving files to another filesystem, where a rename is impossible.
+
+os.rename() fails with EXDEV when the target directory is on another mount
+(an organize target that is a mount point or a symlink to another volume).
+move_across_devices() copies the file instead, in CHUNK_SIZE pieces spread
+over a few threads, using the kernel's zero-copy paths where the platform has
+them: copy_file_range(), then sendfile(), then plain reads and writes.
+
+The copy goes to a hidden partial file next to the target, and a journal
+beside it records each chunk once it has been flushed to disk. If the move is
+interrupted, the next attempt for the same unchanged source skips the
+journalled chunks. The source is only removed after every chunk is in the
+journal, the copy has the right size (and, optionally, the same content hash)
+and carries its timestamps.
+"""
+
+import errno
+import os
+import shutil
+import threading
+from concurrent.futures import ThreadPoolExecutor
+from pathlib import Path
+
+from hashing import hash_file
+
+CHUNK_SIZE = 64 * 1024 * 1024
+COPY_WORKERS = 4
+PARTIAL_SUFFIX = ".renametool-part"
+JOURNAL_SUFFIX = ".renametool-journal"
+_FALLBACK_BUFFER = 1024 * 1024
+
+# Errors meaning "this copy primitive does not work for these two files"
+_UNSUPPORTED = {
+    errno.EXDEV,  # copy_file_range across filesystems before Linux 5.3
+    errno.ENOSYS,
+    errno.EOPNOTSUPP,
+    errno.ENOTSOCK,  # sendfile to a regular file on macOS
+    getattr(errno, "ENOTSUP", errno.EOPNOTSUPP),
+}
+
+# Primitives found not to work between two filesystems, keyed by (source
+# st_dev, target st_dev, name), are skipped for later chunks between them
+_disabled: set[tuple[int, int, str]] = set()
+
+
+def _copy_file_range(src_fd: int, dst_fd: int, offset: int, count: int) -> int:
+    return os.copy_file_range(src_fd, dst_fd, count, offset, offset)
+
+
+def _sendfile(src_fd: int, dst_fd: int, offset: int, count: int) -> int:
+    os.lseek(dst_fd, offset, os.SEEK_SET)
+    return os.sendfile(dst_fd, src_fd, offset, count)
+
+
+def _read_write(src_fd: int, dst_fd: int, offset: int, count: int) -> int:
+    os.lseek(src_fd, offset, os.SEEK_SET)
+    data = os.read(src_fd, min(count, _FALLBACK_BUFFER))
+    os.lseek(dst_fd, offset, os.SEEK_SET)
+    view = memoryview(data)
+    while view:
+        view = view[os.write(dst_fd, view) :]
+    return len(data)
+
+
+_METHODS = [
+    (name, func)
+    for name, func, available in (
+        ("copy_file_range", _copy_file_range, hasattr(os, "copy_file_range")),
+        ("sendfile", _sendfile, hasattr(os, "sendfile")),
+        ("read_write", _read_write, True),
+    )
+    if available
+]
+
+
+def _copy_chunk(src: Path, dst: Path, offset: int, count: int) -> None:
+    """Copy count bytes at offset from src into the same offset of dst, then flush dst."""
+    binary = getattr(os, "O_BINARY", 0)
+    src_fd = os.open(src, os.O_RDONLY | binary)
+    try:
+        dst_fd = os.open(dst, os.O_WRONLY | binary)
+        try:
+            devices = (os.fstat(src_fd).st_dev, os.fstat(dst_fd).st_dev)
+            end = offset + count
+            for name, method in _METHODS:
+                if (*devices, name) in _disabled:
+                    continue
+                try:
+                    while offset < end:
+                        n = method(src_fd, dst_fd, offset, end - offset)
+                        if n == 0:
+                            raise OSError(errno.EIO, "Source ended early", str(src))
+                        offset += n
+                    break
+                except OSError as e:
+                    if e.errno not in _UNSUPPORTED or name == "read_write":
+                        raise
+                    _disabled.add((*devices, name))
+            os.fsync(dst_fd)
+        finally:
+            os.close(dst_fd)
+    finally:
+        os.close(src_fd)
+
+
+def _journal_header(st: os.stat_result) -> str:
+    return f"{st.st_size} {st.st_mtime_ns} {CHUNK_SIZE}\n"
+
+
+def _load_journal(journal: Path, partial: Path, header: str) -> set[int]:
+    """Return the offsets already copied for this source, or an empty set to start over."""
+    try:
+        with open(journal, encoding="utf-8") as f:
+            lines = f.readlines()
+    except OSError:
+        return set()
+    if not lines or lines[0] != header or not partial.exists():
+        return set()
+    done = set()
+    for line in lines[1:]:
+        if line.endswith("\n") and line[:-1].isdigit():
+            done.add(int(line))
+    return done
+
+
+def move_across_devices(
+    src: Path,
+    dst: Path,
+    *,
+    verify: bool = False,
+    workers: int = COPY_WORKERS,
+) -> None:
+    """Move src to dst on another filesystem by copying, then removing src.
+
+    Resumes an interrupted move of the same (unchanged) source. With verify,
+    the copy's content hash must match the source's as well as its size.
+    Raises FileExistsError if dst appears meanwhile and OSError on any other
+    failure; src is only removed once dst is complete.
+    """
+    st = os.stat(src)
+    partial = dst.with_name(f".{dst.name}{PARTIAL_SUFFIX}")
+    journal = dst.with_name(f".{dst.name}{JOURNAL_SUFFIX}")
+    header = _journal_header(st)
+    done = _load_journal(journal, partial, header)
+    if not done:
+        with open(journal, "w", encoding="utf-8") as f:
+            f.write(header)
+    with open(partial, "r+b" if done else "wb") as f:
+        f.truncate(st.st_size)
+
+    lock = threading.Lock()
+
+    def copy(offset: int) -> None:
+        _copy_chunk(src, partial, offset, min(CHUNK_SIZE, st.st_size - offset))
+        with lock, open(journal, "a", encoding="utf-8") as f:
+            f.write(f"{offset}\n")
+
+    todo = [offset for offset in range(0, st.st_size, CHUNK_SIZE) if offset not in done]
+    if len(todo) > 1 and workers > 1:
+        with ThreadPoolExecutor(max_workers=min(workers, len(todo))) as pool:
+            list(pool.map(copy, todo))
+    else:
+        for offset in todo:
+            copy(offset)
+
+    after = os.stat(src)
+    if (after.st_size, after.st_mtime_ns) != (st.st_size, st.st_mtime_ns):
+        partial.unlink()
+        journal.unlink()
+        raise OSError(errno.EAGAIN, "Source changed while it was being copied", str(src))
+    # The partial file was pre-sized, so its size alone says nothing about
+    # whether every chunk was written; the journal does
+    missing = set(range(0, st.st_size, CHUNK_SIZE)) - _load_journal(journal, partial, header)
+    if missing:
+        raise OSError(errno.EIO, f"Copy is missing {len(missing)} chunk(s)", str(partial))
+    if os.stat(partial).st_size != st.st_size:
+        raise OSError(errno.EIO, "Copy has the wrong size", str(partial))
+    if verify and hash_file(partial) != hash_file(src):
+        partial.unlink()
+        journal.unlink()
+        raise OSError(errno.EIO, "Copy does not match the source", str(partial))
+    shutil.copystat(src, partial)
+    if os.path.lexists(dst):
+        raise FileExistsError(errno.EEXIST, "Target already exists", str(dst))
+    os.rename(partial, dst)
+    journal.unlink()
+    try:
+        os.unlink(src)
+    except OSError as e:
+        raise OSError(e.errno, f"Copied to {dst} but could not remove the source", str(src)) from e